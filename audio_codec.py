@@ -0,0 +1,154 @@
+# audio_codec.py
+"""
+Per-frame audio work for the Exotel transport, vectorised.
+
+Exotel streams 16-bit linear PCM at 8 kHz as base64 in JSON, 20 ms per
+message in each direction, so everything here runs about 50 times a second
+per direction for every call:
+- ExotelSerializer: pipecat's ExotelFrameSerializer runs every audio frame
+  through a stream resampler, even when it is already at 8 kHz, and builds
+  and JSON-encodes a dict for every outbound frame. Here 8 kHz audio goes
+  straight to and from base64, and the outbound message is a prebuilt
+  template around the payload. Other events and rates go to pipecat.
+- PcmWindowBuffer: the VAD needs 256-sample windows plus the 32 samples
+  before them, as float32. VADAnalyzer concatenated and re-sliced a bytes
+  buffer for every frame, and Silero converted and concatenated every
+  window again. This buffer is allocated once per call: incoming PCM is
+  converted into it in place, and each window is a view of it that already
+  has its context in front.
+- pcm_volume(): the same loudness as pipecat's calculate_audio_volume(),
+  which builds a pyloudnorm Meter (and its K-weighting filter coefficients)
+  for every window. The filter is designed once per sample rate here and
+  the one-block loudness is computed directly.
+
+PooledSileroVADAnalyzer (vad_engine.py) uses the buffer and pcm_volume().
+benchmarks/bench_audio_path.py measures per-frame CPU time and allocations
+for both paths at 100 streams.
+"""
+import base64
+import json
+from functools import lru_cache
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import pyloudnorm
+from scipy.signal import lfilter
+
+from pipecat.audio.utils import normalize_value
+from pipecat.frames.frames import AudioRawFrame, Frame, InputAudioRawFrame
+from pipecat.serializers.exotel import ExotelFrameSerializer
+
+INT16_SCALE = 1.0 / 32768.0
+# pipecat measures loudness on int16-scaled samples; ours are scaled to [-1, 1)
+_INT16_GAIN_DB = 20.0 * np.log10(32768.0)
+_LOUDNESS_GATE = -70.0  # BS.1770 absolute gate, LUFS
+_LOUDNESS_RANGE = (-20.0, 80.0)  # what pipecat normalises to 0..1
+
+
+class ExotelSerializer(ExotelFrameSerializer):
+    """ExotelFrameSerializer without resampling or JSON building for 8 kHz media frames."""
+
+    def __init__(
+        self,
+        stream_sid: str,
+        call_sid: Optional[str] = None,
+        params: Optional[ExotelFrameSerializer.InputParams] = None,
+    ):
+        super().__init__(stream_sid, call_sid=call_sid, params=params)
+        self._media_prefix = f'{{"event": "media", "streamSid": {json.dumps(stream_sid)}, "media": {{"payload": "'
+
+    async def serialize(self, frame: Frame) -> str | bytes | None:
+        if isinstance(frame, AudioRawFrame) and frame.sample_rate == self._exotel_sample_rate:
+            if not frame.audio:
+                return None
+            return self._media_prefix + base64.b64encode(frame.audio).decode("ascii") + '"}}'
+        return await super().serialize(frame)
+
+    async def deserialize(self, data: str | bytes) -> Frame | None:
+        message = json.loads(data)
+        if message.get("event") != "media" or self._sample_rate != self._exotel_sample_rate:
+            return await super().deserialize(data)
+        payload = base64.b64decode(message["media"]["payload"])
+        if not payload:
+            return None
+        return InputAudioRawFrame(audio=payload, num_channels=1, sample_rate=self._sample_rate)
+
+
+class PcmWindowBuffer:
+    """
+    Preallocated float32 buffer that cuts 16-bit PCM into model windows.
+
+    windows() yields views of `context + window` samples: the window and the
+    samples just before it. A view is only valid until the next write().
+    """
+
+    def __init__(self, window: int, context: int, capacity_windows: int = 8):
+        self.window = window
+        self.context = context
+        self._data = np.zeros(context + window * capacity_windows, dtype=np.float32)
+        self._start = context  # first sample not yet handed out
+        self._end = context  # one past the last sample written
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def write(self, pcm: bytes) -> None:
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        n = len(samples)
+        if self._end + n > len(self._data):
+            self._compact(n)
+        out = self._data[self._end : self._end + n]
+        out[:] = samples
+        out *= INT16_SCALE
+        self._end += n
+
+    def _compact(self, incoming: int) -> None:
+        # Keep the unread samples and the context in front of them
+        keep = self._data[self._start - self.context : self._end]
+        needed = len(keep) + incoming
+        if needed > len(self._data):
+            data = np.zeros(max(needed, 2 * len(self._data)), dtype=np.float32)
+        else:
+            data = self._data
+        data[: len(keep)] = keep  # numpy copies overlapping ranges safely
+        self._data = data
+        self._end = len(keep)
+        self._start = self.context
+
+    def windows(self) -> Iterator[np.ndarray]:
+        while self._end - self._start >= self.window:
+            start = self._start
+            self._start += self.window
+            yield self._data[start - self.context : start + self.window]
+
+    def zero_context(self) -> None:
+        """Forget the samples before the next window (the model's state was reset)."""
+        self._data[self._start - self.context : self._start] = 0.0
+
+    def clear(self) -> None:
+        self._start = self._end = self.context
+        self.zero_context()
+
+
+@lru_cache(maxsize=None)
+def _k_weighting(sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    # pyloudnorm's two K-weighting stages, merged into one filter
+    meter = pyloudnorm.Meter(sample_rate)
+    b, a, gain = np.array([1.0]), np.array([1.0]), 1.0
+    for stage in meter._filters.values():
+        stage_b, stage_a = stage.generate_coefficients()
+        b, a, gain = np.convolve(b, stage_b), np.convolve(a, stage_a), gain * stage.passband_gain
+    return b * gain, a
+
+
+def pcm_volume(samples: np.ndarray, sample_rate: int) -> float:
+    """calculate_audio_volume() for one window of samples in [-1, 1): 0 (quiet) to 1 (loud)."""
+    b, a = _k_weighting(sample_rate)
+    filtered = lfilter(b, a, samples)
+    power = float(np.dot(filtered, filtered)) / len(filtered)
+    if power <= 0.0:
+        return 0.0
+    loudness = -0.691 + 10.0 * np.log10(power) + _INT16_GAIN_DB
+    if loudness < _LOUDNESS_GATE:
+        return 0.0
+    return normalize_value(float(loudness), *_LOUDNESS_RANGE)
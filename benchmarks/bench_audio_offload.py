@@ -0,0 +1,151 @@
+# benchmarks/bench_audio_offload.py
+"""
+Event-loop lag and VAD latency with AUDIO_OFFLOAD=call (a VAD thread per
+call, pipecat's default) against AUDIO_OFFLOAD=pool (vad_engine.py's
+shared engine threads), for a range of concurrent calls.
+
+Each simulated call is a task on one event loop that, every 20 ms in real
+time, decodes an inbound Exotel media message (audio_codec.ExotelSerializer),
+runs the frame through its PooledSileroVADAnalyzer with analyze_audio(),
+the way the input transport does, and encodes an outbound frame every
+other tick. The caller's audio is load_calls' synthetic voice, 1.2 s of
+speech then 0.8 s of silence, so the VAD goes through every state. Every
+mode sees the same audio, and the benchmark checks that they reach the
+same VAD states (with the model's periodic, wall-clock state reset off).
+
+Per mode and call count it reports:
+- loop lag: p50/p99/max of how late loop_monitor.py's 50 ms probe woke up;
+- VAD wait: p50/p99 of each analyze_audio() call as the call's task saw it;
+- CPU: process time as % of one core, and the threads alive at the end.
+
+Usage:
+    python -m benchmarks.bench_audio_offload [--calls 10 50 100] [--seconds 6] [--threads 1 2]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import threading
+import time
+
+import numpy as np
+
+from pipecat.audio.vad.vad_analyzer import VADParams
+from pipecat.frames.frames import OutputAudioRawFrame, StartFrame
+
+from audio_codec import ExotelSerializer
+from benchmarks.load_calls import synthetic_voice
+from benchmarks.load_workers import FRAME_SAMPLES, FRAME_SECS, SAMPLE_RATE
+from loop_monitor import LoopLagMonitor
+import vad_engine
+from vad_engine import PooledSileroVADAnalyzer, SileroVADEngine
+
+# bot.py's VAD settings
+VAD_PARAMS = VADParams(confidence=0.6, start_secs=0.25, stop_secs=0.5, min_volume=0.3)
+
+
+def caller_audio(seconds: float, seed: int) -> np.ndarray:
+    speech, pause = int(1.2 * SAMPLE_RATE), int(0.8 * SAMPLE_RATE)
+    voice = synthetic_voice(seconds, seed)
+    audio = np.zeros_like(voice)
+    for start in range(0, len(voice), speech + pause):
+        audio[start : start + speech] = voice[start : start + speech]
+    return audio
+
+
+async def run_call(analyzer, serializer, audio: np.ndarray, start: float, waits: list) -> list:
+    states = []
+    outbound = OutputAudioRawFrame(audio=bytes(2 * 2 * FRAME_SAMPLES), sample_rate=SAMPLE_RATE, num_channels=1)
+    for i in range(len(audio) // FRAME_SAMPLES):
+        delay = start + i * FRAME_SECS - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        pcm = audio[i * FRAME_SAMPLES : (i + 1) * FRAME_SAMPLES].tobytes()
+        message = json.dumps({"event": "media", "media": {"payload": base64.b64encode(pcm).decode()}})
+        frame = await serializer.deserialize(message)
+        before = time.perf_counter()
+        states.append(await analyzer.analyze_audio(frame.audio))
+        waits.append(time.perf_counter() - before)
+        if i % 2:
+            await serializer.serialize(outbound)
+    return states
+
+
+async def run_mode(mode: str, threads: int, calls: int, seconds: float) -> dict:
+    engine = SileroVADEngine(threads=threads)
+    engine.warm_up()
+    analyzers, serializers, audios = [], [], []
+    for i in range(calls):
+        analyzer = PooledSileroVADAnalyzer(engine=engine, sample_rate=SAMPLE_RATE, params=VAD_PARAMS, offload=mode)
+        analyzer.set_sample_rate(SAMPLE_RATE)
+        serializer = ExotelSerializer(stream_sid=f"stream-{i}")
+        await serializer.setup(StartFrame(audio_in_sample_rate=SAMPLE_RATE, audio_out_sample_rate=SAMPLE_RATE))
+        analyzers.append(analyzer)
+        serializers.append(serializer)
+        audios.append(caller_audio(seconds, seed=i))
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    waits: list = []
+    cpu, wall = time.process_time(), time.perf_counter()
+    start = wall + 0.1
+    # Stagger the calls across one frame, as independent callers would be
+    results = await asyncio.gather(
+        *(
+            run_call(analyzer, serializer, audio, start + FRAME_SECS * i / calls, waits)
+            for i, (analyzer, serializer, audio) in enumerate(zip(analyzers, serializers, audios))
+        )
+    )
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    await monitor.stop()
+    alive = threading.active_count()
+    for analyzer in analyzers:
+        analyzer._executor.shutdown(wait=False)
+    engine.close()
+
+    lags = np.array(monitor.recent) * 1000
+    waits = np.array(waits) * 1000
+    return {
+        "states": results,
+        "lag": (np.percentile(lags, 50), np.percentile(lags, 99), lags.max()),
+        "wait": (np.percentile(waits, 50), np.percentile(waits, 99)),
+        "cpu": 100 * cpu / wall,
+        "threads": alive,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--seconds", type=float, default=6.0)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2], help="engine threads for the pool mode")
+    args = parser.parse_args()
+    # The model's periodic state reset follows the wall clock, so it would
+    # land on different windows in each run; without it the modes must agree
+    vad_engine._MODEL_RESET_STATES_TIME = float("inf")
+
+    modes = [("call", 1)] + [("pool", threads) for threads in args.threads]
+    print(f"{args.seconds:g} s of caller audio per call, 20 ms frames in real time\n")
+    print(
+        f"{'calls':>5} {'mode':<7} {'lag p50 ms':>10} {'p99':>6} {'max':>6} "
+        f"{'VAD wait p50 ms':>15} {'p99':>6} {'CPU %':>6} {'threads':>7}"
+    )
+    for calls in args.calls:
+        reference = None
+        for mode, threads in modes:
+            result = asyncio.run(run_mode(mode, threads, calls, args.seconds))
+            name = mode if mode == "call" else f"pool/{threads}"
+            lag, wait = result["lag"], result["wait"]
+            print(
+                f"{calls:>5} {name:<7} {lag[0]:>10.2f} {lag[1]:>6.2f} {lag[2]:>6.1f} "
+                f"{wait[0]:>15.3f} {wait[1]:>6.2f} {result['cpu']:>6.0f} {result['threads']:>7}"
+            )
+            if reference is None:
+                reference = result["states"]
+            elif result["states"] != reference:
+                print(f"      {name}: VAD states differ from call mode")
+        print()
+
+
+if __name__ == "__main__":
+    main()
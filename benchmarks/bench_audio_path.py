@@ -0,0 +1,178 @@
+# benchmarks/bench_audio_path.py
+"""
+Per-frame CPU time and allocations of the Exotel audio path: pipecat's
+ExotelFrameSerializer and VADAnalyzer bytes buffering with pyloudnorm volume
+(stock) versus audio_codec.py (vectorised).
+
+--streams simulated calls run side by side, one 20 ms tick at a time. On
+each tick every stream:
+- decodes one inbound Exotel media message (JSON + base64, 160 samples);
+- runs it through its PooledSileroVADAnalyzer: the stock path is
+  VADAnalyzer._run_analyzer(), the vectorised one the analyzer's own;
+- every other tick, encodes one 40 ms outbound frame, the size the output
+  transport sends (audio_out_10ms_chunks=4).
+The caller's audio is load_calls' synthetic voice with pauses, so the VAD
+goes through every state. Both paths see the same audio, and the benchmark
+checks that they reach the same VAD states and volumes.
+
+CPU is process time (it includes the Silero engine thread, the same for
+both paths) per inbound frame, split by stage. Allocations come from a
+second, shorter run under tracemalloc: the memory allocated and freed
+again within a frame (peak over the steady state) and what is still held
+after it.
+
+Usage:
+    python -m benchmarks.bench_audio_path [--streams 100] [--seconds 5]
+"""
+import argparse
+import asyncio
+import base64
+import gc
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams
+from pipecat.frames.frames import OutputAudioRawFrame, StartFrame
+from pipecat.serializers.exotel import ExotelFrameSerializer
+
+from audio_codec import ExotelSerializer
+from benchmarks.load_calls import synthetic_voice
+from vad_engine import PooledSileroVADAnalyzer, get_vad_engine
+
+SAMPLE_RATE = 8000
+FRAME_BYTES = 320  # 20 ms inbound
+OUT_FRAME_BYTES = 640  # 40 ms outbound
+STAGES = ("decode", "vad", "encode")
+
+
+def _caller_audio(seconds: float, seed: int) -> bytes:
+    silence = np.zeros(int(0.6 * SAMPLE_RATE), dtype=np.int16)
+    parts, total = [], 0
+    while total < seconds * SAMPLE_RATE:
+        parts += [synthetic_voice(1.2, seed=seed + len(parts)), silence]
+        total += len(parts[-2]) + len(silence)
+    return np.concatenate(parts)[: int(seconds * SAMPLE_RATE)].tobytes()
+
+
+def _media_messages(audio: bytes, stream_sid: str) -> list:
+    return [
+        json.dumps(
+            {
+                "event": "media",
+                "stream_sid": stream_sid,
+                "media": {"payload": base64.b64encode(audio[i : i + FRAME_BYTES]).decode("ascii")},
+            }
+        )
+        for i in range(0, len(audio) - FRAME_BYTES + 1, FRAME_BYTES)
+    ]
+
+
+class Stream:
+    def __init__(self, kind: str, index: int, audio: bytes):
+        sid = f"stream-{index}"
+        self.serializer = (ExotelFrameSerializer if kind == "stock" else ExotelSerializer)(sid)
+        self.vad = PooledSileroVADAnalyzer(
+            params=VADParams(confidence=0.6, start_secs=0.25, stop_secs=0.5, min_volume=0.3)
+        )
+        self.vad.set_sample_rate(SAMPLE_RATE)
+        # The analyzer resets its model state every 5 s of wall time; the two
+        # paths would reset on different frames and stop being comparable
+        self.vad._last_reset_time = float("inf")
+        self.run_vad = (lambda pcm: VADAnalyzer._run_analyzer(self.vad, pcm)) if kind == "stock" else self.vad._run_analyzer
+        self.messages = _media_messages(audio, sid)
+        self.reply = OutputAudioRawFrame(audio=audio[:OUT_FRAME_BYTES], sample_rate=SAMPLE_RATE, num_channels=1)
+        self.trace = []
+
+    async def start(self) -> None:
+        await self.serializer.setup(StartFrame(audio_in_sample_rate=SAMPLE_RATE, audio_out_sample_rate=SAMPLE_RATE))
+
+
+async def run_path(kind: str, streams_n: int, seconds: float, ticks: int = 0, traced: bool = False) -> dict:
+    streams = [Stream(kind, i, _caller_audio(seconds, seed=i)) for i in range(streams_n)]
+    for stream in streams:
+        await stream.start()
+    ticks = ticks or len(streams[0].messages)
+    cpu = {stage: 0 for stage in STAGES}
+    transient = held = 0
+    clock = time.process_time_ns
+
+    gc.collect()
+    gc.disable()
+    if traced:
+        tracemalloc.start()
+    try:
+        for tick in range(ticks):
+            for stream in streams:
+                if traced:
+                    before, _ = tracemalloc.get_traced_memory()
+                    tracemalloc.reset_peak()
+                t0 = clock()
+                frame = await stream.serializer.deserialize(stream.messages[tick])
+                t1 = clock()
+                state = stream.run_vad(frame.audio)
+                t2 = clock()
+                if tick % 2 == 0:
+                    await stream.serializer.serialize(stream.reply)
+                t3 = clock()
+                cpu["decode"] += t1 - t0
+                cpu["vad"] += t2 - t1
+                cpu["encode"] += t3 - t2
+                del frame
+                if traced:
+                    after, peak = tracemalloc.get_traced_memory()
+                    transient += peak - before
+                    held += after - before
+                else:
+                    stream.trace.append((state, stream.vad.volume))
+    finally:
+        if traced:
+            tracemalloc.stop()
+        gc.enable()
+
+    frames = ticks * streams_n
+    return {
+        "us": {stage: ns / frames / 1000 for stage, ns in cpu.items()},
+        "transient_bytes": transient / frames,
+        "held_bytes": held / frames,
+        "trace": [stream.trace for stream in streams],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=5.0, help="audio seconds per stream")
+    parser.add_argument("--traced-ticks", type=int, default=50, help="ticks measured under tracemalloc")
+    args = parser.parse_args()
+
+    get_vad_engine().warm_up()
+    rows = {}
+    for kind in ("stock", "vectorised"):
+        timed = asyncio.run(run_path(kind, args.streams, args.seconds))
+        traced = asyncio.run(run_path(kind, args.streams, args.seconds, ticks=args.traced_ticks, traced=True))
+        rows[kind] = (timed, traced)
+
+    stock, fast = rows["stock"][0]["trace"], rows["vectorised"][0]["trace"]
+    same_states = all(a[0] == b[0] for s, f in zip(stock, fast) for a, b in zip(s, f))
+    volume_diff = max(abs(a[1] - b[1]) for s, f in zip(stock, fast) for a, b in zip(s, f))
+
+    print(f"{args.streams} streams x {args.seconds:g} s; per 20 ms inbound frame (vad includes Silero inference)")
+    print(
+        f"{'path':<11} {'decode us':>10} {'vad us':>8} {'encode us':>10} {'total us':>9} "
+        f"{f'core % @{args.streams}':>12} {'alloc B/frame':>14} {'held B/frame':>13}"
+    )
+    for kind, (timed, traced) in rows.items():
+        us = timed["us"]
+        total = sum(us.values())
+        print(
+            f"{kind:<11} {us['decode']:>10.1f} {us['vad']:>8.1f} {us['encode']:>10.1f} {total:>9.1f} "
+            f"{total * 50 * args.streams / 1e4:>12.1f} {traced['transient_bytes']:>14.0f} {traced['held_bytes']:>13.1f}"
+        )
+    print(f"same VAD states: {same_states}; largest volume difference: {volume_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
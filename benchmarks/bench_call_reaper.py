@@ -0,0 +1,231 @@
+# benchmarks/bench_call_reaper.py
+"""
+Idle-call reaping (call_reaper.py): what the thresholds would do to real
+calls, and how closely the reaper keeps to them.
+
+1. Replays logs/bot.log (or --log). For each call it finds the time to the
+   customer's first speech, the longest stretch where neither side was
+   speaking, and the call's length. It reports which calls the current
+   thresholds (FIRST_SPEECH_TIMEOUT_SECS, SILENCE_TIMEOUT_SECS,
+   MAX_CALL_SECS) would have ended, and why.
+2. Runs --calls CallReapers at once on one event loop, with short
+   thresholds of their own (--first-speech-secs, --silence-secs,
+   --max-call-secs) so the run takes seconds. Each call gets 20 ms audio frames in real time
+   and follows one of four scripts:
+   - silent: the customer never speaks (no_first_speech);
+   - voicemail: 2 s of a recorded message, then dead air (silence);
+   - talker: turns back and forth without a pause (max_duration);
+   - normal: a few turns, then the bot ends the call (not reaped).
+   It reports the reasons given against the expected ones, how late each
+   call was reaped against its threshold, and the time spent in the
+   reaper per audio frame.
+
+Usage:
+    python -m benchmarks.bench_call_reaper [--log logs/bot.log] [--calls 200] [--silence-secs 1.5]
+"""
+import argparse
+import asyncio
+import re
+import statistics
+import time
+from collections import Counter
+from datetime import datetime
+
+from loguru import logger
+
+from pipecat.clocks.system_clock import SystemClock
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    BotStoppedSpeakingFrame,
+    EndFrame,
+    InputAudioRawFrame,
+    StartFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessorSetup
+from pipecat.utils.asyncio.task_manager import TaskManager, TaskManagerParams
+
+from benchmarks.load_workers import FRAME_SAMPLES, FRAME_SECS, SAMPLE_RATE
+from call_reaper import FIRST_SPEECH_TIMEOUT_SECS, MAX_CALL_SECS, SILENCE_TIMEOUT_SECS, CallReaper
+
+_TS_RE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3})")
+_EVENTS = {
+    "User started speaking": ("user", True),
+    "User stopped speaking": ("user", False),
+    "Bot started speaking": ("bot", True),
+    "Bot stopped speaking": ("bot", False),
+}
+SCRIPTS = ("silent", "voicemail", "talker", "normal")
+EXPECTED = {"silent": "no_first_speech", "voicemail": "silence", "talker": "max_duration", "normal": None}
+
+
+def parse_calls(path: str) -> list[dict]:
+    """Per call: seconds to the first user speech, the longest silence after it, and the length."""
+    calls: list[dict] = []
+    call = None
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if not (ts := _TS_RE.match(line)):
+                continue
+            t = datetime.strptime(ts.group(1), "%Y-%m-%d %H:%M:%S.%f").timestamp()
+            if "Auto-detected transport" in line:
+                call = {"start": t, "end": None, "first_speech": None, "longest_silence": 0.0, "quiet_since": None}
+                call["speaking"] = {"user": False, "bot": False}
+                calls.append(call)
+                continue
+            if call is None or call["end"] is not None:
+                continue
+            if "PipelineRunner finished" in line:
+                call["end"] = t
+                continue
+            for text, (side, speaking) in _EVENTS.items():
+                if text not in line:
+                    continue
+                if side == "user" and speaking and call["first_speech"] is None:
+                    call["first_speech"] = t - call["start"]
+                call["speaking"][side] = speaking
+                quiet = not any(call["speaking"].values())
+                if call["first_speech"] is not None and call["quiet_since"] is not None and not quiet:
+                    call["longest_silence"] = max(call["longest_silence"], t - call["quiet_since"])
+                call["quiet_since"] = t if quiet else None
+    return [call for call in calls if call["end"] is not None]
+
+
+def replay(path: str) -> None:
+    calls = parse_calls(path)
+    print(
+        f"Thresholds: first speech {FIRST_SPEECH_TIMEOUT_SECS:g}s, silence {SILENCE_TIMEOUT_SECS:g}s, "
+        f"max call {MAX_CALL_SECS:g}s; {len(calls)} calls in {path}"
+    )
+    if not calls:
+        return
+    first = [c["first_speech"] for c in calls if c["first_speech"] is not None]
+    print(
+        f"  first speech after: median {statistics.median(first):.1f}s, max {max(first):.1f}s "
+        f"({len(calls) - len(first)} calls with none)"
+    )
+    print(f"  longest silence:    max {max(c['longest_silence'] for c in calls):.1f}s")
+    print(f"  call length:        max {max(c['end'] - c['start'] for c in calls):.1f}s")
+    reaped = Counter()
+    for c in calls:
+        if FIRST_SPEECH_TIMEOUT_SECS and (c["first_speech"] or float("inf")) > FIRST_SPEECH_TIMEOUT_SECS:
+            if c["end"] - c["start"] > FIRST_SPEECH_TIMEOUT_SECS:
+                reaped["no_first_speech"] += 1
+        elif SILENCE_TIMEOUT_SECS and c["longest_silence"] > SILENCE_TIMEOUT_SECS:
+            reaped["silence"] += 1
+        elif MAX_CALL_SECS and c["end"] - c["start"] > MAX_CALL_SECS:
+            reaped["max_duration"] += 1
+    print(f"  would have been reaped: {dict(reaped) or 'none'}")
+
+
+async def run_call(reaper: CallReaper, script: str, horizon: float, start: float, frame_times: list) -> float:
+    """Feed one call's frames until it is reaped or the horizon passes; returns when it ended."""
+    audio = InputAudioRawFrame(audio=bytes(2 * FRAME_SAMPLES), sample_rate=SAMPLE_RATE, num_channels=1)
+    # (start, end, side) speaking spans, in seconds from the start of the call
+    spans = {
+        "silent": [],
+        "voicemail": [(0.3, 2.3, "user")],
+        "talker": [(0.3 + 2 * i, 1.3 + 2 * i, "user") for i in range(100)]
+        + [(1.3 + 2 * i, 2.3 + 2 * i, "bot") for i in range(100)],
+        "normal": [(0.3, 1.0, "user"), (1.0, 2.0, "bot"), (2.2, 3.0, "user"), (3.0, 4.0, "bot")],
+    }[script]
+    await reaper.process_frame(StartFrame(), FrameDirection.DOWNSTREAM)
+    speaking = {"user": False, "bot": False}
+    i = 0
+    while reaper.reason is None:
+        now = time.perf_counter() - start
+        if script == "normal" and now >= 4.5:
+            await reaper.process_frame(EndFrame(), FrameDirection.DOWNSTREAM)
+            break
+        if now >= horizon:
+            break
+        for begin, end, side in spans:
+            active = begin <= now < end
+            if active != speaking[side]:
+                speaking[side] = active
+                if side == "user":
+                    frame = UserStartedSpeakingFrame() if active else UserStoppedSpeakingFrame()
+                    await reaper.process_frame(frame, FrameDirection.DOWNSTREAM)
+                else:
+                    frame = BotStartedSpeakingFrame() if active else BotStoppedSpeakingFrame()
+                    await reaper.process_frame(frame, FrameDirection.UPSTREAM)
+        before = time.perf_counter()
+        await reaper.process_frame(audio, FrameDirection.DOWNSTREAM)
+        frame_times.append(time.perf_counter() - before)
+        i += 1
+        delay = start + i * FRAME_SECS - time.perf_counter()
+        await asyncio.sleep(max(0.0, delay))
+    return time.perf_counter() - start
+
+
+async def _drop(frame, direction=FrameDirection.DOWNSTREAM):
+    pass  # frames are fed straight to process_frame(); nothing downstream to push to
+
+
+async def simulate(calls: int, thresholds: dict) -> None:
+    task_manager = TaskManager()
+    task_manager.setup(TaskManagerParams(loop=asyncio.get_running_loop()))
+    reapers, scripts = [], []
+    for i in range(calls):
+        reaper = CallReaper(
+            first_speech_secs=thresholds["no_first_speech"],
+            silence_secs=thresholds["silence"],
+            max_call_secs=thresholds["max_duration"],
+        )
+        await reaper.setup(FrameProcessorSetup(clock=SystemClock(), task_manager=task_manager))
+        reaper.push_frame = _drop
+        reapers.append(reaper)
+        scripts.append(SCRIPTS[i % len(SCRIPTS)])
+
+    horizon = thresholds["max_duration"] + 2.0
+    frame_times: list = []
+    start = time.perf_counter()
+    ended = await asyncio.gather(
+        *(run_call(r, s, horizon, start, frame_times) for r, s in zip(reapers, scripts))
+    )
+    for reaper in reapers:
+        await reaper.cleanup()
+
+    print(
+        f"\n{calls} calls at once, first speech {thresholds['no_first_speech']:g}s, "
+        f"silence {thresholds['silence']:g}s, max call {thresholds['max_duration']:g}s"
+    )
+    print(f"{'script':<10} {'calls':>5} {'reason':<16} {'as expected':>11} {'late p50 ms':>11} {'max':>6}")
+    for script in SCRIPTS:
+        rows = [(r, t) for r, s, t in zip(reapers, scripts, ended) if s == script]
+        reasons = Counter(r.reason for r, _ in rows)
+        expected = EXPECTED[script]
+        correct = sum(1 for r, _ in rows if r.reason == expected)
+        late = []
+        for r, t in rows:
+            if r.reason == "no_first_speech" or r.reason == "max_duration":
+                late.append(t - thresholds[r.reason])
+            elif r.reason == "silence":
+                late.append(t - (2.3 + thresholds["silence"]))  # voicemail audio ends at 2.3 s
+        late_text = f"{statistics.median(late) * 1000:>11.0f} {max(late) * 1000:>6.0f}" if late else f"{'-':>11} {'-':>6}"
+        print(f"{script:<10} {len(rows):>5} {str(dict(reasons)):<16} {correct:>5}/{len(rows):<5} {late_text}")
+    print(f"\nReaper time per audio frame: median {statistics.median(frame_times) * 1e6:.1f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default="logs/bot.log")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--first-speech-secs", type=float, default=1.0)
+    parser.add_argument("--silence-secs", type=float, default=1.5)
+    parser.add_argument("--max-call-secs", type=float, default=8.0)
+    args = parser.parse_args()
+    logger.remove()
+
+    replay(args.log)
+    thresholds = {
+        "no_first_speech": args.first_speech_secs,
+        "silence": args.silence_secs,
+        "max_duration": args.max_call_secs,
+    }
+    asyncio.run(simulate(args.calls, thresholds))
+
+
+if __name__ == "__main__":
+    main()
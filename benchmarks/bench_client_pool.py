@@ -0,0 +1,196 @@
+# benchmarks/bench_client_pool.py
+"""
+First-turn latency with and without the shared provider pool (client_pool.py).
+
+The local fakes answer on loopback, where a new connection costs nothing, so
+each one sits behind a LatencyProxy that makes them look remote:
+- every new connection waits --handshake-rtts round trips before its first
+  byte goes through (TCP plus TLS 1.3 is two);
+- after that, data in each direction is delayed by half a round trip.
+
+The bot runs against the proxies (STT on the OpenAI transcription API, so
+it goes through the pool as well) once with PROVIDER_POOL_SIZE=0, where each
+call builds its own clients and dials Sarvam, and once with the default
+pool. After /ready, --calls one-turn calls are placed one after another.
+For each setting it reports the median first-turn latency (end of the
+caller's utterance to the bot's first audio, as in load_calls), the mean
+STT, LLM and TTS stage times from /metrics, and how many new connections
+each call opened to each provider.
+
+Usage:
+    python -m benchmarks.bench_client_pool [--calls 8] [--rtt-ms 100]
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import tempfile
+import time
+
+import aiohttp
+
+from benchmarks.bench_warmup import _wait_until_ready
+from benchmarks.load_calls import _simulate_call, _stop, _turn_metrics, fake_services, start_bot, synthetic_voice
+from benchmarks.load_workers import _free_port, _wait_for_port
+
+PROVIDERS = {"stt": "STT_BASE_URL", "llm": "OPENAI_BASE_URL", "tts": "SARVAM_API_BASE"}
+
+
+class LatencyProxy:
+    """TCP proxy that adds a connection setup cost and a round-trip delay."""
+
+    def __init__(self, upstream_port: int, rtt: float, handshake_rtts: float):
+        self.upstream_port = upstream_port
+        self.rtt = rtt
+        self.handshake_rtts = handshake_rtts
+        self.port = _free_port()
+        self.connections = 0
+        self._server = None
+        self._writers: set = set()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", self.port)
+
+    async def close(self) -> None:
+        self._server.close()
+        for writer in self._writers:
+            writer.close()
+        await asyncio.sleep(self.rtt)
+
+    async def _pipe(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # Delay each chunk by rtt/2 without limiting throughput
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def _deliver():
+            while True:
+                due, data = await queue.get()
+                await asyncio.sleep(max(0.0, due - time.monotonic()))
+                if not data:
+                    writer.close()
+                    return
+                writer.write(data)
+                await writer.drain()
+
+        deliver = asyncio.create_task(_deliver())
+        try:
+            while data := await reader.read(65536):
+                queue.put_nowait((time.monotonic() + self.rtt / 2, data))
+        except ConnectionError:
+            pass
+        queue.put_nowait((time.monotonic() + self.rtt / 2, b""))
+        await asyncio.gather(deliver, return_exceptions=True)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            await asyncio.sleep(self.handshake_rtts * self.rtt)
+            upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", self.upstream_port)
+            self._writers.add(upstream_writer)
+            await asyncio.gather(
+                self._pipe(reader, upstream_writer), self._pipe(upstream_reader, writer), return_exceptions=True
+            )
+        except OSError:
+            writer.close()
+
+
+async def _proxied(env: dict, args) -> tuple[dict, dict]:
+    proxies, env = {}, dict(env)
+    for name, var in PROVIDERS.items():
+        port = int(re.search(r":(\d+)", env[var].split("//", 1)[1]).group(1))
+        proxies[name] = LatencyProxy(port, args.rtt_ms / 1000, args.handshake_rtts)
+        await proxies[name].start()
+        env[var] = env[var].replace(f":{port}", f":{proxies[name].port}", 1)
+    return env, proxies
+
+
+async def one_setting(env: dict, proxies: dict, workdir: str, log, utterance, args) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    server = start_bot(port, env, workdir, log)
+    latencies, connections = [], {name: [] for name in proxies}
+    try:
+        await _wait_for_port(port)
+        await _wait_until_ready(base)
+        async with aiohttp.ClientSession() as session:
+
+            async def _metrics():
+                async with session.get(f"{base}/metrics") as response:
+                    return _turn_metrics(await response.text())
+
+            metrics_before = await _metrics()
+            for _ in range(args.calls):
+                opened = {name: proxy.connections for name, proxy in proxies.items()}
+                result = await _simulate_call(base.replace("http", "ws", 1) + "/ws", utterance, 1, 4.0, 0.0)
+                latencies.extend(result["latencies"])
+                for name, proxy in proxies.items():
+                    connections[name].append(proxy.connections - opened[name])
+                await asyncio.sleep(args.gap_secs)
+            metrics_after = await _metrics()
+    finally:
+        _stop([server])
+
+    turns = metrics_after["count"] - metrics_before["count"]
+    stages = {
+        stage: (metrics_after["stages"][stage] - metrics_before["stages"].get(stage, 0.0)) / turns
+        for stage in ("stt", "llm", "tts")
+        if turns and stage in metrics_after["stages"]
+    }
+    return {
+        "first_turn": statistics.median(latencies) if latencies else float("nan"),
+        "answered": len(latencies),
+        "stages": stages,
+        "connections": {name: statistics.mean(counts) for name, counts in connections.items()},
+    }
+
+
+async def main_async(args) -> None:
+    workdir = tempfile.mkdtemp(prefix="voicebot_pool_")
+    utterance = synthetic_voice(1.5, seed=1)
+    rows = {}
+    with open(os.path.join(workdir, "processes.log"), "ab") as log:
+        async with fake_services(args, workdir, log) as env:
+            env, proxies = await _proxied(env, args)
+            try:
+                for pool_size in ("0", str(args.pool_size)):
+                    rows[pool_size] = await one_setting(
+                        dict(env, PROVIDER_POOL_SIZE=pool_size), proxies, workdir, log, utterance, args
+                    )
+            finally:
+                for proxy in proxies.values():
+                    await proxy.close()
+
+    print(
+        f"logs: {workdir}; {args.calls} sequential one-turn calls, rtt {args.rtt_ms:.0f} ms, "
+        f"{args.handshake_rtts:g} round trips per new connection"
+    )
+    print(
+        f"{'PROVIDER_POOL_SIZE':<19} {'1st turn ms':>11} {'stt ms':>7} {'llm ms':>7} {'tts ms':>7} "
+        f"{'new conns/call stt,llm,tts':>27}"
+    )
+    for pool_size, row in rows.items():
+        stage = {name: row["stages"].get(name, float("nan")) * 1000 for name in ("stt", "llm", "tts")}
+        conns = ",".join(f"{row['connections'][name]:.1f}" for name in PROVIDERS)
+        print(
+            f"{pool_size:<19} {row['first_turn'] * 1000:>11.0f} {stage['stt']:>7.0f} {stage['llm']:>7.0f} "
+            f"{stage['tts']:>7.0f} {conns:>27}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=8)
+    parser.add_argument("--gap-secs", type=float, default=1.0, help="pause between calls")
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument("--rtt-ms", type=float, default=100.0)
+    parser.add_argument("--handshake-rtts", type=float, default=2.0)
+    parser.add_argument("--stt", choices=["deepgram", "openai"], default="openai")
+    parser.add_argument("--llm-ttfb-ms", type=float, default=600.0)
+    parser.add_argument("--tts-latency-ms", type=float, default=450.0)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/bench_context_window.py
+"""
+Prompt size per turn on a long call, with and without the context window.
+
+Plays a scripted call through ConversationStateProcessor: the usual stages,
+then a customer who keeps changing the details in Stage 4, so the call runs
+for --turns user turns. Each turn measures the prompt that would be sent to
+the LLM and the time update() spends in the response path. The summariser
+is a fake that takes --summary-ms, so the windowed run also shows how many
+turns each summary lags behind.
+
+Tokens are estimated at 3.2 characters per token, the rate
+bench_stage_prompts.py fits from logs/bot.log.
+
+Usage:
+    python -m benchmarks.bench_context_window [--turns 40] [--summary-ms 800]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from loguru import logger
+
+from context_window import ContextWindow
+from conversation_state import ConversationStateProcessor
+from prompt_context import build_call_context
+
+CHARS_PER_TOKEN = 3.2
+
+_OPENING = [
+    ("Hello?", "Hello! This is Shruti from Digi Loans. I'm calling to discuss some loan options. May I know your name please?"),
+    ("I'm Ravi.", "Nice to speak with you, Ravi. Would you be interested in hearing about our loan options?"),
+    ("Yes, tell me.", "What type of loan are you looking for – personal loan or home loan?"),
+    ("Personal loan.", "Okay, got it. Approximately how much loan amount do you need?"),
+    ("Around five lakh.", "Understood. What is your approximate monthly income?"),
+    ("Forty thousand.", "Thank you. Are you salaried or self-employed?"),
+    ("Salaried.", "So you want a personal loan of 5 lakh, income around 40,000 per month, and you are salaried. Is that correct?"),
+]
+_CHANGES = [
+    ("Actually, make it seven lakh.", "Sure. So a personal loan of 7 lakh, income around 40,000 per month, salaried. Is that correct?"),
+    ("No wait, what would the EMI be?", "Our team will share exact EMI options when they call you back. Shall I keep 7 lakh?"),
+    ("Hmm, maybe home loan instead.", "Okay. So a home loan of 7 lakh, income around 40,000 per month, salaried. Is that correct?"),
+    ("My income is actually forty-five.", "Got it. Home loan of 7 lakh, income around 45,000 per month, salaried. Is that correct?"),
+]
+
+
+def _prompt_chars(messages) -> int:
+    return sum(len(m["content"]) for m in messages if isinstance(m.get("content"), str))
+
+
+async def run(turns: int, window: ContextWindow | None, summary_secs: float) -> dict:
+    context = build_call_context("Ravi")
+    processor = ConversationStateProcessor(window=window)
+    # Outside a pipeline there is no task manager; plain asyncio tasks will do
+    processor.create_task = lambda coroutine, name=None: asyncio.create_task(coroutine)
+
+    script = _OPENING + [_CHANGES[i % len(_CHANGES)] for i in range(max(0, turns - len(_OPENING)))]
+    sizes, update_us, compacted_at = [], [], []
+    for n, (user, assistant) in enumerate(script[:turns], start=1):
+        context.add_message({"role": "user", "content": user})
+        before = window.compactions if window else 0
+        start = time.perf_counter()
+        processor.update(context)
+        update_us.append((time.perf_counter() - start) * 1e6)
+        if window and window.compactions > before:
+            compacted_at.append(n)
+        sizes.append(_prompt_chars(context.messages) / CHARS_PER_TOKEN)
+        # The LLM reply and the TTS playout take a while; summaries run meanwhile
+        await asyncio.sleep(summary_secs / 2)
+        context.add_message({"role": "assistant", "content": assistant})
+    return {"sizes": sizes, "update_us": update_us, "compacted_at": compacted_at}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--max-turns", type=int, default=6)
+    parser.add_argument("--compact-turns", type=int, default=4)
+    parser.add_argument("--summary-ms", type=float, default=800.0, help="fake summariser latency")
+    args = parser.parse_args()
+    logger.remove()
+
+    summary_secs = args.summary_ms / 1000
+
+    async def fake_summarizer(previous: str, transcript: str) -> str:
+        await asyncio.sleep(summary_secs)
+        return (
+            "Ravi, salaried, wants a loan and keeps revising the amount and type; he asked about EMIs "
+            "and was told the team will share them. He speaks English."
+        )
+
+    full = asyncio.run(run(args.turns, None, summary_secs))
+    windowed = asyncio.run(
+        run(args.turns, ContextWindow(args.max_turns, args.compact_turns, fake_summarizer), summary_secs)
+    )
+
+    print(f"Estimated prompt tokens per LLM turn ({args.turns}-turn call, window {args.max_turns}+{args.compact_turns})")
+    print(f"{'turn':>6} {'unbounded':>10} {'windowed':>9}")
+    for n in sorted({1, 5, 10, 15, 20, 30, args.turns} & set(range(1, args.turns + 1))):
+        print(f"{n:>6} {full['sizes'][n - 1]:>10.0f} {windowed['sizes'][n - 1]:>9.0f}")
+    total_full, total_windowed = sum(full["sizes"]), sum(windowed["sizes"])
+    print(f"{'total':>6} {total_full:>10.0f} {total_windowed:>9.0f}   ({1 - total_windowed / total_full:.0%} fewer)")
+    print(f"\nSummaries swapped in at turns {windowed['compacted_at']}")
+    print(
+        f"update() in the response path: median {statistics.median(windowed['update_us']):.0f} us, "
+        f"max {max(windowed['update_us']):.0f} us (summaries run in the background)"
+    )
+
+
+if __name__ == "__main__":
+    main()
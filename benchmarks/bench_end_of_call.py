@@ -0,0 +1,220 @@
+# benchmarks/bench_end_of_call.py
+"""
+CPU per call and detection lag: polling goodbye_watcher vs EndOfCallDetector.
+
+Runs --calls concurrent simulated calls for --duration seconds each, three
+times over:
+
+- baseline: a pipeline that only carries the LLM's streamed frames;
+- watcher: the same, plus the goodbye_watcher loop bot.py used to run
+  (copied below). It polls len(context.messages) every 0.5 s and, on a
+  change, walks the list backwards and runs both regexes;
+- detector: the same pipeline with EndOfCallDetector after the "LLM".
+
+Each call streams the same scripted replies, about 4 characters per
+LLMTextFrame at 50 frames/s, and ends with a goodbye. The assistant message
+is appended to the call's context when a reply finishes, as the assistant
+aggregator would. CPU is process time above the baseline run, scaled to
+one minute of call; the modes are interleaved over --repeat rounds and the
+median is reported, since the baseline alone drifts by several ms between
+runs. Lag runs from the end of the goodbye reply to the end path being
+triggered; _do_end's own 0.5 s pause is excluded for both.
+
+The per-operation costs are measured separately: one watcher wake-up that
+finds a new message, and one EndOfCallMatcher.feed() per streamed chunk.
+
+Usage:
+    python -m benchmarks.bench_end_of_call [--calls 50] [--duration 10] [--repeat 3]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from loguru import logger
+
+from pipecat.frames.frames import LLMFullResponseEndFrame, LLMFullResponseStartFrame, LLMTextFrame
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineParams, PipelineTask
+
+from end_of_call import GOODBYE_RE, NOT_INTERESTED_RE, EndOfCallDetector, EndOfCallMatcher
+
+REPLIES = [
+    "Hello! This is Shruti from Digi Loans. I'm calling to discuss some loan options. May I know your name please?",
+    "Nice to speak with you, Ravi. Would you be interested in hearing about our loan options?",
+    "What type of loan are you looking for – personal loan or home loan?",
+    "Okay, got it. Approximately how much loan amount do you need?",
+    "Understood. What is your approximate monthly income?",
+    "Thank you. Are you salaried or self-employed?",
+    "So you want a personal loan of 5 lakh, income around 40,000 per month, and you are salaried. Is that correct?",
+    "Perfect. Our team will review your details and call you back with suitable loan options. Thank you for your time. Goodbye.",
+]
+CHUNK_CHARS = 4
+CHUNK_SECS = 0.02
+
+
+async def legacy_goodbye_watcher(context_messages, call_ended: asyncio.Event, on_end):
+    """bot.py's goodbye_watcher before EndOfCallDetector, minus the _do_end call."""
+    logger.info("[WATCHER] Goodbye watcher started.")
+    last_seen_len = 0
+
+    while not call_ended.is_set():
+        try:
+            if len(context_messages) == last_seen_len:
+                await asyncio.sleep(0.5)
+                continue
+
+            last_seen_len = len(context_messages)
+
+            last_text = ""
+            for m in reversed(context_messages):
+                if m.get("role") == "assistant":
+                    c = m.get("content", "")
+                    if isinstance(c, str) and c.strip():
+                        last_text = c
+                        break
+
+            logger.info(f"[WATCHER] Last assistant message: {last_text!r}")
+
+            if not last_text:
+                await asyncio.sleep(0.5)
+                continue
+
+            text_lower = last_text.lower()
+            reason = None
+            if NOT_INTERESTED_RE.search(text_lower):
+                reason = "customer_not_interested"
+            elif GOODBYE_RE.search(text_lower):
+                reason = "customer_goodbye"
+
+            if reason and not call_ended.is_set():
+                on_end(reason)
+                break
+
+            await asyncio.sleep(0.5)
+
+        except Exception as e:
+            logger.warning(f"[WATCHER] Goodbye watcher error: {e}")
+            await asyncio.sleep(0.5)
+
+
+async def one_call(mode: str, duration: float, offset: float, lags: list):
+    detector = EndOfCallDetector() if mode == "detector" else None
+    task = PipelineTask(Pipeline([detector] if detector else []), params=PipelineParams())
+    runner = asyncio.create_task(PipelineRunner(handle_sigint=False).run(task))
+
+    messages = [{"role": "system", "content": "prompt"}]
+    call_ended = asyncio.Event()
+    reply_done = {}
+
+    def on_end(reason):
+        lags.append(time.perf_counter() - reply_done["at"])
+        call_ended.set()
+
+    if detector:
+        @detector.event_handler("on_end_of_call")
+        async def _on_end(_, reason):
+            on_end(reason)
+
+    watcher = asyncio.create_task(legacy_goodbye_watcher(messages, call_ended, on_end)) if mode == "watcher" else None
+
+    await asyncio.sleep(offset)
+    gap = duration / len(REPLIES)
+    for reply in REPLIES:
+        messages.append({"role": "user", "content": "..."})
+        await asyncio.sleep(gap / 2)
+        await task.queue_frame(LLMFullResponseStartFrame())
+        for i in range(0, len(reply), CHUNK_CHARS):
+            await task.queue_frame(LLMTextFrame(reply[i : i + CHUNK_CHARS]))
+            await asyncio.sleep(CHUNK_SECS)
+        reply_done["at"] = time.perf_counter()
+        await task.queue_frame(LLMFullResponseEndFrame())
+        messages.append({"role": "assistant", "content": reply})
+        await asyncio.sleep(gap / 2)
+
+    # Give the watcher its next poll before tearing down
+    await asyncio.wait_for(call_ended.wait(), 1.0) if mode != "baseline" else None
+    call_ended.set()
+    if watcher:
+        await watcher
+    await task.cancel()
+    await runner
+
+
+async def run(mode: str, calls: int, duration: float) -> tuple[float, list]:
+    lags: list = []
+    start = time.process_time()
+    await asyncio.gather(*(one_call(mode, duration, offset=n * 0.5 / calls, lags=lags) for n in range(calls)))
+    return time.process_time() - start, lags
+
+
+def per_operation_us() -> dict:
+    """Microseconds for one watcher scan of a new message and one matcher feed() of a chunk."""
+    messages = [{"role": "system", "content": "prompt"}]
+    for reply in REPLIES:
+        messages += [{"role": "user", "content": "..."}, {"role": "assistant", "content": reply}]
+    rounds = 20000
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        last_text = ""
+        for m in reversed(messages):
+            if m.get("role") == "assistant":
+                c = m.get("content", "")
+                if isinstance(c, str) and c.strip():
+                    last_text = c
+                    break
+        text_lower = last_text.lower()
+        NOT_INTERESTED_RE.search(text_lower) or GOODBYE_RE.search(text_lower)
+    scan = (time.perf_counter() - start) / rounds
+
+    chunks = [reply[i : i + CHUNK_CHARS] for reply in REPLIES for i in range(0, len(reply), CHUNK_CHARS)]
+    matcher = EndOfCallMatcher()
+    start = time.perf_counter()
+    for _ in range(rounds // 100):
+        for chunk in chunks:
+            matcher.feed(chunk)
+        matcher.finish()
+        matcher.reset()
+    feed = (time.perf_counter() - start) / (rounds // 100) / len(chunks)
+    return {"watcher scan": scan * 1e6, "matcher feed": feed * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0, help="simulated call length in seconds")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logger.remove()
+
+    modes = ("baseline", "watcher", "detector")
+    cpu = {mode: [] for mode in modes}
+    lags = {mode: [] for mode in modes}
+    for _ in range(args.repeat):
+        for mode in modes:
+            used, found = asyncio.run(run(mode, args.calls, args.duration))
+            cpu[mode].append(used)
+            lags[mode] += found
+
+    scale = 60 / args.duration / args.calls * 1000  # ms of CPU per call-minute
+    baseline = statistics.median(cpu["baseline"])
+    print(f"{args.calls} concurrent calls x {args.duration:g} s, {len(REPLIES)} replies each, {args.repeat} rounds")
+    print(f"{'':<10} {'CPU ms/call-min':>16} {'lag median ms':>14} {'lag max ms':>11}")
+    for mode in ("watcher", "detector"):
+        extra = (statistics.median(cpu[mode]) - baseline) * scale
+        found = lags[mode]
+        median = statistics.median(found) * 1000 if found else float("nan")
+        worst = max(found) * 1000 if found else float("nan")
+        print(f"{mode:<10} {extra:>16.2f} {median:>14.1f} {worst:>11.1f}   ({len(found)} detected)")
+    spread = (max(cpu["baseline"]) - min(cpu["baseline"])) * scale
+    print(f"(baseline pipeline: {baseline * scale:.1f} CPU ms/call-min, spread {spread:.1f} across rounds)")
+
+    print("\nPer operation:")
+    for name, us in per_operation_us().items():
+        print(f"  {name:<13} {us:6.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# benchmarks/bench_greeting.py
+"""
+The greeting rendered while the phone rings (greeting.py): the wait it
+removes, and whether it is ready before the customer answers.
+
+1. Replays logs/bot.log (or --log). For each call it takes the first turn,
+   from the first "User stopped speaking" to the next "Bot started
+   speaking", with that turn's STT, LLM and TTS TTFB. With a pre-rendered
+   greeting this wait is only the output transport's, since the audio is
+   pushed on the VAD stop itself.
+2. Runs prerender_greeting() for --calls calls at once, against the local
+   fake Sarvam (benchmarks/fake_tts.py) with --tts-latency-ms of delay. Each
+   call's context is taken after --ring-secs, as the WebSocket handler
+   would, and the benchmark counts the contexts that had their greeting
+   attached by then.
+3. Times the greeting's path through GreetingPlayer and
+   CachedSarvamTTSService.run_tts(), up to its first audio frame.
+
+Usage:
+    python -m benchmarks.bench_greeting [--log logs/bot.log] [--calls 50] [--ring-secs 3]
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import time
+from datetime import datetime
+
+os.environ.setdefault("SARVAM_API_KEY", "local")  # the fake accepts any key
+
+from aiohttp import ClientSession
+
+from benchmarks.bench_provider_router import _serve
+from benchmarks.fake_tts import FakeTTS
+from pipecat.frames.frames import TTSAudioRawFrame, TTSSpeakFrame, UserStoppedSpeakingFrame
+from pipecat.processors.frame_processor import FrameDirection
+
+import tts_cache
+from call_memory import add_outbound_call, take_outbound_call
+from greeting import Greeting, GreetingPlayer, greeting_from_context, greeting_text, prerender_greeting
+from tts_cache import TTS_MODEL, TTS_SAMPLE_RATE, TTS_VOICE_ID, CachedSarvamTTSService
+
+_TS_RE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3})")
+_TTFB_RE = re.compile(r"(\w+)#\d+ TTFB: ([\d.]+)")
+
+
+def first_turns(path: str) -> list[dict]:
+    """The first turn of each call: its wait and each stage's TTFB."""
+    turns: list[dict] = []
+    turn = None
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if "Auto-detected transport" in line:
+                turn = {"stopped": None, "wait": None, "ttfb": {}}
+                turns.append(turn)
+                continue
+            if turn is None or turn["wait"] is not None or not (ts := _TS_RE.match(line)):
+                continue
+            t = datetime.strptime(ts.group(1), "%Y-%m-%d %H:%M:%S.%f").timestamp()
+            if m := _TTFB_RE.search(line):
+                turn["ttfb"].setdefault(m.group(1), float(m.group(2)))
+            elif "User stopped speaking" in line and turn["stopped"] is None:
+                turn["stopped"] = t
+            elif "Bot started speaking" in line and turn["stopped"] is not None:
+                turn["wait"] = t - turn["stopped"]
+    return [turn for turn in turns if turn["wait"] is not None]
+
+
+def replay(path: str) -> None:
+    turns = first_turns(path)
+    if not turns:
+        print(f"No first turns found in {path}")
+        return
+    waits = sorted(turn["wait"] for turn in turns)
+    print(f"First turn, user stopped speaking -> bot started speaking, {len(turns)} calls in {path}:")
+    print(f"  wait:  median {statistics.median(waits):.2f}s, max {waits[-1]:.2f}s")
+    for stage in ("STT", "LLM", "TTS"):
+        values = [secs for turn in turns for name, secs in turn["ttfb"].items() if f"{stage}Service" in name]
+        if values:
+            print(f"  {stage} TTFB: median {statistics.median(values):.2f}s over {len(values)} calls")
+
+
+async def prerender(calls: int, ring_secs: float, latency: float) -> None:
+    fake = FakeTTS(latency)
+    runner, url = await _serve(fake.app())
+    tts_cache.SARVAM_API_BASE = url
+    try:
+        async with ClientSession() as session:
+            names = [f"Customer {i}" for i in range(calls)]
+            for i, name in enumerate(names):
+                await add_outbound_call(f"CA{i}", {"phone_number": f"98000{i:05d}", "customer_name": name})
+
+            async def _render(i: int) -> float:
+                started = time.perf_counter()
+                await prerender_greeting(session, f"CA{i}", f"98000{i:05d}", names[i])
+                return time.perf_counter() - started
+
+            rendering = asyncio.gather(*(_render(i) for i in range(calls)))
+            await asyncio.sleep(ring_secs)
+            contexts = [await take_outbound_call(f"CA{i}") for i in range(calls)]
+            render_times = sorted(await rendering)
+    finally:
+        await runner.cleanup()
+
+    ready = [greeting_from_context(context) for context in contexts]
+    audio_secs = [len(g.audio) / 2 / TTS_SAMPLE_RATE for g in ready if g]
+    print(
+        f"\n{calls} greetings rendered at once, fake Sarvam {latency * 1000:.0f} ms: "
+        f"median {statistics.median(render_times):.2f}s, max {render_times[-1]:.2f}s"
+    )
+    print(
+        f"  ready when the call connected {ring_secs:g}s later: {len(audio_secs)}/{calls}"
+        + (f", {statistics.mean(audio_secs):.1f}s of audio each" if audio_secs else "")
+    )
+
+
+async def time_playback(runs: int = 1000) -> None:
+    text = greeting_text("Ravi")
+    tts = CachedSarvamTTSService(api_key="local", model=TTS_MODEL, voice_id=TTS_VOICE_ID, sample_rate=TTS_SAMPLE_RATE)
+    tts.add_call_phrase(text, bytes(2 * TTS_SAMPLE_RATE * 2))
+    timings = []
+    for _ in range(runs):
+        player = GreetingPlayer(Greeting(text, b""))
+        spoken = []
+
+        async def _push(frame, direction=FrameDirection.DOWNSTREAM):
+            if isinstance(frame, TTSSpeakFrame):
+                spoken.append(frame.text)
+
+        player.push_frame = _push
+        start = time.perf_counter()
+        await player.process_frame(UserStoppedSpeakingFrame(), FrameDirection.DOWNSTREAM)
+        async for frame in tts.run_tts(spoken[0]):
+            if isinstance(frame, TTSAudioRawFrame):
+                break
+        timings.append(time.perf_counter() - start)
+    print(f"\nVAD stop -> first greeting audio frame in-process: median {statistics.median(timings) * 1e6:.0f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default="logs/bot.log")
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--ring-secs", type=float, default=3.0, help="time from /start to the WebSocket connect")
+    parser.add_argument("--tts-latency-ms", type=float, default=700.0)
+    args = parser.parse_args()
+
+    replay(args.log)
+    asyncio.run(prerender(args.calls, args.ring_secs, args.tts_latency_ms / 1000))
+    asyncio.run(time_playback())
+
+
+if __name__ == "__main__":
+    main()
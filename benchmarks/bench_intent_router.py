@@ -0,0 +1,139 @@
+# benchmarks/bench_intent_router.py
+"""
+Share of turns the IntentRouter answers itself, and the LLM time it saves.
+
+Replays every LLM request logged in logs/bot.log ("Generating chat from
+universal context [...]") through ConversationStateProcessor and
+IntentRouter, as the pipeline would run them, and reports:
+- the share of turns that would have taken the fast path, by intent;
+- the latency saved: the logged gpt-4o TTFB of those requests. The fast
+  path itself takes well under a millisecond (timed here as well);
+- agreement: where the log also has the reply the LLM gave (the next
+  request of the same call starts with this one's messages), whether the
+  router's line asks the same next question.
+
+Requests logged before the router existed are replayed as they were; ones
+the router already answered never reached the LLM and are not in the log.
+
+Usage:
+    python -m benchmarks.bench_intent_router [--log logs/bot.log]
+"""
+import argparse
+import ast
+import re
+import statistics
+import time
+from collections import Counter
+
+from loguru import logger
+
+from benchmarks.bench_stage_prompts import _Context
+from benchmarks.bench_stage_prompts import _CONTEXT_RE, _TTFB_RE
+from conversation_state import ConversationState, ConversationStateProcessor, message_text
+from intent_router import IntentRouter, normalise
+
+_CUSTOMER_RE = re.compile(r'customer\'s name is "([^"]*)"')
+
+
+def parse_log(path: str) -> list[dict]:
+    """Logged LLM requests (user and assistant messages, the dialer's customer name) and their TTFB."""
+    requests: list[dict] = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if m := _CONTEXT_RE.search(line):
+                try:
+                    messages = ast.literal_eval(m.group(1))
+                except (ValueError, SyntaxError):
+                    continue
+                turns = [
+                    {"role": msg["role"], "content": message_text(msg)}
+                    for msg in messages
+                    if isinstance(msg, dict) and msg.get("role") in ("user", "assistant")
+                ]
+                names = [n.group(1) for msg in messages if (n := _CUSTOMER_RE.search(str(msg.get("content", ""))))]
+                if turns and turns[-1]["role"] == "user":
+                    requests.append({"turns": turns, "customer_name": names[0] if names else "", "ttfb": None})
+            elif requests and (m := _TTFB_RE.search(line)) and requests[-1]["ttfb"] is None:
+                requests[-1]["ttfb"] = float(m.group(1))
+    return requests
+
+
+def _llm_reply(requests: list[dict], i: int) -> str | None:
+    """The assistant message that followed request i, if the call's next request is logged."""
+    turns = requests[i]["turns"]
+    if i + 1 < len(requests):
+        following = requests[i + 1]["turns"]
+        if following[: len(turns)] == turns and len(following) > len(turns):
+            reply = following[len(turns)]
+            if reply["role"] == "assistant":
+                return reply["content"]
+    return None
+
+
+def _question(text: str) -> tuple:
+    state = ConversationState()
+    state.observe_assistant(text)
+    return state.last_question, state.stage, "goodbye" in text.lower()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default="logs/bot.log")
+    args = parser.parse_args()
+
+    requests = parse_log(args.log)
+    if not requests:
+        print(f"no LLM requests found in {args.log}")
+        return
+
+    logger.disable("conversation_state")
+    intents: Counter = Counter()
+    fast_ttfb, slow_ttfb, route_us = [], [], []
+    compared = same = 0
+    for i, r in enumerate(requests):
+        messages = [{"role": "system", "content": ""}] + [dict(m) for m in r["turns"]]
+        processor = ConversationStateProcessor()
+        processor.update(_Context(messages))
+        router = IntentRouter(processor.state, r["customer_name"])
+        # The call's language comes from its earlier replies, as it would live
+        for m in r["turns"][:-1]:
+            if m["role"] == "user":
+                router.route([m])
+        t0 = time.perf_counter()
+        routed = router.route(messages)
+        route_us.append((time.perf_counter() - t0) * 1e6)
+        if not routed:
+            if r["ttfb"] is not None:
+                slow_ttfb.append(r["ttfb"])
+            continue
+        intent, reply = routed
+        intents[intent] += 1
+        if r["ttfb"] is not None:
+            fast_ttfb.append(r["ttfb"])
+        actual = _llm_reply(requests, i)
+        if actual is not None:
+            compared += 1
+            same += _question(reply) == _question(actual)
+            if normalise(reply) != normalise(actual) and _question(reply) != _question(actual):
+                print(f"  differs: {r['turns'][-1]['content']!r}\n    router: {reply!r}\n    llm:    {actual!r}")
+
+    fast = sum(intents.values())
+    print(f"\n{len(requests)} logged LLM turns; fast path would answer {fast} ({fast / len(requests):.0%})")
+    for intent, n in intents.most_common():
+        print(f"  {intent:<16} {n:>4}")
+    print(f"router decision: median {statistics.median(route_us):.0f} us, max {max(route_us):.0f} us")
+    if fast_ttfb:
+        saved = sum(fast_ttfb)
+        all_ttfb = fast_ttfb + slow_ttfb
+        print(
+            f"LLM TTFB of fast-path turns: mean {statistics.mean(fast_ttfb) * 1000:.0f} ms "
+            f"(all turns {statistics.mean(all_ttfb) * 1000:.0f} ms); "
+            f"saved {saved:.1f} s of {sum(all_ttfb):.1f} s, "
+            f"{saved / len(all_ttfb) * 1000:.0f} ms per turn on average"
+        )
+    if compared:
+        print(f"same next question as the LLM's logged reply: {same}/{compared}")
+
+
+if __name__ == "__main__":
+    main()
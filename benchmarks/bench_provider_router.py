@@ -0,0 +1,192 @@
+# benchmarks/bench_provider_router.py
+"""
+Hedged provider routing (provider_router.py) against a single provider,
+with local fake providers that inject delay.
+
+Starts two fake LLMs (benchmarks/fake_llm.py) and two fake batch STT
+servers (benchmarks/fake_stt.py) in-process. The primaries are the slower
+ones and stall on --slow-share of requests for --slow-ms. The secondaries
+answer faster, like gpt-4o-mini or Groq Whisper. Then it sends --requests
+requests, --concurrency at a time, through the real services:
+- LLM: get_chat_completions() up to the first streamed chunk, on
+  PooledOpenAILLMService (single) and HedgedOpenAILLMService (hedged);
+- STT: one 2 s utterance through _transcribe(), on PooledOpenAISTTService
+  (single) and HedgedWhisperSTTService (hedged).
+Halfway through, the primary has an outage: every request stalls for
+--outage-ms (POST /admin/faults). The hedged run should take it out of
+rotation and come back to it after PROVIDER_COOLDOWN_SECS.
+
+Reports p50/p95/p99/max latency for each phase, and the router's counters.
+
+Usage:
+    python -m benchmarks.bench_provider_router [--requests 200] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import time
+import wave
+
+os.environ.setdefault("PROVIDER_COOLDOWN_SECS", "5")
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.faults import Faults
+from benchmarks.fake_llm import FakeLLM
+from benchmarks.fake_stt import FakeSTT
+from benchmarks.load_calls import synthetic_voice
+from benchmarks.load_workers import SAMPLE_RATE, _free_port
+from client_pool import PooledOpenAILLMService, PooledOpenAISTTService
+from provider_router import HedgedOpenAILLMService, HedgedWhisperSTTService, provider_router_stats
+
+MESSAGES = [
+    {"role": "system", "content": "You are Shruti from Digi Loans."},
+    {"role": "user", "content": "Hello?"},
+]
+
+
+async def _serve(app: web.Application) -> tuple[web.AppRunner, str]:
+    port = _free_port()
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def _wav(seconds: float) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(synthetic_voice(seconds, seed=1).tobytes())
+    return buffer.getvalue()
+
+
+def _percentiles(values: list[float]) -> str:
+    values = sorted(values)
+
+    def pick(q: float) -> float:
+        return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+    return (
+        f"{statistics.median(values) * 1000:>6.0f} {pick(0.95):>6.0f} {pick(0.99):>6.0f} {values[-1] * 1000:>6.0f}"
+    )
+
+
+async def run_requests(request, n: int, concurrency: int, outage) -> list[tuple[int, float]]:
+    """(index, latency) for n requests; outage() is awaited before request n // 2."""
+    results, index = [], 0
+    lock = asyncio.Lock()
+
+    async def worker():
+        nonlocal index
+        while True:
+            async with lock:
+                i, index = index, index + 1
+                if i == n // 2:
+                    await outage()
+            if i >= n:
+                return
+            start = time.perf_counter()
+            await request()
+            results.append((i, time.perf_counter() - start))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+async def main_async(args) -> None:
+    primary_faults = Faults(args.slow_share, args.slow_ms, seed=1)
+    llm_primary = FakeLLM(0.6, 0.015, primary_faults)
+    llm_secondary = FakeLLM(0.4, 0.010, Faults(seed=2))
+    stt_faults = Faults(args.slow_share, args.slow_ms, seed=3)
+    stt_primary = FakeSTT(0.08, 0.8, 0.7, 0.15, stt_faults)
+    stt_secondary = FakeSTT(0.08, 0.8, 0.3, 0.05, Faults(seed=4))
+    servers = [await _serve(fake.app()) for fake in (llm_primary, llm_secondary, stt_primary, stt_secondary)]
+    (_, llm_a), (_, llm_b), (_, stt_a), (_, stt_b) = servers
+    audio = _wav(2.0)
+
+    def _reset_faults():
+        for faults in (primary_faults, stt_faults):
+            faults.slow_share, faults.slow_ms = args.slow_share, args.slow_ms
+
+    async def _outage_via(url: str):
+        async with aiohttp.ClientSession() as session:
+            await session.post(f"{url}/admin/faults", json={"slow_share": 1.0, "slow_ms": args.outage_ms})
+
+    def _llm(hedged: bool):
+        kwargs = dict(api_key="local", model="gpt-4o", base_url=f"{llm_a}/v1")
+        if hedged:
+            return HedgedOpenAILLMService(fallback_model="gpt-4o-mini", fallback_base_url=f"{llm_b}/v1", **kwargs)
+        return PooledOpenAILLMService(**kwargs)
+
+    def _stt(hedged: bool):
+        primary = PooledOpenAISTTService(api_key="local", model="gpt-4o-transcribe", base_url=f"{stt_a}/v1")
+        if not hedged:
+            return primary
+        secondary = PooledOpenAISTTService(api_key="local", model="whisper-large-v3-turbo", base_url=f"{stt_b}/v1")
+        return HedgedWhisperSTTService(primary, secondary)
+
+    async def _llm_request(service):
+        stream = await service.get_chat_completions({"messages": MESSAGES})
+        async for _ in stream:
+            break  # the first chunk is what the caller waits for
+
+    print(
+        f"{args.requests} requests, {args.concurrency} at a time; primaries stall {args.slow_ms:g} ms on "
+        f"{args.slow_share:.0%}, then always stall {args.outage_ms:g} ms from request {args.requests // 2}\n"
+    )
+    print(f"{'stage':<5} {'routing':<8} {'phase':<7} {'p50 ms':>6} {'p95':>6} {'p99':>6} {'max':>6}")
+    try:
+        for stage in ("llm", "stt"):
+            for hedged in (False, True):
+                _reset_faults()
+                if stage == "llm":
+                    service = _llm(hedged)
+
+                    def request(service=service):
+                        return _llm_request(service)
+
+                    def outage():
+                        return _outage_via(llm_a)
+
+                else:
+                    service = _stt(hedged)
+
+                    def request(service=service):
+                        return service._transcribe(audio)
+
+                    def outage():
+                        return _outage_via(stt_a)
+
+                results = await run_requests(request, args.requests, args.concurrency, outage)
+                for phase, rows in (
+                    ("normal", [t for i, t in results if i < args.requests // 2]),
+                    ("outage", [t for i, t in results if i >= args.requests // 2]),
+                ):
+                    print(f"{stage:<5} {'hedged' if hedged else 'single':<8} {phase:<7} {_percentiles(rows)}")
+        print()
+        for stage, stats in provider_router_stats().items():
+            print(f"{stage}: {stats}")
+    finally:
+        for runner, _ in servers:
+            await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--slow-share", type=float, default=0.04, help="share of primary requests that stall")
+    parser.add_argument("--slow-ms", type=float, default=2500.0)
+    parser.add_argument("--outage-ms", type=float, default=4000.0, help="stall on every request in the outage")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
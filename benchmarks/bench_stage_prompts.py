@@ -0,0 +1,183 @@
+# benchmarks/bench_stage_prompts.py
+"""
+Stage-aware prompt vs the monolithic config.py prompt: input tokens and TTFB.
+
+Offline (default): replays every LLM request logged in logs/bot.log ("Generating
+chat from universal context [...]") through ConversationStateProcessor and
+compares the prompt it would have sent with the one that was sent.
+
+- Tokens: the logged prompt_tokens are known for the monolithic prompt. A
+  tokens-per-character rate fitted over all logged requests converts the
+  character difference into a staged-prompt estimate.
+- TTFB: a least-squares fit of logged gpt-4o TTFB against prompt tokens
+  projects the staged prompt's TTFB. Network jitter dominates single
+  requests, so treat it as a trend, not a promise.
+
+--live N sends both prompt variants of a scripted conversation to gpt-4o N
+times each (needs OPENAI_API_KEY) and reports the measured token counts and
+streaming TTFB.
+
+Usage:
+    python -m benchmarks.bench_stage_prompts [--log logs/bot.log] [--live 5]
+"""
+import argparse
+import ast
+import asyncio
+import os
+import re
+import statistics
+import time
+
+import numpy as np
+from loguru import logger
+
+from conversation_state import STAGE_NAMES, ConversationStateProcessor
+from prompt_context import STATIC_SYSTEM_PROMPT, TOOLS, build_call_context
+
+_CONTEXT_RE = re.compile(r"Generating chat from universal context (\[.*\])\s*$")
+_USAGE_RE = re.compile(r"OpenAILLMService#\d+ prompt tokens: (\d+)")
+_TTFB_RE = re.compile(r"OpenAILLMService#\d+ TTFB: ([\d.]+)")
+
+
+class _Context:
+    """Just enough of LLMContext for ConversationStateProcessor.update()."""
+
+    def __init__(self, messages):
+        self.messages = messages
+
+
+def _chars(messages) -> int:
+    return sum(len(str(m.get("content", ""))) for m in messages)
+
+
+def parse_log(path: str) -> list[dict]:
+    """Logged LLM requests with the prompt tokens and TTFB that followed them."""
+    requests: list[dict] = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if m := _CONTEXT_RE.search(line):
+                try:
+                    messages = ast.literal_eval(m.group(1))
+                except (ValueError, SyntaxError):
+                    continue
+                requests.append({"messages": messages, "tokens": None, "ttfb": None})
+            elif requests and (m := _USAGE_RE.search(line)) and requests[-1]["tokens"] is None:
+                requests[-1]["tokens"] = int(m.group(1))
+            elif requests and (m := _TTFB_RE.search(line)) and requests[-1]["ttfb"] is None:
+                requests[-1]["ttfb"] = float(m.group(1))
+    return [r for r in requests if r["tokens"] is not None]
+
+
+def replay(path: str) -> None:
+    requests = parse_log(path)
+    if not requests:
+        print(f"no LLM requests with usage found in {path}")
+        return
+
+    chars = np.array([_chars(r["messages"]) for r in requests], dtype=float)
+    tokens = np.array([r["tokens"] for r in requests], dtype=float)
+    tokens_per_char, _ = np.polyfit(chars, tokens, 1)
+    print(f"{len(requests)} logged LLM requests; fitted {1 / tokens_per_char:.2f} chars/token")
+
+    logger.disable("conversation_state")  # stage transitions for every replayed request
+    by_stage: dict[int, list[tuple[float, float]]] = {}
+    rows = []
+    for r in requests:
+        messages = [dict(m) for m in r["messages"]]
+        processor = ConversationStateProcessor()
+        processor.update(_Context(messages))
+        staged_tokens = r["tokens"] - (_chars(r["messages"]) - _chars(messages)) * tokens_per_char
+        by_stage.setdefault(processor.state.stage, []).append((r["tokens"], staged_tokens))
+        rows.append((r["tokens"], staged_tokens, r["ttfb"]))
+
+    print(f"\n{'stage':<22} {'requests':>8} {'full tokens':>12} {'staged tokens':>14} {'saved':>6}")
+    for stage in sorted(by_stage):
+        full = statistics.mean(t for t, _ in by_stage[stage])
+        staged = statistics.mean(s for _, s in by_stage[stage])
+        print(
+            f"{stage} {STAGE_NAMES[stage]:<20} {len(by_stage[stage]):>8} {full:>12.0f} {staged:>14.0f} "
+            f"{1 - staged / full:>6.0%}"
+        )
+    full_total = sum(t for t, _, _ in rows)
+    staged_total = sum(s for _, s, _ in rows)
+    print(f"{'all':<22} {len(rows):>8} {full_total / len(rows):>12.0f} {staged_total / len(rows):>14.0f} "
+          f"{1 - staged_total / full_total:>6.0%}")
+
+    timed = [(t, s, ttfb) for t, s, ttfb in rows if ttfb is not None]
+    if len(timed) < 3:
+        return
+    slope, intercept = np.polyfit([t for t, _, _ in timed], [ttfb for _, _, ttfb in timed], 1)
+    full_ttfb = statistics.mean(ttfb for _, _, ttfb in timed)
+    print(f"\nLogged gpt-4o TTFB: mean {full_ttfb * 1000:.0f} ms over {len(timed)} requests; "
+          f"fit {slope * 1e6:+.0f} ms per 1k prompt tokens")
+    if slope <= 0:
+        print("The logged prompt sizes span too little for the fit to beat network jitter; "
+              "use --live for a TTFB comparison.")
+        return
+    projected = statistics.mean(intercept + slope * s for _, s, _ in timed)
+    print(f"Projected TTFB with staged prompts: {projected * 1000:.0f} ms")
+
+
+_SCRIPT = [
+    ("user", "Hello?"),
+    ("assistant", "Hello! This is Shruti from Digi Loans. I'm calling to discuss some loan options. May I know your name please?"),
+    ("user", "I'm Ravi."),
+    ("assistant", "Nice to speak with you, Ravi. Would you be interested in hearing about our loan options?"),
+    ("user", "Yes, tell me."),
+    ("assistant", "What type of loan are you looking for – personal loan or home loan?"),
+    ("user", "Personal loan."),
+    ("assistant", "Okay, got it. Approximately how much loan amount do you need?"),
+    ("user", "Around five lakh."),
+]
+
+
+async def live(trials: int) -> None:
+    from openai import AsyncOpenAI
+    from pipecat.adapters.services.open_ai_adapter import OpenAILLMAdapter
+
+    client = AsyncOpenAI(api_key=os.environ["OPENAI_API_KEY"])
+    adapter = OpenAILLMAdapter()
+
+    def _params(staged: bool):
+        context = build_call_context()
+        for role, text in _SCRIPT:
+            context.add_message({"role": role, "content": text})
+        if staged:
+            ConversationStateProcessor().update(context)
+        return adapter.get_llm_invocation_params(context)
+
+    async def _once(params) -> tuple[float, int]:
+        start = time.perf_counter()
+        ttfb, prompt_tokens = None, 0
+        stream = await client.chat.completions.create(
+            model="gpt-4o", stream=True, stream_options={"include_usage": True}, **params
+        )
+        async for chunk in stream:
+            if ttfb is None and chunk.choices:
+                ttfb = time.perf_counter() - start
+            if chunk.usage:
+                prompt_tokens = chunk.usage.prompt_tokens
+        return ttfb or float("inf"), prompt_tokens
+
+    print(f"\nLive gpt-4o, {trials} trials each (static prompt {len(STATIC_SYSTEM_PROMPT)} chars, "
+          f"{len(TOOLS.standard_tools)} tool)")
+    for label, staged in (("full", False), ("staged", True)):
+        params = _params(staged)
+        results = [await _once(params) for _ in range(trials)]
+        ttfbs = [r[0] for r in results]
+        print(f"  {label:<7} prompt tokens {results[-1][1]:>5}  TTFB median {statistics.median(ttfbs) * 1000:6.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default="logs/bot.log")
+    parser.add_argument("--live", type=int, default=0, help="trials per prompt variant against the real API")
+    args = parser.parse_args()
+
+    replay(args.log)
+    if args.live:
+        asyncio.run(live(args.live))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+# benchmarks/bench_teardown.py
+"""
+Goodbye audio heard and call slot time: old _do_end vs CallTeardown.
+
+Builds the tail of bot.py's pipeline from fakes:
+- FakeTTS is a TTSService with the same pause_frame_processing /
+  push_stop_frames settings as Sarvam. Like Sarvam's websocket, it gets
+  one request per sentence and streams each sentence's audio back from a
+  background task after a varying latency (around --latency-ms), faster
+  than real time. Audio not yet delivered when it stops is lost.
+- PacedOutput is an output transport that paces writes like
+  FastAPIWebsocketOutputTransport. It feeds a FarEnd that plays what it
+  receives in real time, like Exotel.
+- PlayoutTracker sits after the output.
+
+Scenarios:
+- goodbye: the end is triggered as soon as the LLM has finished the
+  closing line. This is when EndOfCallDetector fires, and about when
+  end_call runs.
+- silent: the end is triggered with nothing left to say (e.g. end_call
+  with no text).
+
+For each, the run reports how much of the goodbye the far end heard before
+the stream closed, and how long the call held its pipeline after the
+trigger.
+
+Usage:
+    python -m benchmarks.bench_teardown [--runs 10] [--latency-ms 800]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import AsyncGenerator
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    CancelFrame,
+    EndFrame,
+    Frame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    OutputAudioRawFrame,
+    StartFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+)
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineParams, PipelineTask
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.services.tts_service import TTSService
+from pipecat.transports.base_output import BaseOutputTransport
+from pipecat.transports.base_transport import TransportParams
+
+from call_teardown import CallTeardown, PlayoutTracker
+
+SAMPLE_RATE = 8000
+# As the sentence aggregator hands them to Sarvam (logs/bot.log)
+GOODBYE = [
+    "Perfect.",
+    " Our team will review your details and call you back with suitable loan options.",
+    " Thank you for your time.",
+    " Goodbye.",
+]
+WORDS_PER_SEC = 2.5
+
+
+class FarEnd:
+    """Exotel's side: plays received audio in real time until the stream closes."""
+
+    def __init__(self):
+        self.play_end = 0.0
+        self.received = 0.0
+        self.closed_at = None
+
+    def write(self, seconds: float) -> None:
+        self.play_end = max(self.play_end, time.monotonic()) + seconds
+        self.received += seconds
+
+    def close(self) -> None:
+        if self.closed_at is None:
+            self.closed_at = time.monotonic()
+
+    def unplayed(self) -> float:
+        return max(0.0, self.play_end - self.closed_at) if self.closed_at else 0.0
+
+
+class PacedOutput(BaseOutputTransport):
+    def __init__(self, far_end: FarEnd, **kwargs):
+        super().__init__(TransportParams(audio_out_enabled=True, audio_out_end_silence_secs=0), **kwargs)
+        self._far_end = far_end
+        self._send_interval = 0.0
+        self._next_send_time = 0.0
+
+    async def start(self, frame: StartFrame):
+        await super().start(frame)
+        self._send_interval = (self.audio_chunk_size / self.sample_rate) / 2
+        await self.set_transport_ready(frame)
+
+    async def stop(self, frame: EndFrame):
+        await super().stop(frame)
+        self._far_end.close()
+
+    async def cancel(self, frame):
+        await super().cancel(frame)
+        self._far_end.close()
+
+    async def write_audio_frame(self, frame: OutputAudioRawFrame) -> bool:
+        if self._far_end.closed_at:
+            return False
+        self._far_end.write(len(frame.audio) / (frame.sample_rate * 2))
+        # FastAPIWebsocketOutputTransport._write_audio_sleep
+        current_time = time.monotonic()
+        sleep_duration = max(0, self._next_send_time - current_time)
+        await asyncio.sleep(sleep_duration)
+        if sleep_duration == 0:
+            self._next_send_time = time.monotonic() + self._send_interval
+        else:
+            self._next_send_time += self._send_interval
+        return True
+
+
+class FakeTTS(TTSService):
+    """Sarvam-shaped TTS: run_tts sends each sentence to a "server" task that
+    streams its audio back later; stopping drops whatever has not arrived."""
+
+    def __init__(self, latency: float, seed: int, **kwargs):
+        super().__init__(
+            sample_rate=SAMPLE_RATE,
+            push_text_frames=True,
+            # GOODBYE is already split; the aggregator would need NLTK data
+            aggregate_sentences=False,
+            pause_frame_processing=True,
+            push_stop_frames=True,
+            **kwargs,
+        )
+        self._latency = latency
+        self._rng = random.Random(seed)
+        self._sentences: asyncio.Queue = asyncio.Queue()
+        self._server = None
+        self._started = False
+
+    def can_generate_metrics(self) -> bool:
+        return False
+
+    async def start(self, frame: StartFrame):
+        await super().start(frame)
+        self._server = self.create_task(self._serve(), "server")
+
+    async def stop(self, frame: EndFrame):
+        await super().stop(frame)
+        await self._disconnect()
+
+    async def cancel(self, frame: CancelFrame):
+        await super().cancel(frame)
+        await self._disconnect()
+
+    async def _disconnect(self):
+        if self._server:
+            await self.cancel_task(self._server)
+            self._server = None
+
+    async def push_frame(self, frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM):
+        await super().push_frame(frame, direction)
+        if isinstance(frame, TTSStoppedFrame):
+            self._started = False
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        if not self._started:
+            yield TTSStartedFrame()
+            self._started = True
+        await self._sentences.put(text)
+        yield None
+
+    async def _serve(self):
+        while True:
+            text = await self._sentences.get()
+            # Sarvam's first-audio latency varies per sentence (p10-p90 in logs/bot.log: 0.4-1.1 s)
+            await asyncio.sleep(self._latency * self._rng.uniform(0.5, 1.4))
+            seconds = len(text.split()) / WORDS_PER_SEC
+            block = 0.5
+            while seconds > 0:
+                part = min(block, seconds)
+                await self.push_frame(TTSAudioRawFrame(bytes(int(part * SAMPLE_RATE) * 2), SAMPLE_RATE, 1))
+                seconds -= part
+                await asyncio.sleep(block / 4)  # faster than real time
+
+
+async def one_run(mode: str, scenario: str, latency: float, seed: int) -> dict:
+    far_end = FarEnd()
+    tts = FakeTTS(latency, seed)
+    tracker = PlayoutTracker()
+    task = PipelineTask(
+        Pipeline([tts, PacedOutput(far_end), tracker]),
+        params=PipelineParams(audio_out_sample_rate=SAMPLE_RATE),
+        cancel_on_idle_timeout=False,
+    )
+    teardown = CallTeardown(task, tracker)
+    runner = asyncio.create_task(PipelineRunner(handle_sigint=False).run(task))
+    await asyncio.sleep(0.2)
+
+    if scenario == "goodbye":
+        await task.queue_frames(
+            [LLMFullResponseStartFrame(), *(LLMTextFrame(s) for s in GOODBYE), LLMFullResponseEndFrame()]
+        )
+    await asyncio.sleep(0.05)  # the detector fires as the response end passes it
+
+    triggered = time.monotonic()
+    if mode == "old":
+        await asyncio.sleep(0.5)
+        await task.queue_frames([EndFrame()])
+        await task.cancel()
+    else:
+        await teardown.end("customer_goodbye")
+    await runner
+    held = time.monotonic() - triggered
+
+    expected = sum(len(s.split()) for s in GOODBYE) / WORDS_PER_SEC if scenario == "goodbye" else 0.0
+    heard = max(0.0, far_end.received - far_end.unplayed())
+    return {"heard": heard, "expected": expected, "held": held}
+
+
+async def main_async(args):
+    rows = []
+    for scenario in ("goodbye", "silent"):
+        for mode in ("old", "new"):
+            # The same seeds for both modes, so each pair of runs sees the same TTS latencies
+            results = [await one_run(mode, scenario, args.latency_ms / 1000, seed) for seed in range(args.runs)]
+            rows.append((scenario, mode, results))
+
+    print(f"{'scenario':<9} {'teardown':<9} {'goodbye heard':>14} {'slot held after trigger':>24}")
+    for scenario, mode, results in rows:
+        heard = statistics.mean(r["heard"] for r in results)
+        expected = statistics.mean(r["expected"] for r in results)
+        held = statistics.median(r["held"] for r in results)
+        heard_text = f"{heard:.1f}/{expected:.1f} s" if expected else "-"
+        print(f"{scenario:<9} {mode:<9} {heard_text:>14} {held * 1000:>21.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="median TTS latency per sentence")
+    args = parser.parse_args()
+    logger.remove()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
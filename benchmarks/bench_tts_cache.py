@@ -0,0 +1,160 @@
+# benchmarks/bench_tts_cache.py
+"""
+TTS phrase cache: hit rate and latency saved, replayed from real call logs.
+
+Reads logs/bot.log (or --log), splits it into calls at "Auto-detected
+transport", and groups each call's "Generating TTS: [...]" lines into bot
+responses (a new response starts after a --gap of silence). Every sentence is
+looked up against the phrases extracted from config.messages, following the
+same rule CachedSarvamTTSService uses: cached sentences play only until the
+first miss in a response. A response whose opening sentence hits saves the
+Sarvam TTFB that the log recorded for it.
+
+It also times PhraseCache.get() from memory and from disk with 3 s phrases.
+
+Usage:
+    python -m benchmarks.bench_tts_cache [--log logs/bot.log] [--gap 1.0]
+"""
+import argparse
+import asyncio
+import re
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from tts_cache import TTS_MODEL, TTS_SAMPLE_RATE, TTS_VOICE_ID, PhraseCache, extract_phrases, normalize_text
+
+_TS_RE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3})")
+_TTS_RE = re.compile(r"Generating TTS: \[(.*)\]\s*$")
+_TTFB_RE = re.compile(r"SarvamTTSService#\d+ TTFB: ([\d.]+)")
+
+
+def _parse_calls(path: str) -> list[list[tuple]]:
+    """Each call is a list of ("tts", t, text) and ("ttfb", t, secs) events."""
+    calls: list[list[tuple]] = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if "Auto-detected transport" in line:
+                calls.append([])
+                continue
+            if not calls:
+                continue
+            ts = _TS_RE.match(line)
+            if not ts:
+                continue
+            t = datetime.strptime(ts.group(1), "%Y-%m-%d %H:%M:%S.%f").timestamp()
+            if m := _TTS_RE.search(line):
+                calls[-1].append(("tts", t, m.group(1)))
+            elif m := _TTFB_RE.search(line):
+                calls[-1].append(("ttfb", t, float(m.group(1))))
+    return [c for c in calls if any(kind == "tts" for kind, _, _ in c)]
+
+
+def _responses(events: list[tuple], gap: float) -> list[dict]:
+    responses: list[dict] = []
+    last_tts = None
+    for kind, t, value in events:
+        if kind == "tts":
+            if last_tts is None or t - last_tts > gap:
+                responses.append({"sentences": [], "ttfb": None})
+            responses[-1]["sentences"].append(value)
+            last_tts = t
+        elif responses and responses[-1]["ttfb"] is None:
+            responses[-1]["ttfb"] = value
+    return responses
+
+
+def replay(path: str, gap: float) -> None:
+    from config import messages
+
+    cached = {normalize_text(p) for p in extract_phrases(messages[0]["content"])}
+    print(f"{len(cached)} phrases extracted from config.messages\n")
+
+    totals = {"sentences": 0, "hits": 0, "responses": 0, "fast_starts": 0, "ttfb": 0.0, "saved": 0.0}
+    per_call_saved = []
+    missed = {}
+    print(f"{'call':>4} {'sentences':>9} {'hits':>5} {'hit rate':>8} {'responses':>9} {'fast starts':>11} {'saved (s)':>9}")
+    for i, events in enumerate(_parse_calls(path)):
+        sentences = hits = fast_starts = 0
+        saved = 0.0
+        responses = _responses(events, gap)
+        for response in responses:
+            live = False
+            for n, sentence in enumerate(response["sentences"]):
+                sentences += 1
+                hit = not live and normalize_text(sentence) in cached
+                if hit:
+                    hits += 1
+                    if n == 0:
+                        fast_starts += 1
+                        saved += response["ttfb"] or 0.0
+                else:
+                    live = True
+                    key = sentence.strip()
+                    missed[key] = missed.get(key, 0) + 1
+            totals["ttfb"] += response["ttfb"] or 0.0
+        print(
+            f"{i:>4} {sentences:>9} {hits:>5} {hits / sentences:>8.0%} {len(responses):>9} "
+            f"{fast_starts:>11} {saved:>9.2f}"
+        )
+        totals["sentences"] += sentences
+        totals["hits"] += hits
+        totals["responses"] += len(responses)
+        totals["fast_starts"] += fast_starts
+        totals["saved"] += saved
+        per_call_saved.append(saved)
+
+    calls = len(per_call_saved)
+    print(
+        f"\n{calls} calls: sentence hit rate {totals['hits'] / max(1, totals['sentences']):.0%}, "
+        f"{totals['fast_starts']}/{totals['responses']} responses start from cache"
+    )
+    print(
+        f"TTS wait saved per call: mean {statistics.mean(per_call_saved):.2f}s, "
+        f"median {statistics.median(per_call_saved):.2f}s "
+        f"({totals['saved'] / max(1e-9, totals['ttfb']):.0%} of all logged Sarvam TTFB)"
+    )
+    print("\nMost frequent misses:")
+    for sentence, count in sorted(missed.items(), key=lambda kv: -kv[1])[:10]:
+        print(f"  {count:>3}  {sentence}")
+
+
+async def time_lookups(phrases: int = 200, lookups: int = 2000) -> None:
+    audio = bytes(TTS_SAMPLE_RATE * 2 * 3)  # 3 s of 16-bit PCM
+    with tempfile.TemporaryDirectory() as cache_dir:
+        keys = [PhraseCache.key(TTS_MODEL, TTS_VOICE_ID, TTS_SAMPLE_RATE, f"phrase {i}") for i in range(phrases)]
+        writer = PhraseCache(cache_dir)
+        for key in keys:
+            await writer.put(key, audio)
+
+        # A fresh instance reads every phrase from disk once, then from memory
+        fresh = PhraseCache(cache_dir)
+        for label, cache in (("disk", fresh), ("memory", fresh)):
+            timings = []
+            for key in keys:
+                start = time.perf_counter()
+                await cache.get(key)
+                timings.append(time.perf_counter() - start)
+            print(f"get() from {label:<6}: median {statistics.median(timings) * 1e6:7.1f} µs")
+
+        miss_key = PhraseCache.key(TTS_MODEL, TTS_VOICE_ID, TTS_SAMPLE_RATE, "not cached")
+        start = time.perf_counter()
+        for _ in range(lookups):
+            await writer.get(miss_key)
+        print(f"get() miss       : mean   {(time.perf_counter() - start) / lookups * 1e6:7.1f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default="logs/bot.log")
+    parser.add_argument("--gap", type=float, default=1.0, help="seconds between TTS lines that start a new response")
+    args = parser.parse_args()
+
+    replay(args.log, args.gap)
+    print()
+    asyncio.run(time_lookups())
+
+
+if __name__ == "__main__":
+    main()
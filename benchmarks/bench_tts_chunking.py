@@ -0,0 +1,154 @@
+# benchmarks/bench_tts_chunking.py
+"""
+First-audio latency of clause chunking (text_chunking.py) against sentence
+chunking, replayed over the bot's logged replies.
+
+Takes every distinct assistant reply from the LLM requests logged in
+logs/bot.log (or --log) and streams it into each aggregator one token at
+a time, --token-ms apart, the way gpt-4o streams after its TTFB. It then
+works out when the caller hears the first audio, counted from the first
+token:
+- sentence: pipecat's SimpleTextAggregator, then Sarvam's WebSocket, which
+  renders nothing until it holds min_buffer_size (50) characters or gets
+  the flush at the end of the reply;
+- sentence+flush: the same chunks, each flushed to Sarvam at once, to
+  separate the flush's share of the saving from the clause splits;
+- clause: ClauseTextAggregator, with each chunk flushed to Sarvam at once.
+Either way, live audio starts --tts-ttfb-ms after Sarvam starts rendering
+(default: the median Sarvam TTFB in the log). A first chunk that is a
+cached scripted phrase plays at once.
+
+pipecat's sentence splitter needs NLTK's punkt data. Without it, the
+sentence path falls back to ClauseTextAggregator with clause splitting
+turned off (sentence ends only), which cuts the same places for these
+replies.
+
+Usage:
+    python -m benchmarks.bench_tts_chunking [--log logs/bot.log] [--token-ms 25]
+"""
+import argparse
+import ast
+import asyncio
+import re
+import statistics
+import sys
+
+from benchmarks.bench_stage_prompts import _CONTEXT_RE
+from conversation_state import message_text
+from prompt_context import STATIC_SYSTEM_PROMPT
+from text_chunking import ClauseTextAggregator
+from tts_cache import extract_phrases, normalize_text
+
+_SARVAM_TTFB_RE = re.compile(r"SarvamTTSService#\d+ TTFB: ([\d.]+)")
+_TOKEN_RE = re.compile(r"\s*[^\s.,!?।;:]+|\s*[.,!?।;:]+")
+SARVAM_MIN_BUFFER = 50
+
+
+def parse_log(path: str) -> tuple[list[str], list[float]]:
+    """Distinct logged assistant replies, and the Sarvam TTFBs."""
+    replies, seen, ttfbs = [], set(), []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if m := _CONTEXT_RE.search(line):
+                try:
+                    messages = ast.literal_eval(m.group(1))
+                except (ValueError, SyntaxError):
+                    continue
+                for message in messages:
+                    if isinstance(message, dict) and message.get("role") == "assistant":
+                        text = " ".join(message_text(message).split())
+                        if text and text not in seen:
+                            seen.add(text)
+                            replies.append(text)
+            elif m := _SARVAM_TTFB_RE.search(line):
+                ttfbs.append(float(m.group(1)))
+    return replies, ttfbs
+
+
+def _sentence_aggregator():
+    from pipecat.utils.text.simple_text_aggregator import SimpleTextAggregator
+
+    try:
+        aggregator = SimpleTextAggregator()
+        asyncio.run(aggregator.aggregate("Okay. Fine"))
+        return SimpleTextAggregator(), "pipecat SimpleTextAggregator"
+    except LookupError:
+        return ClauseTextAggregator(min_chars=sys.maxsize, max_chars=sys.maxsize), "sentence ends only (no NLTK punkt)"
+
+
+async def chunk_times(aggregator, reply: str, token_secs: float) -> list[tuple[float, str]]:
+    """(release time, chunk) for each chunk the aggregator hands to the TTS."""
+    chunks = []
+    tokens = _TOKEN_RE.findall(reply)
+    for i, token in enumerate(tokens):
+        chunk = await aggregator.aggregate(token)
+        if chunk and chunk.strip():
+            chunks.append((i * token_secs, chunk))
+    # LLMFullResponseEndFrame: the rest goes out with the reply's last token
+    if aggregator.text.strip():
+        chunks.append(((len(tokens) - 1) * token_secs, aggregator.text))
+    await aggregator.reset()
+    return chunks
+
+
+def first_audio(chunks, end: float, tts_ttfb: float, cached: set, buffered: bool) -> float:
+    first_time, first_chunk = chunks[0]
+    if normalize_text(first_chunk) in cached:
+        return first_time
+    if not buffered:
+        return first_time + tts_ttfb
+    # Sarvam starts once it holds min_buffer_size characters, or at the final flush
+    held = 0
+    for t, chunk in chunks:
+        held += len(chunk)
+        if held >= SARVAM_MIN_BUFFER:
+            return t + tts_ttfb
+    return end + tts_ttfb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default="logs/bot.log")
+    parser.add_argument("--token-ms", type=float, default=25.0, help="gap between streamed LLM tokens")
+    parser.add_argument("--tts-ttfb-ms", type=float, default=None, help="Sarvam TTFB (default: logged median)")
+    args = parser.parse_args()
+
+    replies, ttfbs = parse_log(args.log)
+    if not replies:
+        print(f"no assistant replies found in {args.log}")
+        return
+    tts_ttfb = args.tts_ttfb_ms / 1000 if args.tts_ttfb_ms is not None else (statistics.median(ttfbs) if ttfbs else 0.45)
+    token_secs = args.token_ms / 1000
+    phrases = extract_phrases(STATIC_SYSTEM_PROMPT)
+    cached = {normalize_text(p) for p in phrases}
+
+    sentence, sentence_name = _sentence_aggregator()
+    clause = ClauseTextAggregator(scripted_lines=phrases)
+    paths = (("sentence", sentence, True), ("sentence+flush", sentence, False), ("clause", clause, False))
+    rows = {name: [] for name, _, _ in paths}
+    lengths = {name: [] for name, _, _ in paths}
+    for reply in replies:
+        end = (len(_TOKEN_RE.findall(reply)) - 1) * token_secs
+        for name, aggregator, buffered in paths:
+            chunks = asyncio.run(chunk_times(aggregator, reply, token_secs))
+            rows[name].append(first_audio(chunks, end, tts_ttfb, cached, buffered))
+            lengths[name] += [len(chunk.strip()) for _, chunk in chunks]
+
+    print(f"{len(replies)} logged replies; {args.token_ms:g} ms per token; Sarvam TTFB {tts_ttfb * 1000:.0f} ms")
+    print(f"sentence path: {sentence_name}\n")
+    print(f"{'chunking':<14} {'first audio p50':>15} {'p90':>6} {'mean':>6} {'chunks':>7} {'chars p50':>9} {'min':>4}")
+    for name in rows:
+        times = sorted(rows[name])
+        print(
+            f"{name:<14} {statistics.median(times) * 1000:>12.0f} ms {times[int(0.9 * (len(times) - 1))] * 1000:>6.0f} "
+            f"{statistics.mean(times) * 1000:>6.0f} {len(lengths[name]):>7} {statistics.median(lengths[name]):>9.0f} "
+            f"{min(lengths[name]):>4}"
+        )
+    saved = [s - c for s, c in zip(rows["sentence"], rows["clause"])]
+    print(f"\nclause saves {statistics.mean(saved) * 1000:.0f} ms on average; "
+          f"{sum(1 for s in saved if s > 0.001)} of {len(saved)} replies start sooner, "
+          f"{sum(1 for s in saved if s < -0.001)} later")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# benchmarks/bench_turn_metrics.py
+"""
+Accuracy and cost of TurnLatencyObserver.
+
+Runs --calls concurrent calls through a pipeline of fakes with known stage
+delays: VAD stop -> STT final after --stt-ms -> LLM first token after
+--llm-ms -> TTS first audio after --tts-ms -> an output transport paced like
+FastAPIWebsocketOutputTransport (bench_teardown.PacedOutput). Each fake
+subclasses the pipecat base the observer looks for (BaseInputTransport,
+STTService, LLMService, TTSService, BaseOutputTransport).
+
+Reports the stage medians the observer recorded against the injected
+delays. Also reports the observer's CPU per call-minute: the same calls run
+with and without it, interleaved over --repeat rounds, and the medians are
+compared. It sees every frame push in the pipeline, audio included.
+
+Usage:
+    python -m benchmarks.bench_turn_metrics [--calls 20] [--turns 6] [--repeat 3]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import AsyncGenerator
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    Frame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    VADUserStoppedSpeakingFrame,
+)
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineParams, PipelineTask
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.services.llm_service import LLMService
+from pipecat.services.stt_service import STTService
+from pipecat.services.tts_service import TTSService
+from pipecat.transports.base_input import BaseInputTransport
+from pipecat.transports.base_transport import TransportParams
+
+from benchmarks.bench_teardown import SAMPLE_RATE, FarEnd, PacedOutput
+from metrics import TurnLatencyObserver, render_metrics
+
+REPLY = ["Okay, got it.", " Approximately how much loan amount do you need?"]
+
+
+class FakeInput(BaseInputTransport):
+    def __init__(self, **kwargs):
+        super().__init__(TransportParams(audio_in_enabled=False), **kwargs)
+
+
+class FakeSTT(STTService):
+    def __init__(self, delay: float, **kwargs):
+        super().__init__(**kwargs)
+        self._delay = delay
+
+    async def run_stt(self, audio: bytes) -> AsyncGenerator[Frame, None]:
+        yield None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, VADUserStoppedSpeakingFrame):
+            self.create_task(self._transcribe())
+
+    async def _transcribe(self):
+        await asyncio.sleep(self._delay)
+        await self.push_frame(TranscriptionFrame("Around five lakh.", "user", "", language="hi-IN"))
+
+
+class FakeLLM(LLMService):
+    def __init__(self, delay: float, **kwargs):
+        super().__init__(**kwargs)
+        self._delay = delay
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, TranscriptionFrame):
+            await asyncio.sleep(self._delay)
+            await self.push_frame(LLMFullResponseStartFrame())
+            for sentence in REPLY:
+                await self.push_frame(LLMTextFrame(sentence))
+            await self.push_frame(LLMFullResponseEndFrame())
+        else:
+            await self.push_frame(frame, direction)
+
+
+class FakeTTS(TTSService):
+    def __init__(self, delay: float, **kwargs):
+        super().__init__(sample_rate=SAMPLE_RATE, aggregate_sentences=False, **kwargs)
+        self._delay = delay
+
+    def can_generate_metrics(self) -> bool:
+        return False
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        yield TTSStartedFrame()
+        await asyncio.sleep(self._delay)
+        for _ in range(len(text) // 10):
+            yield TTSAudioRawFrame(bytes(int(0.1 * SAMPLE_RATE) * 2), SAMPLE_RATE, 1)
+
+
+async def one_call(args, observe: bool, offset: float, observers: list):
+    observer = TurnLatencyObserver(stt="fake", llm="fake", tts="fake") if observe else None
+    task = PipelineTask(
+        Pipeline(
+            [
+                FakeInput(),
+                FakeSTT(args.stt_ms / 1000),
+                FakeLLM(args.llm_ms / 1000),
+                FakeTTS(args.tts_ms / 1000),
+                PacedOutput(FarEnd()),
+            ]
+        ),
+        params=PipelineParams(audio_out_sample_rate=SAMPLE_RATE),
+        observers=[observer] if observer else [],
+        cancel_on_idle_timeout=False,
+    )
+    runner = asyncio.create_task(PipelineRunner(handle_sigint=False).run(task))
+    await asyncio.sleep(0.2 + offset)
+    for _ in range(args.turns):
+        await task.queue_frame(VADUserStoppedSpeakingFrame())
+        await asyncio.sleep(args.turn_secs)
+    await task.cancel()
+    await runner
+    if observer:
+        observers.append(observer)
+
+
+async def run(args, observe: bool) -> tuple[float, list]:
+    observers: list = []
+    start = time.process_time()
+    await asyncio.gather(*(one_call(args, observe, n * 0.3 / args.calls, observers) for n in range(args.calls)))
+    return time.process_time() - start, observers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--turn-secs", type=float, default=4.0, help="time between the user's turns")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stt-ms", type=float, default=300.0)
+    parser.add_argument("--llm-ms", type=float, default=700.0)
+    parser.add_argument("--tts-ms", type=float, default=400.0)
+    args = parser.parse_args()
+    logger.remove()
+
+    cpu = {False: [], True: []}
+    turns = []
+    for _ in range(args.repeat):
+        for observe in (False, True):
+            used, observers = asyncio.run(run(args, observe))
+            cpu[observe].append(used)
+            turns += [t for o in observers for t in o.turns]
+
+    expected = {"stt": args.stt_ms, "llm": args.llm_ms, "tts": args.tts_ms, "transport": None}
+    print(f"{args.calls} calls x {args.turns} turns, {args.repeat} rounds: {len(turns)} turns recorded")
+    print(f"{'stage':<10} {'injected ms':>12} {'recorded median ms':>19} {'p90 ms':>8}")
+    for stage, injected in expected.items():
+        values = sorted(t[stage] * 1000 for t in turns)
+        p90 = values[int(len(values) * 0.9)] if values else float("nan")
+        injected_text = f"{injected:.0f}" if injected is not None else "-"
+        print(f"{stage:<10} {injected_text:>12} {statistics.median(values):>19.1f} {p90:>8.1f}")
+    totals = [t["total"] * 1000 for t in turns]
+    print(f"{'total':<10} {'':>12} {statistics.median(totals):>19.1f}")
+
+    call_secs = 0.2 + args.turns * args.turn_secs
+    scale = 60 / call_secs / args.calls * 1000  # ms of CPU per call-minute
+    extra = (statistics.median(cpu[True]) - statistics.median(cpu[False])) * scale
+    spread = (max(cpu[False]) - min(cpu[False])) * scale
+    print(f"\nObserver CPU: {extra:.2f} ms per call-minute (run-to-run spread without it: {spread:.2f})")
+    print("\n/metrics sample:")
+    print("\n".join(line for line in render_metrics().splitlines() if 'stage="llm"' in line and "_bucket" not in line))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# benchmarks/bench_vad_engine.py
+"""
+Per-call memory and CPU cost of VAD: one SileroVADAnalyzer per call (old)
+versus PooledSileroVADAnalyzer on the shared engine (new).
+
+Each simulated call feeds 20 ms frames (160 samples at 8 kHz) of synthetic
+speech-like audio through `analyze_audio`, all calls concurrently, which is
+what the transport input tasks do during real calls.
+
+Usage:
+    python -m benchmarks.bench_vad_engine [--seconds 5] [--calls 1 10 50]
+"""
+import argparse
+import asyncio
+import gc
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+from pipecat.audio.vad.silero import SileroVADAnalyzer
+from pipecat.audio.vad.vad_analyzer import VADParams
+
+from vad_engine import PooledSileroVADAnalyzer, get_vad_engine
+
+SAMPLE_RATE = 8000
+FRAME_SAMPLES = 160  # 20 ms at 8 kHz
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _make_audio(seconds: float, seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    # Alternating 1 s bursts of voiced tone + noise and near-silence
+    envelope = (np.floor(t) % 2 == 0).astype(np.float32)
+    voiced = 0.3 * np.sin(2 * np.pi * 180 * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    signal = envelope * voiced + 0.01 * rng.standard_normal(t.shape)
+    return (np.clip(signal, -1, 1) * 32767).astype(np.int16).tobytes()
+
+
+def _make_analyzer(kind: str):
+    params = VADParams(confidence=0.6, start_secs=0.25, stop_secs=0.5, min_volume=0.3)
+    if kind == "per_call":
+        analyzer = SileroVADAnalyzer(params=params)
+    else:
+        analyzer = PooledSileroVADAnalyzer(params=params)
+    analyzer.set_sample_rate(SAMPLE_RATE)
+    return analyzer
+
+
+async def _feed(analyzer, audio: bytes) -> int:
+    frame_bytes = FRAME_SAMPLES * 2
+    frames = 0
+    for offset in range(0, len(audio) - frame_bytes + 1, frame_bytes):
+        await analyzer.analyze_audio(audio[offset : offset + frame_bytes])
+        frames += 1
+    return frames
+
+
+def run_case(kind: str, calls: int, seconds: float) -> dict:
+    gc.collect()
+    rss_before = _rss_bytes()
+    tracemalloc.start()
+    analyzers = [_make_analyzer(kind) for _ in range(calls)]
+    gc.collect()
+    py_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = _rss_bytes()
+
+    audio = [_make_audio(seconds, seed=i) for i in range(calls)]
+
+    async def _run():
+        return await asyncio.gather(*(_feed(a, pcm) for a, pcm in zip(analyzers, audio)))
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    frames = sum(asyncio.run(_run()))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    return {
+        "kind": kind,
+        "calls": calls,
+        "rss_per_call_kb": (rss_after - rss_before) / calls / 1024,
+        "py_per_call_kb": py_bytes / calls / 1024,
+        "cpu_us_per_frame": cpu / frames * 1e6,
+        "realtime_factor": (frames * FRAME_SAMPLES / SAMPLE_RATE) / wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0, help="audio seconds per call")
+    parser.add_argument("--calls", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+
+    # Model load is a startup cost for the pooled engine, not a per-call one
+    engine = get_vad_engine()
+    engine.warm_up()
+
+    print(f"{'analyzer':<10} {'calls':>5} {'RSS/call (KB)':>14} {'py/call (KB)':>13} {'CPU/20ms frame (us)':>20} {'x realtime':>11}")
+    for calls in args.calls:
+        for kind in ("per_call", "pooled"):
+            frames_before, batches_before = engine.frames, engine.batches
+            r = run_case(kind, calls, args.seconds)
+            line = (
+                f"{r['kind']:<10} {r['calls']:>5} {r['rss_per_call_kb']:>14.1f} {r['py_per_call_kb']:>13.1f} "
+                f"{r['cpu_us_per_frame']:>20.1f} {r['realtime_factor']:>11.1f}"
+            )
+            if kind == "pooled":
+                batches = engine.batches - batches_before
+                if batches:
+                    line += f"   avg batch={(engine.frames - frames_before) / batches:.1f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
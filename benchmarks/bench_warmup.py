@@ -0,0 +1,100 @@
+# benchmarks/bench_warmup.py
+"""
+Server startup time and the first call's latency, with and without warm-up.
+
+Starts server.py (load_calls --serve-bot) against the local fakes --runs
+times for each WARMUP_ON_START setting. For each start it records:
+- listen: from spawning the process until the port accepts connections;
+- ready: until GET /ready answers 200 (the same as listen on a build
+  without /ready);
+- first call: the first turn's latency of a call placed as soon as the
+  server is ready (from the end of the caller's utterance to the bot's
+  first audio, as in load_calls);
+- second call: the same for the next call, by which time everything the
+  bot needs has been imported and built.
+
+The first call's penalty is the difference between the two.
+
+Usage:
+    python -m benchmarks.bench_warmup [--runs 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import aiohttp
+
+from benchmarks.load_calls import _simulate_call, _stop, fake_services, start_bot, synthetic_voice
+from benchmarks.load_workers import _free_port, _wait_for_port
+
+
+async def _wait_until_ready(base: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            async with session.get(f"{base}/ready") as response:
+                if response.status in (200, 404):
+                    return
+            await asyncio.sleep(0.02)
+    raise RuntimeError("server did not become ready")
+
+
+async def _call_latency(base: str, utterance) -> float:
+    result = await _simulate_call(base.replace("http", "ws", 1) + "/ws", utterance, 1, 4.0, 0.0)
+    return result["latencies"][0] if result["latencies"] else float("nan")
+
+
+async def one_start(env: dict, workdir: str, log, utterance) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    spawned = time.monotonic()
+    server = start_bot(port, env, workdir, log)
+    try:
+        await _wait_for_port(port)
+        listening = time.monotonic()
+        await _wait_until_ready(base)
+        ready = time.monotonic()
+        first = await _call_latency(base, utterance)
+        second = await _call_latency(base, utterance)
+    finally:
+        _stop([server])
+    return {"listen": listening - spawned, "ready": ready - spawned, "first": first, "second": second}
+
+
+async def main_async(args) -> None:
+    workdir = tempfile.mkdtemp(prefix="voicebot_warmup_")
+    utterance = synthetic_voice(1.5, seed=1)
+    rows = {}
+    with open(os.path.join(workdir, "processes.log"), "ab") as log:
+        async with fake_services(args, workdir, log) as env:
+            for warmup in ("0", "1"):
+                rows[warmup] = [
+                    await one_start(dict(env, WARMUP_ON_START=warmup), workdir, log, utterance)
+                    for _ in range(args.runs)
+                ]
+
+    print(f"logs: {workdir}; medians of {args.runs} starts")
+    print(f"{'WARMUP_ON_START':<16} {'listen s':>9} {'ready s':>8} {'1st call ms':>12} {'2nd call ms':>12} {'penalty ms':>11}")
+    for warmup, results in rows.items():
+        med = {key: statistics.median(r[key] for r in results) for key in results[0]}
+        print(
+            f"{warmup:<16} {med['listen']:>9.2f} {med['ready']:>8.2f} {med['first'] * 1000:>12.0f} "
+            f"{med['second'] * 1000:>12.0f} {(med['first'] - med['second']) * 1000:>11.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--stt", choices=["deepgram", "openai"], default="deepgram")
+    parser.add_argument("--llm-ttfb-ms", type=float, default=600.0)
+    parser.add_argument("--tts-latency-ms", type=float, default=450.0)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# benchmarks/eval_endpointing.py
+"""
+Offline evaluation of end-of-turn detection: fixed VAD stop_secs versus the
+adaptive endpointing in endpointing.py.
+
+Each recording (the caller's side of a call, 8 kHz mono 16-bit WAV) is
+replayed in 20 ms frames through PooledSileroVADAnalyzer, and for
+"adaptive" through AdaptiveTurnAnalyzer as well, the way pipecat's input
+transport drives them. Every time the caller is declared done, the decision
+is scored against where the caller's speech really stopped:
+- a turn end detected after the last phrase of a turn counts toward the
+  latency: the time from the end of that speech to the decision;
+- one made during a pause inside a turn is a premature cutoff: the bot
+  would have answered over the rest of the sentence;
+- a turn started where there is no speech is a false start (line noise).
+
+Turns come from --labels, a JSON file mapping each WAV's name to a list of
+[start, end] seconds for every phrase and whether it ends a turn:
+{"call1.wav": [[0.4, 1.6, false], [2.1, 3.0, true, "salaried"], ...]}. Without labels,
+phrases are found with the same Silero model (threshold 0.5, 0.1 s
+hangover), and a phrase ends a turn when the next one starts more than
+--turn-gap-secs later.
+
+Without --recordings it generates --synthetic calls from synthetic_voice()
+(see load_calls): turns of one to four phrases, fluent or hesitant callers
+(pauses of 0.1-0.35 s or 0.35-0.9 s within a turn), 2-3 s between turns,
+and line noise from none to loud, with the true segmentation as labels.
+Each phrase also gets a transcript: most turns end on an answer ("I am
+salaried.", "2 lakh") and most pauses follow a dangling word ("my income
+is", "matlab"), but not all. Labels may carry the same as a fourth field.
+The text is given to the analyzer --stt-lag-ms after the phrase ends, as
+a streaming STT's transcript would arrive (--no-transcripts for
+segmented STT, where only the audio signals apply).
+
+Usage:
+    python -m benchmarks.eval_endpointing [--synthetic 40]
+    python -m benchmarks.eval_endpointing --recordings calls/ [--labels labels.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+from typing import List, Tuple
+
+import numpy as np
+
+from pipecat.audio.turn.base_turn_analyzer import EndOfTurnState
+from pipecat.audio.vad.vad_analyzer import VADParams, VADState
+
+from benchmarks.load_calls import SAMPLE_RATE, load_utterance, synthetic_voice
+from endpointing import create_turn_analyzer
+from vad_engine import PooledSileroVADAnalyzer
+
+FRAME_SAMPLES = 160  # 20 ms, as Exotel sends them
+# bot.py's VADParams
+VAD_PARAMS = dict(confidence=0.6, start_secs=0.25, stop_secs=0.5, min_volume=0.3)
+
+Phrase = Tuple  # start, end, ends the turn[, transcript]
+
+# Synthetic transcripts: how the caller's phrases end, as a streaming STT would hear them
+FINISHED_ENDINGS = ["I am salaried.", "around fifty thousand", "haan ji", "personal loan", "yes", "2 lakh"]
+NEUTRAL_ENDINGS = ["my name is Ravi", "I work in Hyderabad", "I have been thinking about it"]
+TRAILING_ENDINGS = ["my income is", "matlab", "I am working with", "and", "um"]
+
+
+def synthetic_call(seed: int, turns: int = 8) -> Tuple[np.ndarray, List[Phrase]]:
+    rng = np.random.default_rng(seed)
+    hesitant = rng.random() < 0.5
+    noise = rng.choice([0.0, 0.003, 0.01, 0.03])
+    pieces, phrases, t = [np.zeros(int(rng.uniform(0.5, 1.0) * SAMPLE_RATE), dtype=np.int16)], [], 0.0
+    t = len(pieces[0]) / SAMPLE_RATE
+    for turn in range(turns):
+        count = int(rng.integers(1, 5))
+        for n in range(count):
+            voice = synthetic_voice(float(rng.uniform(0.4, 1.6)), seed=seed * 100 + turn * 10 + n)
+            last = n == count - 1
+            gap = rng.uniform(2.0, 3.0) if last else rng.uniform(0.35, 0.9) if hesitant else rng.uniform(0.1, 0.35)
+            # Most answers end like answers and most pauses follow a dangling word, but not all
+            if last:
+                endings = FINISHED_ENDINGS if rng.random() < 0.6 else NEUTRAL_ENDINGS
+            else:
+                endings = TRAILING_ENDINGS if rng.random() < 0.5 else NEUTRAL_ENDINGS + FINISHED_ENDINGS[:2]
+            pieces += [voice, np.zeros(int(gap * SAMPLE_RATE), dtype=np.int16)]
+            phrases.append((t, t + len(voice) / SAMPLE_RATE, last, str(rng.choice(endings))))
+            t += (len(voice) + int(gap * SAMPLE_RATE)) / SAMPLE_RATE
+    audio = np.concatenate(pieces).astype(np.float64)
+    audio += noise * 32767 * rng.standard_normal(len(audio))
+    return np.clip(audio, -32768, 32767).astype(np.int16), phrases
+
+
+async def reference_phrases(audio: np.ndarray, turn_gap: float) -> List[Phrase]:
+    """Speech segments by Silero alone, merged over gaps under 0.1 s."""
+    vad = PooledSileroVADAnalyzer(params=VADParams(confidence=0.5, start_secs=0.05, stop_secs=0.1, min_volume=0.0))
+    vad.set_sample_rate(SAMPLE_RATE)
+    segments, start, frame_secs = [], None, FRAME_SAMPLES / SAMPLE_RATE
+    for i, frame in enumerate(_frames(audio)):
+        state = await vad.analyze_audio(frame)
+        now = (i + 1) * frame_secs
+        if state == VADState.SPEAKING and start is None:
+            start = now - 0.05
+        elif state == VADState.QUIET and start is not None:
+            segments.append([start, now - 0.1])
+            start = None
+    if start is not None:
+        segments.append([start, len(audio) / SAMPLE_RATE])
+    return [
+        (s, e, i == len(segments) - 1 or segments[i + 1][0] - e > turn_gap) for i, (s, e) in enumerate(segments)
+    ]
+
+
+def _frames(audio: np.ndarray):
+    for offset in range(0, len(audio) - FRAME_SAMPLES + 1, FRAME_SAMPLES):
+        yield audio[offset : offset + FRAME_SAMPLES].tobytes()
+
+
+def transcript_events(phrases: List[Phrase], stt_lag: float) -> List[Tuple[float, str]]:
+    """(time, transcript of the turn so far) as a streaming STT would report it after each phrase."""
+    events, text = [], ""
+    for phrase in phrases:
+        if len(phrase) < 4:
+            continue
+        text = f"{text} {phrase[3]}".strip()
+        events.append((phrase[1] + stt_lag, text))
+        if phrase[2]:
+            text = ""
+    return events
+
+
+async def replay(audio: np.ndarray, mode: str, transcripts: List[Tuple[float, str]] = ()) -> Tuple[List[float], List[float]]:
+    """Times the caller was declared to start and to stop speaking, as BaseInputTransport would."""
+    transcripts = list(transcripts)
+    vad = PooledSileroVADAnalyzer(params=VADParams(**VAD_PARAMS))
+    turn = create_turn_analyzer(vad, mode)
+    vad.set_sample_rate(SAMPLE_RATE)
+    if turn is not None:
+        turn.set_sample_rate(SAMPLE_RATE)
+
+    starts, stops = [], []
+    vad_state, user_speaking = VADState.QUIET, False
+    for i, frame in enumerate(_frames(audio)):
+        now = (i + 1) * FRAME_SAMPLES / SAMPLE_RATE
+        while turn is not None and transcripts and transcripts[0][0] <= now:
+            turn.note_transcript(transcripts.pop(0)[1])
+        previous = vad_state
+        new_state = await vad.analyze_audio(frame)
+        user_event = None
+        if new_state != vad_state and new_state not in (VADState.STARTING, VADState.STOPPING):
+            if turn is None or not turn.speech_triggered:
+                user_event = new_state
+            vad_state = new_state
+        if turn is not None:
+            is_speech = new_state in (VADState.SPEAKING, VADState.STARTING)
+            if turn.append_audio(frame, is_speech) == EndOfTurnState.COMPLETE:
+                user_event = VADState.QUIET
+            elif vad_state == VADState.QUIET and previous != VADState.QUIET:
+                state, _ = await turn.analyze_end_of_turn()
+                if state == EndOfTurnState.COMPLETE:
+                    user_event = VADState.QUIET
+        if user_event == VADState.SPEAKING and not user_speaking:
+            user_speaking = True
+            starts.append(now)
+        elif user_event == VADState.QUIET and user_speaking:
+            user_speaking = False
+            stops.append(now)
+    return starts, stops
+
+
+def score(phrases: List[Phrase], starts: List[float], stops: List[float]) -> dict:
+    delays, cutoffs = [], 0
+    detected = set()
+    for stop in stops:
+        before = [p for p in phrases if p[1] <= stop]
+        if not before:
+            continue
+        phrase = before[-1]
+        if phrase[2]:
+            if phrase not in detected:
+                detected.add(phrase)
+                delays.append(stop - phrase[1])
+        else:
+            cutoffs += 1
+
+    turns, current = [], []
+    for phrase in phrases:
+        current.append(phrase)
+        if phrase[2]:
+            turns.append(current)
+            current = []
+    # A turn the VAD never started on is the VAD's miss, not an endpointing one
+    heard = [t for t in turns if any(t[0][0] - 0.1 <= s <= t[-1][1] + 0.6 for s in starts)]
+    false_starts = sum(1 for s in starts if not any(p[0] - 0.1 <= s <= p[1] + 0.6 for p in phrases))
+    return {
+        "turns": len(heard),
+        "unheard": len(turns) - len(heard),
+        "delays": delays,
+        "cutoffs": cutoffs,
+        "missed": sum(1 for t in heard if t[-1] not in detected),
+        "false_starts": false_starts,
+    }
+
+
+async def main_async(args) -> None:
+    calls = []
+    if args.recordings:
+        labels = {}
+        if args.labels:
+            with open(args.labels) as f:
+                labels = {name: [tuple(p) for p in phrases] for name, phrases in json.load(f).items()}
+        for name in sorted(os.listdir(args.recordings)):
+            if name.endswith(".wav"):
+                audio = load_utterance(os.path.join(args.recordings, name))
+                phrases = labels.get(name) or await reference_phrases(audio, args.turn_gap_secs)
+                calls.append((name, audio, phrases))
+    else:
+        calls = [(f"synthetic-{seed}", *synthetic_call(seed)) for seed in range(args.synthetic)]
+
+    totals = {}
+    for mode in ("fixed", "adaptive"):
+        total = {"turns": 0, "unheard": 0, "delays": [], "cutoffs": 0, "missed": 0, "false_starts": 0}
+        for name, audio, phrases in calls:
+            transcripts = transcript_events(phrases, args.stt_lag_ms / 1000) if args.transcripts else []
+            result = score(phrases, *await replay(audio, mode, transcripts))
+            for key, value in result.items():
+                total[key] += value
+        totals[mode] = total
+
+    minutes = sum(len(audio) for _, audio, _ in calls) / SAMPLE_RATE / 60
+    print(
+        f"{len(calls)} calls, {minutes:.1f} min of caller audio, {totals['fixed']['turns']} turns "
+        f"({totals['fixed']['unheard']} more the VAD never picked up)"
+    )
+    print(f"{'endpointing':<12} {'mean ms':>8} {'p50 ms':>7} {'p90 ms':>7} {'cutoffs/100 turns':>18} {'missed':>7} {'false starts':>13}")
+    for mode, total in totals.items():
+        delays = sorted(total["delays"]) or [float("nan")]
+        print(
+            f"{mode:<12} {statistics.mean(delays) * 1000:>8.0f} {statistics.median(delays) * 1000:>7.0f} "
+            f"{delays[int(0.9 * (len(delays) - 1))] * 1000:>7.0f} "
+            f"{100 * total['cutoffs'] / max(1, total['turns']):>18.1f} {total['missed']:>7} {total['false_starts']:>13}"
+        )
+    saved = statistics.mean(totals["fixed"]["delays"] or [0]) - statistics.mean(totals["adaptive"]["delays"] or [0])
+    print(f"latency saved per turn: {saved * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recordings", help="directory of 8 kHz mono WAVs of the caller's side")
+    parser.add_argument("--labels", help="JSON of [start, end, ends_turn] phrases per WAV")
+    parser.add_argument("--turn-gap-secs", type=float, default=1.5, help="without labels: a longer gap ends a turn")
+    parser.add_argument("--synthetic", type=int, default=40, help="synthetic calls when no --recordings")
+    parser.add_argument(
+        "--transcripts", action=argparse.BooleanOptionalAction, default=True,
+        help="feed the phrases' text to the analyzer as a streaming STT would",
+    )
+    parser.add_argument("--stt-lag-ms", type=float, default=250.0, help="from the end of a phrase to its transcript")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# benchmarks/fake_exotel.py
+"""
+Local fake of Exotel's Connect API, plus a campaign run against it.
+
+The fake answers POST /v1/Accounts/{sid}/Calls/connect with the same XML
+shape Exotel returns, after a configurable delay. It fails a configurable
+fraction of requests and, like Exotel, answers 429 when callers exceed
+its calls-per-second limit.
+
+By default this script starts the fake, starts server.py in-process pointed
+at it (EXOTEL_API_BASE), streams a generated CSV to POST /campaigns and polls
+GET /campaigns/{id} until done. It then checks the counters against what the
+fake saw and reports the peak dial rate.
+
+Usage:
+    python -m benchmarks.fake_exotel [--leads 200] [--cps 10] [--fail-rate 0.02]
+    python -m benchmarks.fake_exotel --serve --port 9010    # fake only
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import time
+import uuid
+from collections import Counter
+
+from aiohttp import web
+
+
+class FakeExotel:
+    def __init__(self, cps_limit: float, latency: float, fail_rate: float, seed: int = 7):
+        self.cps_limit = cps_limit
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.accepted: list[tuple[float, str]] = []
+        self.rejected_429 = 0
+        self.failed = 0
+        self._rng = random.Random(seed)
+        self._window: list[float] = []
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/Accounts/{sid}/Calls/connect", self.connect)
+        return app
+
+    async def connect(self, request: web.Request) -> web.Response:
+        now = time.monotonic()
+        # Sliding one-second window, with a little slack for timer jitter
+        self._window = [t for t in self._window if now - t < 1.0]
+        if len(self._window) >= self.cps_limit * 1.1 + 1:
+            self.rejected_429 += 1
+            return web.Response(status=429, text="Too Many Requests")
+        self._window.append(now)
+
+        form = await request.post()
+        await asyncio.sleep(self.latency)
+
+        if self._rng.random() < self.fail_rate:
+            self.failed += 1
+            return web.Response(status=400, text="<RestException><Message>Invalid To number</Message></RestException>")
+
+        sid = uuid.uuid4().hex
+        self.accepted.append((now, str(form.get("To", ""))))
+        return web.Response(
+            text=(
+                '<?xml version="1.0" encoding="UTF-8"?>\n<TwilioResponse>\n <Call>\n'
+                f"  <Sid>{sid}</Sid>\n  <Status>in-progress</Status>\n </Call>\n</TwilioResponse>\n"
+            ),
+            content_type="application/xml",
+        )
+
+    def peak_cps(self) -> int:
+        per_second = Counter(int(t) for t, _ in self.accepted)
+        return max(per_second.values(), default=0)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _serve_fake(fake: FakeExotel, port: int) -> web.AppRunner:
+    runner = web.AppRunner(fake.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def run_campaign(leads: int, cps: float, fail_rate: float, latency: float) -> bool:
+    import httpx
+    import uvicorn
+
+    fake_port, server_port = _free_port(), _free_port()
+    fake = FakeExotel(cps_limit=cps, latency=latency, fail_rate=fail_rate)
+    fake_runner = await _serve_fake(fake, fake_port)
+
+    os.environ.update(
+        EXOTEL_API_BASE=f"http://127.0.0.1:{fake_port}",
+        EXOTEL_API_KEY="key",
+        EXOTEL_API_TOKEN="token",
+        EXOTEL_SID="fake",
+        EXOTEL_PHONE_NUMBER="08000000000",
+        EXOTEL_CALLS_PER_SECOND=str(cps),
+    )
+    import server
+
+    config = uvicorn.Config(server.app, host="127.0.0.1", port=server_port, log_level="warning")
+    uv_server = uvicorn.Server(config)
+    serve_task = asyncio.create_task(uv_server.serve())
+    while not uv_server.started:
+        await asyncio.sleep(0.05)
+
+    async def _csv():
+        yield b"phone_number,customer_name\n"
+        for i in range(leads):
+            yield f"+9198{i:08d},Lead {i}\n".encode()
+        yield b",missing phone\n"
+
+    ok = True
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server_port}", timeout=30) as client:
+            started = time.monotonic()
+            response = await client.post("/campaigns", content=_csv(), headers={"content-type": "text/csv"})
+            response.raise_for_status()
+            campaign = response.json()
+            print(f"created campaign {campaign['campaign_id']}: {campaign}")
+
+            while campaign["status"] in ("ingesting", "dialing"):
+                await asyncio.sleep(1.0)
+                campaign = (await client.get(f"/campaigns/{campaign['campaign_id']}")).json()
+                print(
+                    f"  t={time.monotonic() - started:5.1f}s queued={campaign['queued']} "
+                    f"dialed={campaign['dialed']} failed={campaign['failed']}"
+                )
+            elapsed = time.monotonic() - started
+    finally:
+        uv_server.should_exit = True
+        await serve_task
+        await fake_runner.cleanup()
+
+    checks = {
+        "all leads dialed or failed": campaign["dialed"] + campaign["failed"] == leads,
+        "dialed matches fake's accepted calls": campaign["dialed"] == len(fake.accepted),
+        "failed matches fake's failures": campaign["failed"] == fake.failed + fake.rejected_429,
+        "no 429s from the fake": fake.rejected_429 == 0,
+        "bad row rejected": campaign["rejected_rows"] == 1,
+        f"peak rate <= {cps:g}/s (+1 burst)": fake.peak_cps() <= cps + 1,
+    }
+    print(f"\n{leads} leads in {elapsed:.1f}s, effective {leads / elapsed:.2f} calls/s, peak {fake.peak_cps()}/s")
+    for name, passed in checks.items():
+        print(f"  [{'ok' if passed else 'FAIL'}] {name}")
+        ok = ok and passed
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", action="store_true", help="only run the fake Exotel API")
+    parser.add_argument("--port", type=int, default=9010)
+    parser.add_argument("--leads", type=int, default=200)
+    parser.add_argument("--cps", type=float, default=10.0)
+    parser.add_argument("--fail-rate", type=float, default=0.02)
+    parser.add_argument("--latency", type=float, default=0.15, help="fake API response time in seconds")
+    args = parser.parse_args()
+
+    if args.serve:
+        fake = FakeExotel(cps_limit=args.cps, latency=args.latency, fail_rate=args.fail_rate)
+        web.run_app(fake.app(), host="127.0.0.1", port=args.port)
+        return
+
+    ok = asyncio.run(run_campaign(args.leads, args.cps, args.fail_rate, args.latency))
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/fake_llm.py
+"""
+Local fake of the OpenAI chat completions API.
+
+POST /v1/chat/completions answers with a scripted reply instead of a model:
+the Nth reply of a conversation (counted from the user messages in the
+request) is REPLIES[N % len(REPLIES)], so every call hears the same lines in
+the same order whatever the load. None of them is a goodbye, so the bot
+never ends a call on its own.
+
+Streaming requests get the reply word by word as server-sent events: the
+first chunk after --ttfb-ms, then one every --token-ms, then a usage chunk
+and [DONE], as gpt-4o sends them with stream_options.include_usage.
+Non-streaming requests (the context window summariser) get one JSON body
+after the same delay. GET /v1/models (the provider pool's keep-warm
+request) answers at once.
+
+Point the bot at it with OPENAI_BASE_URL=http://127.0.0.1:9030/v1; the
+OpenAI SDK reads it for both the LLM service and the summariser.
+
+--slow-share/--slow-ms/--fail-share inject delay and errors into completions
+(benchmarks/faults.py), for provider_router.py's hedging.
+
+Usage:
+    python -m benchmarks.fake_llm [--port 9030] [--ttfb-ms 600] [--token-ms 15] [--slow-share 0.1 --slow-ms 3000]
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from aiohttp import web
+
+from benchmarks.faults import Faults, add_arguments, from_args
+
+REPLIES = [
+    "Hello! This is Shruti from Digi Loans. I'm calling to discuss some loan options. May I know your name please?",
+    "Would you be interested in hearing about our loan options?",
+    "What type of loan are you looking for – personal loan or home loan?",
+    "Okay. Approximately how much loan amount do you need?",
+    "Okay, got it. What is your monthly income?",
+    "Are you salaried or self-employed?",
+    "Thank you. Let me note that down.",
+]
+
+
+class FakeLLM:
+    def __init__(self, ttfb: float, token_interval: float, faults: Faults = None):
+        self.ttfb = ttfb
+        self.token_interval = token_interval
+        self.faults = faults or Faults()
+        self.requests = 0
+        self.streamed = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.completions)
+        app.router.add_get("/v1/models", self.models)
+        self.faults.add_routes(app)
+        return app
+
+    async def models(self, request: web.Request) -> web.Response:
+        return web.json_response({"object": "list", "data": [{"id": "gpt-4o", "object": "model", "owned_by": "fake"}]})
+
+    @staticmethod
+    def _reply(messages: list) -> str:
+        turns = sum(1 for m in messages if m.get("role") == "user")
+        return REPLIES[max(0, turns - 1) % len(REPLIES)]
+
+    async def completions(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.requests += 1
+        model = body.get("model", "fake")
+        reply = self._reply(body.get("messages", []))
+        usage = {
+            "prompt_tokens": sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4,
+            "completion_tokens": len(reply) // 4,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        await self.faults.apply()
+        await asyncio.sleep(self.ttfb)
+        if not body.get("stream"):
+            return web.json_response(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}
+                    ],
+                    "usage": usage,
+                }
+            )
+
+        self.streamed += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+
+        async def _send(choices: list, **extra) -> None:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": choices,
+                **extra,
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        words = reply.split(" ")
+        try:
+            await response.prepare(request)
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(self.token_interval)
+                delta = {"content": word if i == 0 else " " + word}
+                if i == 0:
+                    delta["role"] = "assistant"
+                await _send([{"index": 0, "delta": delta, "finish_reason": None}])
+            await _send([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if body.get("stream_options", {}).get("include_usage"):
+                await _send([], usage=usage)
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+        except ConnectionResetError:
+            pass  # the client closed the stream early, e.g. a cancelled hedge
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9030)
+    parser.add_argument("--ttfb-ms", type=float, default=600.0, help="delay before the first token")
+    parser.add_argument("--token-ms", type=float, default=15.0, help="delay between streamed words")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    fake = FakeLLM(args.ttfb_ms / 1000, args.token_ms / 1000, from_args(args))
+    web.run_app(fake.app(), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+# benchmarks/fake_stt.py
+"""
+Local fake STT server, plus a VAD-stop-to-transcript latency comparison.
+
+The fake speaks two protocols on one port:
+
+- Deepgram live streaming (WebSocket /v1/listen). Binary PCM in; interim
+  "Results" while there is voiced audio, a final on {"type": "Finalize"} or
+  after --endpointing-ms of silence. Each reply is delayed by --rtt-ms.
+- OpenAI-style batch transcription (POST /v1/audio/transcriptions). Replies
+  after --batch-base-ms plus --batch-per-sec-ms for each second of audio,
+  which roughly reproduces the ~1.15 s gpt-4o-transcribe TTFB in our logs.
+  --slow-share/--slow-ms/--fail-share inject delay and errors into it
+  (benchmarks/faults.py).
+
+Transcripts are not recognised from the audio: each utterance takes the
+next line of a fixed script, and interims reveal its words in step with the
+voiced audio received so far.
+
+By default this script starts the fake and runs the real pipecat STT
+services from stt_backends.py against it (STT_BACKEND=deepgram and openai).
+It feeds each one the same utterances in real time, with VAD start/stop
+frames where the pipeline's VAD would emit them, and measures the time from
+UserStoppedSpeakingFrame to the final TranscriptionFrame.
+
+Usage:
+    python -m benchmarks.fake_stt [--utterances 10] [--rtt-ms 80]
+    python -m benchmarks.fake_stt --serve --port 9020    # fake only
+    STT_BACKEND=deepgram STT_BASE_URL=http://127.0.0.1:9020 python server.py
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import time
+import uuid
+import wave
+
+import numpy as np
+from aiohttp import WSMsgType, web
+
+from benchmarks.faults import Faults, add_arguments, from_args
+
+SCRIPT = [
+    "Hello?",
+    "Yes, speaking.",
+    "Haan, bolo.",
+    "I need a personal loan.",
+    "Around five lakh rupees.",
+    "My monthly income is about forty thousand.",
+    "I am salaried, working in a private company.",
+    "Yes, that is correct.",
+    "Mujhe home loan chahiye.",
+    "Okay, thank you. Bye.",
+]
+WORDS_PER_SEC = 2.5
+VOICED_RMS = 500
+
+
+class FakeSTT:
+    def __init__(self, rtt: float, endpointing: float, batch_base: float, batch_per_sec: float, faults: Faults = None):
+        self.faults = faults or Faults()
+        self.rtt = rtt
+        self.endpointing = endpointing
+        self.batch_base = batch_base
+        self.batch_per_sec = batch_per_sec
+        self._line = 0
+        self.streams = 0
+        self.finals = 0
+        self.interims = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/v1/listen", self.listen)
+        app.router.add_post("/v1/audio/transcriptions", self.transcribe)
+        self.faults.add_routes(app)
+        return app
+
+    def _next_line(self) -> str:
+        line = SCRIPT[self._line % len(SCRIPT)]
+        self._line += 1
+        return line
+
+    async def transcribe(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        upload = form["file"]
+        with wave.open(io.BytesIO(upload.file.read())) as wav:
+            seconds = wav.getnframes() / wav.getframerate()
+        await self.faults.apply()
+        await asyncio.sleep(self.batch_base + self.batch_per_sec * seconds)
+        self.finals += 1
+        return web.json_response({"text": self._next_line()})
+
+    async def listen(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.streams += 1
+        sample_rate = int(request.query.get("sample_rate", "8000"))
+        request_id = uuid.uuid4().hex
+
+        outbox: asyncio.Queue = asyncio.Queue()
+        stream_secs = 0.0  # audio time received on this stream
+        voiced_secs = 0.0  # voiced audio in the current utterance
+        silence_secs = 0.0
+        last_interim_words = 0
+        line = None
+
+        def _result(text: str, start: float, is_final: bool, **extra) -> dict:
+            return {
+                "type": "Results",
+                "channel_index": [0, 1],
+                "duration": round(stream_secs - start, 3),
+                "start": round(start, 3),
+                "is_final": is_final,
+                "speech_final": extra.pop("speech_final", False),
+                "channel": {"alternatives": [{"transcript": text, "confidence": 0.98, "words": []}]},
+                "metadata": {
+                    "request_id": request_id,
+                    "model_info": {"name": "fake", "version": "0", "arch": "fake"},
+                    "model_uuid": request_id,
+                },
+                **extra,
+            }
+
+        def _send(message: dict) -> None:
+            # Every reply arrives one network+model round trip later
+            outbox.put_nowait((time.monotonic() + self.rtt, message))
+
+        async def _sender():
+            while True:
+                due, message = await outbox.get()
+                await asyncio.sleep(max(0.0, due - time.monotonic()))
+                if ws.closed:
+                    return
+                await ws.send_str(json.dumps(message))
+
+        def _finish(**extra) -> None:
+            nonlocal line, voiced_secs, silence_secs, last_interim_words
+            if line is not None:
+                self.finals += 1
+                _send(_result(line, stream_secs - voiced_secs, True, **extra))
+            line, voiced_secs, silence_secs, last_interim_words = None, 0.0, 0.0, 0
+
+        sender = asyncio.create_task(_sender())
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.BINARY:
+                    pcm = np.frombuffer(msg.data, dtype=np.int16)
+                    secs = len(pcm) / sample_rate
+                    stream_secs += secs
+                    voiced = len(pcm) and np.sqrt(np.mean(pcm.astype(np.float32) ** 2)) > VOICED_RMS
+                    if voiced:
+                        if line is None:
+                            line = self._next_line()
+                        voiced_secs += secs
+                        silence_secs = 0.0
+                        words = line.split()
+                        shown = min(len(words), max(1, int(voiced_secs * WORDS_PER_SEC)))
+                        if shown > last_interim_words:
+                            last_interim_words = shown
+                            self.interims += 1
+                            _send(_result(" ".join(words[:shown]), stream_secs - voiced_secs, False))
+                    elif line is not None:
+                        silence_secs += secs
+                        if silence_secs >= self.endpointing:
+                            _finish(speech_final=True)
+                elif msg.type == WSMsgType.TEXT:
+                    kind = json.loads(msg.data).get("type")
+                    if kind == "Finalize":
+                        _finish(from_finalize=True)
+                    elif kind == "CloseStream":
+                        _finish()
+                        await asyncio.sleep(self.rtt)
+                        break
+                else:
+                    break
+        finally:
+            await asyncio.sleep(0)
+            sender.cancel()
+            await ws.close()
+        return ws
+
+
+# ---------------------------------------------------------------------------
+# Latency comparison through the real pipecat services
+# ---------------------------------------------------------------------------
+
+def _utterance(seconds: float, sample_rate: int, seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    voice = 0.3 * np.sin(2 * np.pi * 180 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+    return (np.clip(voice + 0.005 * rng.standard_normal(t.shape), -1, 1) * 32767).astype(np.int16).tobytes()
+
+
+async def measure(backend: str, base_url: str, utterances: int, stop_secs: float) -> dict:
+    from pipecat.frames.frames import (
+        InputAudioRawFrame,
+        InterimTranscriptionFrame,
+        TranscriptionFrame,
+        UserStartedSpeakingFrame,
+        UserStoppedSpeakingFrame,
+    )
+    from pipecat.pipeline.pipeline import Pipeline
+    from pipecat.pipeline.runner import PipelineRunner
+    from pipecat.pipeline.task import PipelineParams, PipelineTask
+    from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+    from stt_backends import create_stt_service
+
+    sample_rate, chunk_secs = 8000, 0.02
+    chunk_bytes = int(sample_rate * chunk_secs) * 2
+    finals: asyncio.Queue = asyncio.Queue()
+    interims = 0
+
+    class Collector(FrameProcessor):
+        async def process_frame(self, frame, direction: FrameDirection):
+            nonlocal interims
+            await super().process_frame(frame, direction)
+            if isinstance(frame, InterimTranscriptionFrame):
+                interims += 1
+            elif isinstance(frame, TranscriptionFrame):
+                finals.put_nowait((time.perf_counter(), frame.text))
+            await self.push_frame(frame, direction)
+
+    os.environ.setdefault("OPENAI_API_KEY", "local")
+    stt = create_stt_service(backend, base_url)
+    task = PipelineTask(
+        Pipeline([stt, Collector()]),
+        params=PipelineParams(audio_in_sample_rate=sample_rate, enable_metrics=True),
+    )
+    runner_task = asyncio.create_task(PipelineRunner(handle_sigint=False).run(task))
+    await asyncio.sleep(0.5)  # let the service connect
+
+    async def _play(pcm: bytes) -> None:
+        start = time.perf_counter()
+        for n, i in enumerate(range(0, len(pcm), chunk_bytes)):
+            await task.queue_frame(InputAudioRawFrame(pcm[i : i + chunk_bytes], sample_rate, 1))
+            await asyncio.sleep(max(0.0, start + (n + 1) * chunk_secs - time.perf_counter()))
+
+    latencies = []
+    silence = bytes(int(sample_rate * stop_secs) * 2)
+    for n in range(utterances):
+        await task.queue_frame(UserStartedSpeakingFrame())
+        await _play(_utterance(1.0 + (n % 4) * 0.75, sample_rate, seed=n))
+        # The VAD only reports a stop after stop_secs of trailing silence
+        await _play(silence)
+        stopped = time.perf_counter()
+        await task.queue_frame(UserStoppedSpeakingFrame())
+        try:
+            received, _ = await asyncio.wait_for(finals.get(), timeout=10)
+            latencies.append(received - stopped)
+        except asyncio.TimeoutError:
+            latencies.append(float("inf"))
+        await _play(bytes(int(sample_rate * 0.3) * 2))
+        while not finals.empty():  # a late endpointing final must not count for the next turn
+            finals.get_nowait()
+
+    await task.cancel()
+    await runner_task
+    finite = sorted(x for x in latencies if x != float("inf"))
+    return {
+        "backend": backend,
+        "finals": len(finite),
+        "interims": interims,
+        "median_ms": statistics.median(finite) * 1000 if finite else float("inf"),
+        "p95_ms": finite[min(len(finite) - 1, int(0.95 * len(finite)))] * 1000 if finite else float("inf"),
+    }
+
+
+async def compare(args) -> None:
+    fake = FakeSTT(args.rtt_ms / 1000, args.endpointing_ms / 1000, args.batch_base_ms / 1000, args.batch_per_sec_ms / 1000)
+    runner = web.AppRunner(fake.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", args.port)
+    await site.start()
+    base = f"http://127.0.0.1:{args.port}"
+    try:
+        results = [
+            await measure("deepgram", base, args.utterances, args.stop_secs),
+            await measure("openai", f"{base}/v1", args.utterances, args.stop_secs),
+        ]
+    finally:
+        await runner.cleanup()
+
+    print(f"\nVAD stop -> final transcript ({args.utterances} utterances, fake rtt {args.rtt_ms:g} ms)")
+    print(f"{'backend':>10} {'finals':>7} {'interims':>9} {'median ms':>10} {'p95 ms':>8}")
+    for r in results:
+        print(f"{r['backend']:>10} {r['finals']:>7} {r['interims']:>9} {r['median_ms']:>10.0f} {r['p95_ms']:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", action="store_true", help="only run the fake STT server")
+    parser.add_argument("--port", type=int, default=9020)
+    parser.add_argument("--utterances", type=int, default=10)
+    parser.add_argument("--stop-secs", type=float, default=0.5, help="VAD stop_secs used in bot.py")
+    parser.add_argument("--rtt-ms", type=float, default=80.0, help="streaming reply delay")
+    parser.add_argument("--endpointing-ms", type=float, default=800.0)
+    parser.add_argument("--batch-base-ms", type=float, default=700.0)
+    parser.add_argument("--batch-per-sec-ms", type=float, default=150.0)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.serve:
+        fake = FakeSTT(
+            args.rtt_ms / 1000, args.endpointing_ms / 1000, args.batch_base_ms / 1000, args.batch_per_sec_ms / 1000,
+            from_args(args),
+        )
+        web.run_app(fake.app(), host="127.0.0.1", port=args.port)
+        return
+
+    asyncio.run(compare(args))
+
+
+if __name__ == "__main__":
+    main()
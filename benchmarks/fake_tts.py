@@ -0,0 +1,123 @@
+# benchmarks/fake_tts.py
+"""
+Local fake of Sarvam's text-to-speech API.
+
+- WebSocket /text-to-speech/ws, as SarvamTTSService uses it: a "config"
+  message, then "text" messages (one per chunk from the aggregator),
+  "flush" at the end of a response and "ping" keepalives. Like Sarvam, it
+  buffers text until it has the config's min_buffer_size characters (or
+  a flush) and then renders what it has. Its audio comes back --latency-ms
+  later, as base64 PCM "audio" messages of 0.5 s each, sent four times
+  faster than real time like Sarvam's. Its length follows the word count
+  (WORDS_PER_SEC).
+- POST /text-to-speech, the HTTP endpoint prewarm_phrase_cache() renders
+  the scripted phrases with. It returns one WAV in "audios".
+
+The audio is a quiet tone at the sample rate from the config message.
+Point the bot at it with SARVAM_API_BASE=http://127.0.0.1:9040; the TTS
+WebSocket URL is derived from it (tts_cache.SARVAM_TTS_WS_URL).
+
+Usage:
+    python -m benchmarks.fake_tts [--port 9040] [--latency-ms 450]
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import wave
+
+import numpy as np
+from aiohttp import WSMsgType, web
+
+WORDS_PER_SEC = 2.5
+CHUNK_SECS = 0.5
+
+
+def render(text: str, sample_rate: int) -> bytes:
+    seconds = max(0.3, len(text.split()) / WORDS_PER_SEC)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (1500 * np.sin(2 * np.pi * 220 * t)).astype(np.int16).tobytes()
+
+
+class FakeTTS:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.streams = 0
+        self.sentences = 0
+        self.rendered = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/text-to-speech/ws", self.stream)
+        app.router.add_post("/text-to-speech", self.synthesize)
+        return app
+
+    async def synthesize(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        sample_rate = int(body.get("sample_rate") or 8000)
+        await asyncio.sleep(self.latency)
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(render(body.get("text", ""), sample_rate))
+        self.rendered += 1
+        return web.json_response({"audios": [base64.b64encode(buffer.getvalue()).decode("ascii")]})
+
+    async def stream(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.streams += 1
+        sample_rate = 8000
+        min_buffer = 50
+        pending = ""
+        texts: asyncio.Queue = asyncio.Queue()
+
+        async def _speak():
+            # One buffer at a time, in order, like Sarvam's stream
+            while True:
+                text = await texts.get()
+                await asyncio.sleep(self.latency)
+                audio = render(text, sample_rate)
+                step = int(CHUNK_SECS * sample_rate) * 2
+                for i in range(0, len(audio), step):
+                    if ws.closed:
+                        return
+                    payload = base64.b64encode(audio[i : i + step]).decode("ascii")
+                    await ws.send_str(json.dumps({"type": "audio", "data": {"audio": payload}}))
+                    await asyncio.sleep(CHUNK_SECS / 4)
+
+        speaker = asyncio.create_task(_speak())
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                message = json.loads(msg.data)
+                if message.get("type") == "config":
+                    sample_rate = int(message["data"].get("speech_sample_rate") or sample_rate)
+                    min_buffer = int(message["data"].get("min_buffer_size") or min_buffer)
+                elif message.get("type") == "text":
+                    self.sentences += 1
+                    pending += message["data"]["text"]
+                if pending and (len(pending) >= min_buffer or message.get("type") == "flush"):
+                    texts.put_nowait(pending)
+                    pending = ""
+        finally:
+            speaker.cancel()
+        return ws
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9040)
+    parser.add_argument("--latency-ms", type=float, default=450.0, help="delay before each buffer's first audio")
+    args = parser.parse_args()
+
+    fake = FakeTTS(args.latency_ms / 1000)
+    web.run_app(fake.app(), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/faults.py
+"""
+Injected slowness and errors for the fake providers.
+
+fake_llm and fake_stt take --slow-share/--slow-ms/--fail-share: that share
+of requests waits --slow-ms longer, or fails with a 500. POST /admin/faults
+with the same fields as JSON ({"slow_share": 1.0, "slow_ms": 3000}) changes
+them while the fake runs, so a benchmark can degrade a provider mid-run.
+Draws are seeded, so runs repeat.
+"""
+import asyncio
+import random
+
+from aiohttp import web
+
+
+class Faults:
+    def __init__(self, slow_share: float = 0.0, slow_ms: float = 0.0, fail_share: float = 0.0, seed: int = 0):
+        self.slow_share = slow_share
+        self.slow_ms = slow_ms
+        self.fail_share = fail_share
+        self._random = random.Random(seed)
+        self.slowed = 0
+        self.failed = 0
+
+    def add_routes(self, app: web.Application) -> None:
+        app.router.add_post("/admin/faults", self.update)
+
+    async def update(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        for field in ("slow_share", "slow_ms", "fail_share"):
+            if field in body:
+                setattr(self, field, float(body[field]))
+        return web.json_response({"slow_share": self.slow_share, "slow_ms": self.slow_ms, "fail_share": self.fail_share})
+
+    async def apply(self) -> None:
+        """Wait or raise for this request, as the settings say."""
+        if self._random.random() < self.fail_share:
+            self.failed += 1
+            raise web.HTTPInternalServerError(text='{"error": {"message": "injected failure"}}')
+        if self._random.random() < self.slow_share:
+            self.slowed += 1
+            await asyncio.sleep(self.slow_ms / 1000)
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--slow-share", type=float, default=0.0, help="share of requests delayed by --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=0.0)
+    parser.add_argument("--fail-share", type=float, default=0.0, help="share of requests answered with a 500")
+
+
+def from_args(args) -> Faults:
+    return Faults(args.slow_share, args.slow_ms, args.fail_share)
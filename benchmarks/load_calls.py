@@ -0,0 +1,447 @@
+# benchmarks/load_calls.py
+"""
+Whole-bot load test: concurrent simulated Exotel calls against server.py's /ws.
+
+Starts the local fakes (fake_stt, fake_llm, fake_tts) and server.py, each
+in its own process, with the bot pointed at the fakes (STT_BASE_URL,
+OPENAI_BASE_URL, SARVAM_API_BASE). Then, for each step of concurrency,
+opens that many Exotel Media Streams WebSockets to /ws. Every call sends
+"connected" and "start" like Exotel, then streams 20 ms frames of 8 kHz
+PCM in real time for the whole call: a short silence, then --turns times an
+utterance followed by --turn-secs of silence for the bot to answer in. The
+utterance is --audio (a recorded 8 kHz mono 16-bit WAV) or, by default, a
+synthetic voice that Silero detects as speech. The call hangs up with
+"stop" after the last turn.
+
+Per step it reports:
+- turns: the bot's answers heard out of the turns spoken;
+- turn latency: from the last utterance frame sent to the first bot media
+  received, p50/p95 (includes VAD stop_secs, like the caller hears it),
+  and the server's own voice-to-voice mean from /metrics;
+- jitter: p99 deviation of media inter-arrival times within a response
+  from their median, and underruns, where Exotel's playback would have run
+  dry in the middle of a response;
+- per-call CPU (% of one core per call), RSS growth per call and peak RSS;
+- event-loop lag of the server process: p50/p99/max of how late a 50 ms
+  sleep wakes up.
+
+The server runs in --serve-bot mode: server.py's app plus a probe of its
+event loop, CPU and RSS at /_loadtest/stats. It runs in a temporary
+directory with .env loading disabled, so its logs go there, not to logs/.
+The calls are driven from this process on the same host, so leave it some
+cores. RSS comes from /proc (Linux only).
+
+Usage:
+    python -m benchmarks.load_calls [--steps 1 5 10 20] [--turns 3] [--stt deepgram]
+    python -m benchmarks.load_calls --audio recording.wav --steps 10 25
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import wave
+
+import aiohttp
+import numpy as np
+from scipy.signal import lfilter
+
+from benchmarks.load_workers import FRAME_SAMPLES, FRAME_SECS, SAMPLE_RATE, _free_port, _wait_for_port
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESPONSE_GAP_SECS = 0.3  # a longer media gap starts a new bot response
+LAG_PROBE_SECS = 0.05
+
+
+# ---------------------------------------------------------------------------
+# Server side (--serve-bot)
+# ---------------------------------------------------------------------------
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class _LoopProbe:
+    def __init__(self):
+        self.lags: list[float] = []
+        self.peak_rss = 0
+
+    async def run(self) -> None:
+        while True:
+            before = time.perf_counter()
+            await asyncio.sleep(LAG_PROBE_SECS)
+            self.lags.append(time.perf_counter() - before - LAG_PROBE_SECS)
+            if len(self.lags) % 10 == 0:
+                self.peak_rss = max(self.peak_rss, _rss_bytes())
+
+    def stats(self, reset: bool) -> dict:
+        rss = _rss_bytes()
+        lags = np.array(self.lags or [0.0]) * 1000
+        result = {
+            "cpu_secs": time.process_time(),
+            "rss_bytes": rss,
+            "peak_rss_bytes": max(self.peak_rss, rss),
+            "lag_p50_ms": float(np.percentile(lags, 50)),
+            "lag_p99_ms": float(np.percentile(lags, 99)),
+            "lag_max_ms": float(lags.max()),
+        }
+        if reset:
+            self.lags = []
+            self.peak_rss = rss
+        return result
+
+
+async def _serve_bot(port: int) -> None:
+    import uvicorn
+
+    from server import app
+
+    probe = _LoopProbe()
+
+    async def loadtest_stats(reset: bool = False) -> dict:
+        return probe.stats(reset)
+
+    app.add_api_route("/_loadtest/stats", loadtest_stats, methods=["GET"])
+    probe_task = asyncio.create_task(probe.run())
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    try:
+        await server.serve()
+    finally:
+        probe_task.cancel()
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def synthetic_voice(seconds: float, seed: int) -> np.ndarray:
+    """Voiced syllables: a vibrato glottal buzz through two formant resonators."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = (120 + 60 * rng.random()) * (1 + 0.03 * np.sin(2 * np.pi * 5 * t))
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    signal = sum(np.sin(k * phase) / k for k in range(1, 16))
+    for formant, bandwidth in ((700, 130), (1200, 150)):
+        r = np.exp(-np.pi * bandwidth / SAMPLE_RATE)
+        signal = lfilter([1 - r], [1, -2 * r * np.cos(2 * np.pi * formant / SAMPLE_RATE), r * r], signal)
+
+    syllable = np.hanning(int(0.18 * SAMPLE_RATE))
+    gap = np.zeros(int(0.04 * SAMPLE_RATE))
+    envelope = np.tile(np.concatenate([syllable, gap]), len(t) // (len(syllable) + len(gap)) + 1)[: len(t)]
+    signal = signal * envelope
+    signal = 0.3 * signal / np.abs(signal).max() + 0.005 * rng.standard_normal(len(t))
+    return (np.clip(signal, -1, 1) * 32767).astype(np.int16)
+
+
+def load_utterance(path: str) -> np.ndarray:
+    with wave.open(path) as wav:
+        if wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+            raise SystemExit(f"{path}: expected {SAMPLE_RATE} Hz mono 16-bit PCM")
+        return np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+
+
+def _call_frames(utterance: np.ndarray, turns: int, turn_secs: float) -> tuple[list[str], list[int]]:
+    """Base64 payloads for the whole call, and the index of each utterance's last frame."""
+    silence = np.zeros(int(turn_secs * SAMPLE_RATE), dtype=np.int16)
+    parts = [np.zeros(int(0.5 * SAMPLE_RATE), dtype=np.int16)]
+    ends = []
+    for _ in range(turns):
+        parts.append(utterance)
+        ends.append((sum(len(p) for p in parts) + FRAME_SAMPLES - 1) // FRAME_SAMPLES - 1)
+        parts.append(silence)
+    pcm = np.concatenate(parts).tobytes()
+    step = FRAME_SAMPLES * 2
+    frames = [base64.b64encode(pcm[i : i + step]).decode("ascii") for i in range(0, len(pcm) - step + 1, step)]
+    return frames, ends
+
+
+def _analyse_media(arrivals: list[tuple[float, float]], utterance_ends: list[float]) -> dict:
+    """Turn latencies, inter-arrival jitter and playback underruns from (arrival, seconds) pairs."""
+    # A response starts with the first media after a gap; audio still
+    # arriving from the previous answer is not this turn's answer.
+    starts = [at for n, (at, _) in enumerate(arrivals) if n == 0 or at - arrivals[n - 1][0] >= RESPONSE_GAP_SECS]
+    latencies = []
+    for i, end in enumerate(utterance_ends):
+        until = utterance_ends[i + 1] if i + 1 < len(utterance_ends) else float("inf")
+        first = next((at for at in starts if end < at < until), None)
+        if first is not None:
+            latencies.append(first - end)
+
+    gaps = [b[0] - a[0] for a, b in zip(arrivals, arrivals[1:]) if b[0] - a[0] < RESPONSE_GAP_SECS]
+    median_gap = float(np.median(gaps)) if gaps else 0.0
+    deviations = [abs(g - median_gap) for g in gaps]
+
+    underruns = 0
+    play_end = 0.0
+    for at, seconds in arrivals:
+        # Exotel plays what it has in real time; running dry mid-response is audible
+        if play_end and play_end < at < play_end + RESPONSE_GAP_SECS:
+            underruns += 1
+        play_end = max(play_end, at) + seconds
+    return {"latencies": latencies, "deviations": deviations, "underruns": underruns}
+
+
+async def _simulate_call(url: str, utterance: np.ndarray, turns: int, turn_secs: float, delay: float) -> dict:
+    import websockets
+
+    await asyncio.sleep(delay)
+    frames, ends = _call_frames(utterance, turns, turn_secs)
+    stream_sid = uuid.uuid4().hex
+    arrivals: list[tuple[float, float]] = []
+    utterance_ends: list[float] = []
+
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"event": "connected"}))
+        await ws.send(
+            json.dumps(
+                {
+                    "event": "start",
+                    "sequence_number": 1,
+                    "stream_sid": stream_sid,
+                    "start": {
+                        "stream_sid": stream_sid,
+                        "call_sid": uuid.uuid4().hex,
+                        "account_sid": "loadtest",
+                        "from": "0000000000",
+                        "to": "9000000000",
+                        "media_format": {"encoding": "raw/slin", "sample_rate": str(SAMPLE_RATE), "bit_rate": "128kbps"},
+                    },
+                }
+            )
+        )
+
+        async def _receive():
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get("event") == "media":
+                    seconds = len(base64.b64decode(message["media"]["payload"])) / (SAMPLE_RATE * 2)
+                    arrivals.append((time.perf_counter(), seconds))
+
+        receiver = asyncio.create_task(_receive())
+        start = time.perf_counter()
+        end_indices = set(ends)
+        try:
+            for i, payload in enumerate(frames):
+                # Real-time pacing, like Exotel sending 20 ms chunks
+                wait = start + i * FRAME_SECS - time.perf_counter()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                await ws.send(
+                    json.dumps(
+                        {
+                            "event": "media",
+                            "sequence_number": i + 2,
+                            "stream_sid": stream_sid,
+                            "media": {"chunk": i + 1, "timestamp": str(int(i * FRAME_SECS * 1000)), "payload": payload},
+                        }
+                    )
+                )
+                if i in end_indices:
+                    utterance_ends.append(time.perf_counter())
+            await ws.send(json.dumps({"event": "stop", "sequence_number": len(frames) + 2, "stream_sid": stream_sid}))
+        finally:
+            receiver.cancel()
+
+    return _analyse_media(arrivals, utterance_ends)
+
+
+def _turn_metrics(text: str) -> dict:
+    """Sum and count of the server's voice-to-voice histogram, and each stage's sum."""
+    totals = {"sum": 0.0, "count": 0.0}
+    stages: dict[str, float] = {}
+    for line in text.splitlines():
+        if line.startswith("voicebot_turn_latency_seconds_sum"):
+            totals["sum"] += float(line.rsplit(" ", 1)[1])
+        elif line.startswith("voicebot_turn_latency_seconds_count"):
+            totals["count"] += float(line.rsplit(" ", 1)[1])
+        elif line.startswith("voicebot_turn_stage_seconds_sum"):
+            stage = re.search(r'stage="(\w+)"', line).group(1)
+            stages[stage] = stages.get(stage, 0.0) + float(line.rsplit(" ", 1)[1])
+    return {**totals, "stages": stages}
+
+
+async def _run_step(base: str, calls: int, args, utterance: np.ndarray) -> dict:
+    async with aiohttp.ClientSession() as session:
+
+        async def _get(path: str):
+            async with session.get(f"{base}{path}") as response:
+                return await (response.json() if path.startswith("/_loadtest") else response.text())
+
+        before = await _get("/_loadtest/stats?reset=true")
+        metrics_before = _turn_metrics(await _get("/metrics"))
+        started = time.perf_counter()
+        url = base.replace("http", "ws", 1) + "/ws"
+        results = await asyncio.gather(
+            *(
+                _simulate_call(url, utterance, args.turns, args.turn_secs, n * args.ramp_secs / calls)
+                for n in range(calls)
+            ),
+            return_exceptions=True,
+        )
+        wall = time.perf_counter() - started
+        await asyncio.sleep(1.0)  # let the last pipelines finish and record their turns
+        after = await _get("/_loadtest/stats")
+        metrics_after = _turn_metrics(await _get("/metrics"))
+
+    ok = [r for r in results if isinstance(r, dict)]
+    latencies = np.array([x for r in ok for x in r["latencies"]] or [np.nan]) * 1000
+    deviations = np.array([x for r in ok for x in r["deviations"]] or [0.0]) * 1000
+    server_turns = metrics_after["count"] - metrics_before["count"]
+    server_mean = (metrics_after["sum"] - metrics_before["sum"]) / server_turns * 1000 if server_turns else float("nan")
+    stage_means = {
+        stage: (secs - metrics_before["stages"].get(stage, 0.0)) / server_turns * 1000 if server_turns else float("nan")
+        for stage, secs in metrics_after["stages"].items()
+    }
+    cpu = after["cpu_secs"] - before["cpu_secs"]
+    return {
+        "calls": calls,
+        "errors": len(results) - len(ok),
+        "turns_answered": sum(len(r["latencies"]) for r in ok),
+        "turns_spoken": calls * args.turns,
+        "turn_p50_ms": float(np.nanpercentile(latencies, 50)),
+        "turn_p95_ms": float(np.nanpercentile(latencies, 95)),
+        "server_v2v_ms": server_mean,
+        "server_stages_ms": stage_means,
+        "jitter_p99_ms": float(np.percentile(deviations, 99)),
+        "underruns": sum(r["underruns"] for r in ok),
+        "cpu_pct_per_call": cpu / wall / calls * 100,
+        "cpu_pct_total": cpu / wall * 100,
+        "rss_per_call_mb": (after["peak_rss_bytes"] - before["rss_bytes"]) / calls / 2**20,
+        "peak_rss_mb": after["peak_rss_bytes"] / 2**20,
+        "lag_p50_ms": after["lag_p50_ms"],
+        "lag_p99_ms": after["lag_p99_ms"],
+        "lag_max_ms": after["lag_max_ms"],
+    }
+
+
+def _start(module: str, *argv: str, env: dict, cwd: str, log) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", module, *argv], env=env, cwd=cwd, stdout=log, stderr=log)
+
+
+def _stop(processes: list[subprocess.Popen]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+@contextlib.asynccontextmanager
+async def fake_services(args, workdir: str, log):
+    """Run fake_stt, fake_llm and fake_tts; yields the environment that points server.py at them."""
+    ports = {name: _free_port() for name in ("stt", "llm", "tts")}
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.getenv("PYTHONPATH")])))
+    processes = [
+        _start("benchmarks.fake_stt", "--serve", "--port", str(ports["stt"]), env=env, cwd=REPO_ROOT, log=log),
+        _start(
+            "benchmarks.fake_llm", "--port", str(ports["llm"]), "--ttfb-ms", str(args.llm_ttfb_ms),
+            env=env, cwd=REPO_ROOT, log=log,
+        ),
+        _start(
+            "benchmarks.fake_tts", "--port", str(ports["tts"]), "--latency-ms", str(args.tts_latency_ms),
+            env=env, cwd=REPO_ROOT, log=log,
+        ),
+    ]
+    try:
+        for port in ports.values():
+            await _wait_for_port(port)
+        yield dict(
+            env,
+            PYTHON_DOTENV_DISABLED="1",
+            OPENAI_API_KEY="local",
+            OPENAI_BASE_URL=f"http://127.0.0.1:{ports['llm']}/v1",
+            SARVAM_API_KEY="local",
+            SARVAM_API_BASE=f"http://127.0.0.1:{ports['tts']}",
+            STT_BACKEND=args.stt,
+            STT_BASE_URL=f"http://127.0.0.1:{ports['stt']}" + ("/v1" if args.stt == "openai" else ""),
+            TTS_CACHE_DIR=os.path.join(workdir, "tts_cache"),
+        )
+    finally:
+        _stop(processes)
+
+
+def start_bot(port: int, env: dict, workdir: str, log) -> subprocess.Popen:
+    """server.py in --serve-bot mode, run from workdir so its logs/ go there."""
+    return _start("benchmarks.load_calls", "--serve-bot", "--port", str(port), env=env, cwd=workdir, log=log)
+
+
+async def run(args) -> list[dict]:
+    workdir = tempfile.mkdtemp(prefix="voicebot_load_")
+    port = _free_port()
+    print(f"logs: {workdir}")
+
+    with open(os.path.join(workdir, "processes.log"), "ab") as log:
+        async with fake_services(args, workdir, log) as env:
+            server = start_bot(port, dict(env, MAX_CONCURRENT_CALLS=str(max(args.steps) * 2)), workdir, log)
+            try:
+                await _wait_for_port(port)
+                await asyncio.sleep(2.0)  # phrase cache prewarm against the fake TTS
+
+                utterance = load_utterance(args.audio) if args.audio else synthetic_voice(args.utterance_secs, seed=1)
+                base = f"http://127.0.0.1:{port}"
+                results = []
+                for calls in args.steps:
+                    results.append(await _run_step(base, calls, args, utterance))
+                    await asyncio.sleep(2.0)
+                return results
+            finally:
+                _stop([server])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve-bot", action="store_true", help="internal: run server.py with the stats probe")
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--steps", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--turn-secs", type=float, default=6.0, help="silence after each utterance")
+    parser.add_argument("--utterance-secs", type=float, default=1.5, help="length of the synthetic utterance")
+    parser.add_argument("--audio", help="8 kHz mono 16-bit WAV to speak each turn instead")
+    parser.add_argument("--ramp-secs", type=float, default=2.0, help="spread the calls' start over this long")
+    parser.add_argument("--stt", choices=["deepgram", "openai"], default="deepgram")
+    parser.add_argument("--llm-ttfb-ms", type=float, default=600.0)
+    parser.add_argument("--tts-latency-ms", type=float, default=450.0)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    if args.serve_bot:
+        asyncio.run(_serve_bot(args.port))
+        return
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"cpu cores: {os.cpu_count()}, stt: {args.stt}, {args.turns} turns per call")
+    print(
+        f"{'calls':>5} {'err':>4} {'turns':>7} {'p50 ms':>7} {'p95 ms':>7} {'srv ms':>7} "
+        f"{'jit p99':>8} {'underrun':>9} {'cpu%/call':>10} {'cpu%':>6} {'MB/call':>8} {'rss MB':>7} "
+        f"{'lag p50':>8} {'lag p99':>8} {'lag max':>8}"
+    )
+    for r in results:
+        print(
+            f"{r['calls']:>5} {r['errors']:>4} {r['turns_answered']:>3}/{r['turns_spoken']:<3} "
+            f"{r['turn_p50_ms']:>7.0f} {r['turn_p95_ms']:>7.0f} {r['server_v2v_ms']:>7.0f} "
+            f"{r['jitter_p99_ms']:>8.1f} {r['underruns']:>9} {r['cpu_pct_per_call']:>10.1f} "
+            f"{r['cpu_pct_total']:>6.0f} {r['rss_per_call_mb']:>8.1f} {r['peak_rss_mb']:>7.0f} "
+            f"{r['lag_p50_ms']:>8.1f} {r['lag_p99_ms']:>8.1f} {r['lag_max_ms']:>8.1f}"
+        )
+    print("\nserver stage means (ms): " + "; ".join(
+        f"{r['calls']} calls " + ", ".join(f"{s} {ms:.0f}" for s, ms in r["server_stages_ms"].items())
+        for r in results
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+# benchmarks/load_workers.py
+"""
+Concurrent-call capacity versus server worker count.
+
+Starts `uvicorn benchmarks.load_workers:app --workers N` with the SQLite call
+store, registers each call's context from this (separate) process the way
+/start does, then opens Exotel Media Streams WebSockets in steps of
+concurrency. Each simulated call streams 20 ms PCM frames in real time; the
+server side looks its context up in the shared store, runs the pooled Silero
+VAD on every frame and echoes the frame back as outbound audio.
+
+A call is healthy when its context was found and its p95 frame round trip
+stays under --rtt-budget-ms. Capacity is the highest concurrency step where
+at least 95% of calls are healthy.
+
+Usage:
+    python -m benchmarks.load_workers [--workers 1 2 4] [--steps 10 25 50 100 200]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+
+from call_memory import take_outbound_call
+
+SAMPLE_RATE = 8000
+FRAME_SAMPLES = 160
+FRAME_SECS = FRAME_SAMPLES / SAMPLE_RATE
+
+
+# ---------------------------------------------------------------------------
+# Server side (runs inside each uvicorn worker)
+# ---------------------------------------------------------------------------
+
+async def _lifespan(app: FastAPI):
+    from vad_engine import get_vad_engine
+
+    await asyncio.to_thread(get_vad_engine().warm_up)
+    yield
+
+
+app = FastAPI(lifespan=_lifespan)
+
+
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    from pipecat.audio.vad.vad_analyzer import VADParams
+    from pipecat.runner.utils import parse_telephony_websocket
+
+    from vad_engine import PooledSileroVADAnalyzer
+
+    await websocket.accept()
+    _, call_data = await parse_telephony_websocket(websocket)
+    context = await take_outbound_call(call_id=call_data.get("call_id"))
+    found = bool(context and context.get("call_sid") == call_data.get("call_id"))
+    await websocket.send_text(json.dumps({"event": "context", "found": found, "pid": os.getpid()}))
+
+    analyzer = PooledSileroVADAnalyzer(params=VADParams(confidence=0.6, start_secs=0.25, stop_secs=0.5, min_volume=0.3))
+    analyzer.set_sample_rate(SAMPLE_RATE)
+
+    try:
+        while True:
+            message = json.loads(await websocket.receive_text())
+            if message.get("event") == "stop":
+                break
+            if message.get("event") != "media":
+                continue
+            payload = base64.b64decode(message["media"]["payload"])
+            await analyzer.analyze_audio(payload)
+            await websocket.send_text(
+                json.dumps(
+                    {
+                        "event": "media",
+                        "stream_sid": call_data.get("stream_id"),
+                        "media": {"payload": base64.b64encode(payload).decode("ascii")},
+                        "seq": message.get("sequence_number"),
+                    }
+                )
+            )
+    except WebSocketDisconnect:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _frames(seconds: float, seed: int) -> list[str]:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    signal = 0.3 * np.sin(2 * np.pi * 180 * t) * (np.floor(t * 2) % 2) + 0.01 * rng.standard_normal(t.shape)
+    pcm = (np.clip(signal, -1, 1) * 32767).astype(np.int16).tobytes()
+    step = FRAME_SAMPLES * 2
+    return [base64.b64encode(pcm[i : i + step]).decode("ascii") for i in range(0, len(pcm) - step + 1, step)]
+
+
+async def _simulate_call(url: str, store, seconds: float, seed: int) -> dict:
+    import websockets
+
+    call_sid = uuid.uuid4().hex
+    stream_sid = uuid.uuid4().hex
+    await store.add(call_sid, {"phone_number": f"9{seed:09d}", "customer_name": f"Load {seed}"})
+
+    frames = _frames(seconds, seed)
+    sent_at: dict[int, float] = {}
+    rtts: list[float] = []
+
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"event": "connected"}))
+        await ws.send(
+            json.dumps(
+                {
+                    "event": "start",
+                    "start": {
+                        "stream_sid": stream_sid,
+                        "call_sid": call_sid,
+                        "account_sid": "loadtest",
+                        "from": "0000000000",
+                        "to": f"9{seed:09d}",
+                    },
+                }
+            )
+        )
+        hello = json.loads(await ws.recv())
+
+        async def _receive():
+            async for raw in ws:
+                message = json.loads(raw)
+                seq = message.get("seq")
+                if seq in sent_at:
+                    rtts.append(time.perf_counter() - sent_at.pop(seq))
+                if not sent_at and len(rtts) == len(frames):
+                    return
+
+        receiver = asyncio.create_task(_receive())
+        start = time.perf_counter()
+        for i, payload in enumerate(frames):
+            # Real-time pacing, like Exotel sending 20 ms chunks
+            delay = start + i * FRAME_SECS - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sent_at[i] = time.perf_counter()
+            await ws.send(json.dumps({"event": "media", "sequence_number": i, "media": {"payload": payload}}))
+
+        try:
+            await asyncio.wait_for(receiver, timeout=5.0)
+        except asyncio.TimeoutError:
+            receiver.cancel()
+        await ws.send(json.dumps({"event": "stop"}))
+
+    return {
+        "found": hello.get("found", False),
+        "pid": hello.get("pid"),
+        "lost": len(frames) - len(rtts),
+        "p95_rtt": float(np.percentile(rtts, 95)) if rtts else float("inf"),
+    }
+
+
+async def _run_step(url: str, store, calls: int, seconds: float, rtt_budget: float) -> dict:
+    results = await asyncio.gather(
+        *(_simulate_call(url, store, seconds, seed=i) for i in range(calls)), return_exceptions=True
+    )
+    ok = [r for r in results if isinstance(r, dict)]
+    healthy = [r for r in ok if r["found"] and r["lost"] == 0 and r["p95_rtt"] <= rtt_budget]
+    p95s = [r["p95_rtt"] for r in ok if r["p95_rtt"] != float("inf")]
+    return {
+        "calls": calls,
+        "healthy": len(healthy),
+        "errors": len(results) - len(ok),
+        "context_hits": sum(1 for r in ok if r["found"]),
+        "workers_used": len({r["pid"] for r in ok}),
+        "p95_rtt_ms": float(np.percentile(p95s, 95)) * 1000 if p95s else float("inf"),
+    }
+
+
+async def _wait_for_port(port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+async def _run_workers(workers: int, steps: list[int], seconds: float, rtt_budget: float) -> list[dict]:
+    port = _free_port()
+    store_path = os.path.join(tempfile.mkdtemp(), "call_store.sqlite3")
+    env = dict(os.environ, CALL_STORE_BACKEND="sqlite", CALL_STORE_PATH=store_path)
+
+    # Import after the env is set so this driver writes to the same store file
+    os.environ.update(CALL_STORE_BACKEND="sqlite", CALL_STORE_PATH=store_path)
+    from call_memory import SQLiteCallStore
+
+    store = SQLiteCallStore(store_path)
+
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "benchmarks.load_workers:app",
+            "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+        ],
+        env=env,
+    )
+    try:
+        await _wait_for_port(port)
+        await asyncio.sleep(2.0 * workers)  # let every worker finish its lifespan warm-up
+        results = []
+        for calls in steps:
+            r = await _run_step(f"ws://127.0.0.1:{port}/ws", store, calls, seconds, rtt_budget)
+            results.append(r)
+            if r["healthy"] < 0.95 * calls:
+                break
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        await store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--steps", type=int, nargs="+", default=[10, 25, 50, 100, 200, 400])
+    parser.add_argument("--seconds", type=float, default=10.0, help="audio seconds per simulated call")
+    parser.add_argument("--rtt-budget-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    print(f"cpu cores: {os.cpu_count()}")
+    print(f"{'workers':>7} {'calls':>6} {'healthy':>8} {'ctx hits':>9} {'errors':>7} {'procs':>6} {'p95 rtt (ms)':>13}")
+    for workers in args.workers:
+        results = asyncio.run(_run_workers(workers, args.steps, args.seconds, args.rtt_budget_ms / 1000))
+        capacity = 0
+        for r in results:
+            print(
+                f"{workers:>7} {r['calls']:>6} {r['healthy']:>8} {r['context_hits']:>9} "
+                f"{r['errors']:>7} {r['workers_used']:>6} {r['p95_rtt_ms']:>13.1f}"
+            )
+            if r["healthy"] >= 0.95 * r["calls"]:
+                capacity = r["calls"]
+        print(f"{workers:>7} workers -> capacity ~{capacity} concurrent calls\n")
+
+
+if __name__ == "__main__":
+    main()
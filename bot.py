@@ -1,33 +1,47 @@
 # bot.py
 import os
-import re
-import asyncio
+from typing import Optional, Tuple
+
 from dotenv import load_dotenv
 from loguru import logger
 
-from pipecat.audio.vad.silero import SileroVADAnalyzer
 from pipecat.audio.vad.vad_analyzer import VADParams
-from pipecat.frames.frames import EndFrame
+from pipecat.frames.frames import FunctionCallResultProperties
 from pipecat.pipeline.pipeline import Pipeline
 from pipecat.pipeline.runner import PipelineRunner
 from pipecat.pipeline.task import PipelineParams, PipelineTask
-from pipecat.processors.aggregators.llm_context import LLMContext
 from pipecat.processors.aggregators.llm_response_universal import LLMContextAggregatorPair
 from pipecat.runner.types import RunnerArguments
 from pipecat.runner.utils import parse_telephony_websocket
-from pipecat.serializers.exotel import ExotelFrameSerializer
 from pipecat.services.openai.llm import OpenAILLMService
-from pipecat.services.sarvam.stt import SarvamSTTService
-from pipecat.services.openai.stt import OpenAISTTService
-from pipecat.services.groq.stt import GroqSTTService
-from pipecat.services.sarvam.tts import SarvamTTSService
+from pipecat.services.stt_service import STTService
 from pipecat.transports.base_transport import BaseTransport
 from pipecat.transports.websocket.fastapi import (
     FastAPIWebsocketParams,
     FastAPIWebsocketTransport,
 )
 
-from call_memory import pop_next_outbound_call  # ✅ NEW
+from audio_codec import ExotelSerializer
+from call_memory import call_ref_from, take_outbound_call
+from call_reaper import CallReaper
+from call_teardown import CallTeardown, PlayoutTracker
+from campaigns import record_connected
+from capacity import get_capacity_manager
+from client_pool import PooledOpenAILLMService
+from context_window import ContextWindow
+from conversation_state import ConversationStateProcessor
+from end_of_call import EndOfCallDetector
+from greeting import Greeting, GreetingPlayer, greeting_from_context
+from intent_router import IntentRouter
+from endpointing import TranscriptHints, create_turn_analyzer, user_aggregator_params
+from loop_monitor import get_loop_monitor
+from metrics import TurnLatencyObserver
+from prompt_context import PromptCacheObserver, build_call_context
+from provider_router import PROVIDER_HEDGING, HedgedOpenAILLMService
+from stt_backends import create_stt_service, stt_backend_name
+from text_chunking import TTS_CHUNKING, create_text_aggregator
+from tts_cache import TTS_MODEL, TTS_SAMPLE_RATE, TTS_VOICE_ID, CachedSarvamTTSService
+from vad_engine import PooledSileroVADAnalyzer
 
 LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
@@ -43,131 +57,99 @@ logger.add(
     level="DEBUG",
 )
 
-load_dotenv(override=True)
-
-GOODBYE_RE = re.compile(
-    r"\b(good\s*bye|goodbye|bye|thanks\,?\s*bye|thank you\.?\s*goodbye|bas,\s*theek\s*hai|band\s*karo)\b",
-    re.IGNORECASE,
-)
-NOT_INTERESTED_RE = re.compile(
-    r"(not\s*interested|don.?t\s*call|stop\s*calling|nahi\s*chahiye|mujhe\s*nahi\s*chahiye|vaddu|malli\s*call\s*cheyyakandi)",
-    re.IGNORECASE,
-)
-
+load_dotenv()
 
-async def run_bot(transport: BaseTransport, handle_sigint: bool, customer_name: str = ""):
-    from config import messages
-
-    tools = [
-        {
-            "type": "function",
-            "function": {
-                "name": "end_call",
-                "description": (
-                    "CRITICAL: End the phone call immediately. You MUST use this function when:\n"
-                    "1. You say goodbye to the customer\n"
-                    "2. Customer says goodbye or not interested\n"
-                    "3. Conversation is complete (all details collected and confirmed)\n"
-                    "4. Wrong person answered\n"
-                    "NEVER say goodbye without calling this function."
-                ),
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "reason": {
-                            "type": "string",
-                            "description": (
-                                "Reason for ending the call "
-                                "(e.g., 'customer_not_interested', "
-                                "'conversation_complete', 'customer_goodbye', 'wrong_person')"
-                            ),
-                        }
-                    },
-                    "required": ["reason"],
-                },
-            },
-        }
-    ]
-
-    llm = OpenAILLMService(
+def create_services() -> Tuple[OpenAILLMService, STTService, CachedSarvamTTSService]:
+    """One call's LLM, STT and TTS. warmup.py also builds a set at startup."""
+    # ✅ Borrows the process-wide OpenAI client, so its connections stay warm between calls;
+    # with PROVIDER_HEDGING a slow gpt-4o response is raced against LLM_FALLBACK_MODEL
+    llm_class = HedgedOpenAILLMService if PROVIDER_HEDGING else PooledOpenAILLMService
+    llm = llm_class(
         api_key=os.getenv("OPENAI_API_KEY"),
         model="gpt-4o",
-        tools=tools,
-        tool_choice="auto",
     )
 
-    stt = OpenAISTTService(
-        api_key=os.getenv("OPENAI_API_KEY"),
-        model="gpt-4o-transcribe",
-        prompt="Expect multilingual indian accent and indian languages.",
-    )
+    # ✅ STT_BACKEND picks segmented (openai, groq) or streaming (deepgram, sarvam) STT
+    stt = create_stt_service()
 
-    tts = SarvamTTSService(
+    # ✅ Scripted lines from config.py play from the pre-rendered phrase cache;
+    # TTS_CHUNKING=clause starts speaking at the first clause, not the first sentence
+    tts = CachedSarvamTTSService(
         api_key=os.getenv("SARVAM_API_KEY"),
-        model="bulbul:v2",
-        voice_id="manisha",
-        sample_rate=8000,
+        model=TTS_MODEL,
+        voice_id=TTS_VOICE_ID,
+        sample_rate=TTS_SAMPLE_RATE,
+        text_aggregator=create_text_aggregator(),
+        flush_chunks=TTS_CHUNKING == "clause",
+    )
+    return llm, stt, tts
+
+
+async def run_bot(
+    transport: BaseTransport,
+    handle_sigint: bool,
+    customer_name: str = "",
+    greeting: Optional[Greeting] = None,
+):
+    llm, stt, tts = create_services()
+
+    # ✅ The greeting rendered while the phone rang plays as soon as the customer first stops speaking
+    greeting_player = GreetingPlayer(greeting)
+    if greeting:
+        tts.add_call_phrase(greeting.text, greeting.audio)
+
+    # ✅ Streaming STT transcripts tell the adaptive endpointing whether the caller sounds done
+    transcript_hints = TranscriptHints(transport.input().turn_analyzer)
+
+    # ✅ Static prompt + tools first (shared, cacheable prefix), per-call messages after
+    context = build_call_context(customer_name)
+
+    context_aggregator = LLMContextAggregatorPair(context, user_params=user_aggregator_params())
+
+    # ✅ PROMPT_MODE=full (default) sends the whole config.py script as one prefix
+    # shared by every call; "staged" sends only the current stage's instructions,
+    # cached per stage. Either way, turns older than CONTEXT_MAX_TURNS are
+    # summarised in the background.
+    prompt_mode = os.getenv("PROMPT_MODE", "full").lower()
+    conversation_state = ConversationStateProcessor(
+        window=ContextWindow(),
+        stage_prompts=prompt_mode == "staged",
     )
 
-    context = LLMContext(messages)
-
-    # ✅ If we already know the name, tell the LLM
-    if customer_name:
-        context.messages.insert(
-            1,
-            {
-                "role": "system",
-                "content": f"""
-    You already know the customer's name is "{customer_name}" from the dialer.
-
-    SPECIAL RULES WHEN NAME IS KNOWN:
-
-    - You STILL MUST wait for the customer to say something first (e.g. "Hello?", "Yes", "Haan", "Bolo", etc.).
-    - On your VERY FIRST reply after the customer speaks, you MUST:
-    1) Greet them, and
-    2) Explicitly CONFIRM the name with EXACTLY ONE short question, for example:
-
-    English:
-    - "Hello, am I speaking with {customer_name}?"
-
-    Hindi:
-    - "Hello, kya main {customer_name} se baat kar rahi hoon?"
-
-    Telugu:
-    - "Hello, nenu {customer_name} garitho maatladutunnaana?"
-
-    - Do NOT ask "What is your name?" or "May I know your name?" when you already know {customer_name}.
-    - Treat this as STAGE 1 - NAME VERIFICATION:
-    - If they clearly confirm ("Yes", "Haan", "Speaking", "This is {customer_name}", etc.):
-        → Briefly acknowledge (e.g. "Nice to speak with you, {customer_name}.")
-        → IMMEDIATELY move to the INTEREST CHECK (Stage 2 in the main instructions):
-            e.g. "Would you be interested in hearing about our loan options?"
-    - If they clearly say it's the WRONG PERSON or WRONG NUMBER:
-        → Say a short apology and goodbye:
-            e.g. "I'm sorry for the inconvenience. Goodbye."
-        → Then IMMEDIATELY call end_call with reason "wrong_person".
-
-    - After this first confirmation:
-    - Do NOT re-introduce yourself again ("I'm Shruti from Digi Loans") later in the call.
-    - Do NOT repeatedly confirm their name again unless they themselves are confused.
-    """
-            },
-        )
+    # ✅ Scripted turns (intro, interest check, next question) skip the LLM; INTENT_ROUTER=0 turns it off
+    intent_router = IntentRouter(conversation_state.state, customer_name)
+
+    # ✅ Watches the LLM's streamed text for goodbye / not-interested phrases
+    end_of_call = EndOfCallDetector()
 
-    context_aggregator = LLMContextAggregatorPair(context)
+    # ✅ Follows what Exotel still has to play, so teardown waits for the goodbye
+    playout = PlayoutTracker()
+
+    # ✅ Ends calls with no speech, long silence or past MAX_CALL_SECS, so they free their slot
+    reaper = CallReaper()
 
     pipeline = Pipeline(
         [
             transport.input(),
+            reaper,
             stt,
+            transcript_hints,
             context_aggregator.user(),
+            greeting_player,
+            conversation_state,
+            intent_router,
             llm,
+            end_of_call,
             tts,
             transport.output(),
+            playout,
             context_aggregator.assistant(),
         ]
     )
 
+    prompt_cache = PromptCacheObserver()
+    # ✅ Per-turn voice-to-voice latency by stage, exported on /metrics
+    turn_latency = TurnLatencyObserver(stt=stt_backend_name(), llm=llm.model_name, tts=TTS_MODEL)
     task = PipelineTask(
         pipeline,
         params=PipelineParams(
@@ -176,43 +158,37 @@ async def run_bot(transport: BaseTransport, handle_sigint: bool, customer_name:
             enable_metrics=True,
             enable_usage_metrics=True,
         ),
+        observers=[prompt_cache, turn_latency],
     )
 
-    call_ended = asyncio.Event()
-
-    async def _do_end(reason: str):
-        logger.info(f"[_do_end] Bot is ending call. Reason: {reason}")
-        try:
-            await asyncio.sleep(0.5)
-            logger.info("[_do_end] Queuing EndFrame...")
-            await task.queue_frames([EndFrame()])
-            logger.info("[_do_end] EndFrame queued successfully.")
-        except Exception as e:
-            logger.error(f"[_do_end] Queue EndFrame failed: {e}")
-
-        logger.info("[_do_end] Cancelling PipelineTask...")
-        try:
-            await task.cancel()
-            logger.info("[_do_end] PipelineTask cancelled.")
-        except Exception as e:
-            logger.error(f"[_do_end] Task cancel error: {e}")
-        finally:
-            call_ended.set()
+    teardown = CallTeardown(task, playout)
 
     async def end_call_handler(function_name, tool_call_id, args, llm_service, context_obj, result_callback):
         reason = args.get("reason", "unknown")
         logger.info(f"[TOOL] end_call invoked. tool_call_id={tool_call_id}, reason={reason}, args={args}")
 
         try:
-            await result_callback({"status": "call_ended", "reason": reason})
+            # No follow-up completion: nothing should be said after the goodbye
+            await result_callback(
+                {"status": "call_ended", "reason": reason},
+                properties=FunctionCallResultProperties(run_llm=False),
+            )
             logger.info("[TOOL] end_call result_callback sent successfully.")
         except Exception as e:
             logger.error(f"[TOOL] end_call result_callback error: {e}")
 
-        await _do_end(reason)
+        await teardown.end(reason)
 
     llm.register_function("end_call", end_call_handler)
 
+    @end_of_call.event_handler("on_end_of_call")
+    async def on_end_of_call(detector, reason):
+        await teardown.end(reason)
+
+    @reaper.event_handler("on_reap")
+    async def on_reap(reaper_obj, reason):
+        await teardown.end(reason)
+
     @transport.event_handler("on_client_connected")
     async def on_client_connected(transport_obj, client):
         logger.info(
@@ -222,86 +198,63 @@ async def run_bot(transport: BaseTransport, handle_sigint: bool, customer_name:
 
     @transport.event_handler("on_client_disconnected")
     async def on_client_disconnected(transport_obj, client):
+        if teardown.started:
+            logger.info("Client disconnected during teardown.")
+            return
         logger.info("Client disconnected, cancelling task.")
         await task.cancel()
-        call_ended.set()
-
-    async def goodbye_watcher():
-        logger.info("[WATCHER] Goodbye watcher started.")
-        last_seen_len = 0
 
-        while not call_ended.is_set():
-            try:
-                if len(context.messages) == last_seen_len:
-                    await asyncio.sleep(0.5)
-                    continue
-
-                last_seen_len = len(context.messages)
-
-                last_text = ""
-                for m in reversed(context.messages):
-                    if m.get("role") == "assistant":
-                        c = m.get("content", "")
-                        if isinstance(c, str) and c.strip():
-                            last_text = c
-                            break
-
-                logger.info(f"[WATCHER] Last assistant message: {last_text!r}")
-
-                if not last_text:
-                    await asyncio.sleep(0.5)
-                    continue
-
-                text_lower = last_text.lower()
-                reason = None
-                if NOT_INTERESTED_RE.search(text_lower):
-                    reason = "customer_not_interested"
-                    logger.info("[WATCHER] NOT_INTERESTED_RE matched assistant text.")
-                elif GOODBYE_RE.search(text_lower):
-                    reason = "customer_goodbye"
-                    logger.info("[WATCHER] GOODBYE_RE matched assistant text.")
-
-                if reason and not call_ended.is_set():
-                    logger.info(f"[WATCHER] Triggering _do_end with reason={reason}")
-                    await _do_end(reason)
-                    break
-
-                await asyncio.sleep(0.5)
-
-            except Exception as e:
-                logger.warning(f"[WATCHER] Goodbye watcher error: {e}")
-                await asyncio.sleep(0.5)
-
-        logger.info("[WATCHER] Goodbye watcher exiting (call_ended or pipeline finished).")
-
-    asyncio.create_task(goodbye_watcher())
+    # ✅ Event-loop lag while this call is in progress, logged with its stats
+    loop_lag = get_loop_monitor().track_call()
 
     runner = PipelineRunner(handle_sigint=handle_sigint)
-    await runner.run(task)
+    try:
+        await runner.run(task)
+    finally:
+        loop_lag_stats = loop_lag.finish()
     logger.info("PipelineRunner finished for this call.")
+    logger.info(f"[TTS_CACHE] Call stats: {tts.cache_stats()}")
+    logger.info(f"[PROMPT_CACHE] Call stats: {prompt_cache.summary()}")
+    logger.info(f"[LATENCY] Call stats: {turn_latency.summary()}")
+    logger.info(f"[LOOP] Call stats: {loop_lag_stats}")
+    logger.info(f"[STATE] Final call state: {conversation_state.state}")
+    logger.info(f"[CONTEXT] Call stats: {conversation_state.window.stats()}")
+    logger.info(f"[ROUTER] Call stats: {intent_router.stats()}")
+    logger.info(f"[GREETING] Call stats: {greeting_player.stats()}")
+    logger.info(f"[REAPER] Call stats: {reaper.stats()}")
+    if transcript_hints.analyzer is not None:
+        logger.info(f"[ENDPOINTING] Call stats: {transcript_hints.analyzer.stats()}")
 
 
 async def bot(runner_args: RunnerArguments):
-    # ✅ Pop the next outbound call context (set by /start)
-    call_context = await pop_next_outbound_call()
+    transport_type, call_data = await parse_telephony_websocket(runner_args.websocket)
+    logger.info(f"Auto-detected transport: {transport_type}")
+    logger.info(f"Call data from Exotel: {call_data}")
+
+    # ✅ Look up this call's context (set by /start) by the call_ref in the stream URL, else its CallSid
+    call_context = await take_outbound_call(
+        call_id=call_data.get("call_id"),
+        phone_numbers=(call_data.get("to"), call_data.get("from")),
+        call_ref=call_ref_from(call_data.get("custom_parameters")),
+    )
     customer_name = ""
     phone_number = ""
+    greeting = greeting_from_context(call_context)
 
     if call_context:
         customer_name = call_context.get("customer_name", "").strip()
         phone_number = call_context.get("phone_number", "").strip()
+        record_connected(call_context.get("campaign_id"))
         logger.info(
             f"[CALL_MEMORY] Using outbound call context from memory: "
-            f"phone_number={phone_number!r}, customer_name={customer_name!r}"
+            f"phone_number={phone_number!r}, customer_name={customer_name!r}, "
+            f"greeting={'ready' if greeting else 'none'}"
         )
     else:
         logger.info("[CALL_MEMORY] No outbound call context found in memory; customer_name will be 'Unknown'.")
 
-    transport_type, call_data = await parse_telephony_websocket(runner_args.websocket)
-    logger.info(f"Auto-detected transport: {transport_type}")
-    logger.info(f"Call data from Exotel: {call_data}")
-
-    serializer = ExotelFrameSerializer(
+    # ✅ 8 kHz media goes straight to and from base64, without pipecat's resampler and dict building
+    serializer = ExotelSerializer(
         stream_sid=call_data["stream_id"],
         call_sid=call_data["call_id"],
     )
@@ -313,6 +266,10 @@ async def bot(runner_args: RunnerArguments):
         stop_secs=0.5,
         min_volume=0.3,
     )
+    # Shares the process-wide Silero model; only per-call state lives here
+    vad_analyzer = PooledSileroVADAnalyzer(params=vad_params)
+    # ✅ ENDPOINTING=adaptive: the turn ends after a per-call silence window instead of stop_secs
+    turn_analyzer = create_turn_analyzer(vad_analyzer)
 
     transport = FastAPIWebsocketTransport(
         websocket=runner_args.websocket,
@@ -320,10 +277,19 @@ async def bot(runner_args: RunnerArguments):
             audio_in_enabled=True,
             audio_out_enabled=True,
             add_wav_header=False,
-            vad_analyzer=SileroVADAnalyzer(params=vad_params),
+            vad_analyzer=vad_analyzer,
+            turn_analyzer=turn_analyzer,
             serializer=serializer,
         ),
     )
 
     handle_sigint = runner_args.handle_sigint
-    await run_bot(transport, handle_sigint, customer_name)
+
+    # ✅ Hold this call's capacity slot until the PipelineRunner finishes
+    capacity = get_capacity_manager()
+    slot = capacity.activate(call_context.get("capacity_slot") if call_context else None)
+    try:
+        await run_bot(transport, handle_sigint, customer_name, greeting)
+    finally:
+        capacity.release(slot)
+        logger.info(f"[CAPACITY] Released call slot; status={capacity.status()}")
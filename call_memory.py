@@ -1,29 +1,480 @@
 # call_memory.py
-from collections import deque
-from typing import Optional, Dict
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Iterable, Optional, Dict, Set, Tuple
 import asyncio
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import parse_qsl
 
-# Simple in-process queue of pending outbound calls
-# Each entry: {"phone_number": "...", "customer_name": "..."}
-_call_queue: deque[Dict[str, str]] = deque()
-_lock = asyncio.Lock()
+from loguru import logger
 
+# Pending outbound call contexts, written by /start and read by the /ws handler.
+# Each entry: {"phone_number": "...", "customer_name": "...", "call_ref": "..."}
+CALL_CONTEXT_TTL_SECS = float(os.getenv("CALL_CONTEXT_TTL_SECS", "180"))
+CALL_CONTEXT_MAX_ENTRIES = int(os.getenv("CALL_CONTEXT_MAX_ENTRIES", "10000"))
+CALL_CONTEXT_SWEEP_SECS = float(os.getenv("CALL_CONTEXT_SWEEP_SECS", "15"))
 
-async def add_outbound_call(info: Dict[str, str]) -> None:
+# "memory" keeps contexts in this process only. "sqlite" shares them between
+# server worker processes on the same machine (required with --workers > 1).
+CALL_STORE_BACKEND = os.getenv("CALL_STORE_BACKEND", "memory").lower()
+# A blank value counts as unset: sqlite3.connect("") opens a private temp database
+CALL_STORE_PATH = os.getenv("CALL_STORE_PATH") or os.path.join(
+    tempfile.gettempdir(), "voicebot_call_store.sqlite3"
+)
+
+
+def normalize_phone(number: Optional[str]) -> str:
     """
-    Add an outbound call context into the queue.
-    Called from /start after we trigger Exotel.
+    Reduce a phone number to its last 10 digits so "+91 89195 68249",
+    "08919568249" and "8919568249" all map to the same key.
+    """
+    digits = re.sub(r"\D", "", number or "")
+    return digits[-10:]
+
+
+def new_call_ref() -> str:
+    """
+    A key that ties a /start to its /ws connection. It goes to Exotel as
+    CustomField and comes back in the stream URL's custom parameters.
+    """
+    return uuid.uuid4().hex[:16]
+
+
+def call_ref_from(custom_parameters) -> str:
+    """The call_ref from the start event's custom_parameters (a dict, or a query string)."""
+    if isinstance(custom_parameters, str):
+        custom_parameters = dict(parse_qsl(custom_parameters.lstrip("?")))
+    if isinstance(custom_parameters, dict):
+        return str(custom_parameters.get("call_ref") or "")
+    return ""
+
+
+def _context_key(call_sid: str, phone: str) -> str:
+    # Exotel may not hand back a Sid; fall back to the phone number as key
+    return call_sid if call_sid and call_sid != "unknown" else f"phone:{phone}"
+
+
+class CallContextRegistry:
+    """
+    Call contexts indexed by Exotel CallSid, with the call_ref and the callee's
+    phone number as secondary indexes. Every entry has the same TTL, so insertion order is also
+    expiry order and both sweeping and size-bounded eviction pop from the front.
+    """
+
+    def __init__(self, ttl_secs: float = CALL_CONTEXT_TTL_SECS, max_entries: int = CALL_CONTEXT_MAX_ENTRIES):
+        self._ttl_secs = ttl_secs
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, str]]]" = OrderedDict()
+        self._by_phone: Dict[str, str] = {}
+        self._by_ref: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, call_sid: str, info: Dict[str, str]) -> None:
+        phone = normalize_phone(info.get("phone_number"))
+        key = _context_key(call_sid, phone)
+
+        self._remove(key)
+        while len(self._entries) >= self._max_entries:
+            oldest_key = next(iter(self._entries))
+            logger.warning(f"[CALL_MEMORY] Registry full ({self._max_entries}), evicting {oldest_key}")
+            self._remove(oldest_key)
+
+        self._entries[key] = (time.monotonic() + self._ttl_secs, dict(info, call_sid=call_sid))
+        if phone:
+            self._by_phone[phone] = key
+        if info.get("call_ref"):
+            self._by_ref[info["call_ref"]] = key
+
+    def update(self, call_sid: str, phone_number: Optional[str], fields: Dict[str, str]) -> bool:
+        """Add fields to a context that is still pending. False if it was taken or has expired."""
+        self.sweep()
+        entry = self._entries.get(_context_key(call_sid, normalize_phone(phone_number)))
+        if entry is None:
+            return False
+        entry[1].update(fields)
+        return True
+
+    def take(
+        self,
+        call_id: Optional[str] = None,
+        phone_numbers: Iterable[Optional[str]] = (),
+        call_ref: Optional[str] = None,
+    ) -> Optional[Dict[str, str]]:
+        """
+        Remove and return the context for this call: by call_ref first, then by
+        CallSid, then by any of the given phone numbers. Expired entries are
+        never returned.
+        """
+        self.sweep()
+
+        key = None
+        if call_ref and call_ref in self._by_ref:
+            key = self._by_ref[call_ref]
+        elif call_id and call_id in self._entries:
+            key = call_id
+        else:
+            for number in phone_numbers:
+                phone = normalize_phone(number)
+                if phone and phone in self._by_phone:
+                    key = self._by_phone[phone]
+                    break
+
+        if key is None:
+            return None
+        return self._remove(key)
+
+    def sweep(self) -> int:
+        """Drop expired entries. Returns how many were removed."""
+        now = time.monotonic()
+        removed = 0
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            self._remove(key)
+            removed += 1
+        return removed
+
+    def _remove(self, key: str) -> Optional[Dict[str, str]]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        info = entry[1]
+        phone = normalize_phone(info.get("phone_number"))
+        if phone and self._by_phone.get(phone) == key:
+            del self._by_phone[phone]
+        ref = info.get("call_ref")
+        if ref and self._by_ref.get(ref) == key:
+            del self._by_ref[ref]
+        return info
+
+
+class CallStore(ABC):
+    """
+    Where /start leaves call contexts for the /ws handler to pick up.
+    All methods are async so backends may do blocking I/O off the event loop.
     """
-    async with _lock:
-        _call_queue.append(info)
 
+    @abstractmethod
+    async def add(self, call_sid: str, info: Dict[str, str]) -> None:
+        pass
+
+    @abstractmethod
+    async def update(self, call_sid: str, phone_number: Optional[str], fields: Dict[str, str]) -> bool:
+        """Add fields to a context that is still pending. False if it was taken or has expired."""
+        pass
+
+    @abstractmethod
+    async def take(
+        self, call_id: Optional[str], phone_numbers: Iterable[Optional[str]], call_ref: Optional[str] = None
+    ) -> Optional[Dict[str, str]]:
+        pass
+
+    @abstractmethod
+    async def sweep(self) -> Tuple[int, int]:
+        """Drop expired entries. Returns (removed, still pending)."""
+        pass
+
+    async def taken_slots(self, slots: Iterable[str]) -> Set[str]:
+        """
+        Which of these capacity slots belong to contexts another process has
+        taken, so the dialing process can drop its reservation. Only a store
+        shared between processes has any.
+        """
+        return set()
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryCallStore(CallStore):
+    """Single-process store backed by CallContextRegistry."""
+
+    def __init__(self, ttl_secs: float = CALL_CONTEXT_TTL_SECS, max_entries: int = CALL_CONTEXT_MAX_ENTRIES):
+        self._registry = CallContextRegistry(ttl_secs, max_entries)
+        self._lock = asyncio.Lock()
+
+    async def add(self, call_sid: str, info: Dict[str, str]) -> None:
+        async with self._lock:
+            self._registry.add(call_sid, info)
+
+    async def update(self, call_sid: str, phone_number: Optional[str], fields: Dict[str, str]) -> bool:
+        async with self._lock:
+            return self._registry.update(call_sid, phone_number, fields)
+
+    async def take(
+        self, call_id: Optional[str], phone_numbers: Iterable[Optional[str]], call_ref: Optional[str] = None
+    ) -> Optional[Dict[str, str]]:
+        async with self._lock:
+            return self._registry.take(call_id, phone_numbers, call_ref)
+
+    async def sweep(self) -> Tuple[int, int]:
+        async with self._lock:
+            return self._registry.sweep(), len(self._registry)
 
-async def pop_next_outbound_call() -> Optional[Dict[str, str]]:
+
+class SQLiteCallStore(CallStore):
     """
-    Pop the next outbound call context.
-    Called from the WebSocket handler (bot) when Media Streams connects.
+    Cross-process store in a local SQLite file (WAL mode), so a context
+    written by /start in one worker can be taken by the worker that receives
+    the WebSocket. Each take runs in an IMMEDIATE transaction, so two workers
+    can never hand out the same context. Taking a context also records its
+    capacity slot in taken_slot, where the dialing worker finds it and drops
+    its reservation (capacity.py).
     """
-    async with _lock:
-        if _call_queue:
-            return _call_queue.popleft()
+
+    def __init__(
+        self,
+        path: str = CALL_STORE_PATH,
+        ttl_secs: float = CALL_CONTEXT_TTL_SECS,
+        max_entries: int = CALL_CONTEXT_MAX_ENTRIES,
+    ):
+        self._path = path
+        self._ttl_secs = ttl_secs
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS call_context ("
+            " key TEXT PRIMARY KEY,"
+            " phone TEXT NOT NULL,"
+            " ref TEXT NOT NULL DEFAULT '',"
+            " info TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(call_context)")]
+        if "ref" not in columns:
+            # A store file left by a build without call_ref
+            self._conn.execute("ALTER TABLE call_context ADD COLUMN ref TEXT NOT NULL DEFAULT ''")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS call_context_phone ON call_context(phone)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS call_context_ref ON call_context(ref)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS call_context_expires ON call_context(expires_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS taken_slot (slot TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+        )
+        logger.info(f"[CALL_MEMORY] Using SQLite call store at {path}")
+
+    def _transaction(self, fn, *args):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(*args)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def _add(self, call_sid: str, info: Dict[str, str]) -> None:
+        phone = normalize_phone(info.get("phone_number"))
+        key = _context_key(call_sid, phone)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO call_context (key, phone, ref, info, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (
+                key,
+                phone,
+                info.get("call_ref") or "",
+                json.dumps(dict(info, call_sid=call_sid)),
+                time.time() + self._ttl_secs,
+            ),
+        )
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM call_context").fetchone()
+        if count > self._max_entries:
+            logger.warning(f"[CALL_MEMORY] Call store full ({self._max_entries}), evicting {count - self._max_entries}")
+            self._conn.execute(
+                "DELETE FROM call_context WHERE key IN "
+                "(SELECT key FROM call_context ORDER BY expires_at LIMIT ?)",
+                (count - self._max_entries,),
+            )
+
+    def _update(self, call_sid: str, phone_number: Optional[str], fields: Dict[str, str]) -> bool:
+        key = _context_key(call_sid, normalize_phone(phone_number))
+        row = self._conn.execute(
+            "SELECT info FROM call_context WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            return False
+        info = dict(json.loads(row[0]), **fields)
+        self._conn.execute("UPDATE call_context SET info = ? WHERE key = ?", (json.dumps(info), key))
+        return True
+
+    def _pop_where(self, where: str, params: tuple, order: str = "expires_at") -> Optional[Dict[str, str]]:
+        row = self._conn.execute(
+            f"SELECT key, info FROM call_context WHERE expires_at > ? AND {where} ORDER BY {order} LIMIT 1",
+            (time.time(), *params),
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("DELETE FROM call_context WHERE key = ?", (row[0],))
+        return json.loads(row[1])
+
+    def _take(
+        self, call_id: Optional[str], phone_numbers: Iterable[Optional[str]], call_ref: Optional[str]
+    ) -> Optional[Dict[str, str]]:
+        info = self._pop_for_call(call_id, phone_numbers, call_ref)
+        if info is not None and info.get("capacity_slot"):
+            self._conn.execute(
+                "INSERT OR REPLACE INTO taken_slot (slot, expires_at) VALUES (?, ?)",
+                (info["capacity_slot"], time.time() + self._ttl_secs),
+            )
+        return info
+
+    def _pop_for_call(
+        self, call_id: Optional[str], phone_numbers: Iterable[Optional[str]], call_ref: Optional[str]
+    ) -> Optional[Dict[str, str]]:
+        if call_ref:
+            info = self._pop_where("ref = ?", (call_ref,))
+            if info is not None:
+                return info
+        if call_id:
+            info = self._pop_where("key = ?", (call_id,))
+            if info is not None:
+                return info
+        for number in phone_numbers:
+            phone = normalize_phone(number)
+            if phone:
+                info = self._pop_where("phone = ?", (phone,), order="expires_at DESC")
+                if info is not None:
+                    return info
         return None
+
+    def _sweep(self) -> Tuple[int, int]:
+        now = time.time()
+        removed = self._conn.execute("DELETE FROM call_context WHERE expires_at <= ?", (now,)).rowcount
+        self._conn.execute("DELETE FROM taken_slot WHERE expires_at <= ?", (now,))
+        (pending,) = self._conn.execute("SELECT COUNT(*) FROM call_context").fetchone()
+        return removed, pending
+
+    def _taken_slots(self, slots: list) -> Set[str]:
+        taken: Set[str] = set()
+        for i in range(0, len(slots), 500):  # stay under SQLite's bound-parameter limit
+            batch = slots[i : i + 500]
+            rows = self._conn.execute(
+                f"SELECT slot FROM taken_slot WHERE slot IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            taken.update(row[0] for row in rows)
+        return taken
+
+    async def add(self, call_sid: str, info: Dict[str, str]) -> None:
+        await asyncio.to_thread(self._transaction, self._add, call_sid, info)
+
+    async def update(self, call_sid: str, phone_number: Optional[str], fields: Dict[str, str]) -> bool:
+        return await asyncio.to_thread(self._transaction, self._update, call_sid, phone_number, fields)
+
+    async def take(
+        self, call_id: Optional[str], phone_numbers: Iterable[Optional[str]], call_ref: Optional[str] = None
+    ) -> Optional[Dict[str, str]]:
+        return await asyncio.to_thread(self._transaction, self._take, call_id, list(phone_numbers), call_ref)
+
+    async def sweep(self) -> Tuple[int, int]:
+        return await asyncio.to_thread(self._transaction, self._sweep)
+
+    async def taken_slots(self, slots: Iterable[str]) -> Set[str]:
+        slots = list(slots)
+        if not slots:
+            return set()
+        return await asyncio.to_thread(self._transaction, self._taken_slots, slots)
+
+    async def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _create_store() -> CallStore:
+    if CALL_STORE_BACKEND == "sqlite":
+        return SQLiteCallStore()
+    if CALL_STORE_BACKEND != "memory":
+        logger.warning(f"[CALL_MEMORY] Unknown CALL_STORE_BACKEND={CALL_STORE_BACKEND!r}, using memory")
+    return MemoryCallStore()
+
+
+_store: CallStore = _create_store()
+_sweeper_task: Optional[asyncio.Task] = None
+
+
+def get_call_store() -> CallStore:
+    return _store
+
+
+async def add_outbound_call(call_sid: str, info: Dict[str, str]) -> None:
+    """
+    Register an outbound call context under its Exotel CallSid.
+    Called from /start after we trigger Exotel.
+    """
+    await _store.add(call_sid, info)
+
+
+async def update_outbound_call(call_sid: str, phone_number: Optional[str], fields: Dict[str, str]) -> bool:
+    """
+    Attach fields to a call context that has not been picked up yet, e.g.
+    the greeting rendered while the phone rings. False once the call has
+    connected (or its context expired).
+    """
+    return await _store.update(call_sid, phone_number, fields)
+
+
+async def take_outbound_call(
+    call_id: Optional[str] = None,
+    phone_numbers: Iterable[Optional[str]] = (),
+    call_ref: Optional[str] = None,
+) -> Optional[Dict[str, str]]:
+    """
+    Look up (and remove) the context for the call that just connected.
+    Called from the WebSocket handler (bot) with the call_id, numbers and
+    custom parameters from parse_telephony_websocket.
+
+    Exotel Connect reports a different Sid on the Media Streams leg than the
+    one /start got back, and both numbers may be the ExoPhone, so the call_ref
+    in the stream URL (GET /exotel/stream-url) is the reliable key. A stream
+    that matches no key (an inbound call, or a plain wss:// applet URL) starts
+    without a context rather than risk taking another customer's.
+    """
+    info = await _store.take(call_id, phone_numbers, call_ref)
+    if info is None:
+        logger.warning(
+            f"[CALL_MEMORY] No context keyed by call_ref={call_ref!r}, call_id={call_id!r} "
+            f"or the call's numbers; starting without one"
+        )
+    return info
+
+
+async def _sweep_forever() -> None:
+    while True:
+        await asyncio.sleep(CALL_CONTEXT_SWEEP_SECS)
+        try:
+            removed, pending = await _store.sweep()
+        except Exception as e:
+            logger.warning(f"[CALL_MEMORY] Sweep failed: {e}")
+            continue
+        if removed:
+            logger.info(f"[CALL_MEMORY] Swept {removed} expired call contexts, {pending} pending.")
+
+
+def start_sweeper() -> None:
+    """Start the background TTL sweeper. Called from the server lifespan."""
+    global _sweeper_task
+    if _sweeper_task is None or _sweeper_task.done():
+        _sweeper_task = asyncio.create_task(_sweep_forever())
+
+
+async def stop_sweeper() -> None:
+    global _sweeper_task
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+        try:
+            await _sweeper_task
+        except asyncio.CancelledError:
+            pass
+        _sweeper_task = None
+    await _store.close()
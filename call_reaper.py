@@ -0,0 +1,173 @@
+# call_reaper.py
+"""
+Ends calls that have gone idle, so they stop holding a pipeline slot.
+
+The bot never speaks first, and nothing else in run_bot times out. A
+customer who never says anything, or a stream that Exotel leaves open
+after voicemail or dead air, kept a whole pipeline alive: the VAD, three
+provider clients and the WebSocket, until someone hung up.
+
+CallReaper sits right after transport.input(). It sees the caller's VAD
+frames going downstream and the output transport's bot-speaking frames
+coming upstream, and keeps one timer per call:
+- no_first_speech: the customer has not started speaking
+  FIRST_SPEECH_TIMEOUT_SECS after the call connected;
+- silence: after the customer first spoke, neither side has spoken for
+  SILENCE_TIMEOUT_SECS;
+- max_duration: the call has lasted MAX_CALL_SECS.
+Setting a threshold to 0 turns that check off.
+
+When one runs out, the reaper emits "on_reap"(reaper, reason). run_bot
+hands the reason to CallTeardown, which ends the call the same way as a
+goodbye. The reaper stops once teardown has started (its
+PlayoutMarkerFrame passes by), so a call the bot is already ending is
+not counted. Reaped calls are counted by reason in
+voicebot_calls_reaped_total (GET /metrics) and reaper_stats() (GET
+/capacity).
+"""
+import asyncio
+import os
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    BotStoppedSpeakingFrame,
+    CancelFrame,
+    EndFrame,
+    Frame,
+    StartFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from call_teardown import PlayoutMarkerFrame
+from metrics import CALLS_REAPED
+
+FIRST_SPEECH_TIMEOUT_SECS = float(os.getenv("FIRST_SPEECH_TIMEOUT_SECS", "60"))
+SILENCE_TIMEOUT_SECS = float(os.getenv("SILENCE_TIMEOUT_SECS", "30"))
+MAX_CALL_SECS = float(os.getenv("MAX_CALL_SECS", "600"))
+
+_reaped: Counter = Counter()
+
+
+def reaper_stats() -> Dict:
+    """Process-wide count of reaped calls by reason, with the thresholds in force."""
+    return {
+        "first_speech_timeout_secs": FIRST_SPEECH_TIMEOUT_SECS,
+        "silence_timeout_secs": SILENCE_TIMEOUT_SECS,
+        "max_call_secs": MAX_CALL_SECS,
+        "reaped": dict(_reaped),
+    }
+
+
+class CallReaper(FrameProcessor):
+    """Emits "on_reap"(reaper, reason) when a call has been idle, or up, for too long."""
+
+    def __init__(
+        self,
+        first_speech_secs: float = FIRST_SPEECH_TIMEOUT_SECS,
+        silence_secs: float = SILENCE_TIMEOUT_SECS,
+        max_call_secs: float = MAX_CALL_SECS,
+        **kwargs,
+    ):
+        # Direct mode: every inbound audio frame passes through here, so no
+        # extra queue hop. Handling a frame only updates a few fields.
+        kwargs.setdefault("enable_direct_mode", True)
+        super().__init__(**kwargs)
+        self.first_speech_secs = first_speech_secs
+        self.silence_secs = silence_secs
+        self.max_call_secs = max_call_secs
+        self.started_at: Optional[float] = None
+        self.reason: Optional[str] = None
+        self.heard_user = False
+        self._user_speaking = False
+        self._bot_speaking = False
+        self._quiet_since: Optional[float] = None  # None while either side is speaking
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._register_event_handler("on_reap")
+
+    def deadline(self) -> Optional[Tuple[float, str]]:
+        """(monotonic time, reason) of the next check to run out, or None if none applies now."""
+        if self.started_at is None:
+            return None
+        deadlines = []
+        if self.max_call_secs:
+            deadlines.append((self.started_at + self.max_call_secs, "max_duration"))
+        if not self.heard_user:
+            if self.first_speech_secs:
+                deadlines.append((self.started_at + self.first_speech_secs, "no_first_speech"))
+        elif self.silence_secs and self._quiet_since is not None:
+            deadlines.append((self._quiet_since + self.silence_secs, "silence"))
+        return min(deadlines) if deadlines else None
+
+    def _speaking_changed(self) -> None:
+        speaking = self._user_speaking or self._bot_speaking
+        self._quiet_since = None if speaking else time.monotonic()
+        self._changed.set()
+
+    async def _supervise(self) -> None:
+        while True:
+            self._changed.clear()
+            deadline = self.deadline()
+            timeout = None if deadline is None else deadline[0] - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        reason = deadline[1]
+        self.reason = reason
+        _reaped[reason] += 1
+        CALLS_REAPED.inc(reason=reason)
+        logger.info(f"[REAPER] Ending call after {time.monotonic() - self.started_at:.1f}s, reason={reason}")
+        self._task = None
+        await self._call_event_handler("on_reap", reason)
+
+    async def _stop(self) -> None:
+        if self._task:
+            await self.cancel_task(self._task)
+            self._task = None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, StartFrame):
+            self.started_at = time.monotonic()
+            self._task = self.create_task(self._supervise(), "supervise")
+        elif isinstance(frame, UserStartedSpeakingFrame):
+            self.heard_user = True
+            self._user_speaking = True
+            self._speaking_changed()
+        elif isinstance(frame, UserStoppedSpeakingFrame):
+            self._user_speaking = False
+            self._speaking_changed()
+        elif isinstance(frame, BotStartedSpeakingFrame) and direction == FrameDirection.UPSTREAM:
+            self._bot_speaking = True
+            self._speaking_changed()
+        elif isinstance(frame, BotStoppedSpeakingFrame) and direction == FrameDirection.UPSTREAM:
+            self._bot_speaking = False
+            self._speaking_changed()
+        elif isinstance(frame, (PlayoutMarkerFrame, EndFrame, CancelFrame)):
+            # The call is ending already
+            await self._stop()
+
+        await self.push_frame(frame, direction)
+
+    async def cleanup(self):
+        await super().cleanup()
+        await self._stop()
+
+    def stats(self) -> Dict:
+        return {
+            "reaped": self.reason,
+            "heard_user": self.heard_user,
+            "duration_secs": round(time.monotonic() - self.started_at, 1) if self.started_at else None,
+        }
@@ -0,0 +1,221 @@
+# call_teardown.py
+"""
+Playout-aware end of call.
+
+Ending a call used to sleep 0.5 s, queue an EndFrame and cancel the task
+straight away. The CancelFrame overtook the goodbye audio still on its way
+through the TTS, and the fixed sleep held the call slot even when there was
+nothing left to say. CallTeardown.end() instead:
+
+1. Queues a PlayoutMarkerFrame at the start of the pipeline. The Sarvam TTS
+   pauses its frame processing after a spoken response until the output
+   transport reports BotStoppedSpeakingFrame. The marker therefore reaches
+   PlayoutTracker (after transport.output()) only once the last TTS audio
+   has been written to Exotel.
+2. Sarvam streams each sentence's audio back separately, and a gap between
+   sentences longer than the transport's 0.35 s bot-stopped-speaking
+   window lets the marker through early. So teardown also waits for the
+   TTSStoppedFrame that Sarvam pushes once its audio has stopped coming.
+   That frame goes through the transport in order too, after the audio.
+3. The transport paces its writes in real time, but Exotel has the last
+   chunk and its jitter buffer still to play. PlayoutTracker keeps a
+   playback clock of what has been sent, and teardown waits until that
+   clock runs out, plus a small margin. If more audio arrives meanwhile,
+   it waits again.
+4. Queues an EndFrame. The output transport closes the Exotel stream, and
+   the pipeline finishes by itself. The task is cancelled only if it has
+   not finished within TEARDOWN_STOP_SECS.
+
+The whole wait is capped at TEARDOWN_TIMEOUT_SECS. Each teardown is logged
+and added to teardown_stats() (GET /capacity) and to the
+voicebot_call_teardown_seconds histogram (GET /metrics).
+"""
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    ControlFrame,
+    EndFrame,
+    Frame,
+    InterruptionFrame,
+    OutputAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+)
+from pipecat.pipeline.task import PipelineTask
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from metrics import CALL_TEARDOWN
+
+TEARDOWN_TIMEOUT_SECS = float(os.getenv("TEARDOWN_TIMEOUT_SECS", "10"))
+TEARDOWN_STOP_SECS = float(os.getenv("TEARDOWN_STOP_SECS", "3"))
+# Network and jitter-buffer slack on top of the playback clock
+PLAYOUT_MARGIN_SECS = 0.2
+
+
+@dataclass
+class PlayoutMarkerFrame(ControlFrame):
+    """Travels the pipeline in order; PlayoutTracker consumes it."""
+
+
+class PlayoutTracker(FrameProcessor):
+    """Placed after transport.output(): tracks what the far end has left to play."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("enable_direct_mode", True)
+        super().__init__(**kwargs)
+        self._playout_end = 0.0  # monotonic time the far end finishes what was sent
+        self.last_audio_at = 0.0
+        self.marker_seen = asyncio.Event()
+        self.tts_idle = asyncio.Event()  # between TTSStoppedFrame and the next TTSStartedFrame
+        self.tts_idle.set()
+
+    def playout_remaining(self) -> float:
+        return max(0.0, self._playout_end - time.monotonic())
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, OutputAudioRawFrame) and direction == FrameDirection.DOWNSTREAM:
+            # The output transport pushes each chunk on after writing it
+            seconds = len(frame.audio) / (frame.sample_rate * frame.num_channels * 2)
+            self.last_audio_at = time.monotonic()
+            self._playout_end = max(self._playout_end, self.last_audio_at) + seconds
+        elif isinstance(frame, TTSStartedFrame):
+            self.tts_idle.clear()
+        elif isinstance(frame, TTSStoppedFrame):
+            self.tts_idle.set()
+        elif isinstance(frame, InterruptionFrame):
+            self._playout_end = 0.0  # the serializer has sent Exotel a "clear"
+            self.tts_idle.set()
+        elif isinstance(frame, PlayoutMarkerFrame):
+            self.marker_seen.set()
+            return
+
+        await self.push_frame(frame, direction)
+
+
+class _TeardownStats:
+    def __init__(self):
+        self.count = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.total_secs = 0.0
+        self.max_secs = 0.0
+        self.last_secs: Optional[float] = None
+
+    def record(self, secs: float, timed_out: bool, cancelled: bool) -> None:
+        self.count += 1
+        self.timeouts += int(timed_out)
+        self.cancelled += int(cancelled)
+        self.total_secs += secs
+        self.max_secs = max(self.max_secs, secs)
+        self.last_secs = secs
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "avg_secs": round(self.total_secs / self.count, 3) if self.count else None,
+            "max_secs": round(self.max_secs, 3),
+            "last_secs": round(self.last_secs, 3) if self.last_secs is not None else None,
+            "playout_timeouts": self.timeouts,
+            "forced_cancels": self.cancelled,
+        }
+
+
+_stats = _TeardownStats()
+
+
+def teardown_stats() -> Dict:
+    """Process-wide teardown durations for bot-ended calls."""
+    return _stats.snapshot()
+
+
+class CallTeardown:
+    """Ends one call once its final audio has played out."""
+
+    def __init__(
+        self,
+        task: PipelineTask,
+        tracker: PlayoutTracker,
+        timeout: float = TEARDOWN_TIMEOUT_SECS,
+        stop_timeout: float = TEARDOWN_STOP_SECS,
+    ):
+        self._task = task
+        self._tracker = tracker
+        self._timeout = timeout
+        self._stop_timeout = stop_timeout
+        self._finished = asyncio.Event()
+        self.started_at: Optional[float] = None
+        self.reason: Optional[str] = None
+
+        @task.event_handler("on_pipeline_finished")
+        async def _on_pipeline_finished(task, frame):
+            self._finished.set()
+
+    @property
+    def started(self) -> bool:
+        return self.started_at is not None
+
+    async def end(self, reason: str) -> None:
+        # The end_call tool and the end-of-call detector can both fire for the same goodbye
+        if self.started:
+            logger.info(f"[TEARDOWN] Already ending ({self.reason}); ignoring reason={reason}")
+            return
+        self.started_at = start = time.monotonic()
+        self.reason = reason
+        logger.info(f"[TEARDOWN] Ending call, reason={reason}; waiting for the final audio to play out")
+
+        await self._task.queue_frame(PlayoutMarkerFrame())
+        playout = asyncio.create_task(self._wait_for_playout(start + self._timeout))
+        finished = asyncio.create_task(self._finished.wait())
+        try:
+            await asyncio.wait({playout, finished}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            playout.cancel()
+            finished.cancel()
+        if self._finished.is_set():
+            # Hung up or cancelled while we waited; nothing left to play to
+            logger.info(f"[TEARDOWN] Pipeline finished before playout completed, reason={reason}")
+            return
+        timed_out = playout.result()
+        playout_secs = time.monotonic() - start
+
+        cancelled = False
+        await self._task.queue_frame(EndFrame())
+        try:
+            await asyncio.wait_for(self._finished.wait(), self._stop_timeout)
+        except asyncio.TimeoutError:
+            cancelled = True
+            logger.warning(f"[TEARDOWN] Pipeline still running {self._stop_timeout:g}s after EndFrame; cancelling")
+            await self._task.cancel()
+
+        total = time.monotonic() - start
+        _stats.record(total, timed_out, cancelled)
+        CALL_TEARDOWN.observe(total)
+        logger.info(
+            f"[TEARDOWN] Call ended in {total * 1000:.0f} ms (playout wait {playout_secs * 1000:.0f} ms"
+            f"{', timed out' if timed_out else ''}{', cancelled' if cancelled else ''}), reason={reason}"
+        )
+
+    async def _wait_for_playout(self, deadline: float) -> bool:
+        """Returns True if the deadline passed before the far end finished playing."""
+        for event in (self._tracker.marker_seen, self._tracker.tts_idle):
+            try:
+                await asyncio.wait_for(event.wait(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                return True
+        while True:
+            waiting_from = time.monotonic()
+            wait = self._tracker.playout_remaining() + PLAYOUT_MARGIN_SECS
+            if waiting_from + wait > deadline:
+                await asyncio.sleep(max(0.0, deadline - waiting_from))
+                return True
+            await asyncio.sleep(wait)
+            if self._tracker.last_audio_at < waiting_from:
+                return False
@@ -0,0 +1,319 @@
+# campaigns.py
+"""
+Bulk outbound dialing campaigns.
+
+POST /campaigns streams a CSV or JSONL lead list to a spool file on disk
+(never holding the whole upload in memory), then a background dispatcher
+reads it back line by line and places calls through the shared aiohttp
+session, paced by a token bucket so we stay under Exotel's calls-per-second
+limit. Spool file I/O runs in a thread, in batches of lines.
+"""
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+
+EXOTEL_CALLS_PER_SECOND = float(os.getenv("EXOTEL_CALLS_PER_SECOND", "2"))
+CAMPAIGN_MAX_IN_FLIGHT = int(os.getenv("CAMPAIGN_MAX_IN_FLIGHT", "20"))
+# How long a finished campaign's counters stay visible in GET /campaigns
+CAMPAIGN_RETENTION_SECS = float(os.getenv("CAMPAIGN_RETENTION_SECS", "3600"))
+# Spool lines written or read per thread hop, so file I/O stays off the event loop
+SPOOL_BATCH_LINES = 500
+
+PHONE_COLUMNS = ("phone_number", "phone", "number", "mobile", "to")
+NAME_COLUMNS = ("customer_name", "name", "customer")
+
+# dial(phone_number, customer_name, campaign_id) -> call_sid. It takes the
+# limiter's token itself, right before calling Exotel: a lead may first wait
+# for a free call slot, and a token spent during that wait would let the
+# waiting leads all dial at once when slots free up.
+DialFn = Callable[[str, str, str], Awaitable[str]]
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, bursts up to `capacity`.
+    Waiters are served in arrival order. The default capacity of 1 spaces
+    calls evenly, so no one-second window ever sees more than `rate` calls.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class Campaign:
+    campaign_id: str
+    spool_path: str
+    status: str = "ingesting"
+    queued: int = 0
+    dialed: int = 0
+    failed: int = 0
+    connected: int = 0
+    rejected_rows: int = 0
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "campaign_id": self.campaign_id,
+            "status": self.status,
+            # queued = accepted rows not yet dialed or failed
+            "queued": self.queued - self.dialed - self.failed,
+            "dialed": self.dialed,
+            "failed": self.failed,
+            "connected": self.connected,
+            "rejected_rows": self.rejected_rows,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a stream of byte chunks into decoded lines without buffering it all."""
+    pending = b""
+    first = True
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if first:
+                line = line.removeprefix(b"\xef\xbb\xbf")
+                first = False
+            yield line.decode("utf-8", errors="replace").rstrip("\r")
+    if pending:
+        if first:
+            pending = pending.removeprefix(b"\xef\xbb\xbf")
+        yield pending.decode("utf-8", errors="replace").rstrip("\r")
+
+
+def _pick(row: Dict[str, str], columns) -> str:
+    for column in columns:
+        value = row.get(column)
+        if value:
+            return str(value).strip()
+    return ""
+
+
+async def iter_leads(lines: AsyncIterator[str], fmt: Optional[str] = None) -> AsyncIterator[Optional[Dict[str, str]]]:
+    """
+    Parse CSV (with a header row) or JSONL leads. Yields a dict per valid
+    lead and None for each row that had to be rejected. When fmt is None,
+    the first non-empty line decides: "{" means JSONL, anything else CSV.
+    """
+    header = None
+    async for line in lines:
+        if not line.strip():
+            continue
+
+        if fmt is None:
+            fmt = "jsonl" if line.lstrip().startswith("{") else "csv"
+
+        if fmt == "jsonl":
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+                continue
+            if not isinstance(row, dict):
+                yield None
+                continue
+        else:
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [h.strip().lower() for h in values]
+                continue
+            row = dict(zip(header, values))
+
+        phone_number = _pick(row, PHONE_COLUMNS)
+        if not phone_number:
+            yield None
+            continue
+        yield {"phone_number": phone_number, "customer_name": _pick(row, NAME_COLUMNS)}
+
+
+def _read_lines(spool, count: int) -> list:
+    lines = []
+    for line in spool:
+        lines.append(line)
+        if len(lines) >= count:
+            break
+    return lines
+
+
+class CampaignManager:
+    """Owns all campaigns in this process and their dispatch tasks."""
+
+    def __init__(
+        self,
+        dial: DialFn,
+        limiter: TokenBucket,
+        max_in_flight: int = CAMPAIGN_MAX_IN_FLIGHT,
+        spool_dir: Optional[str] = None,
+        retention_secs: float = CAMPAIGN_RETENTION_SECS,
+    ):
+        self._dial = dial
+        self._limiter = limiter
+        self._max_in_flight = max_in_flight
+        self._retention_secs = retention_secs
+        self._spool_dir = spool_dir or tempfile.gettempdir()
+        self._campaigns: Dict[str, Campaign] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def get(self, campaign_id: str) -> Optional[Campaign]:
+        self._evict_finished()
+        return self._campaigns.get(campaign_id)
+
+    def all_campaigns(self):
+        self._evict_finished()
+        return list(self._campaigns.values())
+
+    def _evict_finished(self) -> None:
+        """Forget campaigns that finished more than retention_secs ago."""
+        cutoff = time.time() - self._retention_secs
+        for campaign_id, campaign in list(self._campaigns.items()):
+            if campaign.finished_at is not None and campaign.finished_at < cutoff:
+                del self._campaigns[campaign_id]
+
+    def record_connected(self, campaign_id: Optional[str]) -> None:
+        """Called by the bot when a campaign call's WebSocket connects."""
+        campaign = self._campaigns.get(campaign_id or "")
+        if campaign:
+            campaign.connected += 1
+
+    async def create(self, chunks: AsyncIterator[bytes], fmt: Optional[str] = None) -> Campaign:
+        """
+        Spool the upload to disk as normalised JSONL, then start dispatching.
+        Returns once the upload has been fully read.
+        """
+        self._evict_finished()
+        campaign_id = uuid.uuid4().hex
+        spool_path = os.path.join(self._spool_dir, f"campaign-{campaign_id}.jsonl")
+        campaign = Campaign(campaign_id=campaign_id, spool_path=spool_path)
+        self._campaigns[campaign_id] = campaign
+
+        try:
+            spool = await asyncio.to_thread(open, spool_path, "w", encoding="utf-8")
+            try:
+                batch = []
+                async for lead in iter_leads(iter_lines(chunks), fmt):
+                    if lead is None:
+                        campaign.rejected_rows += 1
+                        continue
+                    batch.append(json.dumps(lead) + "\n")
+                    campaign.queued += 1
+                    if len(batch) >= SPOOL_BATCH_LINES:
+                        await asyncio.to_thread(spool.writelines, batch)
+                        batch = []
+                if batch:
+                    await asyncio.to_thread(spool.writelines, batch)
+            finally:
+                await asyncio.to_thread(spool.close)
+        except Exception:
+            campaign.status = "failed"
+            campaign.finished_at = time.time()
+            await asyncio.to_thread(self._remove_spool, campaign)
+            raise
+
+        campaign.status = "dialing"
+        logger.info(
+            f"[CAMPAIGN] {campaign_id} accepted {campaign.queued} leads "
+            f"({campaign.rejected_rows} rejected rows), dispatching at {self._limiter.rate}/s"
+        )
+        self._tasks[campaign_id] = asyncio.create_task(self._dispatch(campaign))
+        return campaign
+
+    async def _dispatch(self, campaign: Campaign) -> None:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._max_in_flight * 2)
+
+        async def _reader():
+            spool = await asyncio.to_thread(open, campaign.spool_path, encoding="utf-8")
+            try:
+                while lines := await asyncio.to_thread(_read_lines, spool, SPOOL_BATCH_LINES):
+                    for line in lines:
+                        await queue.put(json.loads(line))
+            finally:
+                await asyncio.to_thread(spool.close)
+            for _ in range(self._max_in_flight):
+                await queue.put(None)
+
+        async def _worker():
+            while True:
+                lead = await queue.get()
+                if lead is None:
+                    return
+                try:
+                    call_sid = await self._dial(lead["phone_number"], lead["customer_name"], campaign.campaign_id)
+                    campaign.dialed += 1
+                    logger.debug(f"[CAMPAIGN] {campaign.campaign_id} dialed {lead['phone_number']} sid={call_sid}")
+                except Exception as e:
+                    campaign.failed += 1
+                    logger.warning(f"[CAMPAIGN] {campaign.campaign_id} failed to dial {lead['phone_number']}: {e}")
+
+        try:
+            await asyncio.gather(_reader(), *(_worker() for _ in range(self._max_in_flight)))
+            campaign.status = "done"
+        except asyncio.CancelledError:
+            campaign.status = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"[CAMPAIGN] {campaign.campaign_id} dispatch error: {e}")
+            campaign.status = "failed"
+        finally:
+            campaign.finished_at = time.time()
+            await asyncio.to_thread(self._remove_spool, campaign)
+            self._tasks.pop(campaign.campaign_id, None)
+            logger.info(f"[CAMPAIGN] {campaign.campaign_id} finished: {campaign.to_dict()}")
+
+    def _remove_spool(self, campaign: Campaign) -> None:
+        try:
+            os.remove(campaign.spool_path)
+        except OSError:
+            pass
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+_manager: Optional[CampaignManager] = None
+
+
+def set_campaign_manager(manager: Optional[CampaignManager]) -> None:
+    global _manager
+    _manager = manager
+
+
+def record_connected(campaign_id: Optional[str]) -> None:
+    """
+    Count a campaign call as connected. Called from bot() once the Media
+    Streams WebSocket for a campaign lead comes in on this process.
+    """
+    if _manager is not None and campaign_id:
+        _manager.record_connected(campaign_id)
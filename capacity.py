@@ -0,0 +1,253 @@
+# capacity.py
+"""
+Admission control for concurrent calls on this node.
+
+Every dial reserves a slot before Exotel is asked to place the call. The slot
+becomes active when the call's WebSocket connects, and is released when
+run_bot's PipelineRunner finishes. Dials that never connect give their slot
+back after a TTL. When the node is full, /start either rejects with
+429 + Retry-After or waits in a bounded queue, depending on ADMISSION_MODE.
+
+With --workers, the call can connect on another worker than the one that
+dialed it. That worker counts it as active, and taking the call's context
+from the shared store marks its slot as taken (call_memory.py). The dialing
+worker checks the store every CAPACITY_SYNC_SECS, and before each reserve,
+and drops those reservations so the call is not counted twice.
+
+The budget is MAX_CONCURRENT_CALLS when set. Otherwise ("auto") it starts at
+CALLS_PER_PROCESS and is re-measured from this process's CPU time per active
+call, aiming at ADMISSION_TARGET_CPU of the one core the event loop runs on.
+"""
+import asyncio
+import math
+import os
+import time
+import uuid
+from collections import deque
+from typing import Dict, Optional, Set
+
+from loguru import logger
+
+from call_memory import get_call_store
+
+MAX_CONCURRENT_CALLS = int(os.getenv("MAX_CONCURRENT_CALLS", "0"))  # 0 = auto
+CALLS_PER_PROCESS = int(os.getenv("CALLS_PER_PROCESS", "10"))
+ADMISSION_TARGET_CPU = float(os.getenv("ADMISSION_TARGET_CPU", "0.8"))
+ADMISSION_MODE = os.getenv("ADMISSION_MODE", "reject").lower()  # "reject" or "queue"
+ADMISSION_QUEUE_MAX = int(os.getenv("ADMISSION_QUEUE_MAX", "50"))
+ADMISSION_QUEUE_TIMEOUT_SECS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECS", "30"))
+ADMISSION_RETRY_AFTER_SECS = int(os.getenv("ADMISSION_RETRY_AFTER_SECS", "15"))
+RESERVATION_TTL_SECS = float(os.getenv("RESERVATION_TTL_SECS", os.getenv("CALL_CONTEXT_TTL_SECS", "180")))
+CAPACITY_MEASURE_SECS = float(os.getenv("CAPACITY_MEASURE_SECS", "10"))
+CAPACITY_SYNC_SECS = float(os.getenv("CAPACITY_SYNC_SECS", "2"))
+
+
+class CapacityFull(Exception):
+    def __init__(self, retry_after: int, message: str = "Node is at call capacity"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CapacityManager:
+    def __init__(
+        self,
+        max_calls: int = MAX_CONCURRENT_CALLS,
+        mode: str = ADMISSION_MODE,
+        queue_max: int = ADMISSION_QUEUE_MAX,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECS,
+        reservation_ttl: float = RESERVATION_TTL_SECS,
+    ):
+        self.auto = max_calls <= 0
+        self.budget = max_calls if max_calls > 0 else CALLS_PER_PROCESS
+        self.mode = mode
+        self._queue_max = queue_max
+        self._queue_timeout = queue_timeout
+        self._reservation_ttl = reservation_ttl
+
+        self._reserved: Dict[str, float] = {}  # slot -> expires_at (dialed, not yet connected)
+        self._active: Dict[str, float] = {}  # slot -> started_at (pipeline running)
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self._taken_elsewhere: Set[str] = set()  # reserved here, connected on another worker
+
+        self.rejected = 0
+        self.per_call_cpu: Optional[float] = None
+        self._avg_call_secs: Optional[float] = None
+        self._measure_task: Optional[asyncio.Task] = None
+        self._sync_task: Optional[asyncio.Task] = None
+
+    @property
+    def in_use(self) -> int:
+        return len(self._reserved) + len(self._active)
+
+    def _expire_reservations(self) -> None:
+        now = time.monotonic()
+        expired = [slot for slot, expires_at in self._reserved.items() if expires_at <= now]
+        for slot in expired:
+            del self._reserved[slot]
+            logger.info(f"[CAPACITY] Reservation {slot} expired without a WebSocket connect.")
+        taken = [slot for slot in self._taken_elsewhere if slot in self._reserved]
+        for slot in taken:
+            del self._reserved[slot]
+            logger.info(f"[CAPACITY] Reservation {slot} connected on another worker.")
+        self._taken_elsewhere.clear()
+        if expired or taken:
+            self._wake_waiters()
+
+    async def sync_reservations(self) -> None:
+        """Drop reservations whose call has connected on another worker (shared call store only)."""
+        if not self._reserved:
+            return
+        try:
+            self._taken_elsewhere |= await get_call_store().taken_slots(list(self._reserved))
+        except Exception as e:
+            logger.warning(f"[CAPACITY] Could not check reservations in the call store: {e}")
+        self._expire_reservations()
+
+    def _retry_after(self) -> int:
+        if self._avg_call_secs:
+            # Roughly how long until enough calls finish to admit the queue
+            return max(1, math.ceil(self._avg_call_secs * (len(self._waiters) + 1) / max(1, self.budget)))
+        return ADMISSION_RETRY_AFTER_SECS
+
+    def _take_slot(self) -> str:
+        slot = uuid.uuid4().hex
+        self._reserved[slot] = time.monotonic() + self._reservation_ttl
+        return slot
+
+    async def reserve(self, wait: Optional[bool] = None) -> str:
+        """
+        Reserve a slot for a call we are about to dial. Raises CapacityFull
+        when the node is full (and, in queue mode, the queue is full too or
+        the wait timed out).
+        """
+        await self.sync_reservations()
+        self._expire_reservations()  # sync_reservations skips this when nothing is reserved
+        if self.in_use < self.budget and not self._waiters:
+            return self._take_slot()
+
+        wait = self.mode == "queue" if wait is None else wait
+        if not wait or len(self._waiters) >= self._queue_max:
+            self.rejected += 1
+            raise CapacityFull(self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # _wake_waiters reserves the slot before handing it over, so a new
+            # arrival can't grab it between wake-up and resumption.
+            return await asyncio.wait_for(waiter, timeout=self._queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise CapacityFull(self._retry_after(), "Timed out waiting for call capacity")
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    async def reserve_blocking(self) -> str:
+        """Wait for a slot as long as it takes. Used by campaign dispatch."""
+        while True:
+            try:
+                return await self.reserve(wait=True)
+            except CapacityFull as e:
+                await asyncio.sleep(min(e.retry_after, 5))
+
+    def activate(self, slot: Optional[str]) -> str:
+        """
+        Mark a call's slot as running. A call whose reservation is unknown
+        here (dialed on another worker, expired, or inbound) still gets
+        counted; it is already live, so it can't be turned away. The dialing
+        worker drops its reservation in sync_reservations.
+        """
+        if slot:
+            self._reserved.pop(slot, None)
+        slot = slot or uuid.uuid4().hex
+        self._active[slot] = time.monotonic()
+        return slot
+
+    def release(self, slot: Optional[str]) -> None:
+        if not slot:
+            return
+        started_at = self._active.pop(slot, None)
+        self._reserved.pop(slot, None)
+        if started_at is not None:
+            duration = time.monotonic() - started_at
+            self._avg_call_secs = (
+                duration if self._avg_call_secs is None else 0.9 * self._avg_call_secs + 0.1 * duration
+            )
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        free = self.budget - self.in_use
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(self._take_slot())
+                free -= 1
+
+    def status(self) -> Dict:
+        self._expire_reservations()
+        return {
+            "budget": self.budget,
+            "auto_budget": self.auto,
+            "mode": self.mode,
+            "active": len(self._active),
+            "reserved": len(self._reserved),
+            "available": max(0, self.budget - self.in_use),
+            "queue_depth": len(self._waiters),
+            "queue_max": self._queue_max,
+            "rejected_total": self.rejected,
+            "per_call_cpu": self.per_call_cpu,
+            "avg_call_secs": self._avg_call_secs,
+        }
+
+    async def _measure_forever(self) -> None:
+        last_cpu, last_wall = time.process_time(), time.monotonic()
+        while True:
+            await asyncio.sleep(CAPACITY_MEASURE_SECS)
+            cpu, wall = time.process_time(), time.monotonic()
+            active = len(self._active)
+            if active >= 2:
+                sample = (cpu - last_cpu) / (wall - last_wall) / active
+                self.per_call_cpu = sample if self.per_call_cpu is None else 0.8 * self.per_call_cpu + 0.2 * sample
+                budget = max(1, int(ADMISSION_TARGET_CPU / max(self.per_call_cpu, 1e-4)))
+                if budget != self.budget:
+                    logger.info(
+                        f"[CAPACITY] Re-measured {self.per_call_cpu:.3f} CPU per call; "
+                        f"budget {self.budget} -> {budget}"
+                    )
+                    self.budget = budget
+                    self._wake_waiters()
+            self._expire_reservations()
+            last_cpu, last_wall = cpu, wall
+
+    async def _sync_forever(self) -> None:
+        while True:
+            await asyncio.sleep(CAPACITY_SYNC_SECS)
+            await self.sync_reservations()
+
+    def start(self) -> None:
+        if self.auto and (self._measure_task is None or self._measure_task.done()):
+            self._measure_task = asyncio.create_task(self._measure_forever())
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._sync_forever())
+
+    async def stop(self) -> None:
+        for task in (self._measure_task, self._sync_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._measure_task = self._sync_task = None
+
+
+_manager: Optional[CapacityManager] = None
+
+
+def get_capacity_manager() -> CapacityManager:
+    global _manager
+    if _manager is None:
+        _manager = CapacityManager()
+    return _manager
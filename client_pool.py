@@ -0,0 +1,279 @@
+# client_pool.py
+"""
+Process-wide provider connections, shared by every call.
+
+pipecat's OpenAILLMService and OpenAISTTService each build their own
+AsyncOpenAI client, and so their own connection pool. So the first LLM
+request and the first transcription of every call opened a new connection
+and did a new TLS handshake on the first turn. SarvamTTSService opens its
+WebSocket when the call starts.
+
+ProviderPool keeps, for the whole process:
+- one AsyncOpenAI client per (api_key, base_url). Calls borrow its
+  keep-alive connections, up to PROVIDER_POOL_SIZE of them. Connections
+  unused for PROVIDER_IDLE_TIMEOUT_SECS are closed, and a keep-warm
+  request every half of that keeps at least one open. PooledOpenAILLMService
+  and PooledOpenAISTTService use it, and so does the context summariser.
+  Its transport also finishes reading streamed responses that the SDK
+  stops at [DONE], so they go back to the pool instead of being closed.
+- SARVAM_WS_SPARES pre-connected Sarvam TTS WebSockets. A call takes one
+  instead of dialling (CachedSarvamTTSService), and a replacement is opened
+  in the background. A socket is never handed to a second call, because
+  audio from the first one may still be in flight. Spares are pinged like
+  live sockets and replaced if they close.
+
+PROVIDER_POOL_SIZE=0 turns pooling off: each call builds its own clients and
+dials Sarvam itself, as before. GET /capacity reports the pool's counters.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from loguru import logger
+from openai import APIError, AsyncOpenAI, DefaultAsyncHttpxClient
+
+from pipecat.services.openai.llm import OpenAILLMService
+from pipecat.services.openai.stt import OpenAISTTService
+
+PROVIDER_POOL_SIZE = int(os.getenv("PROVIDER_POOL_SIZE", "20"))  # 0 = no pooling
+PROVIDER_IDLE_TIMEOUT_SECS = float(os.getenv("PROVIDER_IDLE_TIMEOUT_SECS", "90"))
+SARVAM_WS_SPARES = int(os.getenv("SARVAM_WS_SPARES", "2"))
+SARVAM_PING_SECS = 20  # SarvamTTSService's keepalive cadence
+DRAIN_TIMEOUT_SECS = 0.05
+
+
+class _DrainOnClose(httpx.AsyncByteStream):
+    """
+    Reads what is left of a response body before closing it. The OpenAI SDK
+    stops reading a stream at "data: [DONE]" and closes it, usually just
+    before the body's last chunk arrives; httpx then drops the connection
+    instead of keeping it, so every streamed completion needed a new one.
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream):
+        self._stream = stream
+
+    async def __aiter__(self):
+        async for part in self._stream:
+            yield part
+
+    async def _drain(self) -> None:
+        async for _ in self._stream:
+            pass
+
+    async def aclose(self) -> None:
+        try:
+            # Bounded, for a stream abandoned mid-response (an interruption)
+            await asyncio.wait_for(self._drain(), DRAIN_TIMEOUT_SECS)
+        except Exception:
+            pass
+        finally:
+            await self._stream.aclose()
+
+
+class _KeepAliveTransport(httpx.AsyncHTTPTransport):
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await super().handle_async_request(request)
+        response.stream = _DrainOnClose(response.stream)
+        return response
+
+
+class ProviderPool:
+    def __init__(
+        self,
+        pool_size: int = PROVIDER_POOL_SIZE,
+        idle_timeout: float = PROVIDER_IDLE_TIMEOUT_SECS,
+        sarvam_spares: int = SARVAM_WS_SPARES,
+    ):
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.sarvam_spares = sarvam_spares if pool_size > 0 else 0
+        self._openai: Dict[Tuple[Optional[str], Optional[str]], AsyncOpenAI] = {}
+        self._spares: Dict[Tuple[str, str], List] = {}  # (url, api_key) -> open websockets
+        self._refills: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._keepalive_task: Optional[asyncio.Task] = None
+
+        self.sarvam_taken = 0
+        self.sarvam_missed = 0
+        self.keepalive_failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.pool_size > 0
+
+    # -- OpenAI ---------------------------------------------------------------
+
+    def openai_client(self, api_key: Optional[str] = None, base_url: Optional[str] = None) -> AsyncOpenAI:
+        """The shared client for this key and endpoint (base_url None = OPENAI_BASE_URL or the default)."""
+        key = (api_key, base_url or None)
+        client = self._openai.get(key)
+        if client is None:
+            client = self._openai[key] = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url or None,
+                http_client=DefaultAsyncHttpxClient(
+                    transport=_KeepAliveTransport(
+                        limits=httpx.Limits(
+                            max_keepalive_connections=self.pool_size,
+                            max_connections=None,  # bursts may open more; only pool_size are kept
+                            keepalive_expiry=self.idle_timeout,
+                        )
+                    )
+                ),
+            )
+        return client
+
+    async def _keep_openai_warm(self) -> None:
+        for client in list(self._openai.values()):
+            try:
+                # Cheap authenticated GET; an error answer still leaves the connection open
+                await client.models.list()
+            except APIError:
+                pass
+            except Exception as e:
+                self.keepalive_failures += 1
+                logger.warning(f"[POOL] OpenAI keep-warm request to {client.base_url} failed: {e}")
+
+    # -- Sarvam TTS WebSocket -------------------------------------------------
+
+    async def take_sarvam_websocket(self, url: str, api_key: str):
+        """An open, unused Sarvam TTS WebSocket for this URL and key, or None to dial one."""
+        if not self.sarvam_spares:
+            return None
+        from websockets.protocol import State
+
+        self.start()
+        key = (url, api_key)
+        spares = self._spares.setdefault(key, [])
+        websocket = None
+        while spares and websocket is None:
+            candidate = spares.pop()
+            if candidate.state is State.OPEN:
+                websocket = candidate
+        self._refill(key)
+        if websocket is None:
+            self.sarvam_missed += 1
+            return None
+        self.sarvam_taken += 1
+        return websocket
+
+    def _refill(self, key: Tuple[str, str]) -> None:
+        task = self._refills.get(key)
+        if task is None or task.done():
+            self._refills[key] = asyncio.create_task(self._open_spares(key))
+
+    async def _open_spares(self, key: Tuple[str, str]) -> None:
+        from websockets.asyncio.client import connect as websocket_connect
+
+        url, api_key = key
+        spares = self._spares.setdefault(key, [])
+        while len(spares) < self.sarvam_spares:
+            try:
+                spares.append(await websocket_connect(url, additional_headers={"api-subscription-key": api_key}))
+            except Exception as e:
+                logger.warning(f"[POOL] Could not open a spare Sarvam WebSocket: {e}")
+                return
+
+    async def _keep_sarvam_warm(self) -> None:
+        from websockets.protocol import State
+
+        for key, spares in self._spares.items():
+            for websocket in list(spares):
+                try:
+                    if websocket.state is not State.OPEN:
+                        raise ConnectionError("closed by the server")
+                    await websocket.send(json.dumps({"type": "ping"}))
+                except Exception as e:
+                    spares.remove(websocket)
+                    logger.info(f"[POOL] Dropping a spare Sarvam WebSocket: {e}")
+            self._refill(key)
+
+    # -- Lifecycle ------------------------------------------------------------
+
+    async def _keep_warm_forever(self) -> None:
+        last_openai = time.monotonic()
+        while True:
+            await asyncio.sleep(SARVAM_PING_SECS)
+            await self._keep_sarvam_warm()
+            if time.monotonic() - last_openai >= self.idle_timeout / 2:
+                last_openai = time.monotonic()
+                await self._keep_openai_warm()
+
+    async def prewarm(self, sarvam_url: Optional[str] = None, sarvam_api_key: Optional[str] = None) -> None:
+        """
+        Open a connection on every OpenAI client created so far, and the Sarvam
+        spares for this URL and key. Called from the startup warm-up, after it
+        has built one call's services (and so the clients they use).
+        """
+        if not self.enabled:
+            return
+        self.start()
+        waits = [self._keep_openai_warm()]
+        if self.sarvam_spares and sarvam_url and sarvam_api_key:
+            key = (sarvam_url, sarvam_api_key)
+            self._refill(key)
+            waits.append(self._refills[key])
+        await asyncio.gather(*waits)
+
+    def start(self) -> None:
+        if self.enabled and (self._keepalive_task is None or self._keepalive_task.done()):
+            self._keepalive_task = asyncio.create_task(self._keep_warm_forever())
+
+    async def close(self) -> None:
+        tasks = [t for t in [self._keepalive_task, *self._refills.values()] if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._keepalive_task = None
+        self._refills.clear()
+        for spares in self._spares.values():
+            for websocket in spares:
+                await websocket.close()
+        self._spares.clear()
+        for client in self._openai.values():
+            await client.close()
+        self._openai.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "pool_size": self.pool_size,
+            "idle_timeout_secs": self.idle_timeout,
+            "openai_clients": len(self._openai),
+            "sarvam_spares": sum(len(s) for s in self._spares.values()),
+            "sarvam_taken": self.sarvam_taken,
+            "sarvam_missed": self.sarvam_missed,
+            "keepalive_failures": self.keepalive_failures,
+        }
+
+
+_pool: Optional[ProviderPool] = None
+
+
+def get_provider_pool() -> ProviderPool:
+    global _pool
+    if _pool is None:
+        _pool = ProviderPool()
+    return _pool
+
+
+class PooledOpenAILLMService(OpenAILLMService):
+    """OpenAILLMService on the process-wide client instead of one per call."""
+
+    def create_client(self, api_key=None, base_url=None, **kwargs):
+        pool = get_provider_pool()
+        if not pool.enabled:
+            return super().create_client(api_key=api_key, base_url=base_url, **kwargs)
+        return pool.openai_client(api_key, base_url)
+
+
+class PooledOpenAISTTService(OpenAISTTService):
+    """OpenAISTTService on the process-wide client instead of one per call."""
+
+    def _create_client(self, api_key: Optional[str], base_url: Optional[str]):
+        pool = get_provider_pool()
+        if not pool.enabled:
+            return super()._create_client(api_key, base_url)
+        return pool.openai_client(api_key, base_url)
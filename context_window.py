@@ -0,0 +1,175 @@
+# context_window.py
+"""
+Bounded LLM context for long calls.
+
+Every turn is appended to the call's LLMContext and the whole list is resent
+on each inference, so a long call (say, repeated re-confirmations in Stage 4)
+gets slower and more expensive turn by turn. ContextWindow keeps the last
+CONTEXT_MAX_TURNS user turns verbatim. Anything older is replaced by one
+rolling summary message placed right after the leading system messages. The
+qualification answers do not depend on the summary: they stay in the
+structured CALL STATE note from conversation_state.py.
+
+Compaction never blocks a response. Once the verbatim part has grown by
+CONTEXT_COMPACT_TURNS turns, apply() hands back a coroutine that summarises
+the oldest turns with a small model, and the caller runs it as a background
+task. Until it finishes those turns are sent as they are. The summary
+replaces them on the first inference after it is ready. Compacting a batch
+of turns at a time, rather than one turn every time, also keeps the prompt
+prefix stable for OpenAI's prompt cache between compactions.
+"""
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+
+CONTEXT_MAX_TURNS = int(os.getenv("CONTEXT_MAX_TURNS", "6"))  # 0 disables compaction
+CONTEXT_COMPACT_TURNS = max(1, int(os.getenv("CONTEXT_COMPACT_TURNS", "4")))
+CONTEXT_SUMMARY_MODEL = os.getenv("CONTEXT_SUMMARY_MODEL", "gpt-4o-mini")
+
+SUMMARY_PREFIX = "EARLIER IN THIS CALL (summary): "
+_NO_SUMMARY = "Some earlier turns of this call are not shown."
+
+_SUMMARY_INSTRUCTIONS = (
+    "You compress the earlier part of a phone call between a loan consultant (Agent) and a "
+    "customer. Write at most three short sentences in English: what the customer said about "
+    "themselves and the loan, any objections or questions, which language they speak, and "
+    "anything the agent promised. No greetings or filler."
+)
+
+# (previous summary, transcript of the turns to fold in) -> new summary
+Summarizer = Callable[[str, str], Awaitable[str]]
+
+_openai_client = None
+
+
+def _summary_client():
+    global _openai_client
+    from client_pool import get_provider_pool
+
+    pool = get_provider_pool()
+    if pool.enabled:
+        # Same client, and so the same warm connections, as the calls' LLM
+        return pool.openai_client(os.getenv("OPENAI_API_KEY"))
+    if _openai_client is None:
+        from openai import AsyncOpenAI
+
+        _openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _openai_client
+
+
+async def openai_summarizer(previous: str, transcript: str) -> str:
+    response = await _summary_client().chat.completions.create(
+        model=CONTEXT_SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": _SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": f"Summary so far: {previous or 'none'}\n\nNew turns:\n{transcript}"},
+        ],
+        max_tokens=120,
+        temperature=0,
+    )
+    return response.choices[0].message.content or ""
+
+
+def _transcript(messages: List[Dict]) -> str:
+    lines = []
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else None
+        if not isinstance(content, str) or not content.strip():
+            continue  # tool calls and tool results
+        if message.get("role") == "user":
+            lines.append(f"Customer: {content.strip()}")
+        elif message.get("role") == "assistant":
+            lines.append(f"Agent: {content.strip()}")
+    return "\n".join(lines)
+
+
+class ContextWindow:
+    """Keeps one call's context to the last max_turns user turns plus a rolling summary."""
+
+    def __init__(
+        self,
+        max_turns: int = CONTEXT_MAX_TURNS,
+        compact_turns: int = CONTEXT_COMPACT_TURNS,
+        summarizer: Optional[Summarizer] = None,
+    ):
+        self.max_turns = max_turns
+        self.compact_turns = compact_turns
+        self._summarizer = summarizer or openai_summarizer
+        self.summary = ""
+        self._summary_message: Optional[Dict] = None
+        self._batch: Optional[List] = None  # messages being summarised
+        self._result: Optional[str] = None
+        self.compactions = 0
+        self.messages_compacted = 0
+        self.failures = 0
+
+    def apply(self, messages: List) -> Optional[Awaitable[None]]:
+        """
+        Called on the context's message list just before an inference. Swaps
+        in a finished summary, then returns a summarise() coroutine for the
+        caller to run in the background if enough old turns have piled up.
+        """
+        if self.max_turns <= 0:
+            return None
+        if self._result is not None:
+            self._swap_in(messages)
+        if self._batch is not None:
+            return None  # the previous summary is still running
+
+        start = 0
+        while start < len(messages) and isinstance(messages[start], dict) and messages[start].get("role") == "system":
+            start += 1
+        turn_starts = [
+            i for i in range(start, len(messages)) if isinstance(messages[i], dict) and messages[i].get("role") == "user"
+        ]
+        if len(turn_starts) < self.max_turns + self.compact_turns:
+            return None
+        # Cut at a user message, so a tool call is never separated from its result
+        self._batch = messages[start : turn_starts[-self.max_turns]]
+        return self.summarize()
+
+    async def summarize(self) -> None:
+        batch = self._batch
+        try:
+            summary = (await self._summarizer(self.summary, _transcript(batch))).strip()
+        except Exception as e:
+            # Drop the turns anyway; the customer's answers are in the CALL STATE note
+            self.failures += 1
+            logger.warning(f"[CONTEXT] Summary of {len(batch)} messages failed: {e}")
+            summary = self.summary
+        except BaseException:
+            self._batch = None  # cancelled with the call
+            raise
+        self._result = summary or _NO_SUMMARY
+
+    def _swap_in(self, messages: List) -> None:
+        batch, summary = self._batch, self._result
+        self._batch = self._result = None
+        try:
+            i = next(n for n, m in enumerate(messages) if m is batch[0])
+        except StopIteration:
+            return
+        current = messages[i : i + len(batch)]
+        if len(current) != len(batch) or any(a is not b for a, b in zip(current, batch)):
+            return  # the context was rewritten underneath us; summarise again later
+
+        del messages[i : i + len(batch)]
+        self.summary = summary
+        new_message = {"role": "system", "content": SUMMARY_PREFIX + summary}
+        if self._summary_message is not None and i > 0 and messages[i - 1] is self._summary_message:
+            messages[i - 1] = new_message
+        else:
+            messages.insert(i, new_message)
+        self._summary_message = new_message
+        self.compactions += 1
+        self.messages_compacted += len(batch)
+        logger.info(f"[CONTEXT] Compacted {len(batch)} messages into the summary ({len(summary)} chars)")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "compactions": self.compactions,
+            "messages_compacted": self.messages_compacted,
+            "summary_failures": self.failures,
+            "summary_chars": len(self.summary),
+        }
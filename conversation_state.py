@@ -0,0 +1,265 @@
+# conversation_state.py
+"""
+Stage-aware system prompt.
+
+config.py's prompt covers all five stages of the call in three languages, and
+sending all of it on every turn costs input tokens and LLM TTFB. Instead, the
+prompt is split at import into its sections (by their ALL-CAPS headers) and
+precompiled into one prompt per stage: the core rules that always apply, plus
+the instructions for the current stage and the next one. The next stage is
+included so the model can move on as soon as the customer answers, without
+waiting for the tracker to catch up.
+
+ConversationState follows the call from the messages in the context:
+- what the bot just asked, matched against the scripted questions;
+- which of the four qualification fields the customer has answered;
+- whether the bot has already introduced itself.
+
+ConversationStateProcessor sits between the user aggregator and the LLM.
+Before each inference it swaps in the current stage's prompt. It also keeps
+one short CALL STATE system message at the end of the context, with the
+answers collected so far, and lets a ContextWindow (context_window.py)
+compact the older turns.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from pipecat.frames.frames import Frame, LLMContextFrame
+from pipecat.processors.aggregators.llm_context import LLMContext
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from context_window import ContextWindow
+from prompt_context import STATIC_SYSTEM_PROMPT
+
+NAME_VERIFICATION, INTEREST_CHECK, QUALIFICATION, CONFIRMATION, CLOSING = range(1, 6)
+STAGE_NAMES = {
+    NAME_VERIFICATION: "NAME VERIFICATION",
+    INTEREST_CHECK: "INTEREST CHECK",
+    QUALIFICATION: "QUALIFICATION",
+    CONFIRMATION: "CONFIRMATION",
+    CLOSING: "CLOSING",
+}
+SLOTS = ("loan_type", "loan_amount", "monthly_income", "employment_type")
+
+_HEADER_RE = re.compile(r"^([A-Z][A-Z0-9 ()/-]+):\s*$", re.MULTILINE)
+
+CORE_SECTIONS = (
+    "",  # the opening persona lines before the first header
+    "HIGH-LEVEL BEHAVIOUR",
+    "MULTILINGUAL BEHAVIOUR",
+    "SPEAKING STYLE",
+    "CONFUSION AND REPEAT HANDLING",
+    "DOMAIN BOUNDARY",
+    "GOODBYE AND ENDING RULES - CRITICAL",
+)
+STAGE_SECTIONS = {
+    NAME_VERIFICATION: (
+        "HANDLING USER GREETINGS AT START",
+        "CRITICAL - YOU DO NOT SPEAK FIRST ON THIS CALL",
+        "INTRODUCTION STATE TRACKING",
+        "STAGE 1 - NAME VERIFICATION",
+    ),
+    INTEREST_CHECK: ("STAGE 2 - INTEREST CHECK",),
+    QUALIFICATION: ("SLOT-BASED CALL FLOW", "RULES", "STAGE 3 - QUALIFICATION (ONE QUESTION AT A TIME)"),
+    CONFIRMATION: ("STAGE 4 - CONFIRMATION AND POSSIBLE CHANGES",),
+    CLOSING: ("STAGE 5 - CLOSING",),
+}
+
+_STAGED_NOTE = (
+    "This call follows five stages: name verification, interest check, qualification, "
+    "confirmation, closing. Only the instructions for the current stage and the next one are "
+    "shown below. The CALL STATE message at the end of the conversation says where the call is."
+)
+
+
+def split_sections(prompt: str) -> Dict[str, str]:
+    """Split a prompt into {header: section text}; "" holds the text before the first header."""
+    sections: Dict[str, str] = {}
+    matches = list(_HEADER_RE.finditer(prompt))
+    sections[""] = prompt[: matches[0].start()] if matches else prompt
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(prompt)
+        sections[match.group(1)] = prompt[match.start() : end]
+    return sections
+
+
+def _compile_stage_prompts(prompt: str) -> Dict[int, str]:
+    sections = split_sections(prompt)
+    order = list(sections)
+    compiled = {}
+    for stage in STAGE_NAMES:
+        wanted = set(CORE_SECTIONS) | set(STAGE_SECTIONS[stage]) | set(STAGE_SECTIONS.get(stage + 1, ()))
+        missing = wanted - set(sections)
+        if missing:
+            raise KeyError(f"config.py prompt is missing sections {sorted(missing)}")
+        # Keep config.py's order so the prompt still reads top to bottom
+        body = "".join(sections[name] for name in order if name in wanted)
+        compiled[stage] = body.rstrip() + "\n\n" + _STAGED_NOTE + "\n"
+    return compiled
+
+
+STAGE_PROMPTS: Dict[int, str] = _compile_stage_prompts(STATIC_SYSTEM_PROMPT)
+
+# What the bot's own (scripted) lines look like in each language
+_INTRO_RE = re.compile(r"shruti|digi\s*loans|श्रुति", re.IGNORECASE)
+_INTEREST_RE = re.compile(
+    r"interested in hearing|sunna chahenge|vinataniki interest|interest unda|सुनना चाहेंगे|रुचि", re.IGNORECASE
+)
+_SUMMARY_RE = re.compile(r"is that correct|is this correct|sahi hai\s*\?|correct aa|सही है\s*\?", re.IGNORECASE)
+_CLOSING_RE = re.compile(
+    r"team will review|team aapki details|team mee details|goodbye|अलविदा", re.IGNORECASE
+)
+_NAME_QUESTION_RE = re.compile(
+    r"your name|aapka naam|naam kya|mee peru|नाम क्या|am i speaking with|se baat kar rahi|garitho maatladutunnaana",
+    re.IGNORECASE,
+)
+_SLOT_QUESTION_RE = {
+    "employment_type": re.compile(r"salaried or self|salaried hain ya|सैलरीड", re.IGNORECASE),
+    "monthly_income": re.compile(r"monthly income|income kitni|income entha|मासिक आय|इनकम", re.IGNORECASE),
+    "loan_amount": re.compile(r"how much loan|loan amount|kitna loan|entha loan|कितना लोन|लोन अमाउंट", re.IGNORECASE),
+    "loan_type": re.compile(
+        r"type of loan|kaun sa loan|ye loan kavali|personal loan or home loan|personal loan ya home loan|कौन सा लोन",
+        re.IGNORECASE,
+    ),
+}
+_CONFUSION_RE = re.compile(
+    r"^\W*(what|sorry|come again|repeat|kya\b|dobara|samajh nahi|em chepparu|malli cheppandi|क्या\s*\?|फिर से)",
+    re.IGNORECASE,
+)
+
+
+def message_text(message: Dict) -> str:
+    content = message.get("content", "")
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content if isinstance(content, str) else ""
+
+
+@dataclass
+class ConversationState:
+    stage: int = NAME_VERIFICATION
+    slots: Dict[str, str] = field(default_factory=dict)
+    asked_slot: Optional[str] = None
+    introduced: bool = False
+    # What the bot's latest line asked ("name", "interest", a slot, "summary")
+    # and which slot the customer's latest message answered, for IntentRouter
+    last_question: Optional[str] = None
+    last_answer: Optional[str] = None
+
+    def _advance(self, stage: int) -> None:
+        if stage > self.stage:
+            logger.info(f"[STATE] Stage {self.stage} ({STAGE_NAMES[self.stage]}) -> {stage} ({STAGE_NAMES[stage]})")
+            self.stage = stage
+
+    def observe_assistant(self, text: str) -> None:
+        if _INTRO_RE.search(text):
+            self.introduced = True
+        self.last_question = None
+        if _SUMMARY_RE.search(text):
+            self.asked_slot = None
+            self.last_question = "summary"
+            self._advance(CONFIRMATION)
+        elif _CLOSING_RE.search(text):
+            self.asked_slot = None
+            self._advance(CLOSING)
+        else:
+            for slot, pattern in _SLOT_QUESTION_RE.items():
+                if pattern.search(text):
+                    self.asked_slot = self.last_question = slot
+                    self._advance(QUALIFICATION)
+                    return
+            if _INTEREST_RE.search(text):
+                self.last_question = "interest"
+                self._advance(INTEREST_CHECK)
+            elif _NAME_QUESTION_RE.search(text):
+                self.last_question = "name"
+
+    def observe_user(self, text: str) -> None:
+        text = text.strip()
+        self.last_answer = None
+        if not text or not self.asked_slot or _CONFUSION_RE.match(text):
+            return
+        self.slots[self.asked_slot] = text[:80]
+        self.last_answer = self.asked_slot
+        self.asked_slot = None
+        if all(slot in self.slots for slot in SLOTS):
+            self._advance(CONFIRMATION)
+
+    @property
+    def prompt(self) -> str:
+        return STAGE_PROMPTS[self.stage]
+
+    def state_message(self) -> Dict[str, str]:
+        lines = [f"CALL STATE: stage {self.stage} - {STAGE_NAMES[self.stage]}."]
+        if self.introduced:
+            lines.append("You have already introduced yourself; do not introduce yourself again.")
+        if self.stage >= QUALIFICATION:
+            collected = [f'{slot} = "{self.slots[slot]}"' for slot in SLOTS if slot in self.slots]
+            missing = [slot for slot in SLOTS if slot not in self.slots]
+            if collected:
+                lines.append("Customer's answers so far: " + "; ".join(collected) + ".")
+            if missing and self.stage == QUALIFICATION:
+                lines.append(f"Next field to ask for: {missing[0]}.")
+        return {"role": "system", "content": " ".join(lines)}
+
+
+class ConversationStateProcessor(FrameProcessor):
+    """Rewrites the context's system prompt for the current stage before each LLM turn."""
+
+    def __init__(
+        self,
+        state: Optional[ConversationState] = None,
+        window: Optional[ContextWindow] = None,
+        stage_prompts: bool = True,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.state = state or ConversationState()
+        self.window = window
+        self._stage_prompts = stage_prompts
+        self._seen = 1  # messages already observed; [0] is the system prompt
+        self._state_message: Optional[Dict] = None
+        self._summary_task = None
+
+    def update(self, context: LLMContext) -> None:
+        messages: List = context.messages
+        if self._state_message is not None:
+            # Drop last turn's state note; it is always rebuilt at the end
+            for i in range(len(messages) - 1, -1, -1):
+                if messages[i] is self._state_message:
+                    del messages[i]
+                    break
+
+        for message in messages[self._seen :]:
+            if not isinstance(message, dict):
+                continue
+            if message.get("role") == "assistant":
+                self.state.observe_assistant(message_text(message))
+            elif message.get("role") == "user":
+                self.state.observe_user(message_text(message))
+
+        if self._stage_prompts:
+            messages[0] = {"role": "system", "content": self.state.prompt}
+        if self.window:
+            # Only compacts messages observed above, never the new ones
+            summarize = self.window.apply(messages)
+            if summarize:
+                self._summary_task = self.create_task(summarize, "summarize")
+        self._seen = len(messages)
+        self._state_message = self.state.state_message()
+        messages.append(self._state_message)
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, LLMContextFrame):
+            self.update(frame.context)
+        await self.push_frame(frame, direction)
+
+    async def cleanup(self):
+        await super().cleanup()
+        if self._summary_task:
+            await self.cancel_task(self._summary_task)
+            self._summary_task = None
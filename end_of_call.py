@@ -0,0 +1,135 @@
+# end_of_call.py
+"""
+End-of-call detection on the LLM's output stream.
+
+EndOfCallDetector sits right after the LLM and reads the assistant's text
+as it streams (LLMTextFrame). EndOfCallMatcher buffers the chunks and,
+each time a clause ends (punctuation) or the buffer fills, runs GOODBYE_RE
+and NOT_INTERESTED_RE over the new text plus a short tail of the text
+before it. A phrase split across chunks ("Good" + "bye.") is still found,
+the cost stays the same however long the response gets, and a reply takes
+a handful of scans instead of one per chunk. A match that ends exactly at
+the end of the text so far waits for more, so "bye" is not reported while
+the word might still be "byelaws".
+
+Detection happens mid-stream. The detector emits "on_end_of_call" when
+that response's LLMFullResponseEndFrame passes, after the rest of the line
+has gone on to TTS. An interruption drops whatever was matched for the
+interrupted response. No task runs per call, and the detector runs in
+pipecat's direct mode, so it adds no queue hop for the streamed frames.
+"""
+import re
+from typing import Optional, Set
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    Frame,
+    InterruptionFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+GOODBYE_RE = re.compile(
+    r"\b(good\s*bye|goodbye|bye|thanks\,?\s*bye|thank you\.?\s*goodbye|bas,\s*theek\s*hai|band\s*karo)\b",
+    re.IGNORECASE,
+)
+NOT_INTERESTED_RE = re.compile(
+    r"(not\s*interested|don.?t\s*call|stop\s*calling|nahi\s*chahiye|mujhe\s*nahi\s*chahiye|vaddu|malli\s*call\s*cheyyakandi)",
+    re.IGNORECASE,
+)
+
+# Checked in this order; the first reason found in a response wins at its end
+_PATTERNS = (
+    (NOT_INTERESTED_RE, "customer_not_interested"),
+    (GOODBYE_RE, "customer_goodbye"),
+)
+# Longer than any phrase above can match, with room for extra whitespace
+_TAIL_CHARS = 64
+_CLAUSE_END = frozenset(".,!?;:\n।")
+
+
+class EndOfCallMatcher:
+    """Incremental GOODBYE_RE / NOT_INTERESTED_RE matching over one streamed response."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self._tail = ""
+        self._pending = ""  # chunks since the last scan
+        self._trimmed = False  # _tail starts mid-text, so a match at 0 has no left boundary
+        self._found: Set[str] = set()
+
+    @property
+    def reason(self) -> Optional[str]:
+        for _, reason in _PATTERNS:
+            if reason in self._found:
+                return reason
+        return None
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """Add the next chunk; returns the end-of-call reason if one has matched so far."""
+        self._pending += chunk
+        if len(self._pending) >= _TAIL_CHARS or not _CLAUSE_END.isdisjoint(chunk):
+            self._scan(final=False)
+        return self.reason
+
+    def finish(self) -> Optional[str]:
+        """The response is complete; a match at the very end now counts too."""
+        self._scan(final=True)
+        return self.reason
+
+    def _scan(self, final: bool) -> None:
+        text = self._tail + self._pending
+        self._pending = ""
+        for pattern, reason in _PATTERNS:
+            if reason in self._found:
+                continue
+            for match in pattern.finditer(text):
+                if self._trimmed and match.start() == 0:
+                    continue
+                if final or match.end() < len(text):
+                    self._found.add(reason)
+                    break
+        if len(text) > _TAIL_CHARS:
+            self._tail = text[-_TAIL_CHARS:]
+            self._trimmed = True
+        else:
+            self._tail = text
+
+
+class EndOfCallDetector(FrameProcessor):
+    """Emits "on_end_of_call"(detector, reason) after an assistant response that says goodbye."""
+
+    def __init__(self, **kwargs):
+        # Direct mode: frames are handled inline by the LLM's push instead of
+        # through another queue and task. Nothing here blocks, so that is safe.
+        kwargs.setdefault("enable_direct_mode", True)
+        super().__init__(**kwargs)
+        self._matcher = EndOfCallMatcher()
+        self._fired = False
+        self._register_event_handler("on_end_of_call")
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, (LLMFullResponseStartFrame, InterruptionFrame)):
+            self._matcher.reset()
+        elif isinstance(frame, LLMTextFrame) and not self._fired:
+            had_reason = self._matcher.reason
+            reason = self._matcher.feed(frame.text)
+            if reason and not had_reason:
+                logger.info(f"[END_OF_CALL] {reason} matched in streamed text {frame.text!r}")
+
+        await self.push_frame(frame, direction)
+
+        if isinstance(frame, LLMFullResponseEndFrame) and not self._fired:
+            reason = self._matcher.finish()
+            self._matcher.reset()
+            if reason:
+                self._fired = True
+                logger.info(f"[END_OF_CALL] Response finished with {reason}; ending the call")
+                await self._call_event_handler("on_end_of_call", reason)
@@ -0,0 +1,287 @@
+# endpointing.py
+"""
+Adaptive end-of-turn detection.
+
+With the VAD alone, a turn ends after a fixed stop_secs of silence (0.5 s),
+so every answer waits half a second before STT can finish it. A caller who
+pauses longer mid-sentence to think is cut off, and on a noisy line
+background noise can start a turn.
+
+AdaptiveTurnAnalyzer plugs into pipecat's transport as its turn_analyzer.
+The VAD's stop_secs drops to ENDPOINT_MIN_SECS, so the VAD only reports that
+the caller has paused. The analyzer decides whether the pause ends the turn.
+It ends the turn once the silence is longer than a window that adapts to
+the call:
+- rhythm: from ENDPOINT_MIN_PAUSES pauses on, the window sits just above
+  the longest pauses this caller makes within a turn (their 90th
+  percentile). A fluent caller gets a short window, a hesitant one a long
+  one, between ENDPOINT_MIN_SECS and ENDPOINT_MAX_SECS. Until then it is
+  ENDPOINT_STOP_SECS, the old fixed value.
+- premature cutoffs: if the caller carries on within ENDPOINT_RESUME_SECS
+  of a turn ending, the turn was cut off. That gap counts as a pause, so
+  the window grows.
+- transcript: with a streaming STT backend, TranscriptHints passes on the
+  interim transcript. Text that reads as finished ("yes.", "50000",
+  "salaried") halves the window. Text that trails off ("and", "um",
+  "matlab", a comma) makes it half as long again. Segmented backends only
+  transcribe after the turn ends, so they rely on the audio signals.
+- noise floor: the VAD's volume during silence is tracked. The VAD's
+  min_volume is raised to ENDPOINT_NOISE_MARGIN above it (at least the
+  configured value, at most ENDPOINT_MAX_MIN_VOLUME), so line noise stops
+  starting turns.
+
+Once the analyzer has ended the turn, the user context aggregator no
+longer needs its own 0.5 s wait for more transcript before it runs the
+LLM; user_aggregator_params() shortens it to ENDPOINT_AGGREGATION_SECS,
+enough for the final transcript's last pieces to arrive.
+
+ENDPOINTING=fixed goes back to the VAD's 0.5 s stop_secs, no analyzer and
+the aggregator's default wait.
+benchmarks/eval_endpointing.py replays recorded calls through both and
+reports the latency saved against premature cutoffs.
+"""
+import os
+import re
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from pipecat.audio.turn.base_turn_analyzer import BaseTurnAnalyzer, BaseTurnParams, EndOfTurnState
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer
+from pipecat.frames.frames import Frame, InterimTranscriptionFrame, TranscriptionFrame, UserStartedSpeakingFrame
+from pipecat.metrics.metrics import MetricsData
+from pipecat.processors.aggregators.llm_response import LLMUserAggregatorParams
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+ENDPOINTING = os.getenv("ENDPOINTING", "adaptive").lower()  # "adaptive" or "fixed"
+ENDPOINT_MIN_SECS = float(os.getenv("ENDPOINT_MIN_SECS", "0.2"))
+ENDPOINT_STOP_SECS = float(os.getenv("ENDPOINT_STOP_SECS", "0.5"))
+ENDPOINT_MAX_SECS = float(os.getenv("ENDPOINT_MAX_SECS", "1.2"))
+ENDPOINT_MIN_PAUSES = int(os.getenv("ENDPOINT_MIN_PAUSES", "4"))
+ENDPOINT_RESUME_SECS = float(os.getenv("ENDPOINT_RESUME_SECS", "1.0"))
+ENDPOINT_NOISE_MARGIN = float(os.getenv("ENDPOINT_NOISE_MARGIN", "0.1"))
+ENDPOINT_MAX_MIN_VOLUME = float(os.getenv("ENDPOINT_MAX_MIN_VOLUME", "0.5"))
+ENDPOINT_AGGREGATION_SECS = float(os.getenv("ENDPOINT_AGGREGATION_SECS", "0.2"))
+
+PAUSE_MARGIN_SECS = 0.1  # above the caller's long pauses
+MIN_PAUSE_SECS = 0.1  # shorter gaps are between syllables, not pauses
+PAUSE_HISTORY = 20
+NOISE_SMOOTHING = 0.05
+NOISE_AFTER_SECS = 0.3  # silence this long is line noise, not a trailing word
+
+_TRAILING_OFF_RE = re.compile(
+    r"(,|-|\.\.\.|\b(and|but|or|so|because|like|the|a|my|is|to|of|with|um+|uh+|hmm+|er+|"
+    r"aur|lekin|toh|to|ki|ke|ka|ko|matlab|woh|ya|ki\s+main|mera|meri))\s*$",
+    re.IGNORECASE,
+)
+_FINISHED_RE = re.compile(
+    r"([.?!।]|\b(yes|yeah|yep|no|nope|okay|ok|sure|fine|done|haan|ha|ji|nahi|nahin|theek\s+hai|"
+    r"avunu|ledu|salaried|self[- ]employed|personal\s+loan|home\s+loan|lakh|lakhs|thousand|"
+    r"hazaar|crore|rupees)|\d)\s*$",
+    re.IGNORECASE,
+)
+
+
+def transcript_hint(text: str) -> int:
+    """+1 if the text reads as a finished answer, -1 if it trails off, 0 if unclear."""
+    text = text.strip()
+    if not text:
+        return 0
+    if _TRAILING_OFF_RE.search(text):
+        return -1
+    if _FINISHED_RE.search(text):
+        return 1
+    return 0
+
+
+class AdaptiveTurnParams(BaseTurnParams):
+    min_stop_secs: float = ENDPOINT_MIN_SECS
+    stop_secs: float = ENDPOINT_STOP_SECS
+    max_stop_secs: float = ENDPOINT_MAX_SECS
+    min_pauses: int = ENDPOINT_MIN_PAUSES
+    resume_secs: float = ENDPOINT_RESUME_SECS
+    noise_margin: float = ENDPOINT_NOISE_MARGIN
+    max_min_volume: float = ENDPOINT_MAX_MIN_VOLUME
+
+
+class AdaptiveTurnAnalyzer(BaseTurnAnalyzer):
+    """
+    Per-call end-of-turn decision on top of the call's VAD analyzer.
+
+    `vad` is the same analyzer the transport runs: its volume feeds the
+    noise floor, and its min_volume is raised from here. Its stop_secs
+    should be params.min_stop_secs (see create_turn_analyzer()).
+    """
+
+    def __init__(self, vad: VADAnalyzer, *, params: Optional[AdaptiveTurnParams] = None):
+        super().__init__()
+        self._vad = vad
+        self._params = params or AdaptiveTurnParams()
+        self._base_min_volume = vad.params.min_volume
+        self._pauses: Deque[float] = deque(maxlen=PAUSE_HISTORY)
+        self._noise_floor: Optional[float] = None
+        self._since_end: Optional[float] = None  # seconds since the last turn ended
+        self._last_window = 0.0
+        self._clear_turn()
+
+        self.turns = 0
+        self.cutoffs = 0
+        self.window_total = 0.0
+
+    def _clear_turn(self) -> None:
+        self._speech_triggered = False
+        self._pending_speech = 0.0  # speech not yet long enough to start a turn
+        self._speech_secs = 0.0
+        self._silence = 0.0
+        self._hint = 0
+
+    @property
+    def speech_triggered(self) -> bool:
+        return self._speech_triggered
+
+    @property
+    def params(self) -> AdaptiveTurnParams:
+        return self._params
+
+    def note_transcript(self, text: str) -> None:
+        """Latest interim transcript of the current turn (TranscriptHints)."""
+        if self._speech_triggered:
+            self._hint = transcript_hint(text)
+
+    def stop_window(self) -> float:
+        """Silence, in seconds, that ends the current turn."""
+        p = self._params
+        window = p.stop_secs
+        if len(self._pauses) >= p.min_pauses:
+            window = float(np.percentile(self._pauses, 90)) + PAUSE_MARGIN_SECS
+        if self._hint > 0:
+            window *= 0.5
+        elif self._hint < 0:
+            window *= 1.5
+        return min(max(window, p.min_stop_secs), p.max_stop_secs)
+
+    def append_audio(self, buffer: bytes, is_speech: bool) -> EndOfTurnState:
+        secs = len(buffer) / 2 / (self.sample_rate or 8000)
+        if is_speech:
+            return self._on_speech(secs)
+        self._on_silence(secs)
+        if self._speech_triggered and self._silence >= self.stop_window():
+            self._end_turn()
+            return EndOfTurnState.COMPLETE
+        return EndOfTurnState.INCOMPLETE
+
+    def _on_speech(self, secs: float) -> EndOfTurnState:
+        if not self._speech_triggered:
+            # Same rule as the VAD's start_secs, so a short burst of noise
+            # that never becomes a turn does not start one here either
+            self._pending_speech += secs
+            if self._pending_speech < self._vad.params.start_secs:
+                return EndOfTurnState.INCOMPLETE
+            if self._since_end is not None and self._since_end < self._params.resume_secs:
+                # The caller carried on: the last turn ended too early
+                self.cutoffs += 1
+                self._pauses.append(self._last_window + self._since_end)
+                logger.debug(f"[ENDPOINTING] Caller resumed {self._since_end:.2f}s after end of turn")
+            self._speech_triggered = True
+            self._since_end = None
+            self._speech_secs = self._pending_speech
+        elif self._silence >= MIN_PAUSE_SECS:
+            self._pauses.append(self._silence)
+            self._hint = 0  # the transcript so far no longer ends where the caller is
+        self._silence = 0.0
+        self._speech_secs += secs
+        return EndOfTurnState.INCOMPLETE
+
+    def _on_silence(self, secs: float) -> None:
+        self._pending_speech = 0.0
+        if self._since_end is not None:
+            self._since_end += secs
+        if self._speech_triggered:
+            self._silence += secs
+        if not self._speech_triggered or self._silence >= NOISE_AFTER_SECS:
+            self._track_noise(getattr(self._vad, "volume", None))
+
+    def _track_noise(self, volume: Optional[float]) -> None:
+        if volume is None:
+            return
+        if self._noise_floor is None:
+            self._noise_floor = volume
+        else:
+            self._noise_floor += NOISE_SMOOTHING * (volume - self._noise_floor)
+        p = self._params
+        min_volume = min(max(self._noise_floor + p.noise_margin, self._base_min_volume), p.max_min_volume)
+        if abs(min_volume - self._vad.params.min_volume) >= 0.02:
+            # In place: VADAnalyzer.set_params() would also reset its state
+            self._vad.params.min_volume = min_volume
+
+    def _end_turn(self) -> None:
+        window = self.stop_window()
+        self.turns += 1
+        self.window_total += window
+        logger.debug(
+            f"[ENDPOINTING] End of turn after {self._silence:.2f}s silence "
+            f"(window {window:.2f}s, speech {self._speech_secs:.2f}s, hint {self._hint})"
+        )
+        self._clear_turn()
+        self._since_end = 0.0
+        self._last_window = window
+
+    async def analyze_end_of_turn(self) -> Tuple[EndOfTurnState, Optional[MetricsData]]:
+        # The VAD has seen min_stop_secs of silence; append_audio() ends the turn
+        # as soon as the window has passed.
+        if self._speech_triggered and self._silence >= self.stop_window():
+            self._end_turn()
+            return EndOfTurnState.COMPLETE, None
+        return EndOfTurnState.INCOMPLETE, None
+
+    def clear(self):
+        self._clear_turn()
+
+    def stats(self) -> Dict:
+        return {
+            "turns": self.turns,
+            "cutoffs": self.cutoffs,
+            "mean_window_secs": round(self.window_total / self.turns, 3) if self.turns else None,
+            "noise_floor": round(float(self._noise_floor), 3) if self._noise_floor is not None else None,
+            "min_volume": round(float(self._vad.params.min_volume), 3),
+        }
+
+
+class TranscriptHints(FrameProcessor):
+    """Passes interim transcripts to the call's turn analyzer; sits right after STT."""
+
+    def __init__(self, analyzer: Optional[BaseTurnAnalyzer], **kwargs):
+        super().__init__(**kwargs)
+        self.analyzer = analyzer if isinstance(analyzer, AdaptiveTurnAnalyzer) else None
+        self._text = ""
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if self.analyzer is not None:
+            if isinstance(frame, TranscriptionFrame):
+                self._text = f"{self._text} {frame.text}".strip()
+                self.analyzer.note_transcript(self._text)
+            elif isinstance(frame, InterimTranscriptionFrame):
+                self.analyzer.note_transcript(f"{self._text} {frame.text}")
+            elif isinstance(frame, UserStartedSpeakingFrame):
+                self._text = ""
+        await self.push_frame(frame, direction)
+
+
+def create_turn_analyzer(vad: VADAnalyzer, mode: str = ENDPOINTING) -> Optional[AdaptiveTurnAnalyzer]:
+    """The call's turn analyzer, or None for ENDPOINTING=fixed. Shortens the VAD's stop_secs to match."""
+    if mode != "adaptive":
+        return None
+    params = AdaptiveTurnParams()
+    # Applied when the transport sets the VAD's sample rate at the call's start
+    vad.params.stop_secs = params.min_stop_secs
+    return AdaptiveTurnAnalyzer(vad, params=params)
+
+
+def user_aggregator_params(mode: str = ENDPOINTING) -> LLMUserAggregatorParams:
+    """The user aggregator's settings: a short wait for late transcript when the analyzer ends turns."""
+    if mode != "adaptive":
+        return LLMUserAggregatorParams()
+    return LLMUserAggregatorParams(aggregation_timeout=ENDPOINT_AGGREGATION_SECS)
@@ -0,0 +1,148 @@
+# greeting.py
+"""
+The greeting for a call whose customer name the dialer knows, rendered
+while the phone rings.
+
+With a customer_name, the first reply is already fixed by
+prompt_context.customer_name_message: "Hello, am I speaking with {name}?".
+Saying it used to wait for the customer's "Hello?" to go through STT, the
+LLM and live TTS (1.5 s or more), although Exotel rings for several
+seconds between /start and the WebSocket connect.
+
+- prerender_greeting() runs in the background after make_exotel_call. It
+  renders the line with Sarvam's HTTP endpoint and attaches the text and
+  the 8 kHz PCM to the pending call context (update_outbound_call). If the
+  customer answers before it is ready, the call goes on without it.
+- GreetingPlayer sits right after the user aggregator. When the customer
+  first stops speaking, it pushes the greeting as a TTSSpeakFrame, which
+  plays from the call's own phrase (CachedSarvamTTSService.add_call_phrase)
+  without waiting for the transcript. When that first user turn arrives as
+  an LLMContextFrame, it writes the greeting into the context as the
+  assistant's reply and the turn goes no further: the greeting was the
+  answer. If the customer spoke again after the greeting started, the
+  greeting goes in before their latest message and the LLM answers that.
+
+The customer's language is not known before they speak, so the greeting is
+in GREETING_LANGUAGE (en, hi or te). GREETING_PRERENDER=0 turns it off.
+"""
+import base64
+import os
+import time
+from typing import Dict, NamedTuple, Optional
+
+import aiohttp
+from loguru import logger
+
+from pipecat.frames.frames import (
+    Frame,
+    LLMContextFrame,
+    TTSSpeakFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from call_memory import update_outbound_call
+from intent_router import NAME_CHECK
+from tts_cache import synthesize
+
+GREETING_PRERENDER = os.getenv("GREETING_PRERENDER", "1") == "1"
+GREETING_LANGUAGE = os.getenv("GREETING_LANGUAGE", "en")
+
+
+class Greeting(NamedTuple):
+    text: str
+    audio: bytes
+
+
+def greeting_text(customer_name: str, language: str = GREETING_LANGUAGE) -> str:
+    return NAME_CHECK.get(language, NAME_CHECK["en"]).format(name=customer_name)
+
+
+def greeting_from_context(call_context: Optional[Dict[str, str]]) -> Optional[Greeting]:
+    """The greeting prerender_greeting() attached to this call's context, if it was ready in time."""
+    if not call_context or not call_context.get("greeting_audio"):
+        return None
+    return Greeting(call_context["greeting_text"], base64.b64decode(call_context["greeting_audio"]))
+
+
+async def prerender_greeting(
+    session: aiohttp.ClientSession, call_sid: str, phone_number: str, customer_name: str
+) -> bool:
+    """Render the greeting and attach it to the pending call context. False if the call got none."""
+    api_key = os.getenv("SARVAM_API_KEY")
+    if not api_key:
+        logger.warning("[GREETING] SARVAM_API_KEY not set; not rendering the greeting")
+        return False
+
+    text = greeting_text(customer_name)
+    started = time.monotonic()
+    try:
+        audio = await synthesize(session, text, api_key)
+    except Exception as e:
+        logger.warning(f"[GREETING] Could not render the greeting for call_sid={call_sid}: {e}")
+        return False
+    rendered_in = time.monotonic() - started
+
+    attached = await update_outbound_call(
+        call_sid,
+        phone_number,
+        {"greeting_text": text, "greeting_audio": base64.b64encode(audio).decode("ascii")},
+    )
+    if attached:
+        logger.info(f"[GREETING] Rendered {text!r} for call_sid={call_sid} in {rendered_in:.2f}s")
+    else:
+        logger.info(f"[GREETING] Call {call_sid} connected before its greeting was ready ({rendered_in:.2f}s)")
+    return attached
+
+
+class GreetingPlayer(FrameProcessor):
+    """Plays the pre-rendered greeting when the customer first stops speaking; a no-op without one."""
+
+    def __init__(self, greeting: Optional[Greeting] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.greeting = greeting
+        self.played = False
+        self.answered_first_turn = False
+        self._done = greeting is None
+        # Turns the customer started after the greeting began
+        self._turns_since = 0
+
+    async def _play(self) -> None:
+        self.played = True
+        logger.info(f"[GREETING] Playing the pre-rendered greeting: {self.greeting.text!r}")
+        await self.push_frame(TTSSpeakFrame(self.greeting.text))
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if self._done:
+            await self.push_frame(frame, direction)
+            return
+
+        if isinstance(frame, UserStartedSpeakingFrame) and self.played:
+            self._turns_since += 1
+        elif isinstance(frame, UserStoppedSpeakingFrame) and not self.played:
+            await self.push_frame(frame, direction)
+            await self._play()
+            return
+        elif isinstance(frame, LLMContextFrame) and direction == FrameDirection.DOWNSTREAM:
+            self._done = True
+            if not self.played:
+                await self._play()
+            reply = {"role": "assistant", "content": self.greeting.text}
+            if self._turns_since == 0:
+                # This turn is the one the greeting answered
+                frame.context.add_message(reply)
+                self.answered_first_turn = True
+                return
+            messages = frame.context.messages
+            last_user = max(i for i, m in enumerate(messages) if isinstance(m, dict) and m.get("role") == "user")
+            messages.insert(last_user, reply)
+        await self.push_frame(frame, direction)
+
+    def stats(self) -> Dict:
+        return {
+            "ready": self.greeting is not None,
+            "played": self.played,
+            "answered_first_turn": self.answered_first_turn,
+        }
@@ -0,0 +1,358 @@
+# intent_router.py
+"""
+Fast path for the scripted turns of the call.
+
+Much of config.py's script is deterministic: "Hello?" gets the intro, a
+"yes" to the interest check gets the loan type question, and a plain
+answer to one qualification question gets the next one. The LLM still
+spent its whole TTFB (0.9-1.1 s on gpt-4o) to produce those lines.
+
+IntentRouter sits between ConversationStateProcessor and the LLM. For each
+turn it looks at what the bot last asked (ConversationState.last_question)
+and the customer's reply, and matches the reply against INTENTS, compiled
+at import. A match has to cover the whole reply ("yes" matches; "yes, but
+what is the interest rate?" does not), so anything unexpected still goes
+to the LLM. On a match it answers with the scripted line in the language of
+the reply (English, Hindi or Telugu; an unmarked reply keeps the call's
+language), sending LLMFullResponseStartFrame, one LLMTextFrame per sentence
+and LLMFullResponseEndFrame as the LLM would. The assistant aggregator
+writes it into the context and the phrase cache usually has its audio.
+
+The scripted lines are quoted from config.py, and compiling checks that
+each one is still there (as the stage prompts do for their sections), so
+the prompt and the fast path cannot drift apart. The name pattern is
+checked the same way against NAME_EXAMPLES. The summary in the
+confirmation stage depends on the answers, so it is left to the LLM.
+
+INTENT_ROUTER=0 sends every turn to the LLM. Each call logs how many turns
+took the fast path ([ROUTER] Call stats).
+"""
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    Frame,
+    LLMContextFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from conversation_state import (
+    INTEREST_CHECK,
+    NAME_VERIFICATION,
+    QUALIFICATION,
+    SLOTS,
+    ConversationState,
+    message_text,
+)
+from prompt_context import STATIC_SYSTEM_PROMPT, customer_name_message
+
+INTENT_ROUTER = os.getenv("INTENT_ROUTER", "1") == "1"
+
+_HINDI_RE = re.compile(
+    r"[ऀ-ॿ]|\b(haan|han|ji|bolo|boliye|batao|nahi|nahin|chahiye|mera|meri|mujhe|naam|hai|hoon|hu|"
+    r"theek|kya|aap|thoda|lagbhag|hazaar|kamata|kamati)\b",
+    re.IGNORECASE,
+)
+_TELUGU_RE = re.compile(
+    r"\b(cheppandi|sare|vaddu|kavali|meeku|naaku|nenu|naa|peru|avunu|ledu|entha|undi|garu|chestha|chesthanu)\b",
+    re.IGNORECASE,
+)
+_ENGLISH_RE = re.compile(
+    r"\b(hello|hi|yes|yeah|no|okay|ok|sure|speaking|my|name|need|want|loan|income|salary|around|about|thousand|"
+    r"please|tell|interested)\b",
+    re.IGNORECASE,
+)
+
+# Scripted lines from config.py, by language; "{name}" is the customer's name.
+# The Hindi and Telugu acknowledgements follow the English one.
+_NAME_THANKS = {"en": "Nice to speak with you, {name}.", "hi": "Dhanyavaad, {name} ji.", "te": "Thank you, {name} garu."}
+# When the dialer knows the name, the first reply confirms it instead (prompt_context.customer_name_message)
+NAME_CHECK = {
+    "en": "Hello, am I speaking with {name}?",
+    "hi": "Hello, kya main {name} se baat kar rahi hoon?",
+    "te": "Hello, nenu {name} garitho maatladutunnaana?",
+}
+LINES: Dict[str, Dict[str, str]] = {
+    "intro": {
+        "en": "Hello! This is Shruti from Digi Loans. I'm calling to discuss some loan options. May I know your name please?",
+        "hi": "Hello! Main Shruti bol rahi hoon Digi Loans se. Main aapko loan options ke baare mein batana chahti hoon. Aapka naam kya hai?",
+    },
+    "interest": {
+        "en": "Would you be interested in hearing about our loan options?",
+        "hi": "Kya aap hamare loan options ke baare mein sunna chahenge?",
+        "te": "Mana loan options gurinchi vinataniki interest unda?",
+    },
+    "not_interested": {
+        "en": "Okay, no problem. Thank you for your time. Goodbye.",
+        "hi": "Theek hai, aapka time dene ke liye dhanyavaad. Goodbye.",
+        "te": "Sare, mee time ki thank you. Goodbye.",
+    },
+    "loan_type": {
+        "en": "What type of loan are you looking for – personal loan or home loan?",
+        "hi": "Aapko kaun sa loan chahiye – personal loan ya home loan?",
+        "te": "Meeku ye loan kavali – personal loan or home loan?",
+    },
+    "loan_amount": {
+        "en": "Okay. Approximately how much loan amount do you need?",
+        "hi": "Theek hai. Lagbhag kitna loan amount chahiye?",
+        "te": "Sare. Entha loan amount kavali approximately?",
+    },
+    "monthly_income": {
+        "en": "Understood. What is your approximate monthly income?",
+        "hi": "Samajh gaya. Aapki monthly income kitni hai approximately?",
+        "te": "Arthamaindi. Mee monthly income entha?",
+    },
+    "employment_type": {
+        "en": "Thank you. Are you salaried or self-employed?",
+        "hi": "Dhanyavaad. Aap salaried hain ya self-employed?",
+        "te": "Thank you. Meeru salaried or self-employed?",
+    },
+}
+
+# Whole-reply patterns, applied to normalise()d text
+_YES = r"(yes|yeah|yep|yup|sure|okay|ok|haan|han|ha|ji|haan ji|ji haan|bolo|boliye|batao|thoda batao|sare|avunu|theek hai|go ahead|tell me|please|alright|fine)"
+_NUMBER = (
+    r"(\d[\d,.]*|one|two|three|four|five|six|seven|eight|nine|ten|fifteen|twenty|twenty five|thirty|forty|fifty|"
+    r"sixty|seventy|eighty|ninety|hundred|ek|do|teen|char|paanch|panch|das|pandrah|bees|pachees|tees|chalees|pachaas)"
+)
+_UNIT = r"(lakh|lakhs|lac|thousand|k|crore|crores|hazaar|hazar|rupees|rs|rupaye)"
+_AMOUNT = rf"((around|about|approximately|approx|roughly|almost|nearly|lagbhag|takriban|just) )?({_NUMBER} )+({_UNIT} ?)*"
+INTENTS: Dict[str, re.Pattern] = {
+    "greeting": re.compile(
+        r"((hello|hallo|hi|hey|yes|yeah|haan|han|ha|ji|bolo|boliye|speaking|cheppandi|who is this|kaun|kaun bol raha hai)"
+        r" ?)+"
+    ),
+    # Only replies that say outright they are a name; "this is ...", "i am ...",
+    # "main ..." are as often "wrong number", "driving" or "theek hoon"
+    "name": re.compile(
+        r"((yes|haan|ji|avunu) )?(my name is|my names|mera naam|mera name|naa peru) "
+        r"(?P<name>[a-z]+( [a-z]+)??)( (hai|hoon|hu|here|speaking|ji|garu|andi))*"
+    ),
+    "confirm": re.compile(
+        rf"({_YES} ?)*(speaking|yes speaking|its me|thats me|that is me|bol raha hoon|bol rahi hoon|main hi|nene|"
+        rf"nene matladutunna)?( ji| garu| here)?"
+    ),
+    "yes": re.compile(rf"({_YES} ?)+( (i am|im|i would be) interested)?|interested|i am interested|haan interested"),
+    "no": re.compile(
+        r"(no|nope|nahi|nahin|vaddu|ledu)( (thanks|thank you|sorry|ji))*|(i am |im )?not interested|"
+        r"(mujhe )?(interest )?nahi (chahiye|hai)|no i am not interested|vaddu andi"
+    ),
+    "loan_type": re.compile(
+        r"((i need|i want|need|want|i am looking for|looking for|mujhe|naaku) )?(a )?(personal|home)( loan)?"
+        r"( (chahiye|kavali|please))?"
+    ),
+    "loan_amount": re.compile(rf"((i need|need|i want|mujhe|naaku) )?{_AMOUNT}( (chahiye|kavali|loan))*"),
+    "monthly_income": re.compile(
+        rf"((my )?(monthly )?(income|salary) (is )?|meri (monthly )?(income|salary) |i earn |i make )?{_AMOUNT}"
+        rf"( (per month|a month|monthly|hai|hoon|entha|vastundi))*"
+    ),
+}
+_NOT_A_NAME = {
+    "not", "no", "interested", "busy", "sorry", "fine", "okay", "here", "speaking", "the", "a", "calling",
+    "wrong", "number", "me", "driving", "theek", "bol", "raha", "rahi", "hoon", "kya", "nahi", "what", "why",
+}
+
+# Replies and the name the fast path takes from them (None: left to the LLM),
+# checked at import like the scripted lines below
+NAME_EXAMPLES: Dict[str, Optional[str]] = {
+    "my name is ravi": "Ravi",
+    "my name is ravi kumar": "Ravi Kumar",
+    "yes my name is priya": "Priya",
+    "mera naam suresh hai": "Suresh",
+    "mera naam anil sharma hai": "Anil Sharma",
+    "naa peru lakshmi": "Lakshmi",
+    "naa peru venkat garu": "Venkat",
+    "this is wrong number": None,
+    "main bol raha hoon": None,
+    "i am driving": None,
+    "its me": None,
+    "main theek hoon": None,
+    "this is ravi": None,
+    "my name is wrong number": None,
+}
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?।])\s+")
+
+
+def normalise(text: str) -> str:
+    text = text.lower().replace("’", "'").replace("'", "")
+    text = re.sub(r"[^\wऀ-ॿ]+", " ", text)
+    return " ".join(text.split())
+
+
+def detect_language(text: str) -> Optional[str]:
+    """"hi", "te" or "en" from the words of one reply; None if it has no clear marker."""
+    if _TELUGU_RE.search(text):
+        return "te"
+    if _HINDI_RE.search(text):
+        return "hi"
+    if _ENGLISH_RE.search(text):
+        return "en"
+    return None
+
+
+@dataclass(frozen=True)
+class Route:
+    """Reply to `intent` when the bot last asked `question` (None: nothing yet) in `stage`."""
+
+    stage: int
+    question: Optional[str]
+    intent: str
+    # (state, match, customer name from the dialer or "") -> lines by language
+    reply: Callable[[ConversationState, "re.Match", str], Optional[Dict[str, str]]]
+    # True: only when the dialer gave the name; False: only when it did not
+    known_name: Optional[bool] = None
+
+
+def _line(name: str) -> Callable[[ConversationState, "re.Match", str], Dict[str, str]]:
+    return lambda state, match, customer_name: LINES[name]
+
+
+def _thanks_then_interest(name: str) -> Dict[str, str]:
+    return {lang: f"{_NAME_THANKS[lang].format(name=name)} {LINES['interest'][lang]}" for lang in LINES["interest"]}
+
+
+def _name_check(state: ConversationState, match: "re.Match", customer_name: str) -> Dict[str, str]:
+    return {lang: line.format(name=customer_name) for lang, line in NAME_CHECK.items()}
+
+
+def name_from_reply(text: str) -> Optional[str]:
+    """The name in a normalise()d reply to "May I know your name?", or None if it does not clearly give one."""
+    match = INTENTS["name"].fullmatch(text)
+    if not match:
+        return None
+    words = match.group("name").split()
+    if any(word in _NOT_A_NAME for word in words):
+        return None
+    return " ".join(word.capitalize() for word in words)
+
+
+def _name_then_interest(state: ConversationState, match: "re.Match", customer_name: str) -> Optional[Dict[str, str]]:
+    name = name_from_reply(match.group(0))
+    return _thanks_then_interest(name) if name else None
+
+
+def _confirmed_name(state: ConversationState, match: "re.Match", customer_name: str) -> Dict[str, str]:
+    return _thanks_then_interest(customer_name)
+
+
+def _next_question(state: ConversationState, match: "re.Match", customer_name: str) -> Optional[Dict[str, str]]:
+    answered = SLOTS.index(state.last_answer)
+    if any(slot not in state.slots for slot in SLOTS[: answered + 1]):
+        return None  # an earlier answer is missing or went to the wrong slot: the LLM sorts it out
+    missing = [slot for slot in SLOTS[answered + 1 :] if slot not in state.slots]
+    # The summary needs the answers themselves: the LLM writes it
+    return LINES[missing[0]] if missing else None
+
+
+ROUTES: Tuple[Route, ...] = (
+    Route(NAME_VERIFICATION, None, "greeting", _line("intro"), known_name=False),
+    Route(NAME_VERIFICATION, None, "greeting", _name_check, known_name=True),
+    Route(NAME_VERIFICATION, "name", "name", _name_then_interest, known_name=False),
+    Route(NAME_VERIFICATION, "name", "confirm", _confirmed_name, known_name=True),
+    Route(INTEREST_CHECK, "interest", "yes", _line("loan_type")),
+    Route(INTEREST_CHECK, "interest", "no", _line("not_interested")),
+    Route(QUALIFICATION, "loan_type", "loan_type", _next_question),
+    Route(QUALIFICATION, "loan_amount", "loan_amount", _next_question),
+    Route(QUALIFICATION, "monthly_income", "monthly_income", _next_question),
+)
+
+
+def _check_lines(prompt: str, lines: Dict[str, Dict[str, str]]) -> None:
+    for name, by_language in lines.items():
+        for lang, line in by_language.items():
+            if line not in prompt:
+                raise KeyError(f"the prompt no longer has the scripted {name} line ({lang}): {line!r}")
+
+
+def _check_name_examples(examples: Dict[str, Optional[str]]) -> None:
+    for reply, expected in examples.items():
+        got = name_from_reply(normalise(reply))
+        if got != expected:
+            raise ValueError(f"the name pattern takes {got!r} from {reply!r}, expected {expected!r}")
+
+
+_check_lines(STATIC_SYSTEM_PROMPT, LINES)
+_check_name_examples(NAME_EXAMPLES)
+_check_lines(customer_name_message("{name}")["content"], {"name_check": NAME_CHECK})
+
+
+class IntentRouter(FrameProcessor):
+    """Answers scripted turns itself; passes every other LLMContextFrame on to the LLM."""
+
+    def __init__(self, state: ConversationState, customer_name: str = "", enabled: bool = INTENT_ROUTER, **kwargs):
+        super().__init__(**kwargs)
+        self.state = state
+        self.customer_name = customer_name
+        self.enabled = enabled
+        self.language = "en"
+        self.turns = 0
+        self.fast_turns = 0
+        self.intents: Counter = Counter()
+
+    def route(self, messages: List) -> Optional[Tuple[str, str]]:
+        """(intent, reply) for the latest user message, or None to ask the LLM."""
+        user_text = next(
+            (message_text(m) for m in reversed(messages) if isinstance(m, dict) and m.get("role") == "user"), ""
+        )
+        language = detect_language(user_text)
+        if language:
+            self.language = language
+        text = normalise(user_text)
+        if not text:
+            return None
+
+        state = self.state
+        for route in ROUTES:
+            if route.stage != state.stage or route.question != state.last_question:
+                continue
+            if route.question is None and state.introduced:
+                continue
+            if route.known_name is not None and route.known_name != bool(self.customer_name):
+                continue
+            if route.stage == QUALIFICATION and state.last_answer != route.question:
+                continue  # not taken as an answer (confusion, or already past it)
+            match = INTENTS[route.intent].fullmatch(text)
+            if not match:
+                continue
+            lines = route.reply(state, match, self.customer_name)
+            if lines and self.language in lines:
+                return route.intent, lines[self.language]
+        return None
+
+    async def _say(self, reply: str) -> None:
+        await self.push_frame(LLMFullResponseStartFrame())
+        for i, sentence in enumerate(_SENTENCE_RE.split(reply)):
+            # One frame per sentence, like a streamed reply: each one can hit the phrase cache
+            await self.push_frame(LLMTextFrame(sentence if i == 0 else f" {sentence}"))
+        await self.push_frame(LLMFullResponseEndFrame())
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, LLMContextFrame) and self.enabled:
+            self.turns += 1
+            routed = self.route(frame.context.messages)
+            if routed:
+                intent, reply = routed
+                self.fast_turns += 1
+                self.intents[intent] += 1
+                logger.info(f"[ROUTER] Fast path: {intent} ({self.language}) -> {reply!r}")
+                await self._say(reply)
+                return
+        await self.push_frame(frame, direction)
+
+    def stats(self) -> Dict:
+        return {
+            "turns": self.turns,
+            "fast_turns": self.fast_turns,
+            "fast_share": round(self.fast_turns / self.turns, 3) if self.turns else None,
+            "intents": dict(self.intents),
+        }
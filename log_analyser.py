@@ -0,0 +1,341 @@
+# log_analyser.py
+"""
+Latency percentiles from the loguru output in logs/.
+
+Streams bot.log / server.log and their rotated archives (.zip as written by
+bot.py's loguru sink, or .gz) one line at a time, so memory grows with the
+number of measurements, not with the size of the logs. Lines are handled as
+bytes and filtered with substring checks before any regex runs. Most lines
+are audio and frame chatter and cost only those checks.
+
+What is collected, per call:
+- pipecat's frame_processor_metrics DEBUG lines: "<Service>#n TTFB: x" and
+  "<Service>#n processing time: x", named "<Service> ttfb" / "<Service> processing";
+- "[LATENCY] Turn n: x ms voice to voice" (metrics.TurnLatencyObserver);
+- "[TEARDOWN] Call ended in x ms" (call_teardown.CallTeardown).
+
+Calls are told apart by their PipelineTask. The "Linking ..." DEBUG lines at
+pipeline setup say which service instances belong to which task, so metrics
+from concurrent calls land on the right call. The "Runner ... finished
+running PipelineTask#n" line closes the call. Without DEBUG lines, the
+"Call connected" / "PipelineRunner finished for this call" INFO markers
+bound the calls, and lines go to the call opened last.
+
+Usage:
+    python -m log_analyser [logs/ ...] [--top 10] [--rank-by "OpenAILLMService ttfb"] [--json report.json]
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import re
+import sys
+import time
+import zipfile
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PERCENTILES = (50, 95, 99)
+
+_METRIC_RE = re.compile(rb"- (\w+)#(\d+) (TTFB|processing time): ([\d.eE+-]+)")
+_LINK_RE = re.compile(rb"Linking (\S+) -> (\S+)")
+_TASK_LINK_RE = re.compile(rb"Linking (PipelineTask#\d+)::Source")
+_RUNNER_DONE_RE = re.compile(rb"finished running (PipelineTask#\d+)")
+_CALL_ID_RE = re.compile(rb"'call_id': '([^']*)'")
+_LATENCY_RE = re.compile(rb"\[LATENCY\] Turn \d+: (\d+) ms voice to voice")
+_TEARDOWN_RE = re.compile(rb"\[TEARDOWN\] Call ended in (\d+) ms")
+_REASON_RE = re.compile(rb"(?:Bot is ending call\. Reason: |\[TEARDOWN\] Ending call, reason=)([\w-]+)")
+_TIMESTAMP_RE = re.compile(rb"^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\.\d{3}")
+
+_KINDS = {b"TTFB": "ttfb", b"processing time": "processing"}
+
+
+@dataclass
+class CallRecord:
+    index: int
+    started: str
+    call_id: str = ""
+    task: str = ""
+    ended: str = ""
+    end_reason: str = ""
+    connected: bool = False
+    client_hung_up: bool = False
+    source: str = ""
+    values: Dict[str, array] = field(default_factory=dict)
+
+    def add(self, name: str, value: float) -> None:
+        series = self.values.get(name)
+        if series is None:
+            series = self.values[name] = array("d")
+        series.append(value)
+
+
+def _timestamp(line: bytes) -> str:
+    match = _TIMESTAMP_RE.match(line)
+    return match.group(0).decode() if match else ""
+
+
+def _open_streams(path: str) -> Iterator[Tuple[str, io.BufferedIOBase]]:
+    """(name, binary stream) for a log file or each log inside an archive."""
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.namelist():
+                with archive.open(member) as stream:
+                    yield f"{path}:{member}", io.BufferedReader(stream, 1 << 20)
+    elif path.endswith(".gz"):
+        with gzip.open(path, "rb") as stream:
+            yield path, io.BufferedReader(stream, 1 << 20)
+    else:
+        with open(path, "rb", buffering=1 << 20) as stream:
+            yield path, stream
+
+
+def _first_timestamp(path: str) -> str:
+    try:
+        for _, stream in _open_streams(path):
+            return _timestamp(stream.readline())
+    except (OSError, zipfile.BadZipFile):
+        pass
+    return ""
+
+
+def find_logs(paths: List[str]) -> List[str]:
+    """Expand directories to their bot/server logs and archives, oldest first."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = [n for n in os.listdir(path) if ".log" in n]
+            # server.log repeats bot.py's INFO lines when both run in one process,
+            # so it is only read for a directory that has no bot logs
+            chosen = [n for n in names if n.startswith("bot")] or [n for n in names if n.startswith("server")]
+            files += [os.path.join(path, n) for n in chosen]
+        else:
+            files.append(path)
+    # Rotated archives are older than the live file; their first line says by how much
+    return sorted(files, key=lambda f: (_first_timestamp(f), f))
+
+
+class LogAnalyser:
+    def __init__(self):
+        self.calls: List[CallRecord] = []
+        self._open: Dict[str, CallRecord] = {}  # PipelineTask#n -> call
+        self._owners: Dict[bytes, CallRecord] = {}  # b"OpenAILLMService#3" -> call
+        self._linking: List[bytes] = []  # processors linked since the last task link
+        self._pending_call_id = ""
+        self._last: Optional[CallRecord] = None
+        self.lines = 0
+        self.bytes = 0
+        self.unattributed = 0
+
+    def _new_call(self, line: bytes, source: str) -> CallRecord:
+        call = CallRecord(index=len(self.calls), started=_timestamp(line), source=source)
+        call.call_id, self._pending_call_id = self._pending_call_id, ""
+        self.calls.append(call)
+        self._last = call
+        return call
+
+    def feed(self, stream: io.BufferedIOBase, source: str) -> None:
+        metric_search = _METRIC_RE.search
+        lines = size = 0
+        for line in stream:
+            lines += 1
+            size += len(line)
+            # Cheapest checks first: nearly every line is none of these
+            if b"_metrics:" in line:
+                if b"TTFB: " in line or b"processing time: " in line:
+                    match = metric_search(line)
+                    if match:
+                        self._metric(match)
+            elif b"Linking " in line:
+                self._link(line, source)
+            elif b"| bot:" in line or b"| call_teardown:" in line or b"| metrics:" in line:
+                self._bot_line(line, source)
+            elif b"finished running PipelineTask#" in line:
+                match = _RUNNER_DONE_RE.search(line)
+                if match:
+                    self._close(self._open.pop(match.group(1).decode(), None), line)
+        self.lines += lines
+        self.bytes += size
+
+    def _metric(self, match: "re.Match[bytes]") -> None:
+        service, number, kind, value = match.groups()
+        call = self._owners.get(service + b"#" + number) or self._last
+        if call is None:
+            self.unattributed += 1
+            return
+        call.add(f"{service.decode()} {_KINDS[kind]}", float(value))
+
+    def _link(self, line: bytes, source: str) -> None:
+        match = _TASK_LINK_RE.search(line)
+        if match is None:
+            match = _LINK_RE.search(line)
+            if match:
+                self._linking += [name for name in match.groups() if b"Pipeline" not in name]
+            return
+        task = match.group(1).decode()
+        call = self._new_call(line, source)
+        call.task = task
+        self._open[task] = call
+        for name in self._linking:
+            self._owners[name] = call
+        self._linking = []
+
+    def _bot_line(self, line: bytes, source: str) -> None:
+        if b"Call data from Exotel" in line:
+            match = _CALL_ID_RE.search(line)
+            self._pending_call_id = match.group(1).decode() if match else ""
+        elif b"Call connected with customer" in line:
+            # Follows the call's task link in DEBUG logs; starts the call in INFO-only ones
+            if self._last is None or self._last.connected or self._last.ended:
+                self._new_call(line, source)
+            self._last.connected = True
+        elif b"[LATENCY] Turn" in line:
+            match = _LATENCY_RE.search(line)
+            if match and self._last:
+                self._last.add("voice_to_voice", int(match.group(1)) / 1000)
+        elif b"[TEARDOWN] Call ended in" in line:
+            match = _TEARDOWN_RE.search(line)
+            if match and self._last:
+                self._last.add("teardown", int(match.group(1)) / 1000)
+        elif b"Client disconnected" in line:
+            if self._last:
+                self._last.client_hung_up = True
+        elif b"PipelineRunner finished for this call" in line:
+            # Only closes a call that no "finished running PipelineTask" line will
+            if self._last and not self._last.task and not self._last.ended:
+                self._close(self._last, line)
+        else:
+            match = _REASON_RE.search(line)
+            if match and self._last and not self._last.end_reason:
+                self._last.end_reason = match.group(1).decode()
+
+    def _close(self, call: Optional[CallRecord], line: bytes) -> None:
+        if call is None:
+            return
+        call.ended = _timestamp(line)
+        for name in [n for n, owner in self._owners.items() if owner is call]:
+            del self._owners[name]
+
+    def run(self, paths: List[str]) -> None:
+        for path in paths:
+            for source, stream in _open_streams(path):
+                self.feed(stream, source)
+
+
+def _percentile(ordered, pct: float) -> float:
+    """Nearest-rank percentile of a sorted sequence."""
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarise(values) -> Dict[str, float]:
+    ordered = sorted(values)
+    summary = {"count": len(ordered)}
+    for pct in PERCENTILES:
+        summary[f"p{pct}"] = round(_percentile(ordered, pct), 4)
+    summary["max"] = round(ordered[-1], 4)
+    return summary
+
+
+def build_report(analyser: LogAnalyser, rank_by: str, top: int) -> Dict:
+    merged: Dict[str, array] = {}
+    for call in analyser.calls:
+        for name, series in call.values.items():
+            merged.setdefault(name, array("d")).extend(series)
+
+    ranked = [c for c in analyser.calls if rank_by in c.values]
+    ranked.sort(key=lambda c: summarise(c.values[rank_by])["p95"], reverse=True)
+    slowest = []
+    for call in ranked[:top]:
+        slowest.append(
+            {
+                "started": call.started,
+                "ended": call.ended,
+                "call_id": call.call_id,
+                "task": call.task,
+                "end_reason": call.end_reason or ("client_hung_up" if call.client_hung_up else ""),
+                "source": call.source,
+                "metrics": {name: summarise(series) for name, series in sorted(call.values.items())},
+            }
+        )
+    return {
+        "lines": analyser.lines,
+        "bytes": analyser.bytes,
+        "calls": len(analyser.calls),
+        "unattributed_metrics": analyser.unattributed,
+        "metrics": {name: summarise(series) for name, series in sorted(merged.items())},
+        "rank_by": rank_by,
+        "slowest_calls": slowest,
+    }
+
+
+def format_report(report: Dict) -> str:
+    out = [
+        f"{report['calls']} calls, {report['lines']:,} lines ({report['bytes'] / 1e6:,.1f} MB)"
+        + (f", {report['unattributed_metrics']} metric lines outside any call" if report["unattributed_metrics"] else "")
+    ]
+    header = f"{'metric':<32} {'count':>7}" + "".join(f" {'p' + str(p):>8}" for p in PERCENTILES) + f" {'max':>8}"
+    out += ["", "Latency (seconds)", header]
+    for name, s in report["metrics"].items():
+        out.append(f"{name:<32} {s['count']:>7}" + "".join(f" {s['p' + str(p)]:>8.3f}" for p in PERCENTILES) + f" {s['max']:>8.3f}")
+
+    out += ["", f"Slowest calls by p95 {report['rank_by']}"]
+    if not report["slowest_calls"]:
+        out.append("  (no call has that metric)")
+    for n, call in enumerate(report["slowest_calls"], start=1):
+        ranked = call["metrics"][report["rank_by"]]
+        out.append(
+            f"{n:>3}. {call['started']}  call_id={call['call_id'] or '-'}  "
+            f"p95 {ranked['p95']:.3f}s  max {ranked['max']:.3f}s over {ranked['count']}"
+            + (f"  ended: {call['end_reason']}" if call["end_reason"] else "")
+        )
+        others = [
+            f"{name} p50 {s['p50']:.3f}"
+            for name, s in call["metrics"].items()
+            if name != report["rank_by"] and name.endswith(("ttfb", "voice_to_voice", "teardown"))
+        ]
+        if others:
+            out.append("       " + ", ".join(others))
+    return "\n".join(out)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=["logs"], help="log files, archives or directories (default: logs)")
+    parser.add_argument("--top", type=int, default=10, help="slowest calls to list")
+    parser.add_argument("--rank-by", default="OpenAILLMService ttfb", help='metric to rank calls by, e.g. "voice_to_voice"')
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON ('-' for stdout only)")
+    args = parser.parse_args(argv)
+
+    missing = [p for p in args.paths if not os.path.exists(p)]
+    if missing:
+        print(f"No such file or directory: {' '.join(missing)}", file=sys.stderr)
+        return 1
+    files = find_logs(args.paths)
+    if not files:
+        print(f"No logs found in {' '.join(args.paths)}", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    analyser = LogAnalyser()
+    analyser.run(files)
+    elapsed = time.perf_counter() - start
+    report = build_report(analyser, args.rank_by, args.top)
+
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return 0
+    print(format_report(report))
+    print(f"\n{len(files)} files in {elapsed:.2f} s ({report['bytes'] / 1e6 / max(elapsed, 1e-9):,.0f} MB/s)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"JSON report written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
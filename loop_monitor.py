@@ -0,0 +1,176 @@
+# loop_monitor.py
+"""
+Event-loop lag monitor.
+
+Every call's transport, pipeline and provider I/O share one asyncio loop,
+together with /start and the other endpoints. Anything that holds the loop
+for a while (a slow frame, a big JSON body, a sync call) delays audio for
+every call in the process, and the calls per process are capped by when
+that starts to happen.
+
+LoopLagMonitor sleeps LOOP_LAG_PROBE_SECS in a loop and records how late
+each wake-up is:
+- in voicebot_event_loop_lag_seconds on /metrics, labelled with how many
+  calls were in progress, so the lag can be read against the load;
+- for each call in progress (CallLoopLag), as a small histogram that
+  bot.py logs with the call's other stats ("[LOOP] Call stats");
+- in a rolling window that GET /capacity reports as p50/p99/max.
+A wake-up more than LOOP_LAG_WARN_SECS late is logged as a warning, at
+most once every LOOP_LAG_WARN_INTERVAL_SECS.
+
+The monitor starts with the server (or with the first call when the bot
+runs on its own). benchmarks/bench_audio_offload.py reads it.
+"""
+import asyncio
+import bisect
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Set
+
+import numpy as np
+from loguru import logger
+
+from metrics import EVENT_LOOP_LAG, LOOP_LAG_BUCKETS
+
+LOOP_LAG_PROBE_SECS = float(os.getenv("LOOP_LAG_PROBE_SECS", "0.05"))
+LOOP_LAG_WARN_SECS = float(os.getenv("LOOP_LAG_WARN_SECS", "0.1"))
+LOOP_LAG_WARN_INTERVAL_SECS = 10.0
+LOOP_LAG_RECENT_SECS = 60.0  # the window GET /capacity reports on
+
+# Bands for the "calls" label, so the series stay few
+_CALL_BANDS = ((0, "0"), (1, "1"), (2, "2-4"), (5, "5-9"), (10, "10-19"), (20, "20-39"), (40, "40+"))
+
+
+def _calls_label(calls: int) -> str:
+    label = "0"
+    for lowest, name in _CALL_BANDS:
+        if calls >= lowest:
+            label = name
+    return label
+
+
+def _ms(secs: float) -> float:
+    return round(secs * 1000, 1)
+
+
+class CallLoopLag:
+    """The lag samples taken while one call was in progress, as histogram counts."""
+
+    def __init__(self, monitor: "LoopLagMonitor"):
+        self._monitor = monitor
+        self.counts = [0] * (len(LOOP_LAG_BUCKETS) + 1)
+        self.samples = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, lag: float) -> None:
+        self.counts[bisect.bisect_left(LOOP_LAG_BUCKETS, lag)] += 1
+        self.samples += 1
+        self.total += lag
+        self.max = max(self.max, lag)
+
+    def finish(self) -> Dict:
+        """Stop tracking this call and return its summary."""
+        self._monitor.untrack(self)
+        return self.summary()
+
+    def summary(self) -> Dict:
+        # p99 as the bucket it falls in: the counts are all that is kept
+        p99 = None
+        cumulative = 0
+        for bound, count in zip(LOOP_LAG_BUCKETS + (float("inf"),), self.counts):
+            cumulative += count
+            if self.samples and cumulative >= 0.99 * self.samples:
+                p99 = bound
+                break
+        bounds = [f"{bound * 1000:g}" for bound in LOOP_LAG_BUCKETS] + ["+Inf"]
+        return {
+            "samples": self.samples,
+            "mean_ms": _ms(self.total / self.samples) if self.samples else None,
+            "p99_under_ms": (_ms(p99) if p99 != float("inf") else "+Inf") if p99 is not None else None,
+            "max_ms": _ms(self.max),
+            "histogram_ms": dict(zip(bounds, self.counts)),
+        }
+
+
+class LoopLagMonitor:
+    def __init__(self, probe_secs: float = LOOP_LAG_PROBE_SECS):
+        self.probe_secs = probe_secs
+        self.recent: Deque[float] = deque(maxlen=max(1, int(LOOP_LAG_RECENT_SECS / probe_secs)))
+        self._calls: Set[CallLoopLag] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._last_warning = 0.0
+        self.samples = 0
+        self.warnings = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def track_call(self) -> CallLoopLag:
+        """Start collecting lag for one call; call finish() on the result when it ends."""
+        self.start()
+        call = CallLoopLag(self)
+        self._calls.add(call)
+        return call
+
+    def untrack(self, call: CallLoopLag) -> None:
+        self._calls.discard(call)
+
+    def record(self, lag: float) -> None:
+        calls = len(self._calls)
+        EVENT_LOOP_LAG.observe(lag, calls=_calls_label(calls))
+        self.recent.append(lag)
+        self.samples += 1
+        for call in self._calls:
+            call.add(lag)
+        if lag >= LOOP_LAG_WARN_SECS:
+            now = time.monotonic()
+            if now - self._last_warning >= LOOP_LAG_WARN_INTERVAL_SECS:
+                self._last_warning = now
+                self.warnings += 1
+                logger.warning(f"[LOOP] Event loop {lag * 1000:.0f} ms late with {calls} calls in progress")
+
+    async def _run(self) -> None:
+        while True:
+            before = time.perf_counter()
+            await asyncio.sleep(self.probe_secs)
+            self.record(max(0.0, time.perf_counter() - before - self.probe_secs))
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        # A task left from a loop that has since closed never finishes; start over on this one
+        if not self.running or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict:
+        lags = np.array(self.recent) if self.recent else None
+        return {
+            "running": self.running,
+            "calls": len(self._calls),
+            "samples": self.samples,
+            "warnings": self.warnings,
+            "recent_p50_ms": _ms(float(np.percentile(lags, 50))) if lags is not None else None,
+            "recent_p99_ms": _ms(float(np.percentile(lags, 99))) if lags is not None else None,
+            "recent_max_ms": _ms(float(lags.max())) if lags is not None else None,
+        }
+
+
+_monitor: Optional[LoopLagMonitor] = None
+
+
+def get_loop_monitor() -> LoopLagMonitor:
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopLagMonitor()
+    return _monitor
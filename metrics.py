@@ -0,0 +1,401 @@
+# metrics.py
+"""
+Prometheus histograms and counters for GET /metrics.
+
+prometheus_client is not a dependency, so this is the small part of it the
+server needs: labelled histograms and counters rendered in the text
+exposition format.
+
+Per-turn latency (TurnLatencyObserver, one per call) is measured from the
+moment VAD says the user stopped speaking:
+
+- stt: until the final transcript (0 when a streaming STT finalised first);
+- llm: from there to the LLM's first token;
+- tts: from the first token to the TTS's first audio;
+- transport: from there until that audio has been written to Exotel.
+
+voicebot_turn_latency_seconds covers the whole span (voice to voice). The
+stages are recorded in voicebot_turn_stage_seconds. Both are labelled with
+the STT, LLM and TTS backends, and with the language of the transcript when
+the STT reports one.
+
+voicebot_event_loop_lag_seconds (loop_monitor.py) records how late the
+event loop runs, by the number of calls in progress.
+
+voicebot_calls_reaped_total (call_reaper.py) counts the calls ended for
+inactivity, by reason.
+
+With several server workers, a /metrics scrape lands on any one of them.
+So each worker writes its histograms to METRICS_DIR every METRICS_FLUSH_SECS,
+and /metrics adds up the other workers' files with its own live values.
+Files of workers that have exited (their PID is gone, or the file has not been
+refreshed for a few flush intervals) are left out. server.py sets METRICS_DIR
+up in multi-worker mode.
+"""
+import asyncio
+import bisect
+import json
+import math
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    LLMTextFrame,
+    OutputAudioRawFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    VADUserStoppedSpeakingFrame,
+)
+from pipecat.observers.base_observer import BaseObserver, FramePushed
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.services.llm_service import LLMService
+from pipecat.services.stt_service import STTService
+from pipecat.services.tts_service import TTSService
+from pipecat.transports.base_input import BaseInputTransport
+from pipecat.transports.base_output import BaseOutputTransport
+
+METRICS_FLUSH_SECS = float(os.getenv("METRICS_FLUSH_SECS", "5"))
+# A worker's snapshot older than this is from a worker uvicorn has replaced
+METRICS_STALE_SECS = 4 * METRICS_FLUSH_SECS
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+LOOP_LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+TURN_LABELS = ("stt", "llm", "tts", "language")
+
+
+def metrics_dir() -> str:
+    # Read on use: server.py sets it just before starting the workers. Blank means unset.
+    return os.getenv("METRICS_DIR") or ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_le(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else repr(float(bound))
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> [per-bucket counts..., sum]; counts are not cumulative here
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0.0] * (len(self.buckets) + 1)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+        _registry_changed()
+
+    def snapshot(self) -> List[list]:
+        return [[list(key), list(series)] for key, series in self._series.items()]
+
+    def render(self, others: Sequence[List[list]] = ()) -> str:
+        merged: Dict[Tuple[str, ...], List[float]] = {k: list(v) for k, v in self._series.items()}
+        for snapshot in others:
+            for key, series in snapshot:
+                if len(series) != len(self.buckets) + 1:
+                    continue  # written with other buckets (older build); skip it
+                into = merged.setdefault(tuple(key), [0.0] * len(series))
+                for i, v in enumerate(series):
+                    into[i] += v
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key in sorted(merged):
+            series = merged[key]
+            labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key))
+            prefix = labels + "," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += int(count)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{_format_le(bound)}"}} {cumulative}')
+            braces = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{braces} {series[-1]!r}")
+            lines.append(f"{self.name}_count{braces} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # label values -> [value]; a list so snapshots look like a histogram's
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        self._series.setdefault(key, [0.0])[0] += amount
+        _registry_changed()
+
+    def snapshot(self) -> List[list]:
+        return [[list(key), list(series)] for key, series in self._series.items()]
+
+    def render(self, others: Sequence[List[list]] = ()) -> str:
+        merged: Dict[Tuple[str, ...], float] = {k: v[0] for k, v in self._series.items()}
+        for snapshot in others:
+            for key, series in snapshot:
+                if len(series) == 1:
+                    merged[tuple(key)] = merged.get(tuple(key), 0.0) + series[0]
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key in sorted(merged):
+            labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key))
+            braces = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}{braces} {merged[key]!r}")
+        return "\n".join(lines) + "\n"
+
+
+TURN_LATENCY = Histogram(
+    "voicebot_turn_latency_seconds",
+    "Time from the user stopping speaking (VAD) to the bot's first audio written to Exotel.",
+    TURN_LABELS,
+)
+TURN_STAGE = Histogram(
+    "voicebot_turn_stage_seconds",
+    "Per-turn latency by stage: stt, llm, tts, transport.",
+    ("stage",) + TURN_LABELS,
+)
+CALL_TEARDOWN = Histogram(
+    "voicebot_call_teardown_seconds",
+    "Time from the bot deciding to end a call until its pipeline stopped.",
+    buckets=(0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 10.0, 15.0),
+)
+EVENT_LOOP_LAG = Histogram(
+    "voicebot_event_loop_lag_seconds",
+    "How late the event loop woke up from a short sleep (loop_monitor.py), by calls in progress.",
+    ("calls",),
+    buckets=LOOP_LAG_BUCKETS,
+)
+CALLS_REAPED = Counter(
+    "voicebot_calls_reaped_total",
+    "Calls ended for inactivity (call_reaper.py): no_first_speech, silence or max_duration.",
+    ("reason",),
+)
+_REGISTRY = (TURN_LATENCY, TURN_STAGE, CALL_TEARDOWN, EVENT_LOOP_LAG, CALLS_REAPED)
+
+_dirty = False
+_flusher_task: Optional[asyncio.Task] = None
+
+
+def _registry_changed() -> None:
+    global _dirty
+    _dirty = True
+
+
+def _snapshot_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"{pid}.json")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by someone else
+    return True
+
+
+def _read_other_workers(directory: str) -> List[Dict[str, List[list]]]:
+    own = os.path.basename(_snapshot_path(directory, os.getpid()))
+    snapshots = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return snapshots
+    now = time.time()
+    for name in names:
+        if not name.endswith(".json") or name == own:
+            continue
+        path = os.path.join(directory, name)
+        try:
+            # A restarted worker's file would otherwise be summed forever
+            pid = int(name[: -len(".json")])
+            if not _pid_alive(pid) or now - os.path.getmtime(path) > METRICS_STALE_SECS:
+                continue
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning(f"[METRICS] Skipping unreadable snapshot {name}: {e}")
+    return snapshots
+
+
+def render_metrics() -> str:
+    """The text for GET /metrics: this process, plus the other workers when METRICS_DIR is set."""
+    directory = metrics_dir()
+    others = _read_other_workers(directory) if directory else []
+    return "".join(h.render([s[h.name] for s in others if h.name in s]) for h in _REGISTRY)
+
+
+def _take_snapshot() -> Optional[Dict[str, List[list]]]:
+    global _dirty
+    if not metrics_dir() or not _dirty:
+        return None
+    _dirty = False
+    return {h.name: h.snapshot() for h in _REGISTRY}
+
+
+def _write_snapshot(snapshot: Dict[str, List[list]]) -> None:
+    path = _snapshot_path(metrics_dir(), os.getpid())
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def _touch_snapshot() -> None:
+    # Nothing changed: refresh the mtime so other workers still count this file
+    try:
+        os.utime(_snapshot_path(metrics_dir(), os.getpid()))
+    except FileNotFoundError:
+        pass  # nothing recorded yet
+
+
+def flush_metrics() -> None:
+    """Write this worker's histograms to METRICS_DIR (no-op without one or without changes)."""
+    snapshot = _take_snapshot()
+    if snapshot is not None:
+        _write_snapshot(snapshot)
+
+
+async def _flush_forever() -> None:
+    while True:
+        await asyncio.sleep(METRICS_FLUSH_SECS)
+        # Copy on the loop, where observe() runs; only the file write goes to a thread
+        snapshot = _take_snapshot()
+        try:
+            if snapshot is None:
+                await asyncio.to_thread(_touch_snapshot)
+            else:
+                await asyncio.to_thread(_write_snapshot, snapshot)
+        except OSError as e:
+            logger.warning(f"[METRICS] Flush failed: {e}")
+
+
+def start_metrics_flusher() -> None:
+    """Start writing this worker's snapshot to METRICS_DIR. Called from the server lifespan."""
+    global _flusher_task
+    if metrics_dir() and (_flusher_task is None or _flusher_task.done()):
+        os.makedirs(metrics_dir(), exist_ok=True)
+        _flusher_task = asyncio.create_task(_flush_forever())
+
+
+async def stop_metrics_flusher() -> None:
+    global _flusher_task
+    if _flusher_task is not None:
+        _flusher_task.cancel()
+        try:
+            await _flusher_task
+        except asyncio.CancelledError:
+            pass
+        _flusher_task = None
+        try:
+            flush_metrics()
+        except OSError as e:
+            logger.warning(f"[METRICS] Final flush failed: {e}")
+
+
+def _language_label(language) -> str:
+    """"hi-IN" / Language.HI_IN -> "hi"; keeps the label's values few."""
+    value = str(getattr(language, "value", language))
+    return value.split("-")[0].lower() or "unknown"
+
+
+class TurnLatencyObserver(BaseObserver):
+    """Per-call voice-to-voice timing for each user turn, recorded into TURN_LATENCY / TURN_STAGE."""
+
+    def __init__(self, stt: str, llm: str, tts: str, **kwargs):
+        super().__init__(**kwargs)
+        self._backends = {"stt": stt, "llm": llm, "tts": tts}
+        self._reset()
+        self.turns: List[Dict[str, float]] = []
+
+    def _reset(self) -> None:
+        self._stopped_at: Optional[float] = None  # VAD stop that opened the turn
+        self._transcript_at: Optional[float] = None
+        self._llm_at: Optional[float] = None
+        self._tts_at: Optional[float] = None
+        self._language: Optional[str] = None
+
+    async def on_push_frame(self, data: FramePushed):
+        frame = data.frame
+        source = data.source
+        at = data.timestamp / 1e9  # pipeline clock, so queueing in the observer doesn't count
+
+        if isinstance(frame, VADUserStoppedSpeakingFrame):
+            if isinstance(source, BaseInputTransport):
+                # A later stop before the bot answered means the user went on
+                # speaking; the turn is timed from their last stop.
+                self._stopped_at = at
+                self._llm_at = self._tts_at = None
+        elif isinstance(frame, TranscriptionFrame):
+            if isinstance(source, STTService) and self._llm_at is None:
+                # Streaming STT can finalise before the VAD stop; keep the last one
+                self._transcript_at = at
+                if frame.language:
+                    self._language = _language_label(frame.language)
+        elif self._stopped_at is None:
+            return
+        elif isinstance(frame, LLMTextFrame):
+            if isinstance(source, LLMService) and self._llm_at is None:
+                self._llm_at = at
+        elif isinstance(frame, TTSAudioRawFrame) and isinstance(source, TTSService):
+            if self._tts_at is None and self._llm_at is not None:
+                self._tts_at = at
+        elif isinstance(frame, OutputAudioRawFrame):
+            if (
+                isinstance(source, BaseOutputTransport)
+                and data.direction == FrameDirection.DOWNSTREAM
+                and self._tts_at is not None
+            ):
+                self._record(at)
+
+    def _record(self, sent_at: float) -> None:
+        stopped = self._stopped_at
+        heard = max(stopped, self._transcript_at) if self._transcript_at is not None else stopped
+        stages = {
+            "stt": heard - stopped,
+            "llm": self._llm_at - heard,
+            "tts": self._tts_at - self._llm_at,
+            "transport": sent_at - self._tts_at,
+        }
+        labels = dict(self._backends, language=self._language or "unknown")
+        total = sent_at - stopped
+        TURN_LATENCY.observe(total, **labels)
+        for stage, secs in stages.items():
+            TURN_STAGE.observe(secs, stage=stage, **labels)
+
+        self.turns.append({"total": total, **stages})
+        logger.info(
+            f"[LATENCY] Turn {len(self.turns)}: {total * 1000:.0f} ms voice to voice ("
+            + ", ".join(f"{stage} {secs * 1000:.0f}" for stage, secs in stages.items())
+            + f" ms), language={labels['language']}"
+        )
+        language = self._language
+        self._reset()
+        self._language = language  # most turns stay in the call's language
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        totals = sorted(t["total"] for t in self.turns)
+        return {
+            "turns": len(totals),
+            "median_ms": round(totals[len(totals) // 2] * 1000) if totals else None,
+            "max_ms": round(totals[-1] * 1000) if totals else None,
+        }
@@ -0,0 +1,183 @@
+# prompt_context.py
+"""
+LLM context layout for prompt caching.
+
+OpenAI caches the longest prompt prefix it has seen recently, in 128-token
+steps, so everything that is the same for every call has to come first and
+be byte-identical: the static system prompt from config.py, then the tools
+schema. Both are built once at import. Everything per call (the known
+customer name, then the conversation) goes after them.
+
+build_call_context() also gives each call its own message list. LLMContext
+keeps the list it is given, so passing config.messages directly would let
+one call's turns leak into the next call's prompt.
+
+PromptCacheObserver records cached versus uncached prompt tokens for every
+LLM turn from the usage metrics (enable_usage_metrics=True).
+"""
+import hashlib
+import json
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from loguru import logger
+
+from pipecat.adapters.schemas.function_schema import FunctionSchema
+from pipecat.adapters.schemas.tools_schema import ToolsSchema
+from pipecat.frames.frames import MetricsFrame
+from pipecat.metrics.metrics import LLMUsageMetricsData
+from pipecat.observers.base_observer import BaseObserver, FramePushed
+from pipecat.processors.aggregators.llm_context import LLMContext
+
+from config import messages as _config_messages
+
+STATIC_SYSTEM_PROMPT: str = _config_messages[0]["content"]
+
+END_CALL_TOOL = FunctionSchema(
+    name="end_call",
+    description=(
+        "CRITICAL: End the phone call immediately. You MUST use this function when:\n"
+        "1. You say goodbye to the customer\n"
+        "2. Customer says goodbye or not interested\n"
+        "3. Conversation is complete (all details collected and confirmed)\n"
+        "4. Wrong person answered\n"
+        "NEVER say goodbye without calling this function."
+    ),
+    properties={
+        "reason": {
+            "type": "string",
+            "description": (
+                "Reason for ending the call "
+                "(e.g., 'customer_not_interested', "
+                "'conversation_complete', 'customer_goodbye', 'wrong_person')"
+            ),
+        }
+    },
+    required=["reason"],
+)
+
+TOOLS = ToolsSchema(standard_tools=[END_CALL_TOOL])
+
+
+def static_prefix_fingerprint(system_prompt: str = STATIC_SYSTEM_PROMPT) -> str:
+    """Hash of a shared prefix (system prompt + tools), logged at startup so a
+    change that breaks caching across deploys or workers shows up as a different value."""
+    prefix = json.dumps(
+        {"system": system_prompt, "tools": [t.to_default_dict() for t in TOOLS.standard_tools]},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:12]
+
+
+def prefix_fingerprints(prompt_mode: str) -> Dict[str, str]:
+    """
+    The fingerprint of each prefix the LLM actually receives: the full prompt,
+    or with PROMPT_MODE=staged one per compiled stage prompt.
+    """
+    if prompt_mode != "staged":
+        return {"full": static_prefix_fingerprint()}
+    # Imported here: conversation_state builds its stage prompts from this module
+    from conversation_state import STAGE_PROMPTS
+
+    return {f"stage {stage}": static_prefix_fingerprint(prompt) for stage, prompt in STAGE_PROMPTS.items()}
+
+
+def customer_name_message(customer_name: str) -> Dict[str, str]:
+    return {
+        "role": "system",
+        "content": f"""
+    You already know the customer's name is "{customer_name}" from the dialer.
+
+    SPECIAL RULES WHEN NAME IS KNOWN:
+
+    - You STILL MUST wait for the customer to say something first (e.g. "Hello?", "Yes", "Haan", "Bolo", etc.).
+    - On your VERY FIRST reply after the customer speaks, you MUST:
+    1) Greet them, and
+    2) Explicitly CONFIRM the name with EXACTLY ONE short question, for example:
+
+    English:
+    - "Hello, am I speaking with {customer_name}?"
+
+    Hindi:
+    - "Hello, kya main {customer_name} se baat kar rahi hoon?"
+
+    Telugu:
+    - "Hello, nenu {customer_name} garitho maatladutunnaana?"
+
+    - Do NOT ask "What is your name?" or "May I know your name?" when you already know {customer_name}.
+    - Treat this as STAGE 1 - NAME VERIFICATION:
+    - If they clearly confirm ("Yes", "Haan", "Speaking", "This is {customer_name}", etc.):
+        → Briefly acknowledge (e.g. "Nice to speak with you, {customer_name}.")
+        → IMMEDIATELY move to the INTEREST CHECK (Stage 2 in the main instructions):
+            e.g. "Would you be interested in hearing about our loan options?"
+    - If they clearly say it's the WRONG PERSON or WRONG NUMBER:
+        → Say a short apology and goodbye:
+            e.g. "I'm sorry for the inconvenience. Goodbye."
+        → Then IMMEDIATELY call end_call with reason "wrong_person".
+
+    - After this first confirmation:
+    - Do NOT re-introduce yourself again ("I'm Shruti from Digi Loans") later in the call.
+    - Do NOT repeatedly confirm their name again unless they themselves are confused.
+    """,
+    }
+
+
+def build_call_context(customer_name: str = "") -> LLMContext:
+    """
+    A fresh context for one call: [static prompt] + tools, then the
+    per-call messages. Only the static part is shared between calls.
+    """
+    call_messages: List[Dict[str, str]] = [{"role": "system", "content": STATIC_SYSTEM_PROMPT}]
+    if customer_name:
+        call_messages.append(customer_name_message(customer_name))
+    return LLMContext(call_messages, tools=TOOLS, tool_choice="auto")
+
+
+# A MetricsFrame is seen once per processor it passes, all within its own turn,
+# and there is one usage frame per turn: the last few ids are enough to count each once
+_FRAMES_SEEN_MAX = 32
+
+
+class PromptCacheObserver(BaseObserver):
+    """Per-call record of cached vs uncached prompt tokens on each LLM turn."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._frames_seen: Deque[int] = deque(maxlen=_FRAMES_SEEN_MAX)
+        self.turns: List[Dict[str, int]] = []
+
+    async def on_push_frame(self, data: FramePushed):
+        frame = data.frame
+        if not isinstance(frame, MetricsFrame) or frame.id in self._frames_seen:
+            return
+        usages = [metrics for metrics in frame.data if isinstance(metrics, LLMUsageMetricsData)]
+        if not usages:
+            return
+        self._frames_seen.append(frame.id)
+
+        for metrics in usages:
+            usage = metrics.value
+            cached = usage.cache_read_input_tokens or 0
+            turn = {
+                "prompt_tokens": usage.prompt_tokens,
+                "cached_tokens": cached,
+                "uncached_tokens": usage.prompt_tokens - cached,
+                "completion_tokens": usage.completion_tokens,
+            }
+            self.turns.append(turn)
+            logger.info(
+                f"[PROMPT_CACHE] Turn {len(self.turns)}: {cached}/{usage.prompt_tokens} prompt tokens cached "
+                f"({turn['uncached_tokens']} uncached, {usage.completion_tokens} completion)"
+            )
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        prompt = sum(t["prompt_tokens"] for t in self.turns)
+        cached = sum(t["cached_tokens"] for t in self.turns)
+        return {
+            "turns": len(self.turns),
+            "prompt_tokens": prompt,
+            "cached_tokens": cached,
+            "uncached_tokens": prompt - cached,
+            "cached_ratio": round(cached / prompt, 3) if prompt else None,
+        }
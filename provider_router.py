@@ -0,0 +1,327 @@
+# provider_router.py
+"""
+Hedged requests and automatic failover between STT and LLM providers.
+
+Every call used one provider per stage, so a slow provider slowed every
+live call at once. In the logs, gpt-4o-transcribe often takes over 1 s.
+
+ProviderRouter runs one request across a primary and a secondary provider:
+- it keeps a rolling window of each provider's latency (the time to the
+  transcript for STT, to the first streamed chunk for the LLM);
+- it sends the request to the primary first. If no answer arrives within
+  the primary's rolling p95, it sends the same request to the secondary
+  (a hedge), and the first answer wins. The other request is cancelled;
+- if a provider fails, the other one gets the request straight away;
+- a provider that failed, or lost a hedge race, in PROVIDER_EJECT_RATIO of
+  its last PROVIDER_HEALTH_WINDOW requests leaves rotation for
+  PROVIDER_COOLDOWN_SECS. The other provider takes its place and is not
+  hedged meanwhile. After the cooldown the provider is tried again.
+
+Until a provider has enough samples, it hedges after HEDGE_DEFAULT_SECS.
+It never hedges sooner than HEDGE_MIN_SECS, so a fast provider's jitter
+does not double the traffic. At the p95, about one request in twenty is
+hedged.
+
+Routers are process-wide, one per stage, so what one call learns about a
+provider applies to every call.
+- HedgedOpenAILLMService hedges gpt-4o with LLM_FALLBACK_MODEL, which is
+  gpt-4o-mini by default. It can use another endpoint via
+  LLM_FALLBACK_BASE_URL and LLM_FALLBACK_API_KEY.
+- HedgedWhisperSTTService hedges a segmented STT backend (openai, groq)
+  with STT_FALLBACK_BACKEND.
+TTS is not hedged: a second provider would speak in another voice
+mid-call. The phrase cache covers the scripted lines.
+
+Hedging is off unless PROVIDER_HEDGING=1: it sends some turns to a
+different (by default weaker) model and raises provider spend, so a
+deployment opts in. GET /capacity
+reports each router's counters. benchmarks/bench_provider_router.py runs
+it against local fakes with injected delay.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+from loguru import logger
+
+from pipecat.services.whisper.base_stt import BaseWhisperSTTService
+
+from client_pool import PooledOpenAILLMService, get_provider_pool
+
+PROVIDER_HEDGING = os.getenv("PROVIDER_HEDGING", "0") == "1"
+HEDGE_MIN_SECS = float(os.getenv("HEDGE_MIN_SECS", "0.3"))
+HEDGE_DEFAULT_SECS = float(os.getenv("HEDGE_DEFAULT_SECS", "1.5"))
+PROVIDER_LATENCY_WINDOW = int(os.getenv("PROVIDER_LATENCY_WINDOW", "100"))
+PROVIDER_HEALTH_WINDOW = int(os.getenv("PROVIDER_HEALTH_WINDOW", "20"))
+PROVIDER_EJECT_RATIO = float(os.getenv("PROVIDER_EJECT_RATIO", "0.5"))
+PROVIDER_COOLDOWN_SECS = float(os.getenv("PROVIDER_COOLDOWN_SECS", "30"))
+MIN_SAMPLES = 10  # latencies needed before the p95 is trusted
+MIN_OUTCOMES = 5  # requests needed before a provider can be taken out
+
+T = TypeVar("T")
+
+
+class ProviderHealth:
+    """One provider's rolling latency and recent outcomes."""
+
+    def __init__(self, name: str, latency_window: int = PROVIDER_LATENCY_WINDOW):
+        self.name = name
+        self.latencies: Deque[float] = deque(maxlen=latency_window)
+        self.outcomes: Deque[bool] = deque(maxlen=PROVIDER_HEALTH_WINDOW)  # False: failed or lost a race
+        self.out_until = 0.0
+        self.requests = 0
+        self.wins = 0
+        self.failures = 0
+        self.ejections = 0
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < MIN_SAMPLES:
+            return None
+        return float(np.percentile(self.latencies, 95))
+
+    def hedge_delay(self) -> float:
+        p95 = self.p95()
+        return max(HEDGE_MIN_SECS, HEDGE_DEFAULT_SECS if p95 is None else p95)
+
+    def in_rotation(self, now: float) -> bool:
+        return now >= self.out_until
+
+    def record(self, ok: bool, latency: Optional[float] = None) -> None:
+        if latency is not None:
+            self.latencies.append(latency)
+        self.outcomes.append(ok)
+        bad = self.outcomes.count(False)
+        if len(self.outcomes) >= MIN_OUTCOMES and bad >= PROVIDER_EJECT_RATIO * len(self.outcomes):
+            self.out_until = time.monotonic() + PROVIDER_COOLDOWN_SECS
+            self.ejections += 1
+            # It comes back with a clean slate; its latencies are kept
+            self.outcomes.clear()
+            logger.warning(
+                f"[ROUTER] {self.name} out of rotation for {PROVIDER_COOLDOWN_SECS:g}s "
+                f"({bad} bad of its last requests, p95 {self.p95()})"
+            )
+
+    def stats(self) -> Dict:
+        p95 = self.p95()
+        return {
+            "requests": self.requests,
+            "wins": self.wins,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "p95_secs": round(p95, 3) if p95 is not None else None,
+            "in_rotation": self.in_rotation(time.monotonic()),
+        }
+
+
+class ProviderRouter:
+    """Runs each request on the healthiest provider, hedging with the next one past its p95."""
+
+    def __init__(self, stage: str, providers: Sequence[str]):
+        self.stage = stage
+        self.providers: Dict[str, ProviderHealth] = {name: ProviderHealth(name) for name in providers}
+        self.requests = 0
+        self.hedged = 0
+        self.hedges_won = 0
+        self.failovers = 0
+
+    def order(self, names: Sequence[str]) -> List[str]:
+        """The providers to try, in preference order; ones out of rotation only if nothing else is left."""
+        now = time.monotonic()
+        healthy = [name for name in names if self.providers[name].in_rotation(now)]
+        return healthy or list(names)
+
+    async def run(
+        self,
+        attempts: Sequence[Tuple[str, Callable[[], Awaitable[T]]]],
+        discard: Optional[Callable[[T], Awaitable[None]]] = None,
+    ) -> T:
+        """
+        Await the first successful attempt: the primary, hedged with the next
+        provider past its p95. Other attempts that succeed anyway (finished in
+        the same wait, or before their cancel landed) are passed to discard.
+        """
+        self.requests += 1
+        factories = dict(attempts)
+        queue = self.order([name for name, _ in attempts])
+        running: Dict[asyncio.Task, Tuple[str, float]] = {}
+        error: Optional[BaseException] = None
+
+        def _start(name: str) -> None:
+            self.providers[name].requests += 1
+            running[asyncio.ensure_future(factories[name]())] = (name, time.monotonic())
+
+        primary = queue.pop(0)
+        _start(primary)
+        try:
+            hedge_at = time.monotonic() + self.providers[primary].hedge_delay()
+            while running:
+                timeout = max(0.0, hedge_at - time.monotonic()) if queue else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Past the primary's p95 with no answer: hedge
+                    self.hedged += 1
+                    _start(queue.pop(0))
+                    continue
+                for task in done:
+                    name, started = running.pop(task)
+                    health = self.providers[name]
+                    if task.exception() is not None:
+                        error = task.exception()
+                        health.failures += 1
+                        health.record(False)
+                        logger.warning(f"[ROUTER] {self.stage} request to {name} failed: {error}")
+                        if queue and not running:
+                            self.failovers += 1
+                            _start(queue.pop(0))
+                        continue
+                    latency = time.monotonic() - started
+                    health.wins += 1
+                    health.record(True, latency)
+                    if name != primary:
+                        self.hedges_won += 1
+                    for loser, (loser_name, loser_started) in running.items():
+                        loser.cancel()
+                        if loser_started <= started:
+                            # Had a head start and still lost: at least this slow
+                            self.providers[loser_name].record(False, time.monotonic() - loser_started)
+                    return task.result()
+            raise error if error is not None else RuntimeError(f"no {self.stage} provider answered")
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                results = await asyncio.gather(*running, return_exceptions=True)
+                for result in results:
+                    if discard is not None and not isinstance(result, BaseException):
+                        try:
+                            await discard(result)
+                        except Exception as e:
+                            logger.warning(f"[ROUTER] Could not release a losing {self.stage} result: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedges_won": self.hedges_won,
+            "failovers": self.failovers,
+            "providers": {name: health.stats() for name, health in self.providers.items()},
+        }
+
+
+_routers: Dict[str, ProviderRouter] = {}
+
+
+def get_provider_router(stage: str, providers: Sequence[str]) -> ProviderRouter:
+    """The process-wide router for a stage ("llm", "stt"); new providers are added as they appear."""
+    router = _routers.get(stage)
+    if router is None:
+        router = _routers[stage] = ProviderRouter(stage, providers)
+    for name in providers:
+        router.providers.setdefault(name, ProviderHealth(name))
+    return router
+
+
+def provider_router_stats() -> Dict:
+    return {stage: router.stats() for stage, router in _routers.items()}
+
+
+def _endpoint(client) -> str:
+    url = client.base_url
+    return f"{url.host}:{url.port}" if url.port else url.host
+
+
+class _PrefetchedStream:
+    """A chat completion stream whose first chunk has already been read."""
+
+    def __init__(self, first, stream):
+        self._first = first
+        self._stream = stream
+
+    async def close(self) -> None:
+        await self._stream.close()
+
+    async def __aiter__(self):
+        yield self._first
+        async for chunk in self._stream:
+            yield chunk
+
+
+class HedgedOpenAILLMService(PooledOpenAILLMService):
+    """PooledOpenAILLMService whose completions race a fallback model when the primary is slow."""
+
+    def __init__(
+        self,
+        *,
+        fallback_model: Optional[str] = None,
+        fallback_base_url: Optional[str] = None,
+        fallback_api_key: Optional[str] = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._fallback_model = fallback_model or os.getenv("LLM_FALLBACK_MODEL", "gpt-4o-mini")
+        self._fallback_client = get_provider_pool().openai_client(
+            fallback_api_key or os.getenv("LLM_FALLBACK_API_KEY") or kwargs.get("api_key"),
+            fallback_base_url or os.getenv("LLM_FALLBACK_BASE_URL") or kwargs.get("base_url"),
+        )
+        self._primary_name = f"{self.model_name}@{_endpoint(self._client)}"
+        self._fallback_name = f"{self._fallback_model}@{_endpoint(self._fallback_client)}"
+        self._router = get_provider_router("llm", [self._primary_name, self._fallback_name])
+
+    async def _first_chunk(self, client, params: dict) -> _PrefetchedStream:
+        stream = await client.chat.completions.create(**params)
+        try:
+            first = await stream.__anext__()
+        except BaseException:
+            await stream.close()
+            raise
+        return _PrefetchedStream(first, stream)
+
+    async def get_chat_completions(self, params_from_context):
+        params = self.build_chat_completion_params(params_from_context)
+        fallback_params = {**params, "model": self._fallback_model}
+        return await self._router.run(
+            [
+                (self._primary_name, lambda: self._first_chunk(self._client, params)),
+                (self._fallback_name, lambda: self._first_chunk(self._fallback_client, fallback_params)),
+            ],
+            # A losing stream that had its first chunk too: close it, or its HTTP response stays open
+            discard=_PrefetchedStream.close,
+        )
+
+
+class HedgedWhisperSTTService(BaseWhisperSTTService):
+    """Transcribes each utterance with a primary Whisper-API service, hedged with a secondary one."""
+
+    def __init__(self, primary: BaseWhisperSTTService, secondary: BaseWhisperSTTService, **kwargs):
+        self._primary = primary
+        self._secondary = secondary
+        super().__init__(
+            model=primary.model_name,
+            prompt=primary._prompt,
+            temperature=primary._temperature,
+            **kwargs,
+        )
+        self._language = primary._language
+        self._router = get_provider_router("stt", [self.primary_name, self.secondary_name])
+
+    @property
+    def primary_name(self) -> str:
+        return f"{self._primary.model_name}@{_endpoint(self._primary._client)}"
+
+    @property
+    def secondary_name(self) -> str:
+        return f"{self._secondary.model_name}@{_endpoint(self._secondary._client)}"
+
+    def _create_client(self, api_key: Optional[str], base_url: Optional[str]):
+        return None  # the wrapped services bring their own
+
+    async def _transcribe(self, audio: bytes):
+        return await self._router.run(
+            [
+                (self.primary_name, lambda: self._primary._transcribe(audio)),
+                (self.secondary_name, lambda: self._secondary._transcribe(audio)),
+            ]
+        )
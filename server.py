@@ -1,15 +1,31 @@
 # server.py
+import asyncio
 import os
+import tempfile
 from contextlib import asynccontextmanager
+from urllib.parse import urlencode
 import aiohttp
 import uvicorn
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from loguru import logger
 
-from call_memory import add_outbound_call  # ✅ NEW
+# Load .env first: the local modules below read their settings at import time.
+# No override: --workers sets CALL_STORE_BACKEND/METRICS_DIR for the worker
+# processes, which import this module again and must not lose them to .env.
+load_dotenv()
+
+from call_memory import add_outbound_call, new_call_ref, start_sweeper, stop_sweeper
+from call_reaper import reaper_stats
+from call_teardown import teardown_stats
+from capacity import CapacityFull, get_capacity_manager
+from loop_monitor import get_loop_monitor
+from metrics import render_metrics, start_metrics_flusher, stop_metrics_flusher
+from campaigns import EXOTEL_CALLS_PER_SECOND, CampaignManager, TokenBucket, set_campaign_manager
+from tts_cache import TTS_CACHE_PREWARM, get_phrase_cache, prewarm_phrase_cache
+from warmup import WarmUp
 
 LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
@@ -25,7 +41,10 @@ logger.add(
     level="INFO",
 )
 
-load_dotenv(override=True)
+# Regional clusters (e.g. https://api.in.exotel.com) or a local fake for tests
+EXOTEL_API_BASE = os.getenv("EXOTEL_API_BASE", "https://api.exotel.com").rstrip("/")
+# The /ws URL handed out by GET /exotel/stream-url; blank means this host's /ws
+EXOTEL_STREAM_URL = os.getenv("EXOTEL_STREAM_URL") or ""
 
 
 async def make_exotel_call(
@@ -33,6 +52,7 @@ async def make_exotel_call(
     to_number: str,
     from_number: str,
     customer_name: str | None = "",
+    call_ref: str = "",
 ):
     """Make an outbound call using Exotel's Connect API."""
     api_key = os.getenv("EXOTEL_API_KEY")
@@ -42,7 +62,7 @@ async def make_exotel_call(
     if not all([api_key, api_token, sid]):
         raise ValueError("Missing Exotel credentials: EXOTEL_API_KEY, EXOTEL_API_TOKEN, EXOTEL_SID")
 
-    url = f"https://api.exotel.com/v1/Accounts/{sid}/Calls/connect"
+    url = f"{EXOTEL_API_BASE}/v1/Accounts/{sid}/Calls/connect"
 
     data = {
         "From": from_number,
@@ -51,10 +71,10 @@ async def make_exotel_call(
         "CallType": "trans",
     }
 
-    if customer_name:
-        # Even if Media Streams doesn't echo this yet, keep it for future.
-        data["CustomField"] = customer_name
-        logger.info(f"[EXOTEL] Sending CustomField with customer_name={customer_name!r}")
+    if call_ref:
+        # Exotel passes CustomField to GET /exotel/stream-url, which puts it in the /ws URL
+        data["CustomField"] = call_ref
+        logger.info(f"[EXOTEL] Sending CustomField with call_ref={call_ref!r}")
 
     auth = aiohttp.BasicAuth(api_key, api_token)
 
@@ -77,10 +97,107 @@ async def make_exotel_call(
         return {"status": "call_initiated", "call_sid": call_sid}
 
 
+def prerender_greeting_later(app: FastAPI, call_sid: str, phone_number: str, customer_name: str) -> None:
+    """Render the call's greeting in the background while the phone rings (greeting.py)."""
+    # Imported here, not at the top: it pulls in the call path's heavy modules
+    from greeting import GREETING_PRERENDER, prerender_greeting
+
+    if not (GREETING_PRERENDER and customer_name):
+        return
+    task = asyncio.create_task(prerender_greeting(app.state.session, call_sid, phone_number, customer_name))
+    app.state.greeting_tasks.add(task)
+    task.add_done_callback(app.state.greeting_tasks.discard)
+
+
+async def dial_campaign_lead(app: FastAPI, phone_number: str, customer_name: str, campaign_id: str) -> str:
+    """Place one campaign call and register its context, like /start does."""
+    capacity = get_capacity_manager()
+    # Campaigns are a backlog anyway: wait for a free slot instead of failing.
+    # The rate token comes after the slot, as in /start, so none is spent waiting.
+    slot = await capacity.reserve_blocking()
+    call_ref = new_call_ref()
+    try:
+        await app.state.exotel_limiter.acquire()
+        call_result = await make_exotel_call(
+            session=app.state.session,
+            to_number=phone_number,
+            from_number=os.getenv("EXOTEL_PHONE_NUMBER"),
+            customer_name=customer_name,
+            call_ref=call_ref,
+        )
+    except Exception:
+        capacity.release(slot)
+        raise
+    call_sid = call_result.get("call_sid", "unknown")
+    await add_outbound_call(
+        call_sid,
+        {
+            "phone_number": phone_number,
+            "customer_name": customer_name,
+            "campaign_id": campaign_id,
+            "capacity_slot": slot,
+            "call_ref": call_ref,
+        },
+    )
+    prerender_greeting_later(app, call_sid, phone_number, customer_name)
+    return call_sid
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     app.state.session = aiohttp.ClientSession()
+    app.state.greeting_tasks = set()
+
+    # One limiter per process for every call we place (/start and campaigns)
+    app.state.exotel_limiter = TokenBucket(EXOTEL_CALLS_PER_SECOND)
+    app.state.campaigns = CampaignManager(
+        dial=lambda phone, name, campaign_id: dial_campaign_lead(app, phone, name, campaign_id),
+        limiter=app.state.exotel_limiter,
+    )
+    set_campaign_manager(app.state.campaigns)
+
+    get_capacity_manager().start()
+
+    # Load the VAD model, import bot.py and build the call's services before
+    # the first call needs them; /ready reports when that has finished.
+    app.state.warmup = WarmUp()
+    app.state.warmup.start()
+
+    from prompt_context import prefix_fingerprints
+
+    prompt_mode = os.getenv("PROMPT_MODE", "full").lower()
+    logger.info(f"[PROMPT_CACHE] Prompt+tools prefix fingerprints ({prompt_mode}): {prefix_fingerprints(prompt_mode)}")
+
+    # Render the scripted phrases in the background; calls that arrive first
+    # just fall through to live Sarvam for anything not cached yet.
+    prewarm_task = None
+    if TTS_CACHE_PREWARM:
+        prewarm_task = asyncio.create_task(prewarm_phrase_cache(app.state.session))
+
+    start_sweeper()
+    start_metrics_flusher()
+    get_loop_monitor().start()
     yield
+    if prewarm_task is not None:
+        prewarm_task.cancel()
+        await asyncio.gather(prewarm_task, return_exceptions=True)
+    for task in app.state.greeting_tasks:
+        task.cancel()
+    await asyncio.gather(*app.state.greeting_tasks, return_exceptions=True)
+    logger.info(f"[TTS_CACHE] Process stats: {get_phrase_cache().stats()}")
+    await get_capacity_manager().stop()
+    await app.state.campaigns.close()
+    set_campaign_manager(None)
+    await stop_sweeper()
+    await stop_metrics_flusher()
+    await get_loop_monitor().stop()
+    await app.state.warmup.stop()
+    # Imported here, not at the top: both pull in the call path's heavy modules
+    from client_pool import get_provider_pool
+    from vad_engine import close_vad_engine
+
+    await get_provider_pool().close()
+    close_vad_engine()
     await app.state.session.close()
 
 
@@ -115,29 +232,46 @@ async def initiate_outbound_call(request: Request) -> JSONResponse:
 
         logger.info(f"Processing outbound call to {phone_number}, customer_name={customer_name!r}")
 
+        # ✅ Admission control: don't dial more calls than this node can run
+        capacity = get_capacity_manager()
+        try:
+            slot = await capacity.reserve()
+        except CapacityFull as e:
+            logger.warning(f"[CAPACITY] Rejecting call to {phone_number}: {e} (status={capacity.status()})")
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+        call_ref = new_call_ref()
         try:
+            await request.app.state.exotel_limiter.acquire()
             call_result = await make_exotel_call(
                 session=request.app.state.session,
                 to_number=phone_number,
                 from_number=os.getenv("EXOTEL_PHONE_NUMBER"),
                 customer_name=customer_name,
+                call_ref=call_ref,
             )
             call_sid = call_result.get("call_sid", "unknown")
             logger.info(f"make_exotel_call returned call_sid={call_sid}")
 
-            # ✅ Store this call context for the next /ws connection
+            # ✅ Store this call context keyed by CallSid for the matching /ws connection
             await add_outbound_call(
+                call_sid,
                 {
                     "phone_number": phone_number,
                     "customer_name": customer_name,
+                    "capacity_slot": slot,
+                    "call_ref": call_ref,
                 }
             )
             logger.info(
-                f"[CALL_MEMORY] Stored outbound call context for phone={phone_number}, "
-                f"customer_name={customer_name!r}"
+                f"[CALL_MEMORY] Stored outbound call context for call_sid={call_sid}, "
+                f"phone={phone_number}, customer_name={customer_name!r}"
             )
+            # ✅ Exotel rings for a few seconds: render the personalised greeting meanwhile
+            prerender_greeting_later(request.app, call_sid, phone_number, customer_name)
 
         except Exception as e:
+            capacity.release(slot)
             logger.error(f"Error initiating Exotel call: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to initiate call: {str(e)}")
 
@@ -157,6 +291,111 @@ async def initiate_outbound_call(request: Request) -> JSONResponse:
     )
 
 
+@app.get("/exotel/stream-url")
+async def exotel_stream_url(request: Request) -> JSONResponse:
+    """
+    Dynamic URL for the Voicebot applet: the /ws URL with the call's call_ref
+    (Exotel's CustomField) as a custom parameter, so bot() can match the
+    stream to its /start context even though the Sids differ.
+    """
+    url = EXOTEL_STREAM_URL or f"wss://{request.headers.get('host', request.url.netloc)}/ws"
+    call_ref = request.query_params.get("CustomField", "")
+    if call_ref:
+        url = f"{url}{'&' if '?' in url else '?'}{urlencode({'call_ref': call_ref})}"
+    return JSONResponse({"url": url})
+
+
+@app.get("/capacity")
+async def capacity_status() -> JSONResponse:
+    """Current call load, budget and admission queue depth for this process."""
+    from client_pool import get_provider_pool
+    from provider_router import provider_router_stats
+
+    capacity = get_capacity_manager()
+    await capacity.sync_reservations()
+    return JSONResponse(
+        {
+            **capacity.status(),
+            "teardown": teardown_stats(),
+            "reaper": reaper_stats(),
+            "providers": get_provider_pool().stats(),
+            "routing": provider_router_stats(),
+            "loop_lag": get_loop_monitor().stats(),
+        }
+    )
+
+
+@app.get("/ready")
+async def readiness(request: Request) -> JSONResponse:
+    """200 once the startup warm-up has finished, 503 until then (or if it failed)."""
+    warmup = request.app.state.warmup
+    return JSONResponse(warmup.status(), status_code=200 if warmup.ready else 503)
+
+
+@app.get("/metrics")
+async def prometheus_metrics() -> PlainTextResponse:
+    """Prometheus text format: per-turn latency by stage, call teardown time and reaped calls."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/campaigns")
+async def create_campaign(request: Request) -> JSONResponse:
+    """
+    Start a bulk dialing campaign from a CSV (header row with phone_number and
+    customer_name) or JSONL upload. Accepts a raw request body or a multipart
+    "file" field; either way the upload is streamed to disk, not held in memory.
+    Use ?format=csv|jsonl to skip auto-detection.
+    """
+    fmt = request.query_params.get("format")
+    if fmt not in (None, "csv", "jsonl"):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'jsonl'")
+
+    content_type = request.headers.get("content-type", "")
+    if fmt is None:
+        if "csv" in content_type:
+            fmt = "csv"
+        elif "ndjson" in content_type or "jsonl" in content_type or "json-lines" in content_type:
+            fmt = "jsonl"
+
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing 'file' field in multipart upload")
+
+        async def _chunks():
+            while chunk := await upload.read(64 * 1024):
+                yield chunk
+
+        chunks = _chunks()
+    else:
+        chunks = request.stream()
+
+    try:
+        campaign = await request.app.state.campaigns.create(chunks, fmt)
+    except Exception as e:
+        logger.error(f"[CAMPAIGN] Failed to ingest upload: {e}")
+        raise HTTPException(status_code=400, detail=f"Could not read campaign upload: {str(e)}")
+
+    if campaign.queued == 0:
+        raise HTTPException(status_code=400, detail="No valid leads found in upload")
+
+    return JSONResponse(campaign.to_dict(), status_code=202)
+
+
+@app.get("/campaigns")
+async def list_campaigns(request: Request) -> JSONResponse:
+    return JSONResponse([c.to_dict() for c in request.app.state.campaigns.all_campaigns()])
+
+
+@app.get("/campaigns/{campaign_id}")
+async def get_campaign(campaign_id: str, request: Request) -> JSONResponse:
+    campaign = request.app.state.campaigns.get(campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Unknown campaign")
+    return JSONResponse(campaign.to_dict())
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """Handle WebSocket connection from Exotel Media Streams."""
@@ -164,6 +403,9 @@ async def websocket_endpoint(websocket: WebSocket):
     logger.info("WebSocket connection accepted for outbound call")
 
     try:
+        # A call that arrives during startup waits for the warm-up instead of repeating it
+        await websocket.app.state.warmup.wait()
+
         from bot import bot
         from pipecat.runner.types import WebSocketRunnerArguments
 
@@ -187,4 +429,34 @@ async def websocket_endpoint(websocket: WebSocket):
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=7860)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exotel outbound voicebot server")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "7860")))
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_CONCURRENCY", "1")),
+        help="Worker processes; /ws sessions are spread across them (default: WEB_CONCURRENCY or 1)",
+    )
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # /start and /ws can land on different workers, so call contexts must
+        # live in a store every worker can read.
+        if os.getenv("CALL_STORE_BACKEND", "memory").lower() == "memory":
+            logger.warning("Multi-worker mode needs a shared call store; using CALL_STORE_BACKEND=sqlite")
+            os.environ["CALL_STORE_BACKEND"] = "sqlite"
+        # Each worker writes its histograms here so any one of them can answer /metrics
+        if not os.getenv("METRICS_DIR"):
+            os.environ["METRICS_DIR"] = os.path.join(tempfile.gettempdir(), f"voicebot_metrics_{args.port}")
+        metrics_dir = os.environ["METRICS_DIR"]
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".json"):
+                os.remove(os.path.join(metrics_dir, name))  # left by an earlier run
+        logger.info(f"Starting {args.workers} server workers on {args.host}:{args.port}")
+        uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,139 @@
+# stt_backends.py
+"""
+Speech-to-text backend selection.
+
+STT_BACKEND picks the service run_bot uses for each call:
+
+- "openai" (default): gpt-4o-transcribe. Segmented, so the whole utterance
+  is uploaded and transcribed only after VAD says the user stopped.
+- "groq": Whisper on Groq. Also segmented, usually faster than OpenAI.
+- "deepgram": streaming. Audio is sent as it arrives, interim transcripts
+  come back while the user is speaking, and the pipeline's VAD stop
+  triggers a finalize, so the final transcript follows within one round trip.
+- "sarvam": streaming Saarika over Sarvam's WebSocket (finals only, no
+  interims), with auto-detected Indian languages.
+
+STT_BASE_URL points the chosen backend somewhere other than its public API,
+e.g. at benchmarks/fake_stt.py for latency tests without a network. Only
+then may DEEPGRAM_API_KEY be left unset.
+
+STT_FALLBACK_BACKEND (groq by default when GROQ_API_KEY is set) hedges a
+segmented backend with another one (provider_router.py);
+STT_FALLBACK_BASE_URL points it elsewhere.
+"""
+import os
+import re
+from typing import Optional
+
+from loguru import logger
+
+from pipecat.services.stt_service import STTService
+
+STT_PROMPT = "Expect multilingual indian accent and indian languages."
+
+STREAMING_BACKENDS = ("deepgram", "sarvam")
+
+
+def stt_backend_name(backend: Optional[str] = None) -> str:
+    return (backend or os.getenv("STT_BACKEND", "openai")).lower()
+
+
+def stt_fallback_name() -> str:
+    # Blank counts as unset, so a copied env.example still gets the groq default
+    default = "groq" if os.getenv("GROQ_API_KEY") else ""
+    return (os.getenv("STT_FALLBACK_BACKEND") or default).lower()
+
+
+def create_stt_service(backend: Optional[str] = None, base_url: Optional[str] = None) -> STTService:
+    """
+    Build the STT service for one call. Reads STT_BACKEND/STT_BASE_URL at call
+    time (after bot.py's load_dotenv) and imports each backend lazily, so only
+    the selected one's SDK needs to be installed.
+    """
+    from provider_router import PROVIDER_HEDGING, HedgedWhisperSTTService
+
+    backend = stt_backend_name(backend)
+    base_url = base_url if base_url is not None else os.getenv("STT_BASE_URL", "")
+    stt = _create_backend(backend, base_url)
+    fallback = stt_fallback_name()
+    if PROVIDER_HEDGING and fallback and fallback != backend:
+        if backend in STREAMING_BACKENDS or fallback in STREAMING_BACKENDS:
+            logger.warning(f"[STT] Not hedging {backend} with {fallback}: only segmented backends can be hedged")
+        else:
+            secondary = _create_backend(fallback, os.getenv("STT_FALLBACK_BASE_URL", ""))
+            logger.info(f"[STT] Hedging {backend} with {fallback}")
+            return HedgedWhisperSTTService(stt, secondary)
+    return stt
+
+
+def _create_backend(backend: str, base_url: str) -> STTService:
+    if backend == "openai":
+        # Borrows the process-wide OpenAI client (client_pool.py)
+        from client_pool import PooledOpenAISTTService
+
+        kwargs = {"base_url": base_url} if base_url else {}
+        stt = PooledOpenAISTTService(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            model="gpt-4o-transcribe",
+            prompt=STT_PROMPT,
+            **kwargs,
+        )
+    elif backend == "groq":
+        from pipecat.services.groq.stt import GroqSTTService
+
+        kwargs = {"base_url": base_url} if base_url else {}
+        stt = GroqSTTService(
+            api_key=os.getenv("GROQ_API_KEY"),
+            model=os.getenv("GROQ_STT_MODEL", "whisper-large-v3-turbo"),
+            prompt=STT_PROMPT,
+            **kwargs,
+        )
+    elif backend == "deepgram":
+        from deepgram import LiveOptions
+        from pipecat.services.deepgram.stt import DeepgramSTTService
+
+        api_key = os.getenv("DEEPGRAM_API_KEY")
+        if not api_key:
+            if not base_url:
+                raise ValueError("STT_BACKEND=deepgram needs DEEPGRAM_API_KEY")
+            api_key = "local"  # the SDK insists on one; a local fake ignores it
+        stt = DeepgramSTTService(
+            api_key=api_key,
+            base_url=base_url,
+            live_options=LiveOptions(
+                model=os.getenv("DEEPGRAM_STT_MODEL", "nova-3"),
+                # "multi" handles English/Hindi code-switching within one utterance
+                language=os.getenv("DEEPGRAM_STT_LANGUAGE", "multi"),
+                encoding="linear16",
+                channels=1,
+                interim_results=True,
+                smart_format=True,
+                punctuate=True,
+                vad_events=False,
+            ),
+        )
+    elif backend == "sarvam":
+        from pipecat.services.sarvam.stt import SarvamSTTService
+
+        stt = SarvamSTTService(
+            api_key=os.getenv("SARVAM_API_KEY"),
+            model=os.getenv("SARVAM_STT_MODEL", "saarika:v2.5"),
+        )
+        if base_url:
+            # The service builds its client with the public endpoints and takes no URL
+            from sarvamai import AsyncSarvamAI
+            from sarvamai.environment import SarvamAIEnvironment
+
+            base_url = base_url.rstrip("/")
+            stt._sarvam_client = AsyncSarvamAI(
+                api_subscription_key=os.getenv("SARVAM_API_KEY"),
+                environment=SarvamAIEnvironment(base=base_url, production=re.sub(r"^http", "ws", base_url)),
+            )
+    else:
+        raise ValueError(f"Unknown STT_BACKEND {backend!r}; use openai, groq, deepgram or sarvam")
+
+    logger.info(
+        f"[STT] Using {backend} ({'streaming' if backend in STREAMING_BACKENDS else 'segmented'})"
+        + (f" at {base_url}" if base_url else "")
+    )
+    return stt
@@ -0,0 +1,132 @@
+# text_chunking.py
+"""
+Clause-sized text chunks for TTS.
+
+pipecat's TTS services cut the LLM's stream into sentences, and Sarvam's
+WebSocket then buffers 50 characters (min_buffer_size) before it starts
+on the audio. A reply's first audio therefore waits for its first full
+sentence, and often for the start of the second one. Hindi and Telugu
+replies end sentences with "।" or not at all, so the first sentence can
+be the whole reply.
+
+ClauseTextAggregator releases text at the first of these boundaries:
+- a sentence end (. ! ? । ॥), always;
+- while the sentence is still being generated, a clause boundary: a
+  comma, semicolon, colon or dash, or the space before a conjunction in
+  English, Hindi or Telugu ("and", "lekin", "और", "kani", ...). The chunk
+  has to be at least TTS_CHUNK_MIN_CHARS long, so the TTS never says one
+  word on its own;
+- with no boundary by TTS_CHUNK_MAX_CHARS, the last space before it.
+A boundary only counts once the next character (a space) has arrived, so
+"40,000" and "5.5" are never split, and common abbreviations ("Rs.",
+"Dr.") do not end a sentence.
+
+The scripted lines in config.py are played from the phrase cache
+(tts_cache.py) by the sentence. While the text so far is still the
+beginning of one of them, clause boundaries are skipped, so those lines
+keep arriving whole and keep hitting the cache.
+
+CachedSarvamTTSService flushes Sarvam after each chunk it sends live, so
+Sarvam starts on it at once instead of waiting for more text.
+
+TTS_CHUNKING=sentence keeps pipecat's sentence aggregation.
+benchmarks/bench_tts_chunking.py compares first-audio latency.
+"""
+import bisect
+import os
+import re
+from typing import List, Optional
+
+from pipecat.utils.text.base_text_aggregator import BaseTextAggregator
+from pipecat.utils.text.simple_text_aggregator import SimpleTextAggregator
+
+from prompt_context import STATIC_SYSTEM_PROMPT
+from tts_cache import extract_phrases, normalize_text
+
+TTS_CHUNKING = os.getenv("TTS_CHUNKING", "clause").lower()
+TTS_CHUNK_MIN_CHARS = int(os.getenv("TTS_CHUNK_MIN_CHARS", "25"))
+TTS_CHUNK_MAX_CHARS = int(os.getenv("TTS_CHUNK_MAX_CHARS", "120"))
+
+_SENTENCE_END_RE = re.compile(r"[.!?।॥]+[\"')\]]*(?=\s|$)")
+_ABBREVIATION_RE = re.compile(r"\b(rs|mr|mrs|ms|dr|no|approx|etc|vs|st)\.$", re.IGNORECASE)
+_CONJUNCTIONS = (
+    # English
+    "and", "but", "or", "so", "because", "which", "then",
+    # Hindi, romanised and in Devanagari
+    "aur", "lekin", "magar", "ya", "kyunki", "toh", "phir",
+    "और", "लेकिन", "मगर", "या", "क्योंकि", "तो", "फिर",
+    # Telugu, romanised and in Telugu script
+    "mariyu", "kani", "leka", "ante", "endukante",
+    "మరియు", "కానీ", "లేదా", "అంటే", "ఎందుకంటే",
+)
+_CLAUSE_RE = re.compile(
+    r"[,;:]+(?=\s)|\s[–—-](?=\s)|(?<=\S)(?=\s+(?:" + "|".join(_CONJUNCTIONS) + r")\s)",
+    re.IGNORECASE,
+)
+
+
+class ClauseTextAggregator(BaseTextAggregator):
+    """Releases text at sentence ends, or at clause boundaries within a long sentence."""
+
+    def __init__(
+        self,
+        min_chars: int = TTS_CHUNK_MIN_CHARS,
+        max_chars: int = TTS_CHUNK_MAX_CHARS,
+        scripted_lines: Optional[List[str]] = None,
+    ):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        # Sorted, so "is this the start of a scripted line" is one bisect
+        self._scripted = sorted({normalize_text(line) for line in scripted_lines or ()})
+        self._text = ""
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def _is_scripted_prefix(self, text: str) -> bool:
+        key = normalize_text(text)
+        i = bisect.bisect_left(self._scripted, key)
+        return i < len(self._scripted) and self._scripted[i].startswith(key)
+
+    def _chunk_end(self) -> int:
+        text = self._text
+        for match in _SENTENCE_END_RE.finditer(text):
+            if _ABBREVIATION_RE.search(text[: match.end()]):
+                continue
+            if match.end() == len(text) and text[match.start() - 1 : match.start()].isdigit():
+                continue  # "5." may still become "5.5"
+            return match.end()
+
+        if not self._is_scripted_prefix(text):
+            for match in _CLAUSE_RE.finditer(text):
+                if len(text[: match.end()].strip()) >= self.min_chars:
+                    return match.end()
+
+        if len(text) > self.max_chars:
+            space = text.rfind(" ", self.min_chars, self.max_chars)
+            return space if space > 0 else self.max_chars
+        return 0
+
+    async def aggregate(self, text: str) -> Optional[str]:
+        self._text += text
+        end = self._chunk_end()
+        if not end:
+            return None
+        chunk, self._text = self._text[:end], self._text[end:]
+        return chunk
+
+    async def handle_interruption(self):
+        self._text = ""
+
+    async def reset(self):
+        self._text = ""
+
+
+def create_text_aggregator(mode: str = TTS_CHUNKING) -> BaseTextAggregator:
+    """The TTS text aggregator for TTS_CHUNKING: "clause" (default) or "sentence"."""
+    if mode == "sentence":
+        return SimpleTextAggregator()
+    if mode != "clause":
+        raise ValueError(f"Unknown TTS_CHUNKING {mode!r}; use clause or sentence")
+    return ClauseTextAggregator(scripted_lines=extract_phrases(STATIC_SYSTEM_PROMPT))
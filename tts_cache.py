@@ -0,0 +1,372 @@
+# tts_cache.py
+"""
+Pre-rendered TTS audio for the bot's scripted lines.
+
+The system prompt in config.py makes the LLM say the same handful of lines on
+every call: the intro, "Okay, got it.", the stage questions in English, Hindi
+and Telugu, and the goodbyes. CachedSarvamTTSService plays those from PCM
+rendered once, instead of waiting 0.4-0.7 s for Sarvam each time.
+
+Entries are keyed by (model, voice_id, sample_rate, text). Text matches either
+exactly or after normalisation (case, curly quotes, dashes and whitespace
+folded), since the LLM's sentence splitter leaves stray spaces and casing.
+They live in an in-memory LRU bounded by TTS_CACHE_MAX_MB, backed by one .pcm
+file per phrase under TTS_CACHE_DIR, so a restart (or another worker) does not
+re-synthesise them. prewarm_phrase_cache() fills the store at startup from the
+quoted lines in config.messages.
+
+Lines rendered for one call only (the greeting with the customer's name, see
+greeting.py) are added to that call's service with add_call_phrase() and are
+never written to the shared store.
+"""
+import asyncio
+import base64
+import hashlib
+import os
+import re
+import tempfile
+import time
+from collections import OrderedDict
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
+
+import aiohttp
+from loguru import logger
+from websockets.protocol import State
+
+from pipecat.frames.frames import (
+    Frame,
+    InterruptionFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.services.sarvam.tts import SarvamTTSService
+
+# The voice run_bot speaks with; prewarm renders the cache for the same one
+TTS_MODEL = "bulbul:v2"
+TTS_VOICE_ID = "manisha"
+TTS_SAMPLE_RATE = 8000
+TTS_LANGUAGE = "en-IN"  # SarvamTTSService's default target_language_code
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "voicebot_tts_cache")
+TTS_CACHE_MAX_BYTES = int(float(os.getenv("TTS_CACHE_MAX_MB", "64")) * 1024 * 1024)
+TTS_CACHE_PREWARM = os.getenv("TTS_CACHE_PREWARM", "1").lower() not in ("0", "false", "no")
+SARVAM_API_BASE = os.getenv("SARVAM_API_BASE", "https://api.sarvam.ai").rstrip("/")
+# Live synthesis goes over Sarvam's WebSocket on the same host
+SARVAM_TTS_WS_URL = re.sub(r"^http", "ws", SARVAM_API_BASE) + "/text-to-speech/ws"
+
+_QUOTED_RE = re.compile(r"\"([^\"\n]+)\"")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?।])\s+")
+# Placeholders ([name], {customer_name}), tool reasons and example numbers
+# mean the LLM will never say the line verbatim.
+_NOT_VERBATIM_RE = re.compile(r"[\[\]{}_\d]")
+_QUOTE_TRANSLATION = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"', "–": "-", "—": "-"})
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.translate(_QUOTE_TRANSLATION).casefold().split())
+
+
+def extract_phrases(prompt: str) -> List[str]:
+    """
+    Pull the lines the bot is told to say verbatim out of a system prompt:
+    every quoted line of three words or more (shorter ones are mostly the
+    customer's side, like "Haan?" or "Bolo"), plus each sentence in it, since
+    that is how the TTS receives them.
+    """
+    phrases: List[str] = []
+    seen = set()
+    for quoted in _QUOTED_RE.findall(prompt):
+        quoted = quoted.strip()
+        if len(quoted.split()) < 3 or _NOT_VERBATIM_RE.search(quoted):
+            continue
+        for phrase in [quoted, *_SENTENCE_SPLIT_RE.split(quoted)]:
+            key = normalize_text(phrase)
+            if key and key not in seen:
+                seen.add(key)
+                phrases.append(phrase.strip())
+    return phrases
+
+
+class PhraseCache:
+    """In-memory LRU of rendered PCM, backed by a directory of .pcm files."""
+
+    def __init__(self, cache_dir: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self._dir = cache_dir
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        # Names of the files on disk, so a miss never has to touch the filesystem
+        self._on_disk = {name for name in os.listdir(cache_dir) if name.endswith(".pcm")}
+
+        self.hits = 0
+        self.misses = 0
+        self.live_ttfb: Optional[float] = None  # moving average of Sarvam TTFB on misses
+
+    @staticmethod
+    def key(model: str, voice_id: str, sample_rate: int, text: str) -> str:
+        return f"{model}|{voice_id}|{sample_rate}|{normalize_text(text)}"
+
+    @staticmethod
+    def _filename(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + ".pcm"
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries or self._filename(key) in self._on_disk
+
+    def _remember(self, key: str, audio: bytes) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = audio
+        self._bytes += len(audio)
+        while self._bytes > self._max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def _read(self, filename: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self._dir, filename), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, filename: str, audio: bytes) -> None:
+        path = os.path.join(self._dir, filename)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        # Atomic, so another worker never reads a half-written phrase
+        os.replace(tmp_path, path)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        audio = self._entries.get(key)
+        if audio is not None:
+            self._entries.move_to_end(key)
+            return audio
+
+        filename = self._filename(key)
+        if filename not in self._on_disk:
+            return None
+        audio = await asyncio.to_thread(self._read, filename)
+        if audio:
+            self._remember(key, audio)
+        else:
+            self._on_disk.discard(filename)
+        return audio
+
+    async def put(self, key: str, audio: bytes) -> None:
+        # Keep samples aligned so the output transport never splits one
+        audio = audio[: len(audio) & ~1]
+        if not audio:
+            return
+        self._remember(key, audio)
+        filename = self._filename(key)
+        await asyncio.to_thread(self._write, filename, audio)
+        self._on_disk.add(filename)
+
+    def record_live_ttfb(self, seconds: float) -> None:
+        self.live_ttfb = seconds if self.live_ttfb is None else 0.8 * self.live_ttfb + 0.2 * seconds
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries_in_memory": len(self._entries),
+            "bytes_in_memory": self._bytes,
+            "entries_on_disk": len(self._on_disk),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "live_ttfb_secs": self.live_ttfb,
+        }
+
+
+_cache: Optional[PhraseCache] = None
+
+
+def get_phrase_cache() -> PhraseCache:
+    global _cache
+    if _cache is None:
+        _cache = PhraseCache()
+    return _cache
+
+
+class CachedSarvamTTSService(SarvamTTSService):
+    """
+    SarvamTTSService that plays cached phrases without a round trip.
+
+    Sarvam's audio comes back asynchronously on the WebSocket, so a cached
+    sentence may only be played while nothing sent to Sarvam is still pending
+    in the current response; otherwise it would jump ahead of live audio.
+    In practice that covers the scripted openers ("Okay, got it.") that start
+    most responses, which is where TTFB matters.
+
+    With flush_chunks, every chunk sent live is followed by a flush, so
+    Sarvam renders it at once rather than buffering until it has
+    min_buffer_size characters (see text_chunking.py).
+    """
+
+    def __init__(self, *, cache: Optional[PhraseCache] = None, flush_chunks: bool = False, **kwargs):
+        kwargs.setdefault("url", SARVAM_TTS_WS_URL)
+        super().__init__(**kwargs)
+        self._cache = cache or get_phrase_cache()
+        self._flush_chunks = flush_chunks
+        self._live_pending = False
+        self._live_sent_at: Optional[float] = None
+        self._call_phrases: Dict[str, bytes] = {}
+
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.latency_saved = 0.0
+
+    def cache_stats(self) -> Dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": self.cache_hits / lookups if lookups else 0.0,
+            "latency_saved_secs": round(self.latency_saved, 3),
+        }
+
+    def add_call_phrase(self, text: str, audio: bytes) -> None:
+        """Audio rendered for this call only; played like a cached phrase."""
+        self._call_phrases[normalize_text(text)] = audio[: len(audio) & ~1]
+
+    async def _connect_websocket(self):
+        # Take a pre-connected socket from the provider pool (client_pool.py)
+        # instead of dialling Sarvam; without a spare, dial as usual.
+        from client_pool import get_provider_pool
+
+        if self._websocket and self._websocket.state is State.OPEN:
+            return
+        websocket = await get_provider_pool().take_sarvam_websocket(self._websocket_url, self._api_key)
+        if websocket is None:
+            await super()._connect_websocket()
+            return
+        try:
+            self._websocket = websocket
+            logger.debug("Using a pooled Sarvam TTS Websocket")
+            await self._send_config()
+            await self._call_event_handler("on_connected")
+        except Exception as e:
+            logger.error(f"{self} initialization error: {e}")
+            self._websocket = None
+            await self._call_event_handler("on_connection_error", f"{e}")
+
+    async def push_frame(self, frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM):
+        if isinstance(frame, TTSAudioRawFrame) and self._live_sent_at is not None:
+            self._cache.record_live_ttfb(time.monotonic() - self._live_sent_at)
+            self._live_sent_at = None
+        await super().push_frame(frame, direction)
+        if isinstance(frame, (TTSStoppedFrame, InterruptionFrame)):
+            self._live_pending = False
+            self._live_sent_at = None
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        audio = None
+        if not self._live_pending:
+            audio = self._call_phrases.get(normalize_text(text))
+            if audio is None:
+                key = self._cache.key(self.model_name, self._voice_id, self.sample_rate, text)
+                audio = await self._cache.get(key)
+
+        if audio:
+            self.cache_hits += 1
+            self._cache.hits += 1
+            logger.debug(f"{self}: Playing cached TTS: [{text}]")
+            if not self._started:
+                # This sentence opens the response, so the user would otherwise
+                # have waited a full Sarvam TTFB for it.
+                if self._cache.live_ttfb:
+                    self.latency_saved += self._cache.live_ttfb
+                await self.start_ttfb_metrics()
+                yield TTSStartedFrame()
+                self._started = True
+            yield TTSAudioRawFrame(audio, self.sample_rate, 1)
+            await self.stop_ttfb_metrics()
+            return
+
+        self.cache_misses += 1
+        self._cache.misses += 1
+        if not self._started:
+            self._live_sent_at = time.monotonic()
+        self._live_pending = True
+        async for frame in super().run_tts(text):
+            yield frame
+        if self._flush_chunks:
+            await self.flush_audio()
+
+
+async def synthesize(session: aiohttp.ClientSession, text: str, api_key: str) -> bytes:
+    payload = {
+        "text": text,
+        "target_language_code": TTS_LANGUAGE,
+        "speaker": TTS_VOICE_ID,
+        "pitch": 0.0,
+        "pace": 1.0,
+        "loudness": 1.0,
+        "sample_rate": TTS_SAMPLE_RATE,
+        "enable_preprocessing": False,
+        "model": TTS_MODEL,
+    }
+    headers = {"api-subscription-key": api_key, "Content-Type": "application/json"}
+
+    async with session.post(f"{SARVAM_API_BASE}/text-to-speech", json=payload, headers=headers) as response:
+        if response.status != 200:
+            raise Exception(f"Sarvam API error ({response.status}): {await response.text()}")
+        data = await response.json()
+
+    if not data.get("audios"):
+        raise Exception("No audio in Sarvam response")
+    audio = base64.b64decode(data["audios"][0])
+    if audio.startswith(b"RIFF"):
+        audio = audio[44:]
+    return audio
+
+
+async def prewarm_phrase_cache(
+    session: aiohttp.ClientSession,
+    phrases: Optional[List[str]] = None,
+    cache: Optional[PhraseCache] = None,
+    concurrency: int = 4,
+) -> Tuple[int, int, int]:
+    """
+    Render every scripted phrase that isn't cached yet. Returns
+    (rendered, already_cached, failed).
+    """
+    cache = cache or get_phrase_cache()
+    if phrases is None:
+        from config import messages
+
+        phrases = extract_phrases(messages[0]["content"])
+
+    api_key = os.getenv("SARVAM_API_KEY")
+    keys = [(phrase, cache.key(TTS_MODEL, TTS_VOICE_ID, TTS_SAMPLE_RATE, phrase)) for phrase in phrases]
+    missing = [(phrase, key) for phrase, key in keys if key not in cache]
+    already_cached = len(keys) - len(missing)
+    if missing and not api_key:
+        logger.warning(f"[TTS_CACHE] SARVAM_API_KEY not set; skipping prewarm of {len(missing)} phrases")
+        return 0, already_cached, len(missing)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    rendered = failed = 0
+
+    async def _render(phrase: str, key: str):
+        nonlocal rendered, failed
+        async with semaphore:
+            try:
+                await cache.put(key, await synthesize(session, phrase, api_key))
+                rendered += 1
+            except Exception as e:
+                failed += 1
+                logger.warning(f"[TTS_CACHE] Could not render {phrase!r}: {e}")
+
+    started = time.monotonic()
+    await asyncio.gather(*(_render(phrase, key) for phrase, key in missing))
+    logger.info(
+        f"[TTS_CACHE] Prewarm: {rendered} rendered, {already_cached} already cached, "
+        f"{failed} failed in {time.monotonic() - started:.1f}s"
+    )
+    return rendered, already_cached, failed
@@ -0,0 +1,406 @@
+# vad_engine.py
+"""
+Process-wide Silero VAD engine.
+
+SileroVADAnalyzer loads its own ONNX session for every call. Here the model is
+loaded once per process (at server startup) and every call gets a lightweight
+PooledSileroVADAnalyzer that only holds its own RNN state, context samples and
+audio buffer. When several calls have frames pending at the same time the
+engine runs them through the model as one batch.
+
+pipecat's VADAnalyzer gives every call a thread of its own and hands it
+every 20 ms frame, whether or not the frame completes a model window.
+With AUDIO_OFFLOAD=pool (the default) the analyzer does not use that
+thread:
+- the frame is copied into the call's window buffer on the event loop (a
+  few microseconds). If it does not complete a window, nothing else runs;
+- a complete window goes to the engine, whose AUDIO_OFFLOAD_THREADS
+  threads work out its volume and voice confidence, batched with the other
+  calls' windows. The loop only waits for the result.
+Each call awaits one window at a time, so its results come back in order.
+AUDIO_OFFLOAD=call goes back to one thread per call.
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+import onnxruntime
+from loguru import logger
+
+from pipecat.audio.utils import exp_smoothing
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams, VADState
+
+from audio_codec import PcmWindowBuffer, pcm_volume
+
+# Same reset cadence as pipecat's SileroVADAnalyzer
+_MODEL_RESET_STATES_TIME = 5.0
+
+VAD_ENGINE_MAX_BATCH = int(os.getenv("VAD_ENGINE_MAX_BATCH", "64"))
+AUDIO_OFFLOAD = os.getenv("AUDIO_OFFLOAD", "pool").lower()  # "pool" or "call"
+AUDIO_OFFLOAD_THREADS = int(os.getenv("AUDIO_OFFLOAD_THREADS", "1"))
+
+
+def _silero_model_path() -> str:
+    from importlib import resources as impresources
+
+    return str(impresources.files("pipecat.audio.vad.data").joinpath("silero_vad.onnx"))
+
+
+def _num_samples(sample_rate: int) -> int:
+    return 512 if sample_rate == 16000 else 256
+
+
+def _context_size(sample_rate: int) -> int:
+    return 64 if sample_rate == 16000 else 32
+
+
+class _VADRequest:
+    __slots__ = ("x", "state", "sample_rate", "confidence", "volume", "error", "done", "future")
+
+    def __init__(self, x: np.ndarray, state: np.ndarray, sample_rate: int, future: Optional[asyncio.Future] = None):
+        self.x = x
+        self.state = state
+        self.sample_rate = sample_rate
+        self.confidence = 0.0
+        self.volume: Optional[float] = None  # only worked out for analyze() requests
+        self.error: Optional[BaseException] = None
+        # analyze() waits on a future on its loop, infer() on an event
+        self.future = future
+        self.done = threading.Event() if future is None else None
+
+
+def _resolve(request: _VADRequest) -> None:
+    # On the caller's loop; the caller may have been cancelled meanwhile
+    if not request.future.done():
+        request.future.set_result(request)
+
+
+class SileroVADEngine:
+    """
+    Owns the single Silero ONNX session for this process.
+
+    Callers hand their window plus RNN state to `analyze()` (awaited on the
+    event loop) or `infer()` (blocking, from a per-call VAD thread). Each
+    inference thread drains everything that is pending, stacks it into one
+    batch per sample rate and returns the confidence and new state to each
+    caller.
+    """
+
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        max_batch: int = VAD_ENGINE_MAX_BATCH,
+        threads: int = AUDIO_OFFLOAD_THREADS,
+    ):
+        model_path = model_path or _silero_model_path()
+        logger.info(f"[VAD_ENGINE] Loading Silero VAD model from {model_path}")
+
+        opts = onnxruntime.SessionOptions()
+        opts.inter_op_num_threads = 1
+        opts.intra_op_num_threads = 1
+        providers = (
+            ["CPUExecutionProvider"]
+            if "CPUExecutionProvider" in onnxruntime.get_available_providers()
+            else None
+        )
+        self._session = onnxruntime.InferenceSession(model_path, providers=providers, sess_options=opts)
+        self._max_batch = max(1, max_batch)
+
+        self._queue: "queue.SimpleQueue[Optional[_VADRequest]]" = queue.SimpleQueue()
+        self._num_threads = max(1, threads)
+        self._threads: List[threading.Thread] = []
+        self._thread_lock = threading.Lock()
+
+        # Counters, read by benchmarks and logs
+        self.frames = 0
+        self.batches = 0
+
+        logger.info("[VAD_ENGINE] Silero VAD model loaded.")
+
+    def _ensure_threads(self) -> None:
+        if self._threads:
+            return
+        with self._thread_lock:
+            if not self._threads:
+                for i in range(self._num_threads):
+                    thread = threading.Thread(target=self._run, name=f"silero-vad-engine-{i}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+    def infer(self, x: np.ndarray, state: np.ndarray, sample_rate: int) -> Tuple[float, np.ndarray]:
+        """
+        Run one VAD window (context + samples) for a single call.
+        Blocks the calling thread until the batch containing it has run.
+        """
+        self._ensure_threads()
+        request = _VADRequest(x, state, sample_rate)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.confidence, request.state
+
+    async def analyze(self, x: np.ndarray, state: np.ndarray, sample_rate: int) -> Tuple[float, float, np.ndarray]:
+        """
+        Volume and voice confidence of one VAD window (context + samples), and
+        the new RNN state. Both are worked out on an engine thread; x must not
+        change until this returns.
+        """
+        self._ensure_threads()
+        request = _VADRequest(x, state, sample_rate, asyncio.get_running_loop().create_future())
+        self._queue.put(request)
+        await request.future
+        if request.error is not None:
+            raise request.error
+        return request.volume, request.confidence, request.state
+
+    def warm_up(self) -> None:
+        """Run one dummy inference so the first real call doesn't pay for it."""
+        for sample_rate in (8000, 16000):
+            x = np.zeros(_context_size(sample_rate) + _num_samples(sample_rate), dtype=np.float32)
+            state = np.zeros((2, 1, 128), dtype=np.float32)
+            self._run_batch([_VADRequest(x, state, sample_rate)])
+        logger.info("[VAD_ENGINE] Warm-up inference done.")
+
+    def close(self) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            stop = False
+            while len(batch) < self._max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            by_rate: dict[int, List[_VADRequest]] = {}
+            for request in batch:
+                by_rate.setdefault(request.sample_rate, []).append(request)
+            for requests in by_rate.values():
+                self._run_batch(requests)
+
+            if stop:
+                return
+
+    def _run_batch(self, requests: List[_VADRequest]) -> None:
+        try:
+            sample_rate = requests[0].sample_rate
+            context = _context_size(sample_rate)
+            for request in requests:
+                if request.future is not None:
+                    request.volume = pcm_volume(request.x[context:], sample_rate)
+            if len(requests) == 1:
+                x = requests[0].x[np.newaxis, :]
+                state = requests[0].state
+            else:
+                x = np.stack([r.x for r in requests])
+                state = np.concatenate([r.state for r in requests], axis=1)
+
+            out, new_state = self._session.run(
+                None,
+                {"input": x, "state": state, "sr": np.array(sample_rate, dtype="int64")},
+            )
+
+            for i, request in enumerate(requests):
+                request.confidence = float(out[i][0])
+                request.state = new_state[:, i : i + 1, :].copy()
+            self.frames += len(requests)
+            self.batches += 1
+        except Exception as e:
+            for request in requests:
+                request.error = e
+        finally:
+            for request in requests:
+                if request.future is None:
+                    request.done.set()
+                    continue
+                try:
+                    request.future.get_loop().call_soon_threadsafe(_resolve, request)
+                except RuntimeError:
+                    pass  # the caller's loop has closed
+
+
+class PooledSileroVADAnalyzer(VADAnalyzer):
+    """
+    Per-call Silero VAD analyzer backed by the shared SileroVADEngine.
+
+    Behaves like pipecat's SileroVADAnalyzer but only keeps this call's RNN
+    state and its audio window buffer; the ONNX session lives in the engine.
+    Audio goes straight from the transport's bytes into a preallocated
+    float32 buffer (audio_codec.PcmWindowBuffer), and each window's volume is
+    computed from it without pyloudnorm.
+    """
+
+    def __init__(
+        self,
+        *,
+        engine: Optional[SileroVADEngine] = None,
+        sample_rate: Optional[int] = None,
+        params: Optional[VADParams] = None,
+        offload: str = AUDIO_OFFLOAD,
+    ):
+        if offload not in ("pool", "call"):
+            raise ValueError(f"Unknown AUDIO_OFFLOAD {offload!r}; use pool or call")
+        self._window: Optional[PcmWindowBuffer] = None
+        super().__init__(sample_rate=sample_rate, params=params)
+        self._engine = engine or get_vad_engine()
+        self._offload = offload
+        self._reset_model_state()
+        self._last_reset_time = 0
+
+    @property
+    def volume(self) -> float:
+        """Smoothed volume of the last analysed window (what min_volume is compared to)."""
+        return self._prev_volume
+
+    def _reset_model_state(self) -> None:
+        self._model_state = np.zeros((2, 1, 128), dtype=np.float32)
+        if self._window is not None:
+            self._window.zero_context()
+
+    def set_sample_rate(self, sample_rate: int):
+        if sample_rate != 16000 and sample_rate != 8000:
+            raise ValueError(
+                f"Silero VAD sample rate needs to be 16000 or 8000 (sample rate: {sample_rate})"
+            )
+        self._window = PcmWindowBuffer(_num_samples(sample_rate), _context_size(sample_rate))
+        super().set_sample_rate(sample_rate)
+        self._reset_model_state()
+
+    def set_params(self, params: VADParams):
+        super().set_params(params)
+        if self._window is not None:
+            self._window.clear()
+
+    def num_frames_required(self) -> int:
+        return _num_samples(self.sample_rate)
+
+    def _maybe_reset_model_state(self) -> None:
+        # Same periodic reset as SileroVADAnalyzer so state doesn't drift
+        curr_time = time.time()
+        if curr_time - self._last_reset_time >= _MODEL_RESET_STATES_TIME:
+            self._reset_model_state()
+            self._last_reset_time = curr_time
+
+    def _infer(self, x: np.ndarray) -> float:
+        try:
+            confidence, self._model_state = self._engine.infer(x, self._model_state, self.sample_rate)
+            self._maybe_reset_model_state()
+            return confidence
+        except Exception as e:
+            logger.error(f"[VAD_ENGINE] Error analyzing audio: {e}")
+            return 0
+
+    def voice_confidence(self, buffer) -> float:
+        confidence = 0.0
+        self._window.write(buffer)
+        for x in self._window.windows():
+            confidence = self._infer(x)
+        return confidence
+
+    async def analyze_audio(self, buffer: bytes) -> VADState:
+        if self._offload == "call":
+            return await super().analyze_audio(buffer)
+        self._window.write(buffer)
+        if len(self._window) < self._window.window:
+            return self._vad_state  # no complete window: nothing changes
+        for x in self._window.windows():
+            try:
+                volume, confidence, self._model_state = await self._engine.analyze(
+                    x, self._model_state, self.sample_rate
+                )
+            except Exception as e:
+                logger.error(f"[VAD_ENGINE] Error analyzing audio: {e}")
+                volume = confidence = 0.0
+            else:
+                self._maybe_reset_model_state()
+            self._step(volume, confidence)
+        return self._settle()
+
+    def _run_analyzer(self, buffer: bytes) -> VADState:
+        # VADAnalyzer._run_analyzer() on the window buffer instead of bytes
+        self._window.write(buffer)
+        for x in self._window.windows():
+            # Volume first: a model reset in _infer() zeroes the end of x (the next context)
+            volume = pcm_volume(x[self._window.context :], self.sample_rate)
+            self._step(volume, self._infer(x))
+        return self._settle()
+
+    def _step(self, volume: float, confidence: float) -> None:
+        """VADAnalyzer's state transitions for one window."""
+        self._prev_volume = exp_smoothing(volume, self._prev_volume, self._smoothing_factor)
+        speaking = confidence >= self._params.confidence and self._prev_volume >= self._params.min_volume
+
+        if speaking:
+            if self._vad_state == VADState.QUIET:
+                self._vad_state = VADState.STARTING
+                self._vad_starting_count = 1
+            elif self._vad_state == VADState.STARTING:
+                self._vad_starting_count += 1
+            elif self._vad_state == VADState.STOPPING:
+                self._vad_state = VADState.SPEAKING
+                self._vad_stopping_count = 0
+        else:
+            if self._vad_state == VADState.STARTING:
+                self._vad_state = VADState.QUIET
+                self._vad_starting_count = 0
+            elif self._vad_state == VADState.SPEAKING:
+                self._vad_state = VADState.STOPPING
+                self._vad_stopping_count = 1
+            elif self._vad_state == VADState.STOPPING:
+                self._vad_stopping_count += 1
+
+    def _settle(self) -> VADState:
+        if self._vad_state == VADState.STARTING and self._vad_starting_count >= self._vad_start_frames:
+            self._vad_state = VADState.SPEAKING
+            self._vad_starting_count = 0
+
+        if self._vad_state == VADState.STOPPING and self._vad_stopping_count >= self._vad_stop_frames:
+            self._vad_state = VADState.QUIET
+            self._vad_stopping_count = 0
+
+        return self._vad_state
+
+
+_engine: Optional[SileroVADEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_vad_engine() -> SileroVADEngine:
+    """
+    Return the process-wide engine, loading the model on first use.
+    The server's warm-up (warmup.py) calls this so the load happens at startup.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = SileroVADEngine()
+    return _engine
+
+
+def close_vad_engine() -> None:
+    """Stop the process-wide engine, if it was ever loaded."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.close()
+            _engine = None
@@ -0,0 +1,129 @@
+# warmup.py
+"""
+Startup warm-up for the call path.
+
+server.py imports bot.py inside the /ws handler, so the first call after a
+start used to pay for everything only the bot needs: importing bot.py and
+the pipecat transport, serializer and provider SDKs behind it, loading the
+Silero model, and building the call's services for the first time.
+WarmUp.start() runs those steps from the lifespan, in the background:
+
+1. load the process-wide Silero engine and run one inference;
+2. import bot.py, and the OpenAI SDK modules it only loads on the first
+   request (about 0.1 s on its own);
+3. build one call's STT, LLM and TTS services and its context, and have
+   the LLM adapter render the prompt and tools once. The objects are
+   dropped afterwards;
+4. open the shared provider connections those services will borrow
+   (client_pool.py): one request on each OpenAI client, and the spare
+   Sarvam TTS WebSockets.
+
+GET /ready answers 503 until the warm-up has finished, so an autoscaler or
+load balancer only routes calls to a warm process. A call that arrives
+earlier waits for it. WARMUP_ON_START=0 skips it, and everything loads on
+the first call as before.
+"""
+import asyncio
+import importlib
+import os
+import time
+from typing import Dict, Optional
+
+from loguru import logger
+
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "1").lower() not in ("0", "false", "no")
+
+# AsyncOpenAI imports its resources on first attribute access (client.chat, client.audio)
+WARM_IMPORTS = ("bot", "openai.resources.chat", "openai.resources.audio")
+
+
+def _load_vad() -> None:
+    from vad_engine import get_vad_engine
+
+    get_vad_engine().warm_up()
+
+
+def _import_modules() -> None:
+    for module in WARM_IMPORTS:
+        importlib.import_module(module)
+
+
+def _build_call_objects():
+    from bot import create_services
+    from prompt_context import build_call_context
+
+    llm, _, tts = create_services()
+    llm.get_llm_adapter().get_llm_invocation_params(build_call_context())
+    return tts
+
+
+async def _open_connections(tts) -> None:
+    from client_pool import get_provider_pool
+
+    await get_provider_pool().prewarm(tts._websocket_url, tts._api_key)
+
+
+class WarmUp:
+    def __init__(self, enabled: bool = WARMUP_ON_START):
+        self.enabled = enabled
+        self.timings: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self._done = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set() and self.error is None
+
+    def start(self) -> None:
+        if not self.enabled:
+            self._done.set()
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def wait(self) -> None:
+        await self._done.wait()
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def status(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "warmup": "disabled" if not self.enabled else "done" if self._done.is_set() else "running",
+            "warmup_secs": {step: round(secs, 3) for step, secs in self.timings.items()},
+            "error": self.error,
+        }
+
+    async def _step(self, name: str, fn, *args, in_thread: bool = True):
+        started = time.monotonic()
+        if asyncio.iscoroutinefunction(fn):
+            result = await fn(*args)
+        elif in_thread:
+            result = await asyncio.to_thread(fn, *args)
+        else:
+            result = fn(*args)
+        self.timings[name] = time.monotonic() - started
+        return result
+
+    async def _run(self) -> None:
+        started = time.monotonic()
+        try:
+            await self._step("vad", _load_vad)
+            await self._step("imports", _import_modules)
+            # Service constructors may create asyncio primitives; keep them on the loop
+            tts = await self._step("services", _build_call_objects, in_thread=False)
+            await self._step("connections", _open_connections, tts)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            logger.exception(f"[WARMUP] Failed; /ready stays 503: {self.error}")
+        else:
+            self.timings["total"] = time.monotonic() - started
+            logger.info(
+                "[WARMUP] Ready in "
+                + ", ".join(f"{step} {secs * 1000:.0f} ms" for step, secs in self.timings.items())
+            )
+        finally:
+            self._done.set()